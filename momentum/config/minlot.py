@@ -1,20 +1,20 @@
 
 from __future__ import annotations
-import json, os
+import os
 from typing import Tuple, Optional
+from momentum.state import read_cache
+from momentum.utils.fixedpoint import PairSpec, decimals_for_step
 
 # Defaults (can be overridden per pair)
 DEFAULTS = {
     "min_qty": 0.0001,   # BTC spot minimum example
     "lot_step": 1e-8,    # BTC lot step
+    "price_decimals": 8, # wide enough not to alter explicit limits
 }
 
 def _load_json(path: str):
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return None
+    # read-only lookups on every sizing call: shared frozen view, re-parsed only when the file changes
+    return read_cache.get(path, None, mode="frozen")
 
 def for_pair(app_path: str, pair: str) -> Tuple[float, float]:
     """Return (min_qty, lot_step) for a given pair, falling back to DEFAULTS.
@@ -35,7 +35,23 @@ def for_pair(app_path: str, pair: str) -> Tuple[float, float]:
     # 2) Fallback: defaults
     return DEFAULTS["min_qty"], DEFAULTS["lot_step"]
 
+def spec_for_pair(app_path: str, pair: str) -> PairSpec:
+    """Fixed-point PairSpec for a pair: lot decimals/min_qty from for_pair(), optional
+    "price_decimals" from the same var/minlot.json entry, else DEFAULTS.
+    """
+    min_qty, lot_step = for_pair(app_path, pair)
+    m = _load_json(os.path.join(app_path, "var", "minlot.json"))
+    entry = (m.get(pair) or {}) if isinstance(m, dict) else {}
+    try:
+        price_dec = int(entry.get("price_decimals", DEFAULTS["price_decimals"]))
+    except Exception:
+        price_dec = DEFAULTS["price_decimals"]
+    return PairSpec.from_steps(10.0 ** -price_dec, lot_step, min_qty)
+
 def quantize_qty(qty: float, lot_step: float) -> float:
-    # Avoid float drift by rounding to nearest step using integer math
-    steps = round(qty / lot_step)
-    return steps * lot_step
+    # Round to nearest step via integer lots; the result is the exact decimal, no float drift
+    try:
+        spec = PairSpec(lot_decimals=decimals_for_step(lot_step))
+    except ValueError:
+        return round(qty / lot_step) * lot_step
+    return spec.qty(spec.qty_lots(qty, "nearest"))
@@ -0,0 +1,227 @@
+
+from __future__ import annotations
+import itertools, os, time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from momentum.models.intent import Intent
+from momentum.utils.safety import LIMIT_ORDER_TYPES, SafetyKnobs, SafetyViolation, enforce_one_position_only
+from momentum.utils.fixedpoint import PairSpec, to_units, wire_dumps
+from momentum.util.clock_sync import exchange_time
+
+# Fast path for WS v2 add_order payloads.
+# The pydantic Intent/AddOrderMessage in ws_v2_payloads stay the validating front door:
+# an OrderTemplate is compiled once per symbol from a validated Intent, after which every
+# order only fills in side/qty/prices and is serialized straight to bytes with orjson
+# (fixedpoint.wire_dumps, so the decimal strings of the fixed-point builders go out as numbers).
+
+@dataclass(slots=True)
+class FastIntent:
+    side: str
+    qty: float
+    limit_price: Optional[float] = None
+    cl_ord_id: Optional[str] = None
+    oto_trigger_price: Optional[float] = None
+    oto_limit_price: Optional[float] = None
+
+@dataclass(slots=True)
+class FastTPLeg:
+    trigger_price: float
+    limit_price: Optional[float] = None
+    pct_size: float = 1.0
+
+class _ClidSeq:
+    """Process-unique cl_ord_id generator (random 48-bit base + counter), same shape as _gen_cl_ord_id."""
+    __slots__ = ("_base", "_n")
+
+    def __init__(self):
+        self._base = int.from_bytes(os.urandom(6), "big")
+        self._n = itertools.count()
+
+    def next(self, prefix: str = "mom") -> str:
+        return f"{prefix}-{(self._base + next(self._n)) & 0xFFFFFFFFFFFF:012x}"
+
+_clids = _ClidSeq()
+_sec_cache: List[Any] = [-1, ""]
+
+def _deadline_iso_fast(ms_from_now: int) -> str:
+    # Same output as ws_v2_payloads._deadline_iso (exchange time); strftime only runs once per second
+    t = exchange_time() + (ms_from_now / 1000.0)
+    s = int(t)
+    if s != _sec_cache[0]:
+        _sec_cache[0] = s
+        _sec_cache[1] = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(s))
+    return f"{_sec_cache[1]}.{int((t % 1)*1000):03d}Z"
+
+class OrderTemplate:
+    """Pre-validated add_order defaults for one symbol/order shape."""
+    __slots__ = ("symbol", "order_type", "tif", "stp_type", "post_only", "validate", "deadline_ms",
+                 "oto_order_type", "gtd_expire_iso", "quote_ccy", "max_notional", "one_position_only", "token",
+                 "_needs_limit", "_oto_needs_limit")
+
+    def __init__(self, intent: Intent, quote_ccy: str, knobs: SafetyKnobs, token_placeholder: str = "TOKEN",
+                 stp_type: str = "cancel_newest"):
+        self.symbol = intent.symbol
+        self.order_type = intent.order_type
+        self.tif = intent.tif
+        self.stp_type = stp_type
+        self.post_only = bool(intent.post_only)
+        self.validate = bool(intent.validate_only)
+        self.deadline_ms = int(intent.deadline_ms)
+        self.oto_order_type = intent.oto_order_type
+        self.gtd_expire_iso = intent.gtd_expire_iso if intent.tif == "gtd" else None
+        self.quote_ccy = quote_ccy
+        self.max_notional = float(knobs.entry_max_notional)
+        self.one_position_only = 1 if knobs.one_position_only else 0
+        self.token = token_placeholder
+        # Checks that only depend on the order shape are resolved once here, not per order
+        self._needs_limit = bool(knobs.abs_limit_required) and intent.order_type in LIMIT_ORDER_TYPES
+        self._oto_needs_limit = bool(intent.oto_order_type and intent.oto_order_type.endswith("-limit"))
+
+    def build(self, fi: FastIntent) -> Dict[str, Any]:
+        # Same per-order checks as build_primary_payload (the template only fixed the shape)
+        if fi.side not in ("buy", "sell"):
+            raise ValueError(f"invalid side: {fi.side!r}")
+        if not fi.qty > 0:
+            raise ValueError(f"invalid qty: {fi.qty!r}")
+        enforce_one_position_only(self.symbol, self.one_position_only, side=fi.side)
+        lp = fi.limit_price
+        if lp is None:
+            if self._needs_limit:
+                raise SafetyViolation(f"ABS_LIMIT_REQUIRED: order_type={self.order_type} must include explicit limit_price")
+        else:
+            notional = fi.qty * lp
+            if notional > self.max_notional:
+                raise SafetyViolation(f"ENTRY_MAX_NOTIONAL exceeded: {notional:.6f} {self.quote_ccy} > {self.max_notional}")
+        params: Dict[str, Any] = {
+            "order_type": self.order_type,
+            "side": fi.side,
+            "order_qty": float(fi.qty),
+            "symbol": self.symbol,
+            "time_in_force": self.tif,
+            "reduce_only": False,
+            "margin": False,
+            "stp_type": self.stp_type,
+            "deadline": _deadline_iso_fast(self.deadline_ms),
+            "validate": self.validate,
+            "token": self.token,
+        }
+        if lp is not None:
+            params["limit_price"] = float(lp)
+        if self.post_only:
+            params["post_only"] = True
+        params["cl_ord_id"] = fi.cl_ord_id or _clids.next()
+        if self.gtd_expire_iso:
+            params["expire_time"] = self.gtd_expire_iso
+        if self.oto_order_type:
+            cond: Dict[str, Any] = {"order_type": self.oto_order_type}
+            if fi.oto_trigger_price is not None:
+                cond["trigger_price"] = float(fi.oto_trigger_price)
+            if self._oto_needs_limit:
+                if fi.oto_limit_price is None:
+                    raise ValueError("OTO limit order requires oto_limit_price")
+                cond["limit_price"] = float(fi.oto_limit_price)
+            params["conditional"] = cond
+        return {"method": "add_order", "params": params, "req_id": None}
+
+    def dumps(self, fi: FastIntent) -> bytes:
+        return wire_dumps(self.build(fi))
+
+    def build_units(self, spec: PairSpec, side: str, qty_lots: int, limit_ticks: int | None = None,
+                    cl_ord_id: str | None = None, oto_trigger_ticks: int | None = None,
+                    oto_limit_ticks: int | None = None) -> Dict[str, Any]:
+        """Build from fixed-point lots/ticks; checks run on floats, the payload gets the exact wire strings."""
+        def px(t):
+            return spec.price(t) if t is not None else None
+        msg = self.build(FastIntent(side, spec.qty(qty_lots), px(limit_ticks), cl_ord_id,
+                                    px(oto_trigger_ticks), px(oto_limit_ticks)))
+        params = msg["params"]
+        params["order_qty"] = spec.qty_str(qty_lots)
+        if limit_ticks is not None:
+            params["limit_price"] = spec.price_str(limit_ticks)
+        cond = params.get("conditional")
+        if cond is not None:
+            if oto_trigger_ticks is not None:
+                cond["trigger_price"] = spec.price_str(oto_trigger_ticks)
+            if "limit_price" in cond:
+                cond["limit_price"] = spec.price_str(oto_limit_ticks)
+        return msg
+
+class TPTemplate:
+    """Pre-validated defaults for standalone take-profit legs of one symbol/side."""
+    __slots__ = ("symbol", "side", "token", "deadline_ms", "spec")
+
+    def __init__(self, symbol: str, side: str, token_placeholder: str = "TOKEN", deadline_ms: int = 5000,
+                 spec: PairSpec | None = None):
+        if side not in ("buy", "sell"):
+            raise ValueError(f"invalid side: {side!r}")
+        self.symbol = symbol
+        self.side = side
+        self.token = token_placeholder
+        self.deadline_ms = int(deadline_ms)
+        self.spec = spec
+
+    def build(self, base_qty: float, tps: Sequence[Any]) -> List[Dict[str, Any]]:
+        msgs: List[Dict[str, Any]] = []
+        deadline = _deadline_iso_fast(self.deadline_ms)
+        spec = self.spec
+        base_lots = spec.qty_lots(base_qty) if spec is not None else 0
+        for i, leg in enumerate(tps, start=1):
+            lp = leg.limit_price
+            tp = leg.trigger_price
+            if spec is not None:
+                qty = spec.qty_str(to_units(base_lots * float(leg.pct_size), 1, "floor"))
+                tp = spec.price_str(spec.price_ticks(tp))
+                lp = spec.price_str(spec.price_ticks(lp)) if lp is not None else None
+            else:
+                qty = round(base_qty * float(leg.pct_size), 12)
+                tp = float(tp)
+                lp = float(lp) if lp is not None else None
+            params: Dict[str, Any] = {
+                "order_type": "take-profit-limit" if lp is not None else "take-profit",
+                "side": self.side,
+                "order_qty": qty,
+                "symbol": self.symbol,
+                "time_in_force": "gtc",
+                "reduce_only": False,
+                "margin": False,
+                "stp_type": "cancel_newest",
+                "deadline": deadline,
+                "validate": True,
+                "cl_ord_id": _clids.next(f"tp{i}"),
+                "token": self.token,
+                "triggers": {"reference": "last", "price": tp, "price_type": "static"},
+            }
+            if lp is not None:
+                params["limit_price"] = lp
+            msgs.append({"method": "add_order", "params": params, "req_id": None})
+        return msgs
+
+    def dumps(self, base_qty: float, tps: Sequence[Any]) -> List[bytes]:
+        return [wire_dumps(m) for m in self.build(base_qty, tps)]
+
+class TemplateCache:
+    """Per-symbol OrderTemplate cache sharing one set of safety knobs and token placeholder."""
+
+    def __init__(self, quote_ccy: str, knobs: SafetyKnobs, token_placeholder: str = "TOKEN"):
+        self.quote_ccy = quote_ccy
+        self.knobs = knobs
+        self.token = token_placeholder
+        self._tpl: Dict[Tuple, OrderTemplate] = {}
+
+    def get(self, symbol: str, order_type: str = "limit", tif: str = "gtc", post_only: bool = False,
+            validate_only: bool = True, deadline_ms: int = 5000, oto_order_type: str | None = None,
+            gtd_expire_iso: str | None = None) -> OrderTemplate:
+        key = (symbol, order_type, tif, post_only, validate_only, deadline_ms, oto_order_type, gtd_expire_iso)
+        tpl = self._tpl.get(key)
+        if tpl is None:
+            # Validate the shape once through the pydantic front door
+            intent = Intent(symbol=symbol, side="buy", qty=0.0, order_type=order_type, tif=tif, post_only=post_only,
+                            validate_only=validate_only, deadline_ms=deadline_ms, oto_order_type=oto_order_type,
+                            gtd_expire_iso=gtd_expire_iso)
+            tpl = self._tpl[key] = OrderTemplate(intent, self.quote_ccy, self.knobs, self.token)
+        return tpl
+
+    def set_token(self, token: str) -> None:
+        self.token = token
+        for tpl in self._tpl.values():
+            tpl.token = token
@@ -1,10 +1,12 @@
 
 from __future__ import annotations
-import time, uuid
+import uuid
 from typing import Any, Dict, Optional, List
 from pydantic import BaseModel
 from momentum.models.intent import Intent, TakeProfitLeg
 from momentum.utils.safety import SafetyKnobs, enforce_abs_limit, enforce_entry_notional, enforce_one_position_only
+from momentum.utils.fixedpoint import PairSpec, to_units
+from momentum.util.clock_sync import exchange_time, format_deadline
 
 WS_ENDPOINT = "wss://ws-auth.kraken.com/v2"
 
@@ -14,18 +16,20 @@ class AddOrderMessage(BaseModel):
     req_id: Optional[int] = None
 
 def _deadline_iso(ms_from_now: int) -> str:
-    # Kraken expects RFC3339 with milliseconds
-    t = time.time() + (ms_from_now / 1000.0)
-    # Format with milliseconds and Z
-    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(t)) + f".{int((t % 1)*1000):03d}Z"
+    # Kraken expects RFC3339 with milliseconds; computed in exchange time (local clock + synced offset)
+    return format_deadline(exchange_time() + (ms_from_now / 1000.0))
+
+def _px(price: float, spec: Optional[PairSpec]) -> float | str:
+    # with a spec: exact wire string on the tick grid (sent as a JSON number by fixedpoint.wire_dumps)
+    return spec.price_str(spec.price_ticks(price)) if spec is not None else float(price)
 
 def _gen_cl_ord_id(prefix: str = "mom") -> str:
     # Short 16-char free text is fine within 18 chars
     return f"{prefix}-{uuid.uuid4().hex[:12]}"
 
 def build_primary_payload(intent: Intent, quote_ccy: str, knobs: SafetyKnobs, token_placeholder: str = "TOKEN") -> AddOrderMessage:
-    # Safety: one-position guard (advisory placeholder)
-    enforce_one_position_only(intent.symbol, 1 if knobs.one_position_only else 0)
+    # Safety: one-position guard (account book lookup; advisory when no fresh book exists)
+    enforce_one_position_only(intent.symbol, 1 if knobs.one_position_only else 0, side=intent.side)
     # Safety: absolute limit if required
     enforce_abs_limit(intent.order_type, intent.limit_price, knobs)
     # Safety: entry max notional (uses limit price if available)
@@ -74,10 +78,16 @@ def build_primary_payload(intent: Intent, quote_ccy: str, knobs: SafetyKnobs, to
     return AddOrderMessage(params=params)
 
 def build_standalone_tp_messages(symbol: str, side: str, base_qty: float, tps: List[TakeProfitLeg], quote_ccy: str,
-                                 knobs: SafetyKnobs, token_placeholder: str = "TOKEN") -> List[AddOrderMessage]:
+                                 knobs: SafetyKnobs, token_placeholder: str = "TOKEN",
+                                 spec: Optional[PairSpec] = None) -> List[AddOrderMessage]:
+    # With a pair spec, legs are floored to whole lots and prices snapped to ticks (as wire strings)
+    base_lots = spec.qty_lots(base_qty) if spec is not None else 0
     msgs: List[AddOrderMessage] = []
     for i, leg in enumerate(tps, start=1):
-        qty_leg = round(base_qty * float(leg.pct_size), 12)
+        if spec is not None:
+            qty_leg = spec.qty_str(to_units(base_lots * float(leg.pct_size), 1, "floor"))
+        else:
+            qty_leg = round(base_qty * float(leg.pct_size), 12)
         params: Dict[str, Any] = {
             "order_type": "take-profit-limit" if leg.limit_price is not None else "take-profit",
             "side": side,
@@ -95,10 +105,10 @@ def build_standalone_tp_messages(symbol: str, side: str, base_qty: float, tps: L
         # Trigger object for top-level triggered orders
         params["triggers"] = {
             "reference": "last",
-            "price": float(leg.trigger_price),
+            "price": _px(leg.trigger_price, spec),
             "price_type": "static",
         }
         if leg.limit_price is not None:
-            params["limit_price"] = float(leg.limit_price)
+            params["limit_price"] = _px(leg.limit_price, spec)
         msgs.append(AddOrderMessage(params=params))
     return msgs
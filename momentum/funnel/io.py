@@ -1,5 +1,6 @@
 from __future__ import annotations
-import json, os, tempfile, shutil, pathlib
+import os, tempfile, shutil, pathlib
+from momentum.state import codec
 
 def ensure_dir(p: str) -> None:
     pathlib.Path(p).parent.mkdir(parents=True, exist_ok=True)
@@ -7,8 +8,8 @@ def ensure_dir(p: str) -> None:
 def atomic_write_json(path: str, obj) -> None:
     ensure_dir(path)
     d = pathlib.Path(path).parent
-    with tempfile.NamedTemporaryFile('w', dir=d, delete=False) as tmp:
-        json.dump(obj, tmp, indent=2, sort_keys=False)
+    with tempfile.NamedTemporaryFile('wb', dir=d, delete=False) as tmp:
+        tmp.write(codec.encode_for(path, obj, pretty=True))   # funnel outputs stay human-readable
         tmp.flush()
         os.fsync(tmp.fileno())
         tmp_name = tmp.name
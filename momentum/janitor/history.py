@@ -0,0 +1,127 @@
+from __future__ import annotations
+import asyncio, json, os, time
+from typing import Any, Dict, List, Optional
+
+from ..state.json_safety import read_json_dict, write_json
+
+COMMIT_WINDOW_SEC = float(os.environ.get("JANITOR_HISTORY_COMMIT_MS", "20")) / 1000.0
+COMPACT_EVERY = int(os.environ.get("JANITOR_HISTORY_COMPACT_EVERY", "256"))
+DONE_TTL_SEC = float(os.environ.get("JANITOR_HISTORY_DONE_TTL_SEC", str(7 * 86400)))
+
+class JanitorHistory:
+    """Janitor `done` / `last_seen` maps: snapshot (janitor_history.json) + append-only journal (.jsonl).
+
+    mark() updates memory and queues one journal line; lines queued within COMMIT_WINDOW are written
+    and fsynced together (group commit), and every awaiting caller resumes after that single fsync.
+    After COMPACT_EVERY journal records (and on close()) the snapshot is rewritten atomically without
+    `last_seen` entries older than the debounce window or `done` entries older than DONE_TTL, then the
+    journal is truncated. Replaying the journal over the snapshot is idempotent, so a crash between the
+    two steps loses nothing. Old single-file histories load unchanged.
+    """
+    def __init__(self, path: str, debounce_sec: float, commit_window_s: float = COMMIT_WINDOW_SEC,
+                 compact_every: int = COMPACT_EVERY, done_ttl_s: float = DONE_TTL_SEC):
+        self.path = path
+        self.journal_path = os.path.splitext(path)[0] + ".jsonl"
+        self.debounce_sec = float(debounce_sec)
+        self.commit_window_s = commit_window_s
+        self.compact_every = compact_every
+        self.done_ttl_s = done_ttl_s
+        snap = read_json_dict(path)
+        self.done: Dict[str, Any] = dict(snap.get("done") or {})
+        self.last_seen: Dict[str, float] = dict(snap.get("last_seen") or {})
+        self.journal_records = self._replay()
+        self._buf: List[str] = []
+        self._waiters: List[asyncio.Future] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self.commits = 0
+        self.compactions = 0
+
+    def _replay(self) -> int:
+        n = 0
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        break                        # torn tail from a crash mid-append
+                    self._apply(rec)
+                    n += 1
+        except FileNotFoundError:
+            pass
+        return n
+
+    def _apply(self, rec: Dict[str, Any]) -> None:
+        key, ts = rec["k"], rec["ts"]
+        self.last_seen[key] = ts
+        if "ack" in rec:
+            self.done[key] = {"ts": ts, "ack": rec["ack"]}
+
+    # ---- reads -------------------------------------------------------------------
+    def seen_recent(self, key: str, now: Optional[float] = None) -> bool:
+        return ((time.time() if now is None else now) - self.last_seen.get(key, 0)) < self.debounce_sec
+
+    # ---- writes ------------------------------------------------------------------
+    def record(self, key: str, ack: Optional[dict] = None, ts: Optional[float] = None) -> None:
+        """Apply in memory and queue the journal line (sync callers then call flush())."""
+        rec: Dict[str, Any] = {"k": key, "ts": time.time() if ts is None else ts}
+        if ack is not None:
+            rec["ack"] = ack
+        self._apply(rec)
+        self._buf.append(json.dumps(rec, ensure_ascii=False, separators=(",", ":")))
+
+    async def mark(self, key: str, ack: Optional[dict] = None) -> None:
+        """record() and wait until the group commit holding it is durable."""
+        self.record(key, ack)
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._group_commit())
+        await fut
+
+    async def _group_commit(self) -> None:
+        await asyncio.sleep(self.commit_window_s)
+        waiters, self._waiters = self._waiters, []
+        try:
+            self.flush()
+        except Exception as e:
+            for w in waiters:
+                if not w.done():
+                    w.set_exception(e)
+            return
+        for w in waiters:
+            if not w.done():
+                w.set_result(None)
+
+    def flush(self) -> int:
+        if not self._buf:
+            return 0
+        lines, self._buf = self._buf, []
+        os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.commits += 1
+        self.journal_records += len(lines)
+        if self.journal_records >= self.compact_every:
+            self.compact()
+        return len(lines)
+
+    def compact(self, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        self.last_seen = {k: t for k, t in self.last_seen.items() if now - t < self.debounce_sec}
+        self.done = {k: v for k, v in self.done.items() if now - float(v.get("ts") or 0) < self.done_ttl_s}
+        write_json(self.path, {"done": self.done, "last_seen": self.last_seen})
+        with open(self.journal_path, "w", encoding="utf-8") as f:
+            f.flush()
+            os.fsync(f.fileno())
+        self.journal_records = 0
+        self.compactions += 1
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        self.flush()
+        if self.journal_records:
+            self.compact()
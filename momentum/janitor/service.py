@@ -1,10 +1,13 @@
 from __future__ import annotations
 import os, time, json, asyncio
 import aiohttp
-from ..state.json_safety import read_json_dict, read_json_list, write_json
-from ..util.rate_limit import TokenBucket
+from ..state.json_safety import read_json_dict
+from ..util.rate_limit import PriorityRateLimiter
+from .history import JanitorHistory
 
 WS_AUTH_URL = "wss://ws-auth.kraken.com/v2"
+# Kraken accepts a WS token for 15 minutes after issue; stay well inside that
+TOKEN_MAX_AGE_SEC = float(os.environ.get("JANITOR_TOKEN_MAX_AGE_SEC", "600"))
 
 def _log(app: str, level: str, msg: str, **kv):
     line = {"ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "lvl": level, "msg": msg, **kv}
@@ -26,6 +29,30 @@ async def _get_token(session: aiohttp.ClientSession) -> str:
     res = await kr._post_private("GetWebSocketsToken", {})
     return res["token"]
 
+async def _cached_token(app: str, session: aiohttp.ClientSession) -> str:
+    """WS token from the warm-start snapshot while younger than TOKEN_MAX_AGE_SEC, else a fresh one."""
+    from ..state.warm_start import WarmStart
+    warm = WarmStart(app, "janitor")
+    token = warm.get("token", TOKEN_MAX_AGE_SEC)
+    if token:
+        return token
+    token = await _get_token(session)
+    warm.put("token", token)
+    try:
+        warm.save("strict")
+    except Exception:
+        pass
+    return token
+
+def _drop_cached_token(app: str) -> None:
+    from ..state.warm_start import WarmStart
+    warm = WarmStart(app, "janitor")
+    warm.put("token", None, ts=0.0)
+    try:
+        warm.save("strict")
+    except Exception:
+        pass
+
 async def _ws_call(method: str, params: dict, session: aiohttp.ClientSession) -> dict:
     req = {"method": method, "params": params, "req_id": int(time.time()*1000)}
     ws = await session.ws_connect(WS_AUTH_URL, heartbeat=25)
@@ -46,22 +73,13 @@ async def _ws_call(method: str, params: dict, session: aiohttp.ClientSession) ->
 class Janitor:
     def __init__(self, app: str, rate_per_sec: float = 2.0, burst: int = 4, debounce_sec: int = 5):
         self.app = app
-        self.bucket = TokenBucket(rate_per_sec, burst)
+        self.limiter = PriorityRateLimiter(rate_per_sec, burst)
         self.debounce_sec = debounce_sec
         self.history_path = os.path.join(app, "var", "janitor_history.json")
-        self.hist = read_json_dict(self.history_path) or {"done": {}, "last_seen": {}}
+        self.history = JanitorHistory(self.history_path, debounce_sec)
 
     def _seen_recent(self, key: str) -> bool:
-        t = self.hist["last_seen"].get(key, 0)
-        return (time.time() - t) < self.debounce_sec
-
-    def _mark_seen(self, key: str):
-        self.hist["last_seen"][key] = time.time()
-        write_json(self.history_path, self.hist)
-
-    def _mark_done(self, key: str, ack: dict):
-        self.hist["done"][key] = {"ts": time.time(), "ack": ack}
-        write_json(self.history_path, self.hist)
+        return self.history.seen_recent(key)
 
     async def run_once(self) -> None:
         _log(self.app, "info", "janitor_run_once_start")
@@ -75,59 +93,73 @@ class Janitor:
         close  = actions.get("close") or []
         amend  = actions.get("amend") or []
 
+        # (priority, fairness key, dedupe key, method, params, log label)
+        jobs = []
+        for item in close:
+            pair = item.get("pair"); qty = item.get("qty"); side = item.get("side")
+            key = f"close:{pair}:{side}:{qty}"
+            if not pair or not qty or not side:
+                _log(self.app, "error", "close_missing_fields", item=item)
+                continue
+            if self._seen_recent(key):
+                continue
+            params = {
+                "symbol": pair,
+                "side": side,
+                "order_type": "market",
+                "order_qty": float(qty),
+                "reduce_only": True,
+                "validate": False,
+            }
+            jobs.append((PriorityRateLimiter.CLOSE, pair, key, "add_order", params, "close"))
+
+        for item in cancel:
+            key = f"cancel:{item.get('cl_ord_id') or item.get('order_id')}"
+            if not key or self._seen_recent(key):
+                continue
+            params = {}
+            if item.get("order_id"):
+                params["order_id"] = item["order_id"]
+            elif item.get("cl_ord_id"):
+                params["cl_ord_id"] = item["cl_ord_id"]
+            else:
+                _log(self.app, "error", "cancel_missing_id", item=item); continue
+            jobs.append((PriorityRateLimiter.CANCEL, item.get("symbol") or key, key, "cancel_order", params, "cancel"))
+
+        for item in amend:
+            key = f"amend:{item.get('cl_ord_id') or item.get('order_id')}"
+            if self._seen_recent(key):
+                continue
+            params = {}
+            for fld in ("cl_ord_id","order_id","price","limit_price","order_qty","trigger_price","trigger_price_type"):
+                if fld in item:
+                    params[fld] = item[fld]
+            jobs.append((PriorityRateLimiter.AMEND, item.get("symbol") or key, key, "amend_order", params, "amend"))
+
+        if not jobs:
+            await self.history.close()
+            return
         async with aiohttp.ClientSession() as sess:
-            token = await _get_token(sess)
-
-            for item in cancel:
-                key = f"cancel:{item.get('cl_ord_id') or item.get('order_id')}"
-                if not key or self._seen_recent(key):
-                    continue
-                if not self.bucket.allow():
-                    _log(self.app, "warn", "rate_limited", action="cancel", key=key); continue
-                params = {"token": token}
-                if item.get("order_id"):
-                    params["order_id"] = item["order_id"]
-                elif item.get("cl_ord_id"):
-                    params["cl_ord_id"] = item["cl_ord_id"]
-                else:
-                    _log(self.app, "error", "cancel_missing_id", item=item); continue
-                ack = await _ws_call("cancel_order", params, sess)
-                _log(self.app, "info", "cancel_ack", key=key, ack=ack)
-                self._mark_done(key, ack); self._mark_seen(key)
-
-            for item in close:
-                pair = item.get("pair"); qty = item.get("qty"); side = item.get("side")
-                key = f"close:{pair}:{side}:{qty}"
-                if not pair or not qty or not side: 
-                    _log(self.app, "error", "close_missing_fields", item=item); 
-                    continue
-                if self._seen_recent(key): 
-                    continue
-                if not self.bucket.allow():
-                    _log(self.app, "warn", "rate_limited", action="close", key=key); continue
-                params = {
-                    "token": token,
-                    "symbol": pair,
-                    "side": side,
-                    "order_type": "market",
-                    "order_qty": float(qty),
-                    "reduce_only": True,
-                    "validate": False,
-                }
-                ack = await _ws_call("add_order", params, sess)
-                _log(self.app, "info", "close_ack", key=key, ack=ack)
-                self._mark_done(key, ack); self._mark_seen(key)
-
-            for item in amend:
-                key = f"amend:{item.get('cl_ord_id') or item.get('order_id')}"
-                if self._seen_recent(key): 
-                    continue
-                if not self.bucket.allow():
-                    _log(self.app, "warn", "rate_limited", action="amend", key=key); continue
-                params = {"token": token}
-                for fld in ("cl_ord_id","order_id","price","limit_price","order_qty","trigger_price","trigger_price_type"):
-                    if fld in item:
-                        params[fld] = item[fld]
-                ack = await _ws_call("amend_order", params, sess)
-                _log(self.app, "info", "amend_ack", key=key, ack=ack)
-                self._mark_done(key, ack); self._mark_seen(key)
+            token = await _cached_token(self.app, sess)
+
+            async def _send(prio, fair_key, key, method, params, label):
+                # queued, never dropped: waits for budget (closes first, round-robin per symbol)
+                waited = await self.limiter.acquire(prio, fair_key)
+                if waited > 0:
+                    _log(self.app, "info", "rate_wait", action=label, key=key, wait_s=round(waited, 3))
+                ack = await _ws_call(method, dict(params, token=token), sess)
+                if ack.get("success") is False and "token" in str(ack.get("error") or "").lower():
+                    _drop_cached_token(self.app)
+                _log(self.app, "info", f"{label}_ack", key=key, ack=ack)
+                await self.history.mark(key, ack)     # done + last_seen in one group-committed journal line
+
+            res = await asyncio.gather(*(_send(*j) for j in jobs), return_exceptions=True)
+            for j, r in zip(jobs, res):
+                if isinstance(r, Exception):
+                    _log(self.app, "error", f"{j[5]}_failed", key=j[2], err=repr(r))
+        await self.history.close()
+        try:
+            from ..observability.textfile import write_textfile
+            write_textfile(self.app, "janitor_rate", self.limiter.prom_lines("momentum_janitor_rate"))
+        except Exception:
+            pass
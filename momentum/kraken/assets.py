@@ -0,0 +1,124 @@
+from __future__ import annotations
+import asyncio, os, time
+from typing import Any, Dict, Optional
+
+from ..state.atomic_json import AtomicJSONWriter, read_json
+
+SCHEMA_ASSET_INDEX = "asset_index/v1"
+TTL_SEC = float(os.environ.get("ASSET_INDEX_TTL_SEC", "86400"))
+QUOTE_CODES = ("ZUSD", "USD")
+# REST / v1 wsnames use XBT and XDG, WS v2 symbols use BTC and DOGE
+V2_ALIASES = {"XBT": "BTC", "XDG": "DOGE"}
+_FROM_V2 = {v: k for k, v in V2_ALIASES.items()}
+_PAIR_FIELDS = ("altname", "wsname", "base", "quote", "lot_decimals", "pair_decimals", "ordermin")
+
+def index_path(app_path: str) -> str:
+    return os.path.join(app_path, "var", "asset_index.json")
+
+def _legacy_alt(code: str) -> str:
+    # Kraken's 4-letter legacy codes carry an X (crypto) / Z (fiat) class prefix: XXBT, XETH, ZUSD
+    return code[1:] if len(code) == 4 and code[0] in "XZ" and code not in ("XTZ",) else code
+
+class AssetIndex:
+    """Kraken asset codes <-> altnames <-> pair keys / wsnames, built once from Assets + AssetPairs."""
+    def __init__(self, assets: Dict[str, Any], pairs: Dict[str, Any], built_at: Optional[float] = None):
+        self.built_at = time.time() if built_at is None else built_at
+        self.assets = {k: {"altname": v.get("altname")} for k, v in assets.items()}
+        self.pairs = {k: {f: v.get(f) for f in _PAIR_FIELDS} for k, v in pairs.items() if not k.endswith(".d")}
+        self.alt = {k: v["altname"] or k for k, v in self.assets.items()}
+        self.by_name: Dict[str, str] = {}
+        self.usd: Dict[str, str] = {}
+        for key, p in self.pairs.items():
+            self.by_name[key] = key
+            for name in (p.get("altname"), p.get("wsname"), self.ws_symbol(key)):
+                if name:
+                    self.by_name.setdefault(name, key)
+            if p.get("quote") in QUOTE_CODES and p.get("base") and (p["base"] not in self.usd or p["quote"] == "ZUSD"):
+                self.usd[p["base"]] = key
+
+    # ---- assets --------------------------------------------------------------------------
+    def asset_alt(self, code: str) -> str:
+        """REST or WS v2 asset code -> position key ("XXBT"/"BTC" -> "XBT", "ZUSD" -> "USD", "ETH.F" kept)."""
+        return self.alt.get(code) or _FROM_V2.get(code) or _legacy_alt(code)
+
+    def is_quote(self, code: str) -> bool:
+        return self.asset_alt(code.split(".", 1)[0]) == "USD"
+
+    # ---- pairs ---------------------------------------------------------------------------
+    def pair_key(self, name: str) -> Optional[str]:
+        """Pair key for a REST key, altname, v1 wsname or v2 symbol."""
+        return self.by_name.get(name)
+
+    def base_of(self, pair: str) -> Optional[str]:
+        key = self.pair_key(pair)
+        return self.pairs[key]["base"] if key else None
+
+    def usd_pair(self, code: str) -> Optional[str]:
+        return self.usd.get(code)
+
+    def ws_symbol(self, key: str) -> Optional[str]:
+        """v2 symbol for a pair key ("XXBTZUSD" -> "BTC/USD")."""
+        ws = (self.pairs.get(key) or {}).get("wsname")
+        if not ws or "/" not in ws:
+            return ws
+        b, q = ws.split("/", 1)
+        return f"{V2_ALIASES.get(b, b)}/{V2_ALIASES.get(q, q)}"
+
+    def altname(self, key: str) -> Optional[str]:
+        return (self.pairs.get(key) or {}).get("altname")
+
+    # ---- persistence ---------------------------------------------------------------------
+    def to_dict(self) -> Dict[str, Any]:
+        return {"built_at": self.built_at, "assets": self.assets, "pairs": self.pairs}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "AssetIndex":
+        return cls(d.get("assets") or {}, d.get("pairs") or {}, float(d.get("built_at") or 0.0))
+
+def v2_symbol(name: Optional[str], index: Optional[AssetIndex] = None) -> Optional[str]:
+    """Any pair name (REST key/altname, v1 wsname, v2 symbol) -> v2 symbol ("XBTUSD" -> "BTC/USD").
+
+    Uses the index when it knows the pair; otherwise USD pairs are split by their quote suffix."""
+    if not name:
+        return name
+    if index is not None:
+        key = index.pair_key(name)
+        if key:
+            return index.ws_symbol(key) or name
+    if "/" in name:
+        b, q = name.split("/", 1)
+    else:
+        q = next((c for c in QUOTE_CODES if name.endswith(c) and len(name) > len(c)), None)
+        if q is None:
+            return name
+        b, q = _legacy_alt(name[:-len(q)]), "USD"
+    return f"{V2_ALIASES.get(b, b)}/{V2_ALIASES.get(q, q)}"
+
+_cached: Dict[str, AssetIndex] = {}
+
+def cached_asset_index(app_path: str) -> Optional[AssetIndex]:
+    """Index already held by this process or in var/asset_index.json, any age; never fetches (sync callers)."""
+    idx = _cached.get(app_path)
+    if idx is None:
+        d = read_json(index_path(app_path))
+        if d.get("_schema") == SCHEMA_ASSET_INDEX:
+            idx = _cached[app_path] = AssetIndex.from_dict(d)
+    return idx
+
+async def load_asset_index(app_path: str, kraken, max_age_s: float = TTL_SEC, refresh: bool = False) -> AssetIndex:
+    """Process cache -> var/asset_index.json (younger than max_age_s) -> Assets + AssetPairs fetched concurrently."""
+    idx = _cached.get(app_path)
+    if idx is not None and not refresh and time.time() - idx.built_at <= max_age_s:
+        return idx
+    if not refresh:
+        d = read_json(index_path(app_path))
+        if d.get("_schema") == SCHEMA_ASSET_INDEX and time.time() - float(d.get("built_at") or 0) <= max_age_s:
+            idx = _cached[app_path] = AssetIndex.from_dict(d)
+            return idx
+    assets, pairs = await asyncio.gather(kraken.assets(), kraken.asset_pairs())
+    idx = _cached[app_path] = AssetIndex(assets, pairs)
+    try:
+        AtomicJSONWriter(index_path(app_path), schema_version=SCHEMA_ASSET_INDEX).write(idx.to_dict())
+    except Exception:
+        pass
+    return idx
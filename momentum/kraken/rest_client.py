@@ -22,6 +22,7 @@ class KrakenREST:
         self.secret = secret or os.getenv("KRAKEN_SECRET")
         self._own = session is None
         self.session = session or aiohttp.ClientSession(headers={"User-Agent": USER_AGENT})
+        self._nonce = 0
 
     async def close(self):
         if self._own:
@@ -31,7 +32,9 @@ class KrakenREST:
         if not self.key or not self.secret:
             raise RuntimeError("Missing KRAKEN_KEY/SECRET for private REST")
         data = dict(data or {})
-        data["nonce"] = str(int(time.time() * 1000))
+        # strictly increasing even for concurrent calls issued within the same millisecond
+        self._nonce = max(self._nonce + 1, int(time.time() * 1000))
+        data["nonce"] = str(self._nonce)
         path = f"/0/private/{endpoint}"
         sig = _sign(path, data, self.secret)
         headers = {"API-Key": self.key, "API-Sign": sig, "Content-Type": "application/x-www-form-urlencoded; charset=utf-8"}
@@ -51,12 +54,42 @@ class KrakenREST:
                 raise RuntimeError(f"Kraken error: {payload['error']}")
             return payload["result"]
 
+    async def server_time(self) -> dict:
+        return await self._post_public("Time", {})
+
     async def asset_pairs(self) -> dict:
         return await self._post_public("AssetPairs", {})
 
     async def ticker_alt(self, altnames_csv: str) -> dict:
         return await self._post_public("Ticker", {"pair": altnames_csv})
 
+    async def ticker(self, pairs_csv: str) -> dict:
+        return await self._post_public("Ticker", {"pair": pairs_csv})
+
+    async def assets(self) -> dict:
+        return await self._post_public("Assets", {})
+
+    async def balances(self) -> dict:
+        """Return account balances by asset, e.g. {"ZUSD": "123.45", ...}"""
+        return await self._post_private("Balance", {})
+
+    async def open_orders(self) -> dict:
+        return await self._post_private("OpenOrders", {})
+
+    async def closed_orders(self, start: float | None = None, ofs: int = 0) -> dict:
+        """{"closed": {txid: order}, "count": n}, newest first, 50 per page."""
+        data = {"ofs": ofs, "closetime": "close"}
+        if start is not None:
+            data["start"] = start
+        return await self._post_private("ClosedOrders", data)
+
+    async def trades_history(self, start: float | None = None, ofs: int = 0) -> dict:
+        """{"trades": {trade_id: trade}, "count": n}, newest first, 50 per page."""
+        data = {"ofs": ofs}
+        if start is not None:
+            data["start"] = start
+        return await self._post_private("TradesHistory", data)
+
     async def altname_for_wsname(self, wsname: str) -> str | None:
         ap = await self.asset_pairs()
         for v in ap.values():
@@ -4,6 +4,8 @@ import json, os, time, re
 from dataclasses import dataclass, asdict
 from typing import Optional, Dict, Any
 
+from ..state import read_cache
+
 FRESH_THRESHOLD_SEC = 15
 
 @dataclass
@@ -37,8 +39,7 @@ def _json_count(path: str, key: Optional[str] = None) -> JsonCountStatus:
     if not os.path.exists(path):
         return JsonCountStatus(path, False, False, 0, "absent")
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = read_cache.load(path, mode="frozen")
         if key is not None and isinstance(data, dict) and key in data and isinstance(data[key], list):
             cnt = len(data[key])
         elif isinstance(data, list):
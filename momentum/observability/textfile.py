@@ -0,0 +1,39 @@
+
+from __future__ import annotations
+import glob, os
+from typing import Dict, Iterable, List
+
+# Prometheus textfile helpers for var/metrics.d/<name>.prom (picked up by scripts/metrics_http)
+
+def metrics_dir(app_path: str) -> str:
+    return os.path.join(app_path, "var", "metrics.d")
+
+def fmt(name: str, value: float, **labels: str) -> str:
+    if labels:
+        lbl = ",".join(f'{k}="{v}"' for k, v in labels.items())
+        return f"{name}{{{lbl}}} {value}"
+    return f"{name} {value}"
+
+def write_textfile(app_path: str, name: str, lines: Iterable[str]) -> str:
+    """Atomically replace var/metrics.d/<name>.prom with the given metric lines."""
+    d = metrics_dir(app_path)
+    os.makedirs(d, exist_ok=True)
+    path = os.path.join(d, f"{name}.prom")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp, path)
+    return path
+
+def read_textfiles(app_path: str) -> str:
+    out: List[str] = []
+    for path in sorted(glob.glob(os.path.join(metrics_dir(app_path), "*.prom"))):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                out.append(f.read().rstrip("\n"))
+        except Exception:
+            continue
+    return "\n".join(x for x in out if x) + ("\n" if out else "")
+
+def gauge_lines(prefix: str, values: Dict[str, float]) -> List[str]:
+    return [fmt(f"{prefix}_{k}", v) for k, v in values.items()]
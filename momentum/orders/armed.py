@@ -0,0 +1,571 @@
+
+from __future__ import annotations
+import asyncio, itertools, json, os, re, socket, sys, time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+import aiohttp, orjson
+
+from ..exchange.kraken.fast_payloads import TemplateCache
+from ..state import read_cache
+from ..utils.env import load_env_knobs
+from ..utils.fixedpoint import PairSpec, wire_dumps
+from ..utils.safety import SafetyKnobs
+from ..util.backoff import exp_backoff
+
+WS_AUTH_URL = "wss://ws-auth.kraken.com/v2"
+REST_HOST = "api.kraken.com"
+PING_INTERVAL_SEC = float(os.environ.get("ARMED_PING_SEC", "10"))
+TOKEN_REFRESH_SEC = float(os.environ.get("ARMED_TOKEN_REFRESH_SEC", "600"))
+DNS_TTL_SEC = int(os.environ.get("ARMED_DNS_TTL_SEC", "300"))
+ACK_TIMEOUT_SEC = float(os.environ.get("ARMED_ACK_TIMEOUT_SEC", "10"))
+USER_AGENT = "momentum/armed"
+
+class LatencyStats:
+    """Rolling latency samples (seconds) plus running count/sum/max, exported as a Prometheus summary."""
+    __slots__ = ("window", "count", "total", "max")
+
+    def __init__(self, maxlen: int = 2048):
+        self.window: Deque[float] = deque(maxlen=maxlen)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, dt: float) -> None:
+        self.window.append(dt)
+        self.count += 1
+        self.total += dt
+        if dt > self.max:
+            self.max = dt
+
+    def quantile(self, q: float) -> float:
+        if not self.window:
+            return float("nan")
+        xs = sorted(self.window)
+        return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+    def prom_lines(self, name: str, labels: str = "") -> List[str]:
+        lb = f"{{{labels}}}" if labels else ""
+        sep = f"{labels}," if labels else ""
+        return [
+            f'{name}{{{sep}quantile="0.5"}} {self.quantile(0.5)}',
+            f'{name}{{{sep}quantile="0.99"}} {self.quantile(0.99)}',
+            f"{name}_sum{lb} {self.total}",
+            f"{name}_count{lb} {self.count}",
+            f"{name}_max{lb} {self.max}",
+        ]
+
+def selection_has_candidates(app_path: str) -> bool:
+    """True when the funnel's last final stage (var/funnel/selection.json) produced candidates."""
+    try:
+        return int(read_cache.load(os.path.join(app_path, "var", "funnel", "selection.json"), mode="frozen")
+                   .get("candidates") or 0) > 0
+    except Exception:
+        return False
+
+async def preresolve(hosts: List[str], port: int = 443) -> Dict[str, List[str]]:
+    """Resolve hosts up front so a resolver stall surfaces while arming, not when the signal fires."""
+    loop = asyncio.get_running_loop()
+    infos = await asyncio.gather(*(loop.getaddrinfo(h, port, type=socket.SOCK_STREAM) for h in hosts))
+    return {h: sorted({i[4][0] for i in info}) for h, info in zip(hosts, infos)}
+
+class ArmedOrderConnection:
+    """Persistent, authenticated WS v2 order connection opened before the signal fires.
+
+    arm() pre-resolves DNS, opens one keep-alive session (REST token call and WS upgrade share its connector
+    and DNS cache), fetches the WS token, connects and puts the token into the payload templates. A keeper
+    task pings, refreshes the token and reconnects with backoff. Firing is then serialization + one send.
+
+    Latencies: signal_to_wire (caller's signal timestamp -> frame handed to the socket, wall clock),
+    ack (send -> ack, monotonic) and ping RTT; see prom_lines()/write_metrics().
+    """
+    def __init__(self, app_path: Optional[str] = None, url: str = WS_AUTH_URL, knobs: Optional[SafetyKnobs] = None,
+                 quote_ccy: str = "USD", ping_interval: float = PING_INTERVAL_SEC,
+                 token_refresh_s: float = TOKEN_REFRESH_SEC, clock=None):
+        self.app_path = app_path or os.environ.get("APP", ".")
+        self.url = url
+        if knobs is None:
+            raw = load_env_knobs(self.app_path)
+            knobs = SafetyKnobs(entry_max_notional=float(raw.get("ENTRY_MAX_NOTIONAL", 10)),
+                                one_position_only=int(raw.get("ONE_POSITION_ONLY", 1)),
+                                abs_limit_required=int(raw.get("ABS_LIMIT_REQUIRED", 1)))
+        self.templates = TemplateCache(quote_ccy, knobs)
+        self.ping_interval = float(ping_interval)
+        self.token_refresh_s = float(token_refresh_s)
+        self.clock = clock  # optional ClockSync fed from ack time_in/time_out
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.ws = None
+        self.token: Optional[str] = None
+        self.token_ts = 0.0
+        self.addrs: Dict[str, List[str]] = {}
+        self._req = itertools.count(1)
+        self._pending: Dict[int, Tuple[asyncio.Future, float, float]] = {}  # req_id -> (fut, t_send_mono, t_send_wall)
+        self._reader_task: Optional[asyncio.Task] = None
+        self._keeper_task: Optional[asyncio.Task] = None
+        self.signal_to_wire = LatencyStats()
+        self.ack = LatencyStats()
+        self.ping_rtt = LatencyStats()
+        self.sent = 0
+        self.reconnects = 0
+        self.errors = 0
+        self.unconfirmed = 0       # queue passes blocked on an add_order whose ack was lost
+        self.risk_rejects = 0      # queued entries refused by the live risk engine
+        self.armed_since = 0.0
+        from ..state.warm_start import WarmStart
+        self.warm = WarmStart(self.app_path, "armed")   # WS token across restarts (same refresh rule)
+
+    @property
+    def armed(self) -> bool:
+        return self.ws is not None and not self.ws.closed
+
+    # ---- lifecycle --------------------------------------------------------------
+    async def arm(self) -> None:
+        if self.armed:
+            return
+        self.addrs = await preresolve([urlparse(self.url).hostname or "", REST_HOST])
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(ttl_dns_cache=DNS_TTL_SEC, keepalive_timeout=max(30.0, self.ping_interval * 3)),
+                headers={"User-Agent": USER_AGENT})
+        if not self.token:
+            saved = self.warm.get("token", self.token_refresh_s)
+            if saved:
+                self.token, self.token_ts = saved["token"], float(saved["ts"])
+                self.templates.set_token(self.token)
+        if not self.token or time.time() - self.token_ts > self.token_refresh_s:
+            await self.refresh_token()
+        self.attach(await self.session.ws_connect(self.url, heartbeat=self.ping_interval))
+        if self._keeper_task is None:
+            self._keeper_task = asyncio.create_task(self._keeper(), name="armed_keeper")
+
+    def attach(self, ws) -> None:
+        """Adopt an open WS (arm() or tests) and start routing its acks."""
+        self.ws = ws
+        self.armed_since = time.time()
+        self._reader_task = asyncio.create_task(self._reader(ws), name="armed_reader")
+
+    async def refresh_token(self) -> None:
+        from ..kraken.rest_client import KrakenREST
+        res = await KrakenREST(session=self.session)._post_private("GetWebSocketsToken", {})
+        self.set_token(res["token"])
+
+    def set_token(self, token: str) -> None:
+        self.token = token
+        self.token_ts = time.time()
+        self.templates.set_token(token)
+        self.warm.put("token", {"token": token, "ts": self.token_ts}, ts=self.token_ts)
+        try:
+            self.warm.save("strict")
+        except Exception:
+            pass
+
+    async def disarm(self) -> None:
+        for t in (self._keeper_task, self._reader_task):
+            if t is not None:
+                t.cancel()
+        await asyncio.gather(*(t for t in (self._keeper_task, self._reader_task) if t is not None), return_exceptions=True)
+        self._keeper_task = self._reader_task = None
+        if self.ws is not None:
+            await self.ws.close()
+            self.ws = None
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        self._fail_pending("disarmed")
+        self.write_metrics()
+
+    # ---- hot path -----------------------------------------------------------------
+    async def fire(self, msg: Dict[str, Any], t_signal: Optional[float] = None) -> asyncio.Future:
+        """Stamp req_id (+ token if the template still has a placeholder), send; the future resolves with the ack."""
+        if not self.armed:
+            await self.arm()
+        rid = next(self._req)
+        msg["req_id"] = rid
+        params = msg.get("params")
+        if params is not None and params.get("token") in (None, "TOKEN") and self.token:
+            params["token"] = self.token
+        data = wire_dumps(msg).decode()
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[rid] = (fut, time.perf_counter(), time.time())
+        try:
+            await self.ws.send_str(data)
+        except BaseException:
+            self._pending.pop(rid, None)
+            raise
+        if t_signal is not None:
+            self.signal_to_wire.add(max(0.0, time.time() - t_signal))
+        self.sent += 1
+        return fut
+
+    async def call(self, method: str, params: Optional[Dict[str, Any]] = None, timeout: float = ACK_TIMEOUT_SEC,
+                   t_signal: Optional[float] = None) -> Dict[str, Any]:
+        msg: Dict[str, Any] = {"method": method}
+        if params is not None:
+            msg["params"] = dict(params)
+        fut = await self.fire(msg, t_signal)
+        try:
+            return await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            self._pending.pop(msg["req_id"], None)
+            self.errors += 1
+            return {"success": False, "error": "timeout waiting for ack"}
+
+    # ---- background ---------------------------------------------------------------
+    def _on_message(self, data: Dict[str, Any]) -> None:
+        ent = self._pending.pop(data.get("req_id"), None) if data.get("req_id") is not None else None
+        if ent is None:
+            return  # status/heartbeat/unsolicited frames
+        fut, t_mono, t_wall = ent
+        (self.ping_rtt if data.get("method") == "pong" else self.ack).add(time.perf_counter() - t_mono)
+        if data.get("success") is False:
+            self.errors += 1
+        if self.clock is not None:
+            self.clock.add_ws_ack(t_wall, data, time.time())
+        if not fut.done():
+            fut.set_result(data)
+
+    async def _reader(self, ws) -> None:
+        try:
+            while True:
+                msg = await ws.receive()
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    try:
+                        self._on_message(orjson.loads(msg.data))
+                    except Exception:
+                        continue
+                elif msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING,
+                                  aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                    break
+        finally:
+            self._fail_pending("connection closed")
+
+    def _fail_pending(self, why: str) -> None:
+        pending, self._pending = self._pending, {}
+        for fut, _, _ in pending.values():
+            if not fut.done():
+                fut.set_result({"success": False, "error": why})
+
+    async def _keeper(self) -> None:
+        attempt = 0
+        while True:
+            await asyncio.sleep(exp_backoff(attempt) if attempt else self.ping_interval)
+            try:
+                if not self.armed:
+                    self.reconnects += 1
+                    await self.arm()
+                elif time.time() - self.token_ts > self.token_refresh_s:
+                    await self.refresh_token()
+                else:
+                    await self.call("ping", timeout=max(1.0, self.ping_interval))
+                attempt = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.errors += 1
+                attempt += 1
+            self.write_metrics()
+
+    # ---- metrics --------------------------------------------------------------------
+    def prom_lines(self) -> List[str]:
+        return [
+            f"momentum_armed_up {1 if self.armed else 0}",
+            f"momentum_armed_uptime_seconds {time.time() - self.armed_since if self.armed else 0}",
+            f"momentum_armed_sent_total {self.sent}",
+            f"momentum_armed_errors_total {self.errors}",
+            f"momentum_armed_unconfirmed_total {self.unconfirmed}",
+            f"momentum_armed_risk_rejects_total {self.risk_rejects}",
+            f"momentum_armed_reconnects_total {self.reconnects}",
+            f"momentum_armed_pending {len(self._pending)}",
+            *self.signal_to_wire.prom_lines("momentum_armed_signal_to_wire_seconds"),
+            *self.ack.prom_lines("momentum_armed_ack_seconds"),
+            *self.ping_rtt.prom_lines("momentum_armed_ping_rtt_seconds"),
+        ]
+
+    def write_metrics(self) -> None:
+        from ..observability.textfile import write_textfile
+        try:
+            write_textfile(self.app_path, "armed_orders", self.prom_lines())
+        except Exception:
+            pass
+
+# ---- inbox: hand-off from one-shot scripts to the armed runner --------------------------
+
+def inbox_dir(app_path: str) -> str:
+    return os.path.join(app_path, "var", "order_inbox")
+
+def outbox_dir(app_path: str) -> str:
+    return os.path.join(app_path, "var", "order_outbox")
+
+def submit(app_path: str, messages: List[Dict[str, Any]], t_signal: Optional[float] = None, name: Optional[str] = None) -> str:
+    """Drop WS v2 messages for the armed runner; t_signal (epoch) starts the signal-to-wire clock."""
+    d = inbox_dir(app_path)
+    os.makedirs(d, exist_ok=True)
+    name = name or f"{time.time_ns()}-{os.getpid()}"
+    path = os.path.join(d, f"{name}.json")
+    tmp = os.path.join(d, f".{name}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(orjson.dumps({"t_signal": t_signal if t_signal is not None else time.time(), "messages": messages}))
+    os.replace(tmp, path)
+    return path
+
+async def drain_inbox(conn: ArmedOrderConnection, app_path: str, timeout: float = ACK_TIMEOUT_SEC) -> int:
+    """Fire every queued inbox file (all sends first, then await acks); acks go to var/order_outbox/.
+
+    A file is renamed to <name>.processing while it is handled and removed only once its acks are
+    written, so a crash replays it. If the first send fails the file goes back to the inbox and the
+    error is raised; after a partial send the unsent messages are recorded as failed."""
+    d = inbox_dir(app_path)
+    try:
+        names = sorted(n for n in os.listdir(d) if n.endswith(".json") or n.endswith(".json.processing"))
+    except FileNotFoundError:
+        return 0
+    for n in names:
+        name = n[:-len(".processing")] if n.endswith(".processing") else n
+        path, work = os.path.join(d, name), os.path.join(d, name + ".processing")
+        try:
+            if work != os.path.join(d, n):
+                os.replace(path, work)
+            with open(work, "rb") as f:
+                job = orjson.loads(f.read())
+        except Exception:
+            continue
+        t_signal = job.get("t_signal")
+        msgs = job.get("messages") or []
+        futs: List[Any] = []
+        for m in msgs:
+            try:
+                futs.append(await conn.fire(m, t_signal))
+            except Exception as e:
+                if not futs:
+                    os.replace(work, path)          # nothing reached the wire: retry the whole file later
+                    raise
+                conn.errors += 1
+                futs += [{"success": False, "error": f"send failed: {e}"}] * (len(msgs) - len(futs))
+                break
+        acks = []
+        for m, fut in zip(msgs, futs):
+            if isinstance(fut, dict):
+                acks.append(fut)
+                continue
+            try:
+                acks.append(await asyncio.wait_for(fut, timeout))
+            except asyncio.TimeoutError:
+                conn._pending.pop(m.get("req_id"), None)
+                acks.append({"success": False, "error": "timeout waiting for ack"})
+        os.makedirs(outbox_dir(app_path), exist_ok=True)
+        with open(os.path.join(outbox_dir(app_path), name), "wb") as f:
+            f.write(orjson.dumps({"t_signal": t_signal, "acks": acks}))
+        os.remove(work)
+    return len(names)
+
+# ---- intent queue: durable hand-off (state.intent_queue), replaces the inbox for new producers ----
+
+QUEUE_CONSUMER = "armed"
+QUEUE_MAX_ATTEMPTS = int(os.environ.get("ARMED_QUEUE_MAX_ATTEMPTS", "5"))
+QUEUE_BOOK_MAX_AGE = float(os.environ.get("ARMED_QUEUE_BOOK_MAX_AGE_SEC", "30"))
+
+def enqueue(app_path: str, messages: List[Dict[str, Any]], t_signal: Optional[float] = None,
+            key: Optional[str] = None) -> Optional[int]:
+    """Queue WS v2 messages for the armed runner; returns the intent seq, None if `key` (default: the
+    first message's cl_ord_id) was already queued."""
+    from ..state.intent_queue import shared_queue
+    return shared_queue(app_path).put({"messages": messages}, key=key,
+                                      t_signal=t_signal if t_signal is not None else time.time())
+
+def record_exits(app_path: str, base_cid: str, exits: List[Dict[str, Any]], **plan: Any) -> None:
+    """Hold a plan's SL/TP messages back until its -E leg fills (orchestrator plan record, see enqueue_exits)."""
+    from .orchestrator import record_plan
+    record_plan(app_path, dict(plan, base_cid=base_cid, legs=[], exit_messages=exits))
+
+def resize_exits(exits: List[Dict[str, Any]], filled_qty: float, volume: float, spec: PairSpec) -> List[Dict[str, Any]]:
+    """Exits sized for `volume` -> the same exits for a partially filled entry (`filled_qty`, floored to lots).
+
+    The -SL leg covers the whole fill; each -TPn leg is scaled by filled/volume and floored, legs below the
+    pair minimum are dropped and the remainder goes to the last kept TP, so the TPs sum to the fill.
+    Empty when the fill is below one lot / the pair minimum."""
+    lots = spec.qty_lots(filled_qty, "floor")
+    min_lots = max(1, spec.min_lots)
+    if lots < min_lots:
+        return []
+    ratio = filled_qty / volume if volume > 0 else 1.0
+    out = [dict(m, params=dict(m.get("params") or {})) for m in exits]
+    sized = [m for m in out if m.get("method") == "add_order" and m["params"].get("order_qty") is not None]
+    tps, kept, used = [], [], 0
+    for m in sized:
+        if str(m["params"].get("cl_ord_id") or "").endswith("-SL"):
+            m["params"]["order_qty"] = spec.qty_str(lots)
+        else:
+            tps.append(m)
+    for m in tps:
+        want = spec.qty_lots(float(m["params"]["order_qty"]) * ratio, "floor")
+        if want >= min_lots:
+            kept.append([m, want])
+            used += want
+    if tps and not kept:
+        kept, used = [[tps[-1], 0]], 0
+    if kept:
+        kept[-1][1] += lots - used
+    for m, n in kept:
+        m["params"]["order_qty"] = spec.qty_str(n)
+    dropped = {id(m) for m in tps} - {id(m) for m, _ in kept}
+    return [m for m in out if id(m) not in dropped]
+
+def enqueue_exits(app_path: str, base_cid: str, t_signal: Optional[float] = None,
+                  filled_qty: Optional[float] = None) -> Optional[int]:
+    """Queue the exits recorded for `base_cid`; keyed per plan, so a replayed entry fill queues them once.
+    `filled_qty` below the recorded volume (entry canceled/expired after a partial fill) resizes them
+    (resize_exits). Hooked to services.trade_events `entry_filled` by ws_private_runner (exits_hook)."""
+    from .orchestrator import load_plan
+    rec = load_plan(app_path, base_cid) or {}
+    exits = rec.get("exit_messages")
+    if not exits:
+        return None
+    volume = float(rec.get("volume") or 0.0)
+    if filled_qty is not None and volume > 0 and filled_qty < volume * (1 - 1e-9):
+        symbol = rec.get("symbol") or next((m["params"].get("symbol") for m in exits if m.get("params")), None)
+        if symbol:
+            from ..config.minlot import spec_for_pair
+            spec = spec_for_pair(app_path, symbol)
+        else:
+            spec = PairSpec(lot_decimals=int(rec.get("lot_decimals", 8)))
+        exits = resize_exits(exits, filled_qty, volume, spec)
+        if not exits:
+            raise ValueError(f"{base_cid}: filled {filled_qty} is below the pair minimum, no exits can be placed")
+    return enqueue(app_path, exits, t_signal=t_signal, key=f"{base_cid}-exits")
+
+def exits_hook(app_path: str, attempts: int = 3):
+    """trade_events `entry_filled` hook: enqueue_exits for the filled (or partially filled, then closed)
+    entry. Retried with backoff; the last failure prints an ALERT (the position has no SL) and re-raises
+    so the engine counts it."""
+    def hook(ev, plan) -> Optional[int]:
+        filled = None if ev.order_status == "filled" else max(plan.entry_qty, ev.cum_qty)
+        for attempt in range(1, attempts + 1):
+            try:
+                return enqueue_exits(app_path, plan.base, filled_qty=filled)
+            except Exception as e:
+                if attempt >= attempts:
+                    print(f"[armed] ALERT exits for {plan.base} not queued after {attempts} attempts, "
+                          f"position unprotected: {e!r}", file=sys.stderr, flush=True)
+                    raise
+                time.sleep(exp_backoff(attempt, base=0.02, cap=0.1, jitter=0.0))
+        return None
+    return hook
+
+def _new_order_id(msg: Dict[str, Any]) -> Optional[str]:
+    # only add_order creates a cl_ord_id; amend/cancel reference an existing one and may repeat
+    return (msg.get("params") or {}).get("cl_ord_id") if msg.get("method") == "add_order" else None
+
+def _lost_order_state(app_path: str, clid: str, sent_at: float) -> Optional[bool]:
+    """Did an add_order whose ack was lost reach the exchange? True/False from a private-WS account book
+    updated after the send; None when no such book exists (the caller must not resend)."""
+    from ..ws.account import shared_account_book
+    book = shared_account_book(app_path, QUEUE_BOOK_MAX_AGE)
+    if book is None or book.asof() <= sent_at:
+        return None
+    return book.knows_clid(clid)
+
+_EXIT_CLID = re.compile(r"-(SL|TP\d+|X\w+)$")     # plan exits / trigger exits (orchestrator, orders.triggers)
+
+def _risk_reject(app_path: str, msg: Dict[str, Any]) -> Optional[str]:
+    """Reject reason from the live risk engine (utils.risk_engine, published by ws_private_runner) for an
+    entry (add_order buy that is not a plan/trigger exit); None when it passes or no fresh engine exists."""
+    p = msg.get("params") or {}
+    if msg.get("method") != "add_order" or p.get("side") != "buy" or _EXIT_CLID.search(str(p.get("cl_ord_id") or "")):
+        return None
+    from ..utils.risk_engine import shared_risk_engine
+    eng = shared_risk_engine(app_path)
+    if eng is None:
+        return None
+    price = p.get("limit_price")
+    return eng.check(str(p.get("symbol") or ""), "buy", float(p.get("order_qty") or 0.0),
+                     None if price is None else float(price), str(p.get("order_type") or "limit"))
+
+async def drain_queue(conn: ArmedOrderConnection, queue, consumer: str = QUEUE_CONSUMER,
+                      timeout: float = ACK_TIMEOUT_SEC, limit: int = 32) -> int:
+    """Fire every intent after the consumer offset, in order; returns the number committed.
+
+    Each exchange ack (even a reject) is recorded as that message's progress, with its cl_ord_id marked
+    delivered, the moment it lands. An intent with a message that failed to send or timed out stays
+    uncommitted and draining stops there (RuntimeError, so the runner backs off); the replay resends
+    only the messages without progress, so amends and id-less legs are not duplicated. After
+    QUEUE_MAX_ATTEMPTS passes the intent is committed with its errors.
+
+    An add_order whose ack was lost may still have been accepted (and filled), so before it is resent
+    its cl_ord_id is looked up in the private-WS account book: known -> recorded as progress, not
+    resent; resent only when a book updated after the send lacks it. Without such a book the intent
+    stays blocked (ALERT on stderr, momentum_armed_unconfirmed_total) and does not use up attempts.
+    Entries are checked against the live risk engine right before they are sent; a reject is recorded
+    as the message's ack ("rejected": true) and not retried."""
+    n = 0
+    for it in queue.read(consumer, limit=limit):
+        msgs = (it.payload or {}).get("messages") or []
+        done = queue.progress(it.seq, consumer)
+        acks: List[Optional[Dict[str, Any]]] = [done.get(i) for i in range(len(msgs))]
+        prev = queue.result(it.seq, consumer) or {}
+        lost = {i: a for i, a in enumerate(prev.get("acks") or []) if a and a.get("retry")}
+        futs = []
+        blocked = []
+        for i, m in enumerate(msgs):
+            if acks[i] is not None:
+                continue
+            clid = _new_order_id(m)
+            if clid and queue.is_delivered(clid):
+                acks[i] = {"success": False, "error": "duplicate cl_ord_id (already delivered)", "skipped": True}
+                queue.record_progress(it.seq, consumer, i, acks[i])
+                continue
+            if clid and i in lost:
+                seen = _lost_order_state(conn.app_path, clid, float(lost[i].get("sent_at") or it.t_signal or 0.0))
+                if seen is None:
+                    acks[i] = dict(lost[i], unconfirmed=True)
+                    blocked.append(i)
+                    continue
+                if seen:
+                    acks[i] = {"success": True, "recovered": "account_book", "cl_ord_id": clid}
+                    with queue.batch():
+                        queue.record_progress(it.seq, consumer, i, acks[i])
+                        queue.mark_delivered([clid], it.seq)
+                    continue
+            reason = _risk_reject(conn.app_path, m)
+            if reason is not None:
+                conn.risk_rejects += 1
+                acks[i] = {"success": False, "error": f"RISK: {reason}", "rejected": True}
+                queue.record_progress(it.seq, consumer, i, acks[i])
+                continue
+            sent_at = time.time()
+            try:
+                futs.append((i, m, sent_at, await conn.fire(m, it.t_signal)))
+            except Exception as e:
+                conn.errors += 1
+                acks[i] = {"success": False, "error": f"send failed: {e}", "retry": True, "sent_at": sent_at}
+        for i, m, sent_at, fut in futs:
+            try:
+                ack = await asyncio.wait_for(fut, timeout)
+            except asyncio.TimeoutError:
+                conn._pending.pop(m.get("req_id"), None)
+                ack = {"success": False, "error": "timeout waiting for ack"}
+            if "req_id" not in ack:         # timeout / disconnect: the exchange may not have seen it
+                acks[i] = dict(ack, retry=True, sent_at=sent_at)
+                continue
+            acks[i] = ack
+            with queue.batch():
+                queue.record_progress(it.seq, consumer, i, ack)
+                queue.mark_delivered([_new_order_id(m)], it.seq)
+        if blocked:
+            conn.unconfirmed += 1
+            queue.record_result(it.seq, consumer, {"t_signal": it.t_signal, "acks": acks,
+                                                   "attempts": int(prev.get("attempts") or 0)})
+            ids = [_new_order_id(msgs[i]) for i in blocked]
+            print(f"[armed] ALERT intent {it.seq}: acks for {ids} were lost and no fresh account book can "
+                  f"confirm them; not resending (is the private WS runner up?)", file=sys.stderr, flush=True)
+            raise RuntimeError(f"intent {it.seq}: messages {blocked} unconfirmed, waiting for the account book")
+        retry = [i for i, a in enumerate(acks) if a is not None and a.get("retry")]
+        attempts = int(prev.get("attempts") or 0) + 1 if retry else int(prev.get("attempts") or 0)
+        final = not retry or attempts >= QUEUE_MAX_ATTEMPTS
+        with queue.batch():
+            queue.record_result(it.seq, consumer, {"t_signal": it.t_signal, "acks": acks, "attempts": attempts})
+            if final:
+                queue.commit(consumer, it.seq)
+        if not final:
+            raise RuntimeError(f"intent {it.seq}: messages {retry} not acked (attempt {attempts}), will retry")
+        n += 1
+    return n
@@ -0,0 +1,221 @@
+from __future__ import annotations
+import asyncio, os, sys, time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .armed import LatencyStats
+from .orchestrator import amend_sl_to_be, be_trigger_ticks, load_plan
+from ..config.minlot import spec_for_pair
+from ..utils.fixedpoint import PairSpec
+from ..util.backoff import exp_backoff
+
+COALESCE_SEC = float(os.environ.get("BE_COALESCE_MS", "0")) / 1000.0
+MAX_ATTEMPTS = int(os.environ.get("BE_MAX_ATTEMPTS", "6"))
+RETRY_BASE_SEC = float(os.environ.get("BE_RETRY_BASE_SEC", "0.25"))
+
+@dataclass(slots=True)
+class _BEState:
+    task: Optional[asyncio.Task] = None
+    dirty: bool = False
+    t_fill: Optional[float] = None                # perf_counter of the oldest fill not yet sent
+    sent: Optional[Tuple[float, float]] = None    # (trigger, qty) last acked
+    attempts: int = 0                             # consecutive failed amends for the current target
+
+class BreakevenPipeline:
+    """TP fill -> SL amended to breakeven over a persistent WS v2 order connection (orders.armed).
+
+    Attach to a services.trade_events.TradeEventEngine: the first TP fill of a plan moves the SL
+    trigger to the recorded `be_trigger` (orchestrator.record_plan; else fill-avg entry +/- be_offset)
+    and sizes it to the remaining position; later TP fills only resize it. Hooks never block dispatch:
+    one worker task per plan sends the amend, and fills that land while an amend is in flight are
+    coalesced into at most one follow-up amend with the latest target. BE_COALESCE_MS adds an optional
+    gather window before the first send. Fill (WS receive) -> amend ack latency is recorded.
+
+    A failed amend is retried with exponential backoff (BE_RETRY_BASE_SEC) until the acked SL matches
+    the target; after BE_MAX_ATTEMPTS failures the plan is reported on stderr and in `unprotected`
+    (momentum_be_unprotected_plans) and retried again on its next fill. A plan's state is dropped
+    once nothing remains to protect.
+    """
+    def __init__(self, app_path: str, conn, coalesce_s: float = COALESCE_SEC,
+                 loader: Callable[[str, str], Optional[Dict[str, Any]]] = load_plan,
+                 max_attempts: int = MAX_ATTEMPTS, retry_base_s: float = RETRY_BASE_SEC):
+        self.app_path = app_path
+        self.conn = conn
+        self.coalesce_s = coalesce_s
+        self.max_attempts = max_attempts
+        self.retry_base_s = retry_base_s
+        self.loader = loader
+        self.state: Dict[str, _BEState] = {}
+        self._plans: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._specs: Dict[str, PairSpec] = {}
+        self.fill_to_ack = LatencyStats()
+        self.requests = 0
+        self.coalesced = 0
+        self.amends = 0
+        self.errors = 0
+        self.skipped = 0
+        self.retries = 0
+        self.exhausted = 0
+        self.evicted = 0
+        self.unprotected: Dict[str, str] = {}        # base -> last amend error, while retries are exhausted
+
+    def attach(self, engine) -> None:
+        engine.add_hook("tp1", self.on_tp1, "breakeven", inline=True)
+        engine.add_hook("fill", self.on_fill, "breakeven_resize", inline=True)
+
+    # ---- hooks (sync, non-blocking) ----------------------------------------------------
+    def on_tp1(self, ev, plan) -> None:
+        self._schedule(ev, plan)
+
+    def on_fill(self, ev, plan) -> None:
+        # the tp1 hook opens the state; later TP fills shrink the remaining SL size
+        if ev.leg == "TP" and ev.base in self.state:
+            self._schedule(ev, plan)
+
+    def _schedule(self, ev, plan) -> None:
+        st = self.state.get(plan.base)
+        if st is None:
+            st = self.state[plan.base] = _BEState()
+        self.requests += 1
+        if st.t_fill is None:
+            st.t_fill = ev.t_recv
+        if st.task is not None:
+            st.dirty = True
+            self.coalesced += 1
+            return
+        st.task = asyncio.create_task(self._run(plan), name=f"breakeven:{plan.base}")
+
+    # ---- amend worker -------------------------------------------------------------------
+    def _record(self, base: str) -> Optional[Dict[str, Any]]:
+        if base not in self._plans or self._plans[base] is None:
+            self._plans[base] = self.loader(self.app_path, base)
+        return self._plans[base]
+
+    def remaining(self, plan) -> float:
+        """Position still held for the plan (entry fills, else the recorded volume, minus TP fills)."""
+        rec = self._record(plan.base) or {}
+        held = plan.entry_qty if plan.entry_qty > 0 else float(rec.get("volume") or 0.0)
+        return round(held - plan.exit_qty, int(rec.get("lot_decimals", 10)))
+
+    def spec(self, base: str) -> PairSpec:
+        """Tick/lot grid of the plan's pair (recorded `pair`/`symbol`), cached with the record."""
+        sp = self._specs.get(base)
+        if sp is None:
+            rec = self._record(base) or {}
+            pair = rec.get("pair") or rec.get("symbol")
+            sp = spec_for_pair(self.app_path, pair) if pair else PairSpec(lot_decimals=int(rec.get("lot_decimals", 8)))
+            if rec:
+                self._specs[base] = sp
+        return sp
+
+    def target(self, plan) -> Optional[Tuple[str, float, float]]:
+        """(sl_clid, trigger, qty) for the plan's current fills, or None when nothing to amend.
+        A trigger computed here (no recorded be_trigger) is snapped like the recorded one:
+        down for a long's SL, up for a short's."""
+        rec = self._record(plan.base) or {}
+        trigger = rec.get("be_trigger")
+        if trigger is None:
+            entry = rec.get("entry_price") or plan.entry_avg
+            if entry is None:
+                return None
+            sp = self.spec(plan.base)
+            trigger = sp.price(be_trigger_ticks(sp, float(entry), float(rec.get("be_offset") or 0.0), rec.get("side", "buy")))
+        qty = self.remaining(plan)
+        if qty <= 0:
+            return None
+        return f"{plan.base}-SL", float(trigger), qty
+
+    async def _run(self, plan) -> None:
+        st = self.state[plan.base]
+        try:
+            if self.coalesce_s > 0:
+                await asyncio.sleep(self.coalesce_s)
+            while True:
+                st.dirty = False
+                tgt = self.target(plan)
+                if tgt is None or tgt[1:] == st.sent:
+                    self.skipped += 1
+                    st.t_fill = None
+                else:
+                    t_fill, st.t_fill = st.t_fill, None   # fills landing in flight start a new window
+                    try:
+                        rec = self._record(plan.base) or {}
+                        res = await amend_sl_to_be(self.app_path, tgt[1], 0.0, tgt[0], tgt[2], conn=self.conn,
+                                                   side=rec.get("side", "buy"), spec=self.spec(plan.base))
+                    except Exception as e:                 # disconnect / not armed: same as a rejected amend
+                        res = {"status": "error", "ack": {"error": str(e)}}
+                    self.amends += 1
+                    if res.get("status") == "ok":
+                        st.sent, st.attempts = tgt[1:], 0
+                        self.unprotected.pop(plan.base, None)
+                        if t_fill is not None:
+                            self.fill_to_ack.add(time.perf_counter() - t_fill)
+                    else:
+                        self.errors += 1
+                        st.attempts += 1
+                        st.t_fill = t_fill if t_fill is not None else st.t_fill   # next amend still owes this fill
+                        if st.attempts < self.max_attempts:
+                            self.retries += 1
+                            await asyncio.sleep(exp_backoff(st.attempts, base=self.retry_base_s))
+                            continue                       # re-read the target: fills may have moved it
+                        self._alert(plan.base, tgt, res)
+                        st.attempts = 0
+                        break
+                if not st.dirty:
+                    break
+        except Exception:
+            self.errors += 1
+        finally:
+            st.task = None
+            if self.remaining(plan) <= 0 and plan.exit_qty > 0:
+                self._evict(plan.base)
+
+    def _alert(self, base: str, tgt: Tuple[str, float, float], res: Dict[str, Any]) -> None:
+        err = str((res.get("ack") or {}).get("error") or res.get("ack") or "amend failed")[:200]
+        self.exhausted += 1
+        self.unprotected[base] = err
+        print(f"[breakeven] ALERT {tgt[0]} not amended to trigger={tgt[1]} qty={tgt[2]} after "
+              f"{self.max_attempts} attempts: {err}", file=sys.stderr, flush=True)
+
+    def _evict(self, base: str) -> None:
+        self.state.pop(base, None)
+        self._plans.pop(base, None)
+        self._specs.pop(base, None)
+        self.unprotected.pop(base, None)
+        self.evicted += 1
+
+    # ---- service -------------------------------------------------------------------------
+    async def serve(self, stop: asyncio.Event, metrics_every_s: float = 5.0) -> None:
+        """Keep the order connection armed (best effort) and write metrics.d/breakeven.prom."""
+        from ..observability.textfile import write_textfile
+        try:
+            while not stop.is_set():
+                if not self.conn.armed:
+                    try:
+                        await self.conn.arm()
+                    except Exception:
+                        self.errors += 1
+                try:
+                    write_textfile(self.app_path, "breakeven", self.prom_lines())
+                except Exception:
+                    pass
+                try:
+                    await asyncio.sleep(metrics_every_s)
+                except asyncio.CancelledError:
+                    break
+        finally:
+            await self.conn.disarm()
+
+    def prom_lines(self) -> List[str]:
+        return [
+            f"momentum_be_requests_total {self.requests}",
+            f"momentum_be_coalesced_total {self.coalesced}",
+            f"momentum_be_amends_total {self.amends}",
+            f"momentum_be_errors_total {self.errors}",
+            f"momentum_be_retries_total {self.retries}",
+            f"momentum_be_exhausted_total {self.exhausted}",
+            f"momentum_be_unprotected_plans {len(self.unprotected)}",
+            f"momentum_be_plans {len(self.state)}",
+            f"momentum_be_inflight {sum(1 for s in self.state.values() if s.task is not None)}",
+            *self.fill_to_ack.prom_lines("momentum_be_fill_to_ack_seconds"),
+        ]
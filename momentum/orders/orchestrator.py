@@ -4,10 +4,14 @@ import time, os, json, asyncio
 from dataclasses import dataclass
 from typing import List, Dict, Optional
 from ..state.atomic_json import AtomicJSONWriter, read_json
-from .executor import AddOrderExecutor
+from ..utils.fixedpoint import PairSpec, to_units, wire_dumps
 import aiohttp
 
 SCHEMA_EXEC_HISTORY = "exec_history/v1"
+SCHEMA_PLAN = "oto_plan/v1"
+# Used when no pair spec is given: config.minlot's 8-decimal default. Callers that know the pair pass
+# its real spec (config.minlot.spec_for_pair); 8 decimals keep ticks below 2**53 up to ~9e7.
+DEFAULT_PLAN_SPEC = PairSpec()
 WS_AUTH_URL = "wss://ws-auth.kraken.com/v2"
 
 @dataclass
@@ -51,14 +55,21 @@ def _mark_clid(app: str, clid: str) -> None:
     seen = set(hist.get("seen", [])); seen.add(clid)
     AtomicJSONWriter(_hist_path(app), schema_version=SCHEMA_EXEC_HISTORY).write({"seen": sorted(seen)})
 
-def build_oto_plan(entry: EntrySpec, tps: List[TPLeg], sl: Optional[SLSpec], be_offset: float | None) -> Dict:
+def build_oto_plan(entry: EntrySpec, tps: List[TPLeg], sl: Optional[SLSpec], be_offset: float | None,
+                   spec: Optional[PairSpec] = None) -> Dict:
+    spec = spec or DEFAULT_PLAN_SPEC
     basecid = entry.client_id or f"oto-{int(time.time())}"
+    # Plan math runs on integer lots/ticks; leg params get the exact wire strings, the plan summary floats
+    total_lots = spec.qty_lots(entry.volume, "nearest")
+    volume = spec.qty_str(total_lots)
+    def px(p: float) -> str:
+        return spec.price_str(spec.price_ticks(p))
     legs: List[Dict] = []
     legs.append({
         "kind": "ENTRY",
         "params": {
             "pair": entry.pair, "side": entry.side, "ordertype": entry.ordertype,
-            "volume": entry.volume, "price": entry.price, "tif": entry.tif,
+            "volume": volume, "price": px(entry.price) if entry.price is not None else None, "tif": entry.tif,
             "post_only": entry.post_only, "cl_ord_id": _cid(basecid, "E")
         }
     })
@@ -67,44 +78,122 @@ def build_oto_plan(entry: EntrySpec, tps: List[TPLeg], sl: Optional[SLSpec], be_
             "pair": entry.pair,
             "side": "sell" if entry.side == "buy" else "buy",
             "ordertype": "stop-loss-limit" if sl.limit_price else "stop-loss",
-            "volume": entry.volume,
+            "volume": volume,
             "tif": "gtc",
             "post_only": 0,
             "cl_ord_id": _cid(basecid, "SL"),
-            "triggers": {"reference": "last", "price": float(sl.price), "price_type": "static"},
+            "triggers": {"reference": "last", "price": px(sl.price), "price_type": "static"},
         }
         if sl.limit_price is not None:
-            sl_params["limit_price"] = float(sl.limit_price)
+            sl_params["limit_price"] = px(sl.limit_price)
         legs.append({"kind": "SL", "params": sl_params})
-    filled = 0.0
+    filled = 0
     for i, tp in enumerate(tps, start=1):
-        vol = round(entry.volume * tp.ratio, 10)
+        vol = to_units(total_lots * tp.ratio, 1, "nearest")
         filled += vol
         legs.append({
             "kind": "TP",
             "params": {
                 "pair": entry.pair, "side": "sell" if entry.side == "buy" else "buy",
                 "ordertype": "limit",
-                "volume": vol, "price": tp.price, "tif": "gtc",
+                "volume": spec.qty_str(vol), "price": px(tp.price), "tif": "gtc",
                 "post_only": 1, "cl_ord_id": _cid(basecid, f"TP{i}")
             }
         })
-    rem = round(entry.volume - filled, 10)
+    rem = total_lots - filled
     if rem > 0:
         i = len([l for l in legs if l["kind"]=="TP"]) + 1
-        last_price = tps[-1].price if tps else (entry.price or 0) * (1.02 if entry.side=="buy" else 0.98)
+        last_price = px(tps[-1].price if tps else (entry.price or 0) * (1.02 if entry.side=="buy" else 0.98))
         legs.append({
             "kind": "TP",
             "params": {
                 "pair": entry.pair, "side": "sell" if entry.side == "buy" else "buy",
                 "ordertype": "limit",
-                "volume": rem, "price": last_price, "tif": "gtc",
+                "volume": spec.qty_str(rem), "price": last_price, "tif": "gtc",
                 "post_only": 1, "cl_ord_id": _cid(basecid, f"TP{i}")
             }
         })
-    return {"base_cid": basecid, "legs": legs, "be_offset": be_offset}
+    # Breakeven trigger in the SL's direction, on the tick grid; recorded so the fill-driven pipeline
+    # (orders.breakeven) can amend without recomputing from scratch.
+    be_trigger = None
+    if be_offset is not None and entry.price is not None:
+        be_trigger = spec.price(be_trigger_ticks(spec, entry.price, be_offset, entry.side))
+    entry_price = spec.price(spec.price_ticks(entry.price)) if entry.price is not None else None
+    return {"base_cid": basecid, "legs": legs, "be_offset": be_offset, "be_trigger": be_trigger,
+            "pair": entry.pair, "side": entry.side, "entry_price": entry_price, "volume": spec.qty(total_lots),
+            "lot_decimals": spec.lot_decimals}
 
-async def execute_plan(app: str, plan: Dict, validate: int = 1) -> Dict:
+def be_trigger_ticks(spec: PairSpec, entry_price: float, be_offset: float, side: str) -> int:
+    """Breakeven SL trigger on the tick grid, for the entry's side: entry + offset rounded down for a long
+    (the SL sells), entry - offset rounded up for a short."""
+    if side == "buy":
+        return spec.price_ticks(entry_price + be_offset, "floor")
+    return spec.price_ticks(entry_price - be_offset, "ceil")
+
+def be_amend_params(entry_price: float, be_offset: float, sl_clid: str, sl_volume: float, side: str = "buy",
+                    spec: Optional[PairSpec] = None) -> Dict:
+    """WS v2 amend_order params moving the SL to breakeven; trigger/qty as exact wire strings (wire_dumps)."""
+    spec = spec or DEFAULT_PLAN_SPEC
+    return {"cl_ord_id": sl_clid, "order_qty": spec.qty_str(spec.qty_lots(sl_volume, "floor")),
+            "trigger_price": spec.price_str(be_trigger_ticks(spec, entry_price, be_offset or 0.0, side)),
+            "trigger_price_type": "static"}
+
+def _plan_path(app: str, base_cid: str) -> str:
+    return os.path.join(app, "var", "plans", f"{base_cid}.json")
+
+def record_plan(app: str, plan: Dict) -> None:
+    """Persist a plan that is about to go live (var/plans/<base_cid>.json) for fill-driven follow-ups."""
+    AtomicJSONWriter(_plan_path(app, plan["base_cid"]), schema_version=SCHEMA_PLAN).write(dict(plan, recorded_at=time.time()))
+
+def load_plan(app: str, base_cid: str) -> Optional[Dict]:
+    d = read_json(_plan_path(app, base_cid))
+    return d if isinstance(d, dict) and d.get("base_cid") == base_cid else None
+
+def _leg_ws_params(params: Dict, validate: int) -> Dict:
+    """Plan leg (REST-style names) -> WS v2 add_order params."""
+    out = {"order_type": params["ordertype"], "side": params["side"], "order_qty": params["volume"],
+           "symbol": params["pair"], "time_in_force": params.get("tif", "gtc"),
+           "post_only": bool(params.get("post_only")), "validate": bool(validate)}
+    if params.get("price") is not None:
+        out["limit_price"] = params["price"]
+    if params.get("limit_price") is not None:
+        out["limit_price"] = params["limit_price"]
+    if params.get("triggers"):
+        out["triggers"] = params["triggers"]
+    if params.get("cl_ord_id"):
+        out["cl_ord_id"] = params["cl_ord_id"]
+    return out
+
+async def execute_plan_armed(app: str, plan: Dict, conn, validate: int = 1, t_signal: Optional[float] = None) -> Dict:
+    """Send all legs on an armed WS connection (orders.armed): sends back-to-back, then collects acks."""
+    sent = []
+    results = []
+    if not validate:
+        record_plan(app, plan)
+    for leg in plan["legs"]:
+        clid = leg["params"].get("cl_ord_id")
+        if clid and _seen_clid(app, clid):
+            results.append({"skipped": "duplicate", "clid": clid, "kind": leg["kind"]})
+            continue
+        msg = {"method": "add_order", "params": _leg_ws_params(leg["params"], validate)}
+        sent.append((leg, clid, await conn.fire(msg, t_signal)))
+    for leg, clid, fut in sent:
+        try:
+            ack = await asyncio.wait_for(fut, 10.0)
+        except asyncio.TimeoutError:
+            ack = {"success": False, "error": "timeout waiting for ack"}
+        ok = ack.get("success") is True
+        results.append({"clid": clid, "res": {"status": "ok" if ok else "error", "ack": ack}, "kind": leg["kind"]})
+        if ok and clid:
+            _mark_clid(app, clid)
+    return {"status": "ok", "results": results}
+
+async def execute_plan(app: str, plan: Dict, validate: int = 1, conn=None) -> Dict:
+    if conn is not None:
+        return await execute_plan_armed(app, plan, conn, validate)
+    from .executor import AddOrderExecutor  # lazy: keeps plan building importable without the REST executor
+    if not validate:
+        record_plan(app, plan)
     ex = AddOrderExecutor()
     try:
         results = []
@@ -126,10 +215,24 @@ async def execute_plan(app: str, plan: Dict, validate: int = 1) -> Dict:
     finally:
         await ex.close()
 
-async def amend_sl_to_be(app: str, entry_price: float, be_offset: float, sl_clid: str, sl_volume: float) -> Dict:
+async def amend_sl_to_be(app: str, entry_price: float, be_offset: float, sl_clid: str, sl_volume: float,
+                         conn=None, side: str = "buy", pair: Optional[str] = None,
+                         spec: Optional[PairSpec] = None) -> Dict:
     """
     WS v2 amend_order with loop to skip initial status frames.
+    With an armed connection (orders.armed) the amend goes out on the already-open socket.
+    `side` is the entry's side (breakeven is entry + offset for a long, entry - offset for a short);
+    the trigger is snapped to the pair's tick (`spec`, else config.minlot.spec_for_pair(app, pair)).
     """
+    if spec is None and pair:
+        from ..config.minlot import spec_for_pair
+        spec = spec_for_pair(app, pair)
+    params = be_amend_params(entry_price, be_offset, sl_clid, sl_volume, side, spec)
+    new_trigger = float(params["trigger_price"])
+    if conn is not None:
+        ack = await conn.call("amend_order", params)
+        ok = ack.get("success") is True and "result" in ack
+        return {"status": "ok" if ok else "error", "ack": ack, "new_trigger": new_trigger}
     # Acquire token
     token = os.getenv("KRAKEN_WS_TOKEN")
     if not token:
@@ -138,18 +241,11 @@ async def amend_sl_to_be(app: str, entry_price: float, be_offset: float, sl_clid
             kr = KrakenREST(session=s)
             token = (await kr._post_private("GetWebSocketsToken", {}))["token"]
 
-    new_trigger = float(entry_price + (be_offset or 0.0))
-    req = {"method": "amend_order", "params": {
-        "cl_ord_id": sl_clid,
-        "order_qty": float(sl_volume),
-        "trigger_price": new_trigger,
-        "trigger_price_type": "static",
-        "token": token,
-    }, "req_id": int(time.time()*1000)}
+    req = {"method": "amend_order", "params": dict(params, token=token), "req_id": int(time.time()*1000)}
 
     async with aiohttp.ClientSession() as sess:
         ws = await sess.ws_connect(WS_AUTH_URL, heartbeat=25)
-        await ws.send_str(json.dumps(req, separators=(",", ":"), ensure_ascii=False))
+        await ws.send_str(wire_dumps(req).decode())
 
         # Read frames until we see amend_order ack or timeout
         deadline = asyncio.get_event_loop().time() + 10.0
@@ -0,0 +1,164 @@
+
+from __future__ import annotations
+import os, tempfile, time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+import orjson
+from ..utils.fixedpoint import PairSpec, to_units
+
+# Batch OTO/TP plan compiler: N pairs x one TP/SL schema in one call. Schema factors are computed once;
+# the pairs and their legs are then a plain Python loop on ints, stored column-wise in a PlanBatch.
+# Everything is integer ticks/lots (utils.fixedpoint); floats only come out of PlanBatch.rows(),
+# wire strings from PlanBatch.spec(i).price_str/qty_str.
+
+SCHEMA_PLAN_BATCH = "plan_batch/v1"
+
+@dataclass(frozen=True, slots=True)
+class PlanSchema:
+    tp: Tuple[Tuple[float, float], ...]      # (pct from entry, alloc %) per TP leg
+    sl_pct: float                            # negative = below entry
+    be_offset_pct: Optional[float] = None    # None disables the breakeven level
+    max_notional: Optional[float] = None     # ENTRY_MAX_NOTIONAL guard
+
+@dataclass(slots=True)
+class PlanBatch:
+    schema: PlanSchema
+    pairs: List[str]
+    price_decimals: List[int]
+    lot_decimals: List[int]
+    entry_ticks: List[int]
+    total_lots: List[int]
+    tp_idx: List[List[int]]      # 1-based schema index of each kept leg
+    tp_ticks: List[List[int]]
+    tp_lots: List[List[int]]
+    sl_ticks: List[int]
+    be_ticks: List[Optional[int]]
+    reject: List[Optional[str]]
+
+    def __len__(self) -> int:
+        return len(self.pairs)
+
+    @property
+    def ok_count(self) -> int:
+        return sum(1 for r in self.reject if r is None)
+
+    def spec(self, i: int) -> PairSpec:
+        """Fixed-point spec of row i (for rendering its ticks/lots as wire strings)."""
+        return PairSpec(self.price_decimals[i], self.lot_decimals[i])
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Per-pair plans with floats (what the per-pair plan.json used to hold, minus payloads)."""
+        out = []
+        for i, pair in enumerate(self.pairs):
+            spec = self.spec(i)
+            row: Dict[str, Any] = {
+                "pair": pair,
+                "status": "ok" if self.reject[i] is None else "rejected",
+                "reject_reason": self.reject[i],
+                "entry": {"price": spec.price(self.entry_ticks[i]), "qty": spec.qty(self.total_lots[i])},
+                "tp_legs": [],
+                "sl": None,
+                "be_price": None,
+            }
+            if self.reject[i] is None:
+                for idx, t, l in zip(self.tp_idx[i], self.tp_ticks[i], self.tp_lots[i]):
+                    pct, alloc = self.schema.tp[idx - 1]
+                    row["tp_legs"].append({"idx": idx, "tp_pct": pct, "alloc_pct": alloc,
+                                           "price": spec.price(t), "qty": spec.qty(l)})
+                row["sl"] = {"sl_pct": self.schema.sl_pct, "trigger": spec.price(self.sl_ticks[i])}
+                if self.be_ticks[i] is not None:
+                    row["be_price"] = spec.price(self.be_ticks[i])
+            out.append(row)
+        return out
+
+    def to_artifact(self, **meta) -> Dict[str, Any]:
+        s = self.schema
+        return {
+            "_schema": SCHEMA_PLAN_BATCH,
+            "ts": meta.pop("ts", time.time()),
+            "meta": meta,
+            "plan_schema": {"tp": [list(x) for x in s.tp], "sl_pct": s.sl_pct,
+                            "be_offset_pct": s.be_offset_pct, "max_notional": s.max_notional},
+            "pairs": self.pairs, "pd": self.price_decimals, "ld": self.lot_decimals,
+            "entry": self.entry_ticks, "lots": self.total_lots,
+            "tp_idx": self.tp_idx, "tp_ticks": self.tp_ticks, "tp_lots": self.tp_lots,
+            "sl": self.sl_ticks, "be": self.be_ticks, "reject": self.reject,
+        }
+
+    @classmethod
+    def from_artifact(cls, obj: Dict[str, Any]) -> "PlanBatch":
+        s = obj["plan_schema"]
+        schema = PlanSchema(tuple((float(p), float(a)) for p, a in s["tp"]), float(s["sl_pct"]),
+                            s.get("be_offset_pct"), s.get("max_notional"))
+        return cls(schema, obj["pairs"], obj["pd"], obj["ld"], obj["entry"], obj["lots"], obj["tp_idx"],
+                   obj["tp_ticks"], obj["tp_lots"], obj["sl"], obj["be"], obj["reject"])
+
+def _column(v: Union[float, Sequence[float]], n: int) -> Sequence[float]:
+    return [float(v)] * n if isinstance(v, (int, float)) else v
+
+def compile_plans(pairs: Sequence[str], specs: Sequence[PairSpec], entry_prices: Union[float, Sequence[float]],
+                  qtys: Union[float, Sequence[float]], schema: PlanSchema) -> PlanBatch:
+    """Compile entry/TP ladder/SL/BE plans for all pairs (one loop over pairs and legs).
+
+    Each TP leg gets alloc/100 of the entry lots (allocations are percentages, as in the dry-run's
+    parse_tp_schema, which normalizes them to 100), floored to whole lots and capped at what is left.
+    Zero legs are dropped and the dust merges into the last kept leg, so legs below 100% still close
+    the whole position. Pairs whose entry notional exceeds schema.max_notional, or whose legs all
+    round to zero, are rejected.
+    """
+    n = len(pairs)
+    prices = _column(entry_prices, n)
+    sizes = _column(qtys, n)
+    # Schema-derived factors are computed once for the whole batch
+    fracs = [a / 100.0 for _, a in schema.tp]
+    tp_mults = [1.0 + p / 100.0 for p, _ in schema.tp]
+    sl_mult = 1.0 + schema.sl_pct / 100.0
+    be_mult = None if schema.be_offset_pct is None else 1.0 + schema.be_offset_pct / 100.0
+    max_notional = schema.max_notional
+
+    batch = PlanBatch(schema, list(pairs), [], [], [], [], [], [], [], [], [], [])
+    for i in range(n):
+        spec = specs[i]
+        et = to_units(prices[i], spec.price_scale, "nearest")
+        lots = to_units(sizes[i], spec.lot_scale, "floor")
+        batch.price_decimals.append(spec.price_decimals)
+        batch.lot_decimals.append(spec.lot_decimals)
+        batch.entry_ticks.append(et)
+        batch.total_lots.append(lots)
+
+        reject = None
+        idx: List[int] = []; ticks: List[int] = []; leg_lots: List[int] = []
+        if max_notional is not None and lots > spec.max_lots_for_notional(max_notional, et):
+            notional = spec.notional(lots, et)
+            reject = f"entry_max_notional_exceeded:{notional:.8f}>{max_notional:.8f}"
+        else:
+            used = 0
+            for j, f in enumerate(fracs):
+                l = min(to_units(lots * f, 1, "floor"), lots - used)
+                if l <= 0:
+                    continue
+                used += l
+                idx.append(j + 1); leg_lots.append(l)
+                ticks.append(to_units(et * tp_mults[j], 1, "nearest"))
+            if leg_lots:
+                leg_lots[-1] += lots - used
+            else:
+                reject = "all_tp_legs_became_zero_after_rounding"
+        batch.tp_idx.append(idx); batch.tp_ticks.append(ticks); batch.tp_lots.append(leg_lots)
+        batch.sl_ticks.append(to_units(et * sl_mult, 1, "nearest"))
+        batch.be_ticks.append(None if be_mult is None else to_units(et * be_mult, 1, "nearest"))
+        batch.reject.append(reject)
+    return batch
+
+def write_batch(path: str, batch: PlanBatch, **meta) -> None:
+    """Write the batch as one compact orjson artifact (tempfile + replace)."""
+    d = os.path.dirname(path) or "."
+    os.makedirs(d, exist_ok=True)
+    with tempfile.NamedTemporaryFile("wb", dir=d, delete=False) as tmp:
+        tmp.write(orjson.dumps(batch.to_artifact(**meta)))
+        tmp.flush(); os.fsync(tmp.fileno()); tmp_name = tmp.name
+    os.replace(tmp_name, path)
+
+def read_batch(path: str) -> PlanBatch:
+    with open(path, "rb") as f:
+        return PlanBatch.from_artifact(orjson.loads(f.read()))
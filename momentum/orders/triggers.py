@@ -0,0 +1,402 @@
+from __future__ import annotations
+import heapq, itertools, json, os, time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..state.atomic_json import AtomicJSONWriter, read_json
+from ..utils.fixedpoint import PairSpec
+
+SCHEMA_TRIGGERS = "client_triggers/v1"
+KINDS = ("stop", "take", "trail", "time")
+COMPACT_MIN = 256       # cancelled entries tolerated in the heaps before a rebuild
+
+def triggers_path(app_path: str) -> str:
+    return os.path.join(app_path, "var", "triggers.json")
+
+@dataclass(slots=True, eq=False)
+class Trigger:
+    """One client-side exit. `side` is the exit order side: 'sell' closes a long, 'buy' closes a short.
+
+    stop   fires when price crosses `level` against the position (sell: price <= level)
+    take   fires when price crosses `level` in favour            (sell: price >= level)
+    trail  fires when price retraces `distance` from the best price since it was armed
+    time   fires at epoch `deadline` (any kind may also carry a deadline)
+    """
+    symbol: str
+    kind: str
+    side: str
+    qty: float
+    level: Optional[float] = None
+    distance: Optional[float] = None
+    deadline: Optional[float] = None
+    ref: Optional[str] = None                 # position / plan reference, e.g. build_oto_plan base_cid
+    uid: Optional[str] = None                 # stable across save/load (exit cl_ord_id, intent key); set by add()
+    tid: int = 0
+    active: bool = True
+    peak: Optional[float] = None              # trail: best price seen (filled in by the engine)
+    fired_price: Optional[float] = None
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"symbol": self.symbol, "kind": self.kind, "side": self.side, "qty": self.qty, "level": self.level,
+                "distance": self.distance, "deadline": self.deadline, "ref": self.ref, "uid": self.uid,
+                "peak": self.peak, "meta": self.meta}
+
+class _Ladder:
+    """Static levels for one symbol: `down` fires at price <= level (max-heap), `up` at price >= level (min-heap)."""
+    __slots__ = ("down", "up")
+
+    def __init__(self):
+        self.down: List[Tuple[float, int, Trigger]] = []
+        self.up: List[Tuple[float, int, Trigger]] = []
+
+    def add(self, t: Trigger, fires_down: bool) -> None:
+        if fires_down:
+            heapq.heappush(self.down, (-t.level, t.tid, t))
+        else:
+            heapq.heappush(self.up, (t.level, t.tid, t))
+
+    def compact(self) -> None:
+        self.down = [e for e in self.down if e[2].active]
+        self.up = [e for e in self.up if e[2].active]
+        heapq.heapify(self.down); heapq.heapify(self.up)
+
+    def __bool__(self) -> bool:
+        return bool(self.down or self.up)
+
+    def crossed(self, price: float, out: List[Trigger]) -> None:
+        down, up = self.down, self.up
+        while down and -down[0][0] >= price:
+            t = heapq.heappop(down)[2]
+            if t.active:
+                out.append(t)
+        while up and up[0][0] <= price:
+            t = heapq.heappop(up)[2]
+            if t.active:
+                out.append(t)
+
+class _TrailLadder:
+    """Trailing stops for one symbol/direction, kept in 'long' orientation y = sign * price
+    (fire at y <= peak - distance; short exits use sign = -1).
+
+    A trail's peak is the max of y since it was armed, i.e. a suffix maximum of the tick series. Trails
+    therefore live in buckets on a stack of suffix maxima (peaks strictly decreasing towards the top);
+    a new high pops every bucket it exceeds and merges them, so all trails sharing a peak are one heap
+    keyed by distance. A max-heap over bucket stop levels (peak - smallest distance, lazily invalidated)
+    finds the crossed buckets, so a tick costs O(log n) plus the triggers it fires.
+    """
+    __slots__ = ("sign", "stack", "buckets", "levels", "_bid")
+
+    def __init__(self, sign: int = 1):
+        self.sign = sign
+        self.stack: List[List[Any]] = []                  # [peak, heap[(distance, tid, trig)], bucket_id]
+        self.buckets: Dict[int, List[Any]] = {}
+        self.levels: List[Tuple[float, int]] = []          # (-stop_level, bucket_id)
+        self._bid = itertools.count()
+
+    def _push_level(self, b: List[Any]) -> None:
+        if b[1]:
+            heapq.heappush(self.levels, (b[1][0][0] - b[0], b[2]))
+
+    def _new_id(self, b: List[Any]) -> None:
+        self.buckets.pop(b[2], None)                       # a new id invalidates stale level entries
+        b[2] = next(self._bid)
+        self.buckets[b[2]] = b
+
+    def _raise(self, y: float) -> None:
+        stack = self.stack
+        if not stack or stack[-1][0] >= y:
+            return
+        merged = stack.pop()
+        while stack and stack[-1][0] <= y:
+            b = stack.pop()
+            self.buckets.pop(b[2], None)
+            small, big = (b[1], merged[1]) if len(b[1]) < len(merged[1]) else (merged[1], b[1])
+            for e in small:
+                heapq.heappush(big, e)
+            merged[1] = big
+        merged[0] = y
+        self._new_id(merged)
+        stack.append(merged)
+        self._push_level(merged)
+
+    def add(self, t: Trigger, price: float) -> None:
+        y = self.sign * price
+        self._raise(y)
+        if not self.stack or self.stack[-1][0] > y:
+            b = [y, [], -1]
+            self._new_id(b)
+            self.stack.append(b)
+        b = self.stack[-1]
+        heapq.heappush(b[1], (t.distance, t.tid, t))
+        self._push_level(b)
+
+    def tick(self, price: float, out: List[Trigger]) -> None:
+        y = self.sign * price
+        self._raise(y)
+        levels = self.levels
+        while levels and -levels[0][0] >= y:
+            neg_level, bid = heapq.heappop(levels)
+            b = self.buckets.get(bid)
+            if b is None or not b[1] or b[1][0][0] - b[0] != neg_level:
+                continue                                   # merged, emptied or already re-levelled
+            heap = b[1]
+            while heap and b[0] - heap[0][0] >= y:
+                t = heapq.heappop(heap)[2]
+                if t.active:
+                    t.peak = self.sign * b[0]
+                    out.append(t)
+            self._push_level(b)
+        stack = self.stack
+        while stack and not stack[-1][1]:
+            self.buckets.pop(stack.pop()[2], None)
+
+    def compact(self) -> None:
+        """Drop cancelled trails; empty buckets leave the stack (peaks stay decreasing) and levels are rebuilt."""
+        stack = []
+        for b in self.stack:
+            b[1] = [e for e in b[1] if e[2].active]
+            if b[1]:
+                heapq.heapify(b[1])
+                stack.append(b)
+            else:
+                self.buckets.pop(b[2], None)
+        self.stack = stack
+        self.levels = []
+        for b in stack:
+            self._push_level(b)
+
+    def __bool__(self) -> bool:
+        return bool(self.stack)
+
+    def peaks(self) -> Iterable[Tuple[Trigger, float]]:
+        for b in self.stack:
+            for e in b[1]:
+                yield e[2], self.sign * b[0]
+
+class TriggerEngine:
+    """Client-side exit triggers indexed per symbol so a tick only touches crossed levels.
+
+    Per symbol: a static ladder (stop/take levels, two heaps) and two trailing ladders (long exits
+    trail below the high, short exits above the low). Time stops sit in one
+    global deadline heap checked by on_time(). Cancelled triggers are dropped lazily when popped, and
+    the heaps are rebuilt once cancellations outnumber the armed triggers (at least COMPACT_MIN).
+    Fired triggers are handed to `sink` (trigger_runner queues exit_order() per trigger on the intent
+    queue) and deactivated only once it returns; if it raises they stay armed and are handed to it
+    again on the next tick / on_time() call.
+    """
+    def __init__(self, sink: Optional[Callable[[List[Trigger]], Any]] = None):
+        self.sink = sink
+        self.static: Dict[str, _Ladder] = {}
+        self.trails: Dict[Tuple[str, str], _TrailLadder] = {}
+        self.deadlines: List[Tuple[float, int, Trigger]] = []
+        self.by_id: Dict[int, Trigger] = {}
+        self.last: Dict[str, float] = {}
+        self._ids = itertools.count(1)
+        self.retry: List[Trigger] = []           # crossed, but the sink raised
+        self.cancelled = 0                       # cancelled entries still sitting in the heaps
+        self.fired = 0
+        self.ticks = 0
+        self.sink_errors = 0
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def add(self, t: Trigger, price: Optional[float] = None) -> Trigger:
+        """Arm a trigger; trails start from `price` (default: last tick for the symbol)."""
+        if t.kind not in KINDS:
+            raise ValueError(f"unknown trigger kind {t.kind!r}")
+        if t.side not in ("buy", "sell"):
+            raise ValueError(f"trigger side must be 'buy' or 'sell', got {t.side!r}")
+        px = price if price is not None else self.last.get(t.symbol)
+        if t.kind in ("stop", "take") and t.level is None:
+            raise ValueError(f"{t.kind} trigger needs a level")
+        if t.kind == "trail" and (t.distance is None or t.distance <= 0 or px is None):
+            raise ValueError("trail trigger needs distance > 0 and a starting price")
+        if t.kind == "time" and t.deadline is None:
+            raise ValueError("time trigger needs a deadline")
+        t.tid = next(self._ids)
+        t.uid = t.uid or os.urandom(4).hex()
+        t.active = True
+        self.by_id[t.tid] = t
+        sell = t.side == "sell"
+        if t.kind in ("stop", "take"):
+            # sell-stop / buy-take fire on the way down, sell-take / buy-stop on the way up
+            self.static.setdefault(t.symbol, _Ladder()).add(t, fires_down=(t.kind == "stop") == sell)
+        elif t.kind == "trail":
+            t.peak = px
+            lad = self.trails.get((t.symbol, t.side))
+            if lad is None:
+                lad = self.trails[(t.symbol, t.side)] = _TrailLadder(1 if sell else -1)
+            lad.add(t, px)
+        if t.deadline is not None:
+            heapq.heappush(self.deadlines, (t.deadline, t.tid, t))
+        return t
+
+    def cancel(self, tid: int) -> bool:
+        t = self.by_id.pop(tid, None)
+        if t is None:
+            return False
+        t.active = False
+        self.cancelled += 1
+        if self.cancelled >= max(COMPACT_MIN, len(self.by_id)):
+            self.compact()
+        return True
+
+    def compact(self) -> None:
+        """Rebuild every heap without cancelled / fired entries."""
+        for key, lad in list(self.static.items()):
+            lad.compact()
+            if not lad:
+                del self.static[key]
+        for key, tl in list(self.trails.items()):
+            tl.compact()
+            if not tl:
+                del self.trails[key]
+        self.deadlines = [e for e in self.deadlines if e[2].active]
+        heapq.heapify(self.deadlines)
+        self.cancelled = 0
+
+    def cancel_ref(self, ref: str) -> int:
+        ids = [tid for tid, t in self.by_id.items() if t.ref == ref]
+        for tid in ids:
+            self.cancel(tid)
+        return len(ids)
+
+    def _emit(self, out: List[Trigger], price: Optional[float]) -> List[Trigger]:
+        for t in out:
+            t.fired_price = price if price is not None else self.last.get(t.symbol)
+        pending = {t.tid: t for t in (*self.retry, *out) if t.active}
+        self.retry = []
+        fired = list(pending.values())
+        if not fired:
+            return fired
+        if self.sink is not None:
+            try:
+                self.sink(fired)
+            except Exception:
+                self.sink_errors += 1
+                self.retry = fired               # still armed; no exit is lost to a failed hand-off
+                return []
+        for t in fired:
+            t.active = False
+            self.by_id.pop(t.tid, None)
+        self.fired += len(fired)
+        return fired
+
+    def on_tick(self, symbol: str, price: float) -> List[Trigger]:
+        self.ticks += 1
+        self.last[symbol] = price
+        out: List[Trigger] = []
+        lad = self.static.get(symbol)
+        if lad is not None:
+            lad.crossed(price, out)
+        tl = self.trails.get((symbol, "sell"))
+        if tl is not None:
+            tl.tick(price, out)
+        tl = self.trails.get((symbol, "buy"))
+        if tl is not None:
+            tl.tick(price, out)
+        return self._emit(out, price)
+
+    def on_time(self, now: Optional[float] = None) -> List[Trigger]:
+        now = time.time() if now is None else now
+        out: List[Trigger] = []
+        dl = self.deadlines
+        while dl and dl[0][0] <= now:
+            t = heapq.heappop(dl)[2]
+            if t.active:
+                out.append(t)
+        return self._emit(out, None)
+
+    def on_ticker_message(self, msg: Dict[str, Any]) -> List[Trigger]:
+        """WS v2 ticker message -> ticks (last, else mid)."""
+        if msg.get("channel") != "ticker":
+            return []
+        fired: List[Trigger] = []
+        for r in msg.get("data") or []:
+            try:
+                px = float(r.get("last") or 0.0) or (float(r["bid"]) + float(r["ask"])) / 2.0
+            except (KeyError, TypeError, ValueError):
+                continue
+            if r.get("symbol") and px > 0:
+                fired += self.on_tick(r["symbol"], px)
+        return fired
+
+    def symbols(self) -> List[str]:
+        return sorted({t.symbol for t in self.by_id.values()})
+
+    # ---- persistence (other processes register exits by rewriting var/triggers.json) ------------
+    def save(self, app_path: str) -> None:
+        for lad in self.trails.values():
+            for t, peak in lad.peaks():
+                t.peak = peak
+        AtomicJSONWriter(triggers_path(app_path), schema_version=SCHEMA_TRIGGERS).write(
+            {"triggers": [t.to_dict() for t in self.by_id.values()]})
+
+    @classmethod
+    def load(cls, app_path: str, sink: Optional[Callable[[List[Trigger]], Any]] = None,
+             prices: Optional[Dict[str, float]] = None) -> "TriggerEngine":
+        eng = cls(sink)
+        eng.last.update(prices or {})
+        d = read_json(triggers_path(app_path))
+        for row in (d.get("triggers") or []) if isinstance(d, dict) else []:
+            try:
+                eng.add(Trigger(**row), price=row.get("peak"))     # trails resume from their saved peak
+            except (TypeError, ValueError):
+                continue
+        return eng
+
+def inbox_dir(app_path: str) -> str:
+    return os.path.join(app_path, "var", "trigger_inbox")
+
+def submit_triggers(app_path: str, triggers: Iterable[Trigger] = (), cancel_refs: Iterable[str] = (),
+                    name: Optional[str] = None) -> str:
+    """Register exits with the trigger runner (var/trigger_inbox/, same drop-file pattern as orders.armed.submit)."""
+    d = inbox_dir(app_path)
+    os.makedirs(d, exist_ok=True)
+    name = name or f"{time.time_ns()}-{os.getpid()}"
+    path = os.path.join(d, f"{name}.json")
+    tmp = os.path.join(d, f".{name}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"triggers": [t.to_dict() for t in triggers], "cancel_refs": list(cancel_refs)}, f)
+    os.replace(tmp, path)
+    return path
+
+def drain_triggers(engine: TriggerEngine, app_path: str) -> int:
+    """Arm every queued trigger and cancel every exit of the queued `cancel_refs`; returns the count applied."""
+    d = inbox_dir(app_path)
+    try:
+        names = sorted(n for n in os.listdir(d) if n.endswith(".json"))
+    except FileNotFoundError:
+        return 0
+    n = 0
+    for name in names:
+        path = os.path.join(d, name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                job = json.load(f)
+            os.remove(path)
+        except Exception:
+            continue
+        for row in job.get("triggers") or []:
+            try:
+                engine.add(Trigger(**row), price=row.get("peak"))
+                n += 1
+            except (TypeError, ValueError):
+                continue
+        for ref in job.get("cancel_refs") or []:
+            n += engine.cancel_ref(ref)
+    return n
+
+def exit_order(t: Trigger, spec: Optional[PairSpec] = None) -> Dict[str, Any]:
+    """WS v2 add_order message closing the trigger's position at market.
+
+    With the pair's spec the size is floored to whole lots (never more than the trigger holds) and
+    written as the exact wire string."""
+    qty = spec.qty_str(spec.qty_lots(t.qty, "floor")) if spec is not None else t.qty
+    params = {"order_type": "market", "side": t.side, "order_qty": qty, "symbol": t.symbol}
+    if t.ref:
+        # the uid survives restarts, so a re-sent exit carries the same id
+        params["cl_ord_id"] = f"{t.ref[:22]}-X{t.uid or t.tid}"[:32]
+    return {"method": "add_order", "params": params}
@@ -5,7 +5,9 @@ Lightweight helpers for the E2E dry-run script.
 - Basic env/.env_meanrev loading for a few keys
 """
 from __future__ import annotations
-import os, json, math, time, pathlib
+import os, time, pathlib
+from momentum.state import codec
+from momentum.utils.fixedpoint import PairSpec, round_to_decimals
 
 APP = os.environ.get("APP") or "/var/www/vhosts/snapdiscounts.nl/momentum"
 
@@ -13,20 +15,20 @@ def _load_json(path: str | pathlib.Path):
     p = pathlib.Path(path)
     if not p.exists():
         return None
-    with open(p, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(p, "rb") as f:
+        return codec.loads(f.read())
 
 def write_json(path: str | pathlib.Path, obj):
     p = pathlib.Path(path)
     p.parent.mkdir(parents=True, exist_ok=True)
-    with open(p, "w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
+    with open(p, "wb") as f:
+        f.write(codec.encode_for(str(p), obj, pretty=True))
 
 def append_ndjson(path: str | pathlib.Path, obj):
     p = pathlib.Path(path)
     p.parent.mkdir(parents=True, exist_ok=True)
-    with open(p, "a", encoding="utf-8") as f:
-        f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+    with open(p, "ab") as f:
+        f.write(codec.dumps_line(obj))
 
 def now_ts():
     return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
@@ -42,14 +44,16 @@ def get_decimals(pair: str, rules: dict):
     qty_dec = int(d.get("qty_decimals", 6))
     return price_dec, qty_dec
 
+def get_spec(pair: str, rules: dict) -> PairSpec:
+    price_dec, qty_dec = get_decimals(pair, rules)
+    return PairSpec(price_decimals=price_dec, lot_decimals=qty_dec)
+
 def round_price(v: float, decimals: int) -> float:
-    q = 10 ** decimals
-    return math.floor(v * q + 0.5) / q
+    return round_to_decimals(v, decimals, "nearest")
 
 def round_qty(v: float, decimals: int) -> float:
     # floor to avoid exceeding qty after rounding
-    q = 10 ** decimals
-    return math.floor(v * q) / q
+    return round_to_decimals(v, decimals, "floor")
 
 def load_env_meanrev():
     # Try environment first
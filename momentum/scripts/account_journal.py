@@ -0,0 +1,23 @@
+from __future__ import annotations
+import argparse, json, os, time
+from momentum.state.journal import EventJournal
+from momentum.ws.account import recover_account_book
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect the account event journal and time a snapshot + tail recovery")
+    ap.add_argument("--app", default=os.getenv("APP") or "/var/www/vhosts/snapdiscounts.nl/momentum")
+    ap.add_argument("--tail", type=int, default=0, help="also print the last N records")
+    args = ap.parse_args()
+
+    j = EventJournal(os.path.join(args.app, "var", "journal", "account"))
+    t0 = time.perf_counter()
+    book = recover_account_book(args.app, j)
+    rec_ms = (time.perf_counter() - t0) * 1000
+    print(json.dumps({**j.stats(), "recover_ms": round(rec_ms, 3), "journal_seq": book.journal_seq,
+                      "open_orders": len(book.orders), "positions": len(book.positions())}))
+    if args.tail:
+        for rec in j.replay(after=max(0, j.n - args.tail)):
+            print(json.dumps(rec, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 
 from __future__ import annotations
-import argparse, asyncio, json, os
+import argparse, asyncio, json, os, time
 from ..orders.orchestrator import amend_sl_to_be
 
 def main():
@@ -10,8 +10,24 @@ def main():
     p.add_argument("--offset", type=float, default=0.0)
     p.add_argument("--clid", required=True, help="SL cl_ord_id")
     p.add_argument("--qty", type=float, required=True, help="SL volume")
+    p.add_argument("--side", choices=("buy", "sell"), default="buy", help="entry side: BE is entry+offset for buy, entry-offset for sell")
+    p.add_argument("--pair", default=None, help="pair for the tick grid (config.minlot); default 8 decimals")
+    p.add_argument("--armed", type=int, default=0, help="1 = hand the amend to armed_order_runner (intent queue)")
     args = p.parse_args()
-    res = asyncio.run(amend_sl_to_be(args.app, args.entry, args.offset, args.clid, args.qty))
+    if args.armed:
+        from ..orders.armed import enqueue
+        from ..orders.orchestrator import be_amend_params
+        spec = None
+        if args.pair:
+            from ..config.minlot import spec_for_pair
+            spec = spec_for_pair(args.app, args.pair)
+        params = be_amend_params(args.entry, args.offset, args.clid, args.qty, args.side, spec)
+        # amends reuse the SL's cl_ord_id, so the producer key is the amend itself, not the order
+        seq = enqueue(args.app, [{"method": "amend_order", "params": params}], key=f"amend:{args.clid}:{time.time_ns()}")
+        print(json.dumps({"queued": seq}, indent=2))
+        return
+    res = asyncio.run(amend_sl_to_be(args.app, args.entry, args.offset, args.clid, args.qty,
+                                     side=args.side, pair=args.pair))
     print(json.dumps(res, indent=2))
 
 if __name__ == "__main__":
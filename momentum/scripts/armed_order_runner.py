@@ -0,0 +1,56 @@
+import os, asyncio, argparse, time
+from momentum.observability.textfile import write_textfile
+from momentum.orders.armed import QUEUE_CONSUMER, ArmedOrderConnection, drain_inbox, drain_queue, selection_has_candidates
+from momentum.state.intent_queue import shared_queue
+from momentum.util.backoff import exp_backoff
+
+async def run(app: str, check_interval: float, idle_disarm: float, poll_ms: float, always: bool) -> None:
+    conn = ArmedOrderConnection(app)
+    queue = shared_queue(app)
+    last_candidates = 0.0
+    next_check = 0.0
+    failures = 0
+    try:
+        while True:
+            now = time.monotonic()
+            if now >= next_check:
+                next_check = now + check_interval
+                if always or selection_has_candidates(app):
+                    last_candidates = now
+                    if not conn.armed:
+                        try:
+                            await conn.arm()
+                        except Exception as e:
+                            conn.errors += 1
+                            print(f"[armed] arm failed: {e}", flush=True)
+                elif conn.armed and now - last_candidates > idle_disarm:
+                    await conn.disarm()
+                conn.write_metrics()
+                write_textfile(app, "intent_queue", queue.prom_lines(QUEUE_CONSUMER))
+            # producers queue intents (orders.armed.enqueue -> var/intents.db); legacy drop files
+            # (orders.armed.submit -> var/order_inbox) still drain. Fires on the open socket, arming if needed
+            failed = False
+            for drain in (lambda: drain_queue(conn, queue), lambda: drain_inbox(conn, app)):
+                try:
+                    await drain()
+                except Exception as e:      # a failed arm/send must not take the order service down
+                    conn.errors += 1
+                    failed = True
+                    print(f"[armed] drain failed: {e}", flush=True)
+            failures = failures + 1 if failed else 0
+            await asyncio.sleep(exp_backoff(failures) if failures else poll_ms / 1000.0)
+    finally:
+        await conn.disarm()
+
+def main():
+    ap = argparse.ArgumentParser(description="Keep the WS v2 order connection armed while the funnel has candidates; fire queued intents (var/intents.db) and var/order_inbox/*.json")
+    ap.add_argument("--app", default=os.environ.get("APP", "."))
+    ap.add_argument("--check-interval", type=float, default=2.0, help="seconds between funnel selection checks")
+    ap.add_argument("--idle-disarm", type=float, default=300.0, help="disarm after this many seconds without candidates")
+    ap.add_argument("--poll-ms", type=float, default=5.0, help="intent queue / inbox poll interval")
+    ap.add_argument("--always", type=int, default=0, help="1 = stay armed regardless of funnel candidates")
+    args = ap.parse_args()
+    asyncio.run(run(args.app, args.check_interval, args.idle_disarm, args.poll_ms, bool(args.always)))
+
+if __name__ == "__main__":
+    main()
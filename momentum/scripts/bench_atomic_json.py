@@ -0,0 +1,45 @@
+from __future__ import annotations
+import argparse, os, tempfile, time
+import orjson
+from momentum.state import atomic_json
+from momentum.state.atomic_json import DURABILITY_LEVELS, AtomicJSONWriter, flush_pending, group_stats
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark AtomicJSONWriter durability levels (writes/sec, call latency)")
+    ap.add_argument("--writes", type=int, default=2000)
+    ap.add_argument("--paths", type=int, default=4, help="files written round-robin")
+    ap.add_argument("--keys", type=int, default=200, help="size of each payload")
+    ap.add_argument("--levels", default=",".join(DURABILITY_LEVELS))
+    args = ap.parse_args()
+
+    payload = {f"k{i}": {"qty": i * 0.5, "px": 100.0 + i, "side": "buy"} for i in range(args.keys)}
+    out = []
+    for level in args.levels.split(","):
+        with tempfile.TemporaryDirectory() as tmp:
+            writers = [AtomicJSONWriter(os.path.join(tmp, "var", f"f{i}.json"), "bench/v1", durability=level)
+                       for i in range(args.paths)]
+            before = group_stats()
+            lat = []
+            t0 = time.perf_counter()
+            for n in range(args.writes):
+                payload["n"] = n
+                a = time.perf_counter()
+                writers[n % args.paths].write(payload)
+                lat.append(time.perf_counter() - a)
+            calls = time.perf_counter() - t0
+            flush_pending()
+            total = time.perf_counter() - t0
+            after = group_stats()
+            lat.sort()
+            out.append({
+                "durability": level, "writes": args.writes, "paths": args.paths,
+                "writes_per_s": round(args.writes / calls),
+                "p50_us": round(lat[len(lat) // 2] * 1e6, 1),
+                "p99_us": round(lat[int(0.99 * len(lat))] * 1e6, 1),
+                "drain_ms": round((total - calls) * 1000, 1),
+                "file_commits": after["commits"] - before["commits"] if level == "group" else args.writes,
+            })
+    print(orjson.dumps(out, option=orjson.OPT_INDENT_2).decode())
+
+if __name__ == "__main__":
+    main()
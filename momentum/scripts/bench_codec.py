@@ -0,0 +1,52 @@
+from __future__ import annotations
+import argparse, json, random, time
+import orjson
+from momentum.state import codec
+
+def _payloads(rnd: random.Random, scale: int) -> dict:
+    pairs = [f"P{i}/USD" for i in range(500 * scale)]
+    universe = {"universe": [{"pair": p, "base": p[:-4], "vol_24h_usd": rnd.uniform(1e4, 1e8),
+                              "spread_bps": rnd.uniform(1, 50), "atr_pct": rnd.uniform(0.5, 9),
+                              "score": rnd.random(), "tags": ["spot", "usd"]} for p in pairs]}
+    open_orders = {f"O{i:06d}-ABCDE-FGHIJ": {"pair": rnd.choice(pairs), "type": "buy", "ordertype": "limit",
+                                            "vol": f"{rnd.uniform(0.01, 50):.8f}", "vol_exec": "0.00000000",
+                                            "price": f"{rnd.uniform(0.1, 9e4):.5f}", "status": "open",
+                                            "opentm": 1.7e9 + i, "userref": i}
+                   for i in range(2000 * scale)}
+    book = {"ts": 1.7e9, "source": "ws", "orders": open_orders,
+            "balances": {p[:-4]: rnd.uniform(0, 10) for p in pairs[:200]}, "opened_at": {}, "seq": {"executions": 9}}
+    tickers = {"ts": 1.7e9, "rows": {p: [rnd.uniform(1, 100), rnd.uniform(1, 100), rnd.uniform(1, 100), 1.7e9]
+                                     for p in pairs}}
+    return {"funnel_universe": universe, "open_orders_state": open_orders, "account_book": book,
+            "ticker_cache": tickers}
+
+def _time(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark var/ artifact codecs on funnel/state-sized payloads")
+    ap.add_argument("--scale", type=int, default=1, help="multiplies payload sizes (1 = 500 pairs / 2000 orders)")
+    ap.add_argument("--n", type=int, default=50)
+    args = ap.parse_args()
+
+    out = []
+    for name, obj in _payloads(random.Random(3), args.scale).items():
+        variants = {
+            "json_indent2": (lambda: json.dumps(obj, indent=2).encode(), json.loads),
+            "json_compact": (lambda: json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode(), json.loads),
+            "orjson": (lambda: codec.dumps(obj), codec.loads),
+            "orjson_pretty": (lambda: codec.dumps(obj, pretty=True), codec.loads),
+            "marshal": (lambda: codec.dumps(obj, "marshal"), codec.loads),
+        }
+        for fmt, (enc, dec) in variants.items():
+            blob = enc()
+            out.append({"payload": name, "codec": fmt, "bytes": len(blob),
+                        "encode_us": round(_time(enc, args.n), 1),
+                        "decode_us": round(_time(lambda: dec(blob), args.n), 1)})
+    print(orjson.dumps(out, option=orjson.OPT_INDENT_2).decode())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+from __future__ import annotations
+import argparse, asyncio, os, tempfile, threading, time
+import orjson
+from momentum.state.intent_queue import IntentQueue
+
+def _msg(i: int) -> dict:
+    return {"messages": [{"method": "add_order", "params": {"symbol": "BTC/USD", "side": "buy", "order_type": "limit",
+                                                            "order_qty": 0.001, "limit_price": 28440.0,
+                                                            "cl_ord_id": f"b{i}-E"}}]}
+
+def _pct(xs, q):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark intent queue put latency and producer->consumer hand-off")
+    ap.add_argument("--n", type=int, default=20000)
+    ap.add_argument("--handoff", type=int, default=2000)
+    ap.add_argument("--poll-ms", type=float, default=1.0)
+    ap.add_argument("--sync", default="NORMAL")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        q = IntentQueue(os.path.join(tmp, "put.db"), synchronous=args.sync)
+        lat = []
+        for i in range(args.n):
+            t0 = time.perf_counter()
+            q.put(_msg(i))
+            lat.append(time.perf_counter() - t0)
+        q.close()
+
+        # separate producer connection/thread, consumer polls its offset like armed_order_runner
+        path = os.path.join(tmp, "handoff.db")
+        cons = IntentQueue(path, synchronous=args.sync)
+        hand = []
+
+        def produce():
+            prod = IntentQueue(path, synchronous=args.sync)
+            for i in range(args.handoff):
+                prod.put(_msg(i), t_signal=time.time())
+                time.sleep(0.0005)
+            prod.close()
+
+        async def consume():
+            got = 0
+            while got < args.handoff:
+                for it in await cons.wait("bench", timeout=1.0, poll_s=args.poll_ms / 1000.0):
+                    hand.append(time.time() - it.t_signal)
+                    cons.commit("bench", it.seq)
+                    got += 1
+        th = threading.Thread(target=produce)
+        th.start()
+        asyncio.run(consume())
+        th.join()
+        cons.close()
+
+    print(orjson.dumps({
+        "sync": args.sync,
+        "put_us": {"p50": round(_pct(lat, 0.5) * 1e6, 1), "p99": round(_pct(lat, 0.99) * 1e6, 1)},
+        "handoff_ms": {"p50": round(_pct(hand, 0.5) * 1e3, 3), "p99": round(_pct(hand, 0.99) * 1e3, 3),
+                       "poll_ms": args.poll_ms},
+    }).decode())
+
+if __name__ == "__main__":
+    main()
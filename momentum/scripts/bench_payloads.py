@@ -0,0 +1,55 @@
+
+from __future__ import annotations
+import argparse, json, time
+import orjson
+from momentum.models.intent import Intent, TakeProfitLeg
+from momentum.utils.safety import SafetyKnobs
+from momentum.exchange.kraken.ws_v2_payloads import build_primary_payload, build_standalone_tp_messages
+from momentum.exchange.kraken.fast_payloads import FastIntent, FastTPLeg, TPTemplate, TemplateCache
+
+def _rate(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return n / (time.perf_counter() - t0)
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark WS v2 add_order payloads/sec: pydantic builder vs fast template path")
+    ap.add_argument("--n", type=int, default=20000)
+    args = ap.parse_args()
+
+    knobs = SafetyKnobs(entry_max_notional=100000, one_position_only=0, abs_limit_required=1)
+    legs = [TakeProfitLeg(trigger_price=28600, limit_price=28590, pct_size=0.5), TakeProfitLeg(trigger_price=28700, pct_size=0.5)]
+    fast_legs = [FastTPLeg(28600, 28590, 0.5), FastTPLeg(28700, None, 0.5)]
+
+    def current(i):
+        intent = Intent(symbol="BTC/USD", side="buy", qty=0.001, limit_price=28440 + i % 7,
+                        oto_order_type="stop-loss-limit", oto_trigger_price=28410, oto_limit_price=28400)
+        json.dumps(build_primary_payload(intent, "USD", knobs).model_dump(), separators=(",", ":"))
+
+    cache = TemplateCache("USD", knobs)
+    def fast(i):
+        tpl = cache.get("BTC/USD", oto_order_type="stop-loss-limit")
+        tpl.dumps(FastIntent("buy", 0.001, 28440 + i % 7, None, 28410, 28400))
+
+    def current_tp(i):
+        for m in build_standalone_tp_messages("BTC/USD", "sell", 0.001, legs, "USD", knobs):
+            json.dumps(m.model_dump(), separators=(",", ":"))
+
+    tp_tpl = TPTemplate("BTC/USD", "sell")
+    def fast_tp(i):
+        tp_tpl.dumps(0.001, fast_legs)
+
+    res = {
+        "n": args.n,
+        "primary_current_per_s": round(_rate(current, args.n)),
+        "primary_fast_per_s": round(_rate(fast, args.n)),
+        "tp2_current_per_s": round(_rate(current_tp, args.n)),
+        "tp2_fast_per_s": round(_rate(fast_tp, args.n)),
+    }
+    res["primary_speedup"] = round(res["primary_fast_per_s"] / res["primary_current_per_s"], 2)
+    res["tp_speedup"] = round(res["tp2_fast_per_s"] / res["tp2_current_per_s"], 2)
+    print(orjson.dumps(res).decode())
+
+if __name__ == "__main__":
+    main()
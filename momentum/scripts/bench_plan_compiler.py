@@ -0,0 +1,35 @@
+
+from __future__ import annotations
+import argparse, random, time
+import orjson
+from momentum.orders.plan_compiler import PlanSchema, compile_plans
+from momentum.utils.fixedpoint import PairSpec
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark batch plan compilation over N synthetic pairs")
+    ap.add_argument("--pairs", type=int, default=500)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    rnd = random.Random(7)
+    pairs = [f"P{i}/USD" for i in range(args.pairs)]
+    specs = [PairSpec(rnd.randint(1, 6), rnd.randint(2, 8)) for _ in pairs]
+    prices = [10 ** rnd.uniform(-3, 4) for _ in pairs]
+    qtys = [8.0 / p for p in prices]
+    schema = PlanSchema(tp=((0.9, 50.0), (1.4, 30.0), (2.1, 20.0)), sl_pct=-0.5, be_offset_pct=0.05, max_notional=10.0)
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        batch = compile_plans(pairs, specs, prices, qtys, schema)
+        best = min(best, time.perf_counter() - t0)
+    print(orjson.dumps({
+        "pairs": args.pairs,
+        "compile_ms_best": round(best * 1000, 3),
+        "pairs_per_s": round(args.pairs / best),
+        "ok": batch.ok_count,
+        "artifact_bytes": len(orjson.dumps(batch.to_artifact())),
+    }).decode())
+
+if __name__ == "__main__":
+    main()
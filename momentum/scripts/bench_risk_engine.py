@@ -0,0 +1,38 @@
+from __future__ import annotations
+import argparse, random, time
+import orjson
+from momentum.utils.risk_engine import RiskEngine, RiskLimits
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark per-intent and batch pre-trade risk checks")
+    ap.add_argument("--n", type=int, default=200000)
+    ap.add_argument("--pairs", type=int, default=500)
+    args = ap.parse_args()
+
+    rnd = random.Random(7)
+    eng = RiskEngine(RiskLimits(entry_max_notional=10.0, entry_min_notional=1.0, max_symbol_exposure=50.0,
+                                max_total_exposure=500.0, max_exposure_pct=0.5, max_open_orders=40), equity_usd=400.0)
+    pairs = [f"P{i}/USD" for i in range(args.pairs)]
+    for s in pairs[:20]:
+        eng.on_order_open(s, "buy", 1.0, 5.0)
+    prices = [10 ** rnd.uniform(-3, 4) for _ in pairs]
+    qtys = [8.0 / p for p in prices]
+
+    t0 = time.perf_counter()
+    for i in range(args.n):
+        j = i % args.pairs
+        eng.check(pairs[j], "buy", qtys[j], prices[j])
+    per_check = (time.perf_counter() - t0) / args.n
+
+    t0 = time.perf_counter()
+    verdicts = eng.evaluate_batch(pairs, prices, qtys)
+    batch = time.perf_counter() - t0
+    print(orjson.dumps({
+        "check_us": round(per_check * 1e6, 3),
+        "batch_pairs": args.pairs,
+        "batch_ms": round(batch * 1000, 3),
+        "feasible": sum(1 for r in verdicts if r is None),
+    }).decode())
+
+if __name__ == "__main__":
+    main()
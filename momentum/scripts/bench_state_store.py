@@ -0,0 +1,70 @@
+from __future__ import annotations
+import argparse, json, os, random, tempfile, time
+import orjson
+from momentum.state.sqlite_store import SQLiteStore
+
+def _fill(rnd: random.Random, i: int, pairs: int) -> dict:
+    return {"ordertxid": f"O{i // 3}", "pair": f"P{rnd.randrange(pairs)}/USD", "time": 1.7e9 + i,
+            "type": "buy" if i & 1 else "sell", "price": str(round(rnd.uniform(1, 100), 4)),
+            "vol": str(round(rnd.uniform(0.1, 5), 6)), "fee": "0.01"}
+
+def _json_store(path: str, fills) -> float:
+    """The legacy state.store path: load the whole state.json, set one key, write it back."""
+    t0 = time.perf_counter()
+    for fid, p in fills:
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {"orders": {}, "fills": {}, "positions": {}, "pnl": {}}
+        data["fills"][fid] = p
+        with open(path, "w") as f:
+            f.write(json.dumps(data, indent=2))
+    return time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the SQLite (WAL) state store against the state.json rewrite")
+    ap.add_argument("--sizes", default="10000,100000")
+    ap.add_argument("--batch", type=int, default=500)
+    ap.add_argument("--pairs", type=int, default=200)
+    ap.add_argument("--json-max", type=int, default=2000, help="legacy JSON path is O(history) per fill; cap it")
+    ap.add_argument("--sync", default="NORMAL")
+    args = ap.parse_args()
+
+    rnd = random.Random(5)
+    out = []
+    for n in (int(s) for s in args.sizes.split(",")):
+        fills = [(f"T{i}", _fill(rnd, i, args.pairs)) for i in range(n)]
+        with tempfile.TemporaryDirectory() as tmp:
+            db = SQLiteStore(os.path.join(tmp, "single.db"), synchronous=args.sync)
+            t0 = time.perf_counter()
+            for fid, p in fills:
+                db.upsert_fill(fid, p)
+            single = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            for k in range(1000):
+                db.fills_for(pair=f"P{k % args.pairs}/USD", since=1.7e9 + n - 1000)
+            query = time.perf_counter() - t0
+            db.close()
+
+            db = SQLiteStore(os.path.join(tmp, "batch.db"), synchronous=args.sync)
+            t0 = time.perf_counter()
+            for i in range(0, n, args.batch):
+                db.upsert_fills(fills[i:i + args.batch])
+            batched = time.perf_counter() - t0
+            db.close()
+
+            m = min(n, args.json_max)
+            js = _json_store(os.path.join(tmp, "state.json"), fills[:m])
+        out.append({
+            "fills": n, "sync": args.sync,
+            "sqlite_upsert_us": round(single / n * 1e6, 2),
+            "sqlite_batched_us": round(batched / n * 1e6, 2),
+            "sqlite_pair_query_us": round(query / 1000 * 1e6, 2),
+            "json_fills": m,
+            "json_upsert_us": round(js / m * 1e6, 2),
+        })
+    print(orjson.dumps(out).decode())
+
+if __name__ == "__main__":
+    main()
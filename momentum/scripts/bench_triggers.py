@@ -0,0 +1,62 @@
+from __future__ import annotations
+import argparse, random, time
+import orjson
+from momentum.orders.triggers import Trigger, TriggerEngine
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the client-side trigger index against a per-position scan")
+    ap.add_argument("--positions", type=int, default=5000)
+    ap.add_argument("--symbols", type=int, default=50)
+    ap.add_argument("--ticks", type=int, default=50000)
+    args = ap.parse_args()
+
+    rnd = random.Random(11)
+    syms = [f"P{i}/USD" for i in range(args.symbols)]
+    px = {s: 100.0 for s in syms}
+    eng = TriggerEngine()
+    naive = []
+    for i in range(args.positions):
+        s = syms[i % args.symbols]
+        sl = rnd.uniform(80, 99); tp = rnd.uniform(101, 120); d = rnd.uniform(1, 10)
+        eng.add(Trigger(s, "stop", "sell", 1.0, level=sl))
+        eng.add(Trigger(s, "take", "sell", 1.0, level=tp))
+        eng.add(Trigger(s, "trail", "sell", 1.0, distance=d), price=px[s])
+        naive.append([s, sl, tp, d, px[s], True])
+    ticks = []
+    for _ in range(args.ticks):
+        s = syms[rnd.randrange(args.symbols)]
+        px[s] = max(1.0, px[s] * (1 + rnd.gauss(0, 0.002)))
+        ticks.append((s, px[s]))
+
+    lat = []
+    t0 = time.perf_counter()
+    for s, p in ticks:
+        a = time.perf_counter()
+        eng.on_tick(s, p)
+        lat.append(time.perf_counter() - a)
+    fast = time.perf_counter() - t0
+
+    by_sym = {}
+    for row in naive:
+        by_sym.setdefault(row[0], []).append(row)
+    t0 = time.perf_counter()
+    for s, p in ticks:           # baseline: scan every position of the ticked symbol
+        for row in by_sym[s]:
+            if not row[5]:
+                continue
+            row[4] = max(row[4], p)
+            if p <= row[1] or p >= row[2] or p <= row[4] - row[3]:
+                row[5] = False
+    scan = time.perf_counter() - t0
+    lat.sort()
+    print(orjson.dumps({
+        "positions": args.positions, "triggers": 3 * args.positions, "ticks": args.ticks,
+        "tick_us": round(fast / args.ticks * 1e6, 3),
+        "tick_p99_us": round(lat[int(0.99 * len(lat))] * 1e6, 3),
+        "tick_max_us": round(lat[-1] * 1e6, 3),
+        "scan_tick_us": round(scan / args.ticks * 1e6, 3),
+        "fired": eng.fired,
+    }).decode())
+
+if __name__ == "__main__":
+    main()
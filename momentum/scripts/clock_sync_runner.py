@@ -0,0 +1,15 @@
+import os, asyncio, argparse
+from momentum.util.clock_sync import SYNC_INTERVAL_SEC, run_clock_sync
+
+def main():
+    ap = argparse.ArgumentParser(description="Track Kraken clock offset/RTT -> var/clock_offset.json + var/metrics.d/clock_sync.prom")
+    ap.add_argument("--app", default=os.environ.get("APP", "."))
+    ap.add_argument("--interval", type=float, default=SYNC_INTERVAL_SEC)
+    ap.add_argument("--iterations", type=int, default=0, help="0 = run forever")
+    args = ap.parse_args()
+    clock = asyncio.run(run_clock_sync(args.app, args.interval, iterations=args.iterations))
+    if args.iterations:
+        print(clock.snapshot())
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 from __future__ import annotations
-import os, json, argparse, pathlib, statistics, math, time, sys
+import os, json, argparse, pathlib, statistics, math, time, sys, dataclasses
 from typing import List, Dict, Any
 from ._e2e_helpers import (
     APP, write_json, append_ndjson, now_ts,
-    load_pair_rules, get_decimals, round_price, round_qty, load_env_meanrev, to_float
+    load_pair_rules, get_spec, load_env_meanrev, to_float
 )
+from momentum.orders.plan_compiler import PlanSchema, compile_plans, write_batch
+from momentum.utils.risk_engine import RiskEngine
 
 
 def _safe_get_pair(row):
@@ -154,8 +156,9 @@ def rank_pairs_spread(top: int, window_s: int, min_top_size: float | None, min_q
     ranked = [r for r in filtered if r[2]]
     return ranked[:top], filtered
 
-def build_add_order_payload(pair: str, side: str, ordertype: str, price: float, volume: float,
+def build_add_order_payload(pair: str, side: str, ordertype: str, price: str, volume: str,
                             tif: str, post_only: bool, validate: bool, cl_id: str) -> Dict[str, Any]:
+    # price/volume are wire strings rendered from integer ticks/lots (PairSpec.price_str/qty_str)
     params = {
         "pair": pair,
         "side": side,
@@ -165,12 +168,9 @@ def build_add_order_payload(pair: str, side: str, ordertype: str, price: float,
         "validate": bool(int(validate)),
         "cl_ord_id": cl_id,
     }
-    if ordertype == "limit":
-        params["price"] = f"{price:.10f}".rstrip("0").rstrip(".")
-    else:
-        # stop-loss / stop-loss-limit: Kraken expects 'price' (trigger) and optional 'price2' (limit)
-        params["price"] = f"{price:.10f}".rstrip("0").rstrip(".")
-    params["volume"] = f"{volume:.10f}".rstrip("0").rstrip(".")
+    # limit: 'price' is the limit; stop-loss / stop-loss-limit: 'price' is the trigger (optional 'price2' limit)
+    params["price"] = price
+    params["volume"] = volume
     # If project has a canonical builder, delegate
     if order_payloads:
         try:
@@ -197,6 +197,10 @@ def main():
     ap.add_argument("--tif", type=str, default=None)
     ap.add_argument("--post_only", type=int, default=None)
     ap.add_argument("--validate_only", type=int, default=1)
+    ap.add_argument("--per_pair_files", type=int, default=1, help="Also write <pair>.plan.json + summary.ndjson (0 = batch artifact only)")
+    ap.add_argument("--risk_filter", type=int, default=0,
+                    help="1 = drop pairs the risk engine (utils.risk_engine) rejects before planning; it checks a "
+                         "one-time snapshot of the account book, live orders are not routed through it")
     ap.add_argument("--output-dir", type=str, required=True)
     args = ap.parse_args()
 
@@ -270,45 +274,51 @@ def main():
     metrics_ok = 0
     metrics_rej = 0
 
-    for idx, pair in enumerate(pairs, 1):
-        price_dec, qty_dec = get_decimals(pair, rules)
-        entry_price = round_price(float(args.limit), price_dec)
-        total_qty = round_qty(float(args.qty), qty_dec)
-
-        # Guard: ENTRY_MAX_NOTIONAL
-        reject_reason = None
-        if ENTRY_MAX_NOTIONAL is not None:
-            notional = entry_price * total_qty
-            if notional > ENTRY_MAX_NOTIONAL + 1e-12:
-                reject_reason = f"entry_max_notional_exceeded:{notional:.8f}>{ENTRY_MAX_NOTIONAL:.8f}"
-
-        # Split TP legs
-        legs = []
-        if not reject_reason:
-            remaining_qty = total_qty
-            for i, (tp_pct, alloc_pct) in enumerate(tp_schema, 1):
-                leg_qty_raw = total_qty * (alloc_pct / 100.0)
-                leg_qty = round_qty(leg_qty_raw, qty_dec)
-                # ensure we don't exceed remaining due to rounding
-                if leg_qty > remaining_qty:
-                    leg_qty = remaining_qty
-                # avoid dust legs
-                if leg_qty <= 0:
-                    continue
-                remaining_qty = round_qty(remaining_qty - leg_qty, qty_dec)
-                tp_price = round_price(entry_price * (1.0 + tp_pct / 100.0), price_dec)
-                legs.append({
-                    "idx": i, "tp_pct": tp_pct, "alloc_pct": alloc_pct,
-                    "price": tp_price, "qty": leg_qty
-                })
-            # Merge dust into last leg if remainder left
-            if remaining_qty > 0 and legs:
-                legs[-1]["qty"] = round_qty(legs[-1]["qty"] + remaining_qty, qty_dec)
-                remaining_qty = 0.0
-            if not legs:
-                reject_reason = "all_tp_legs_became_zero_after_rounding"
+    # Compile all plans in one compile_plans call (integer ticks/lots), then render payloads
+    schema = PlanSchema(
+        tp=tuple(tp_schema), sl_pct=sl_pct,
+        be_offset_pct=(BE_OFFSET or 0.0) if args.breakeven else None,
+        max_notional=ENTRY_MAX_NOTIONAL,
+    )
+    if args.risk_filter and pairs:
+        # one batch pass against cached equity/exposure; infeasible pairs never reach the plan compiler
+        engine = RiskEngine.from_env(APP)
+        # the notional cap is applied on quantized lots/ticks by the plan compiler itself
+        engine.on_limits(dataclasses.replace(engine.limits, entry_max_notional=None))
+        verdicts = engine.evaluate_batch(pairs, float(args.limit), float(args.qty))
+        for pair, reason in zip(pairs, verdicts):
+            if reason:
+                key = f"risk:{reason.split(':', 1)[0]}"
+                report["rejected_count"] += 1
+                report["reasons_hist"][key] = report["reasons_hist"].get(key, 0) + 1
+                metrics_rej += 1
+        pairs = [p for p, r in zip(pairs, verdicts) if r is None]
+    batch = compile_plans(pairs, [get_spec(p, rules) for p in pairs], float(args.limit), float(args.qty), schema)
+    write_batch(str(out_dir / "plans.batch.json"), batch, ts=now_ts(), params=report["params"])
+
+    for i, row in enumerate(batch.rows()):
+        pair = row["pair"]
+        reject_reason = row["reject_reason"]
+        if reject_reason:
+            metrics_rej += 1
+            report["rejected_count"] += 1
+            report["reasons_hist"][reject_reason] = report["reasons_hist"].get(reject_reason, 0) + 1
+            if args.per_pair_files:
+                plan = {"ts": now_ts(), "pair": pair, "entry": row["entry"], "tp_legs": [], "sl": None,
+                        "guards": {"ENTRY_MAX_NOTIONAL": ENTRY_MAX_NOTIONAL}, "guards_passed": False,
+                        "status": "rejected", "reject_reason": reject_reason}
+                write_json(out_dir / f"{pair.replace('/', '_')}.plan.json", plan)
+                append_ndjson(summary_path, {"pair": pair, "guards_passed": False, "reject_reason": reject_reason})
+            continue
+        metrics_ok += 1
+        report["ok_count"] += 1
+        if not args.per_pair_files:
+            continue
 
-        # Build payloads
+        # Legacy per-pair artifacts with rendered (validate-only) payloads
+        entry_price, total_qty = row["entry"]["price"], row["entry"]["qty"]
+        spec = batch.spec(i)
+        qty_wire = spec.qty_str(batch.total_lots[i])
         plan = {
             "ts": now_ts(),
             "pair": pair,
@@ -317,71 +327,43 @@ def main():
             "sl": None,
             "breakeven": {"enabled": bool(args.breakeven), "offset_pct": BE_OFFSET, "hypothetical_amend_payload": None},
             "guards": {"ENTRY_MAX_NOTIONAL": ENTRY_MAX_NOTIONAL},
-            "guards_passed": reject_reason is None
+            "guards_passed": True
         }
-
-        if reject_reason:
-            plan["status"] = "rejected"
-            plan["reject_reason"] = reject_reason
-            write_json(out_dir / f"{pair.replace('/', '_')}.plan.json", plan)
-            append_ndjson(summary_path, {
-                "pair": pair, "guards_passed": False, "reject_reason": reject_reason
-            })
-            metrics_rej += 1
-            report["rejected_count"] += 1
-            report["reasons_hist"][reject_reason] = report["reasons_hist"].get(reject_reason, 0) + 1
-            continue
-
-        # Entry BUY limit (validate only)
-        entry_payload = build_add_order_payload(
-            pair=pair, side="buy", ordertype="limit", price=entry_price, volume=total_qty,
+        plan["entry"]["payload"] = build_add_order_payload(
+            pair=pair, side="buy", ordertype="limit", price=spec.price_str(batch.entry_ticks[i]), volume=qty_wire,
             tif=DEFAULT_TIF, post_only=DEFAULT_POST_ONLY, validate=bool(args.validate_only),
             cl_id=f"e2eSIM:{pair}:ENTRY:{int(time.time())}"
         )
-        plan["entry"]["payload"] = entry_payload
-
-        # TP SELL legs
-        for leg in legs:
-            p = build_add_order_payload(
-                pair=pair, side="sell", ordertype="limit", price=leg["price"], volume=leg["qty"],
+        for leg, ticks, lots in zip(row["tp_legs"], batch.tp_ticks[i], batch.tp_lots[i]):
+            leg["payload"] = build_add_order_payload(
+                pair=pair, side="sell", ordertype="limit", price=spec.price_str(ticks), volume=spec.qty_str(lots),
                 tif=DEFAULT_TIF, post_only=DEFAULT_POST_ONLY, validate=bool(args.validate_only),
                 cl_id=f"e2eSIM:{pair}:TP{leg['idx']}:{int(time.time())}"
             )
-            leg["payload"] = p
             plan["tp_legs"].append(leg)
-
-        # SL separate order (stop-loss or stop-loss-limit -> we model as stop-loss with trigger price)
-        sl_trigger = round_price(entry_price * (1.0 + sl_pct / 100.0), price_dec)
+        sl_trigger = row["sl"]["trigger"]
         sl_payload = build_add_order_payload(
-            pair=pair, side="sell", ordertype=JANITOR_CLOSE_ORDER_TYPE, price=sl_trigger, volume=total_qty,
+            pair=pair, side="sell", ordertype=JANITOR_CLOSE_ORDER_TYPE, price=spec.price_str(batch.sl_ticks[i]), volume=qty_wire,
             tif=JANITOR_CLOSE_TIF, post_only=0, validate=bool(args.validate_only),
             cl_id=f"e2eSIM:{pair}:SL:{int(time.time())}"
         )
         plan["sl"] = {"sl_pct": sl_pct, "trigger": sl_trigger, "payload": sl_payload}
-
-        # Hypothetical breakeven amend after TP1
-        if args.breakeven and plan["tp_legs"]:
-            be_price = round_price(entry_price * (1.0 + (BE_OFFSET or 0.0) / 100.0), price_dec)
+        if row["be_price"] is not None:
             plan["breakeven"]["hypothetical_amend_payload"] = {
                 "action": "amend_sl_to_breakeven",
-                "new_trigger_price": be_price,
+                "new_trigger_price": row["be_price"],
                 "note": "Hypothetical amend after TP1 fill"
             }
-
         plan["status"] = "ok"
         write_json(out_dir / f"{pair.replace('/', '_')}.plan.json", plan)
-
-        # Summary line
         append_ndjson(summary_path, {
             "pair": pair, "guards_passed": True,
             "entry_price": entry_price, "qty": total_qty,
             "tp_prices": [l["price"] for l in plan["tp_legs"]],
             "tp_allocs": [l["alloc_pct"] for l in plan["tp_legs"]],
-            "sl_trigger": plan["sl"]["trigger"],
+            "sl_trigger": sl_trigger,
             "legs_kept": len(plan["tp_legs"])
         })
-        metrics_ok += 1
-        report["ok_count"] += 1
 
     write_json(out_dir / "run_report.json", report)
 
@@ -1,20 +1,17 @@
 
 import argparse, os, sys, shlex, subprocess, json
+from momentum.utils.fixedpoint import round_to_step
 from momentum.utils.risk_sizing import load_knobs_from_env, read_equity_usd, compute_qty
 from momentum.utils.price_feed import mids_sync
 from momentum.utils.specs_sync import specs_sync
 
 def _ceil_to_tick(x: float, tick: float) -> float:
     if tick <= 0: return x
-    n = int((x + 1e-15) / tick)
-    if n * tick < x - 1e-15:
-        n += 1
-    return round(n * tick, 12)
+    return round_to_step(x, tick, "ceil")
 
 def _floor_to_step(x: float, step: float) -> float:
     if step <= 0: return x
-    n = int((x + 1e-15) / step)
-    return round(n * step, 12)
+    return round_to_step(x, step, "floor")
 
 
 def main():
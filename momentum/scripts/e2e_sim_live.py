@@ -1,21 +1,19 @@
 
 import argparse, os, sys, shlex, subprocess, json
 
-from momentum.utils.risk_sizing import load_knobs_from_env, read_equity_usd, compute_qty
+from momentum.utils.fixedpoint import round_to_step
+from momentum.utils.risk_engine import RiskEngine, shared_risk_engine
+from momentum.utils.risk_sizing import load_knobs_from_env
 from momentum.utils.price_feed import mids_sync
 from momentum.utils.specs_sync import specs_sync
 
 def _ceil_to_tick(x: float, tick: float) -> float:
     if tick <= 0: return x
-    n = int((x + 1e-15) / tick)
-    if n * tick < x - 1e-15:
-        n += 1
-    return round(n * tick, 12)
+    return round_to_step(x, tick, "ceil")
 
 def _floor_to_step(x: float, step: float) -> float:
     if step <= 0: return x
-    n = int((x + 1e-15) / step)
-    return round(n * step, 12)
+    return round_to_step(x, step, "floor")
 
 def main():
     p = argparse.ArgumentParser(description="Momentum E2E LIVE (risk-sized, strict cap vs tick/lot, auto-limit)")
@@ -75,16 +73,12 @@ def main():
     min_vol_step = max(vol_steps) if vol_steps else 0.0
 
     if qty is None:
-        eq = read_equity_usd(knobs)
-        base = compute_qty(
-            limit_price=limit_price,
-            equity_usd=eq,
-            risk_pct=knobs.get("ENTRY_RISK_PCT"),
-            max_notional=knobs.get("ENTRY_MAX_NOTIONAL"),
-            min_notional=knobs.get("ENTRY_MIN_NOTIONAL"),
-        )
+        # live engine (ws_private_runner) when published, else a one-time load; equity is its cached value
+        app = os.environ.get("APP", ".")
+        engine = shared_risk_engine(app) or RiskEngine.from_env(app)
+        base = engine.size_qty(limit_price)
         qty = base["final_qty"]
-        max_notional = knobs.get("ENTRY_MAX_NOTIONAL")
+        max_notional = engine.limits.entry_max_notional
         if max_notional not in (None, 0, 0.0):
             cap_qty = max_notional / (effective_limit if effective_limit else limit_price)
             if min_vol_step:
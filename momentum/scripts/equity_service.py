@@ -0,0 +1,15 @@
+import os, asyncio, argparse
+from momentum.services.equity import EquityService
+
+def main():
+    ap = argparse.ArgumentParser(description="Live mark-to-market equity: WS balances + tickers -> var/account_equity_usd.json and shm record")
+    ap.add_argument("--app", default=os.environ.get("APP", "."))
+    ap.add_argument("--quote", default="USD")
+    args = ap.parse_args()
+    try:
+        asyncio.run(EquityService(args.app, quote=args.quote).run())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
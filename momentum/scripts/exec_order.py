@@ -1,24 +1,20 @@
 
 from __future__ import annotations
 import os, sys, json, argparse, time
-from decimal import Decimal, ROUND_HALF_UP, getcontext
 from typing import List, Dict, Any, Optional, Tuple
 
-from momentum.state.atomic_json import read_json
-from momentum.config.minlot import for_pair as minlot_for_pair, quantize_qty
-
-getcontext().prec = 28  # ample precision
+from momentum.config.minlot import spec_for_pair
+from momentum.utils.fixedpoint import PairSpec, round_to_decimals, to_units
+from momentum.utils.safety import one_position_min_qty
+from momentum.ws.account import AccountBook, account_book_for
 
 def _clid(prefix: str = "mom6e") -> str:
     return f"{prefix}-{int(time.time()*1000)%100000000:x}"
 
-def _qdec(x) -> Decimal:
-    return x if isinstance(x, Decimal) else Decimal(str(x))
-
-def _usd(x: Decimal) -> Decimal:
-    return x.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+def _usd(x: float) -> float:
+    return round_to_decimals(x, 2, "nearest")
 
-def _parse_tp(tp_str: str, qty: float) -> List[Dict[str, float]]:
+def _parse_tp(tp_str: str, qty_lots: int, spec: PairSpec) -> List[Dict[str, Any]]:
     if not tp_str:
         return []
     legs = []
@@ -32,33 +28,32 @@ def _parse_tp(tp_str: str, qty: float) -> List[Dict[str, float]]:
         trig_and_rest = part.split("@", 1)
         if len(trig_and_rest) != 2:
             continue
-        trigger = Decimal(trig_and_rest[0])
+        trigger = spec.price_ticks(float(trig_and_rest[0]))
         pct_and_maybe_limit = trig_and_rest[1]
         if ":" in pct_and_maybe_limit:
             pct_part, limit_part = pct_and_maybe_limit.split(":", 1)
-            limit_price = Decimal(limit_part)
+            limit_price = spec.price_ticks(float(limit_part))
             order_type = "take-profit-limit"
         else:
             pct_part = pct_and_maybe_limit
             limit_price = None
             order_type = "take-profit"
-        pct = Decimal(pct_part.strip().rstrip("%")) / Decimal(100)
+        pct = float(pct_part.strip().rstrip("%")) / 100.0
         legs.append({
             "order_type": order_type,
             "trigger": trigger,
             "limit": limit_price,
             "portion": pct
         })
-    # size legs
+    # size legs in whole lots (half-up), convert to wire strings only for the payload
     out = []
-    qty_dec = _qdec(qty)
     for leg in legs:
-        leg_qty = (qty_dec * leg["portion"]).quantize(Decimal("0.00000001"), rounding=ROUND_HALF_UP)
+        leg_lots = to_units(qty_lots * leg["portion"], 1, "nearest")
         out.append({
             "order_type": leg["order_type"],
-            "trigger": float(leg["trigger"]),
-            "limit": float(leg["limit"]) if leg["limit"] is not None else None,
-            "qty": float(leg_qty)
+            "trigger": spec.price_str(leg["trigger"]),
+            "limit": spec.price_str(leg["limit"]) if leg["limit"] is not None else None,
+            "qty": spec.qty_str(leg_lots)
         })
     return out
 
@@ -73,38 +68,14 @@ def _write_to_var(app_path: str, payload: Any, guard: bool=False) -> str:
     print(f"[dry-run] wrote {'guard result' if guard else 'payloads'} to ./var/ws_payloads.json")
     return outp
 
-def _load_positions(app_path: str, symbol: str) -> Decimal:
-    try:
-        state = read_json(os.path.join(app_path, "var", "positions.json")) or {}
-        row = state.get(symbol) or {}
-        nb = Decimal(str(row.get("net_base", 0)))
-        return nb
-    except Exception:
-        return Decimal("0")
-
-def _has_pending_entry(app_path: str, symbol: str) -> bool:
-    try:
-        state = read_json(os.path.join(app_path, "var", "open_orders_state.json")) or {}
-    except Exception:
-        return False
-    # Support both list and dict formats
-    if isinstance(state, list):
-        it = state
-    elif isinstance(state, dict):
-        it = state.get("open") or state.get("orders") or state.values()
-        if isinstance(it, dict):
-            it = list(it.values())
-    else:
-        it = []
-    for od in it:
-        try:
-            if (od.get("symbol") == symbol or od.get("pair") == symbol) and od.get("side") == "buy" and od.get("status","open") == "open":
-                return True
-        except Exception:
-            continue
-    return False
+def _has_position(book: AccountBook, symbol: str) -> bool:
+    return book.has_position(symbol, one_position_min_qty())
+
+def _has_pending_entry(book: AccountBook, symbol: str) -> bool:
+    return book.has_pending_entry(symbol)
 
 def main() -> int:
+    t_signal = time.time()
     ap = argparse.ArgumentParser()
     ap.add_argument("--symbol", required=True)
     ap.add_argument("--side", required=True, choices=["buy","sell"])
@@ -116,26 +87,30 @@ def main() -> int:
     ap.add_argument("--validate", type=int, default=1)
     ap.add_argument("--dry_run", type=int, default=1)
     ap.add_argument("--app", default=os.environ.get("APP") or "")
+    ap.add_argument("--armed", type=int, default=0,
+                    help="1 (with --dry_run 0) = hand the entry to armed_order_runner; the SL/TPs are queued "
+                         "once it fills (needs ws_private_runner with trade events on)")
     args = ap.parse_args()
 
     app_path = args.app or os.environ.get("APP") or os.getcwd()
 
-    # Load minlot
-    min_qty, lot_step = minlot_for_pair(app_path, args.symbol)
+    # Load minlot as fixed-point spec (lots/ticks)
+    spec = spec_for_pair(app_path, args.symbol)
 
     # Quantize qty first
-    qty_q = quantize_qty(float(args.qty), float(lot_step))
-    limit_dec = _qdec(args.limit)
-    notional = _usd(_qdec(qty_q) * limit_dec)
+    qty_lots = spec.qty_lots(float(args.qty), "nearest")
+    limit_ticks = spec.price_ticks(float(args.limit))
+    qty_q = spec.qty(qty_lots)
+    notional = _usd(spec.notional(qty_lots, limit_ticks))
 
     # Guards
-    ENTRY_MAX = _usd(Decimal("10.00"))
+    ENTRY_MAX = 10.00
     entry_ok = notional <= ENTRY_MAX
 
-    # ONE_POSITION_ONLY
-    nb = _load_positions(app_path, args.symbol)
-    has_pos = (nb != 0)
-    has_pending = _has_pending_entry(app_path, args.symbol)
+    # ONE_POSITION_ONLY: streamed account book when fresh, else built once from the reconcile files
+    book = account_book_for(app_path, max_age_s=float(os.environ.get("ACCOUNT_BOOK_MAX_AGE_SEC", "30")))
+    has_pos = _has_position(book, args.symbol)
+    has_pending = _has_pending_entry(book, args.symbol)
     one_pos_ok = (not has_pos) and (not has_pending)
 
     if not entry_ok:
@@ -147,20 +122,28 @@ def main() -> int:
         obj = {"error":"one_position_only_blocked","symbol":args.symbol,"reason":reason}
         _write_to_var(app_path, obj, guard=True)
         return 0
+    if qty_lots < spec.min_lots:
+        obj = {"error":"below_min_order","qty":float(qty_q),"min_qty":spec.qty(spec.min_lots)}
+        _write_to_var(app_path, obj, guard=True)
+        return 0
+
+    # Leg ids follow orchestrator.build_oto_plan (<base>-E / -SL / -TPn) so services.trade_events
+    # recognizes the fills and can place the exits once the entry is filled
+    base = _clid("mom6")
 
-    # Build payloads
+    # Build payloads: prices/quantities as exact wire strings (sent as JSON numbers by fixedpoint.wire_dumps)
     entry = {
         "method":"add_order",
         "params":{
             "order_type":"limit",
             "side": args.side,
-            "order_qty": float(qty_q),
+            "order_qty": spec.qty_str(qty_lots),
             "symbol": args.symbol,
-            "limit_price": float(args.limit),
+            "limit_price": spec.price_str(limit_ticks),
             "time_in_force":"gtc",
             "post_only": True,
             "validate": bool(args.validate),
-            "cl_ord_id": _clid("mom6e")
+            "cl_ord_id": f"{base}-E"
         }
     }
     stop_loss = {
@@ -168,41 +151,41 @@ def main() -> int:
         "params":{
             "order_type":"stop-loss-limit",
             "side":"sell" if args.side=="buy" else "buy",
-            "order_qty": float(qty_q),
+            "order_qty": spec.qty_str(qty_lots),
             "symbol": args.symbol,
             "triggers":{
                 "reference":"last",
-                "price": float(args.sl),
+                "price": spec.price_str(spec.price_ticks(args.sl)),
                 "price_type":"static"
             },
             "time_in_force":"gtc",
             "validate": bool(args.validate),
-            "cl_ord_id": _clid("mom6s"),
-            "limit_price": float(args.sl_limit)
+            "cl_ord_id": f"{base}-SL",
+            "limit_price": spec.price_str(spec.price_ticks(args.sl_limit))
         }
     }
-    tp_legs = _parse_tp(args.tp, qty_q)
+    tp_legs = _parse_tp(args.tp, qty_lots, spec)
     take_profits: List[Dict[str, Any]] = []
-    for leg in tp_legs:
+    for i, leg in enumerate(tp_legs, start=1):
         common = {
             "method":"add_order",
             "params":{
                 "order_type": leg["order_type"],
                 "side":"sell" if args.side=="buy" else "buy",
-                "order_qty": float(leg["qty"]),
+                "order_qty": leg["qty"],
                 "symbol": args.symbol,
                 "triggers":{
                     "reference":"last",
-                    "price": float(leg["trigger"]),
+                    "price": leg["trigger"],
                     "price_type":"static"
                 },
                 "time_in_force":"gtc",
                 "validate": bool(args.validate),
-                "cl_ord_id": _clid("mom6t")
+                "cl_ord_id": f"{base}-TP{i}"
             }
         }
         if leg["order_type"] == "take-profit-limit" and leg["limit"] is not None:
-            common["params"]["limit_price"] = float(leg["limit"])
+            common["params"]["limit_price"] = leg["limit"]
         take_profits.append(common)
 
     meta = {
@@ -212,14 +195,14 @@ def main() -> int:
             "ONE_POSITION_ONLY": {"ok": bool(one_pos_ok), "reason": None if one_pos_ok else ("existing_position" if has_pos else "pending_entry")}
         },
         "min_order": {
-            "ok": qty_q >= min_qty,
-            "min_qty": float(min_qty),
+            "ok": qty_lots >= spec.min_lots,
+            "min_qty": spec.qty(spec.min_lots),
             "effective_qty": float(qty_q)
         },
         "qty": float(qty_q),
         "symbol": args.symbol,
         "side": args.side,
-        "limit_price": float(args.limit),
+        "limit_price": spec.price(limit_ticks),
     }
 
     result = {
@@ -230,6 +213,16 @@ def main() -> int:
     }
 
     _write_to_var(app_path, result, guard=False)
+    if args.armed and not args.dry_run:
+        from momentum.orders.armed import enqueue, record_exits  # lazy: aiohttp only needed when handing off
+        # Only the post-only entry goes out now; the SL/TPs would otherwise rest (and could trigger)
+        # before anything is held. They are recorded with the plan and queued by the private WS
+        # runner's entry_filled hook (orders.armed.enqueue_exits).
+        record_exits(app_path, base, [stop_loss, *take_profits], symbol=args.symbol, side=args.side,
+                     volume=float(qty_q), entry_price=spec.price(limit_ticks), lot_decimals=spec.lot_decimals)
+        seq = enqueue(app_path, [entry], t_signal=t_signal)
+        print(f"[armed] queued entry {base}-E -> var/intents.db seq={seq}; "
+              f"{1 + len(take_profits)} exits wait for the fill")
     return 0
 
 if __name__ == "__main__":
@@ -1,6 +1,7 @@
 
 from __future__ import annotations
 import argparse, asyncio, json, os
+from ..config.minlot import spec_for_pair
 from ..orders.orchestrator import EntrySpec, TPLeg, SLSpec, build_oto_plan, execute_plan, amend_sl_to_be
 
 def main():
@@ -26,7 +27,7 @@ def main():
     tps = [TPLeg(ratio=args.tp1_ratio, price=args.tp1), TPLeg(ratio=args.tp2_ratio, price=args.tp2)]
     sl = SLSpec(price=args.sl, limit_price=args.sl_limit)
 
-    plan = build_oto_plan(entry, tps, sl, be_offset=args.be_offset)
+    plan = build_oto_plan(entry, tps, sl, be_offset=args.be_offset, spec=spec_for_pair(args.app, args.pair))
     print("[PLAN]"); print(json.dumps(plan, indent=2))
 
     if args.execute:
@@ -36,7 +37,8 @@ def main():
     if args.simulate_partial:
         sl_clids = [l["params"]["cl_ord_id"] for l in plan["legs"] if l["kind"]=="SL"]
         if sl_clids:
-            be = asyncio.run(amend_sl_to_be(args.app, entry_price=args.entry, be_offset=args.be_offset, sl_clid=sl_clids[0], sl_volume=args.qty))
+            be = asyncio.run(amend_sl_to_be(args.app, entry_price=args.entry, be_offset=args.be_offset, sl_clid=sl_clids[0], sl_volume=args.qty,
+                                           side=args.side, pair=args.pair))
             print("[BE-MOVE]"); print(json.dumps(be, indent=2))
         else:
             print("[BE-MOVE] skipped: no SL leg present")
@@ -4,6 +4,7 @@ import os, asyncio
 from aiohttp import web
 from momentum.observability.status import snapshot
 from momentum.scripts.obs_emit_metrics import write_prom as _write_prom
+from momentum.observability.textfile import read_textfiles
 
 APP_PATH = os.environ.get("APP", os.getcwd())
 METRICS_FILE = os.path.join(APP_PATH, "var", "metrics.prom")
@@ -33,7 +34,7 @@ def render_prom_text(snap) -> str:
 async def metrics(request: web.Request) -> web.Response:
     try:
         snap = snapshot(APP_PATH)
-        text = render_prom_text(snap)
+        text = render_prom_text(snap) + read_textfiles(APP_PATH)
         # also persist to file atomically for sidecar scrapers if desired
         os.makedirs(os.path.dirname(METRICS_FILE), exist_ok=True)
         tmp = METRICS_FILE + ".tmp"
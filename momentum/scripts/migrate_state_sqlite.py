@@ -0,0 +1,19 @@
+from __future__ import annotations
+import argparse, json
+from ..state import store
+from ..state.sqlite_store import SQLiteStore
+
+def main():
+    ap = argparse.ArgumentParser(description="Import var/state.json into the SQLite state store (STATE_BACKEND=sqlite)")
+    ap.add_argument("--json", default=str(store.STATE_PATH))
+    ap.add_argument("--db", default=str(store.DB_PATH))
+    ap.add_argument("--force", action="store_true", help="re-import even if the database was already migrated")
+    args = ap.parse_args()
+
+    db = SQLiteStore(args.db)
+    counts = db.migrate_from_json(args.json, force=args.force)
+    print(json.dumps({"db": args.db, "migrated": counts is not None, "counts": counts or db.counts()}))
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+from __future__ import annotations
+import argparse, asyncio, json, os
+from momentum.services.reconcile_daemon import ReconcileDaemon
+
+def main():
+    ap = argparse.ArgumentParser(description="Adaptive reconciliation loop -> var/*.json + var/metrics.d/reconcile_daemon.prom")
+    ap.add_argument("--app", default=os.environ.get("APP", "."))
+    ap.add_argument("--dry-run", type=int, default=1)
+    ap.add_argument("--iterations", type=int, default=0, help="0 = run forever")
+    args = ap.parse_args()
+    d = ReconcileDaemon(args.app, dry_run=bool(args.dry_run))
+    asyncio.run(d.run(iterations=args.iterations))
+    if args.iterations:
+        print(json.dumps({"last": d.last_result, "interval": d.iv.interval, "reason": d.iv.reason, "lag": d.lag()}))
+
+if __name__ == "__main__":
+    main()
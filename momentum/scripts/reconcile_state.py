@@ -1,15 +1,18 @@
 
 from __future__ import annotations
 import argparse, asyncio, json, os
-from ..services.reconciliation import reconcile
+from ..services.reconciliation import reconcile_incremental
 
 def main():
     p = argparse.ArgumentParser(description="Reconcile state files from Kraken REST truth")
     p.add_argument("--app", default=os.getenv("APP") or "/var/www/vhosts/snapdiscounts.nl/momentum")
     p.add_argument("--dry-run", type=int, default=1)
+    p.add_argument("--full", type=int, default=0, help="force a full audit instead of the incremental delta pass")
     args = p.parse_args()
 
-    diff_oo, diff_pos = asyncio.run(reconcile(args.app, dry_run=bool(args.dry_run)))
+    res = asyncio.run(reconcile_incremental(args.app, dry_run=bool(args.dry_run), force_full=bool(args.full)))
+    diff_oo, diff_pos = res["diff_oo"], res["diff_pos"]
+    print(json.dumps({k: v for k, v in res.items() if not k.startswith("diff_")}))
     print("[open_orders_state.json]")
     print(json.dumps(diff_oo, indent=2, ensure_ascii=False))
     print("[positions.json]")
@@ -0,0 +1,67 @@
+import os, asyncio, argparse, json, time
+from momentum.config.minlot import spec_for_pair
+from momentum.orders.armed import enqueue
+from momentum.orders.triggers import TriggerEngine, drain_triggers, exit_order
+from momentum.ws.ticker_cache import TickerCache, follow_tickers
+
+async def run(app: str, poll_ms: float, save_every: float) -> None:
+    fired_log = os.path.join(app, "var", "triggers_fired.jsonl")
+
+    specs = {}
+    def spec(symbol):
+        if symbol not in specs:
+            specs[symbol] = spec_for_pair(app, symbol)
+        return specs[symbol]
+
+    def to_gateway(fired) -> None:
+        # exits go through the armed order runner (intent queue); it owns the authenticated socket.
+        # One intent per exit keyed by its stable uid: if enqueue raises, the engine keeps the triggers
+        # armed and hands them back next tick, and exits already queued are deduped.
+        for t in fired:
+            enqueue(app, [exit_order(t, spec(t.symbol))], key=f"trigger:{t.uid}")
+        try:
+            with open(fired_log, "a", encoding="utf-8") as f:
+                for t in fired:
+                    f.write(json.dumps({"ts": time.time(), "price": t.fired_price, **t.to_dict()}) + "\n")
+        except OSError as e:
+            print(f"[triggers] fired log write failed: {e}", flush=True)
+
+    marks = TickerCache.load(app, max_age_s=60)      # warm prices from the public WS manager's cache
+    eng = TriggerEngine.load(app, sink=to_gateway, prices=marks.mids(marks.rows))
+    stop = asyncio.Event()
+    feed = asyncio.create_task(follow_tickers(eng.symbols, eng.on_ticker_message, stop), name="trigger_tickers")
+    from momentum.observability.textfile import write_textfile
+    last_save = 0.0
+    try:
+        while True:
+            changed = drain_triggers(eng, app)
+            eng.on_time()
+            now = time.time()
+            if changed or now - last_save >= save_every:     # also keeps trail peaks for warm restarts
+                eng.save(app)
+                last_save = now
+                write_textfile(app, "triggers", [f"momentum_triggers_armed {len(eng)}",
+                                                 f"momentum_triggers_fired_total {eng.fired}",
+                                                 f"momentum_triggers_sink_errors_total {eng.sink_errors}",
+                                                 f"momentum_triggers_retry_pending {len(eng.retry)}",
+                                                 f"momentum_triggers_ticks_total {eng.ticks}"])
+            await asyncio.sleep(poll_ms / 1000.0)
+    finally:
+        stop.set()
+        feed.cancel()
+        await asyncio.gather(feed, return_exceptions=True)
+        eng.save(app)
+
+def main():
+    ap = argparse.ArgumentParser(description="Client-side trailing/time/conditional exits on live tickers; fires via the armed order runner")
+    ap.add_argument("--app", default=os.environ.get("APP", "."))
+    ap.add_argument("--poll-ms", type=float, default=20.0, help="inbox/deadline poll interval")
+    ap.add_argument("--save-every", type=float, default=5.0, help="seconds between var/triggers.json saves")
+    args = ap.parse_args()
+    try:
+        asyncio.run(run(args.app, args.poll_ms, args.save_every))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
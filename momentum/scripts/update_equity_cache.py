@@ -19,9 +19,17 @@ async def _fetch_usd_balance():
 def main():
     p = argparse.ArgumentParser(description="Update local equity cache (USD cash balance)")
     p.add_argument("--out", type=str, default=None, help="Output file (defaults to $APP/var/account_equity_usd.json)")
+    p.add_argument("--max-age", type=float, default=30.0, help="reuse the live equity service record when younger than this")
+    p.add_argument("--force", action="store_true", help="always fetch via REST (overwrites the live file)")
     args = p.parse_args()
     app = os.environ.get("APP", ".")
     out = args.out or os.path.join(app, "var", "account_equity_usd.json")
+    if not args.force:
+        from momentum.services.equity import read_equity_record
+        rec = read_equity_record(app, max_age_s=args.max_age)
+        if rec is not None and not rec.get("stale"):
+            print(json.dumps({"out": out, "equity_usd": rec["equity_usd"], "source": "equity_service", "asof": rec["asof"]}))
+            return
     allow = os.environ.get("ALLOW_BALANCE_REST", "0") in ("1","true","yes","on","True")
     if not allow:
         print("REST disabled. Set ALLOW_BALANCE_REST=1 to enable.", file=sys.stderr)
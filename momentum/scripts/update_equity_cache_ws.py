@@ -69,9 +69,17 @@ async def fetch_usd_equity_via_ws():
 def main():
     ap = argparse.ArgumentParser(description="Update local equity cache (USD) via Kraken WS v2 balances snapshot")
     ap.add_argument("--out", type=str, default=None, help="Output file (defaults to $APP/var/account_equity_usd.json)")
+    ap.add_argument("--max-age", type=float, default=30.0, help="reuse the live equity service record when younger than this")
+    ap.add_argument("--force", action="store_true", help="always take a one-shot snapshot (overwrites the live file)")
     args = ap.parse_args()
     app = os.environ.get("APP", ".")
     out = args.out or os.path.join(app, "var", "account_equity_usd.json")
+    if not args.force:
+        from momentum.services.equity import read_equity_record
+        rec = read_equity_record(app, max_age_s=args.max_age)
+        if rec is not None and not rec.get("stale"):
+            print(json.dumps({"out": out, "equity_usd": rec["equity_usd"], "source": "equity_service", "asof": rec["asof"]}))
+            return
     usd = asyncio.run(fetch_usd_equity_via_ws())
     os.makedirs(os.path.dirname(out), exist_ok=True)
     with open(out, "w", encoding="utf-8") as f:
@@ -0,0 +1,29 @@
+from __future__ import annotations
+import argparse, glob, os, time
+import orjson
+from momentum.state import codec
+from momentum.state.warm_start import warm_path
+
+def main():
+    ap = argparse.ArgumentParser(description="List warm-start snapshots (var/warm/*.mbin): sections and ages; --drop forces a cold start")
+    ap.add_argument("--app", default=os.environ.get("APP", "."))
+    ap.add_argument("--drop", default="", help="service name whose snapshot to delete")
+    args = ap.parse_args()
+    if args.drop:
+        try:
+            os.remove(warm_path(args.app, args.drop))
+        except FileNotFoundError:
+            pass
+    now = time.time()
+    out = {}
+    for path in sorted(glob.glob(os.path.join(args.app, "var", "warm", "*.mbin"))):
+        doc = codec.read(path, {})
+        out[os.path.basename(path)[:-5]] = {
+            "schema": doc.get("_schema"), "version": doc.get("version"), "bytes": os.path.getsize(path),
+            "saved_age_s": round(now - float(doc.get("saved_ts") or 0), 1),
+            "sections": {k: round(now - float((v or {}).get("ts") or 0), 1) for k, v in (doc.get("sections") or {}).items()},
+        }
+    print(orjson.dumps(out).decode())
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,33 @@ from momentum.ws.private import PrivateWSManager
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--app", default=os.environ.get("APP", "."))
+    ap.add_argument("--trade-events", type=int, default=int(os.environ.get("TRADE_EVENTS", "1")),
+                    help="1 = dispatch plan-leg fills to services.trader hooks (services.trade_events)")
+    ap.add_argument("--breakeven", type=int, default=int(os.environ.get("BREAKEVEN_AUTO", "0")),
+                    help="1 = amend the SL to breakeven on the first TP fill of a plan (orders.breakeven); "
+                         "off by default, enable with --breakeven 1 or BREAKEVEN_AUTO=1")
+    ap.add_argument("--risk-engine", type=int, default=int(os.environ.get("RISK_ENGINE", "1")),
+                    help="1 = keep the pre-trade risk engine (utils.risk_engine) on the executions stream and publish "
+                         "var/risk_engine.json for the armed entry gate and live sizing")
     args = ap.parse_args()
     mgr = PrivateWSManager(app_path=args.app)
+    if args.risk_engine and mgr.streams:
+        from momentum.utils.risk_engine import RiskEngine
+        RiskEngine.from_env(args.app, book=mgr.book).attach(mgr)
+    if args.trade_events and mgr.streams:
+        from momentum.services.trade_events import TradeEventEngine
+        engine = TradeEventEngine()
+        mgr.add_consumer(engine.on_message, lambda stop: engine.serve(args.app, stop))
+        # exec_order --armed holds the SL/TPs back until the entry fills; queue them for armed_order_runner
+        # (resized to the fill when the entry closes partially filled)
+        from momentum.orders.armed import exits_hook
+        engine.add_hook("entry_filled", exits_hook(args.app), "armed_exits")
+        if args.breakeven:
+            from momentum.orders.armed import ArmedOrderConnection
+            from momentum.orders.breakeven import BreakevenPipeline
+            be = BreakevenPipeline(args.app, ArmedOrderConnection(args.app))
+            be.attach(engine)
+            mgr.add_consumer(lambda msg, t: None, be.serve)
     asyncio.run(mgr.run())
 
 if __name__ == "__main__":
@@ -0,0 +1,197 @@
+from __future__ import annotations
+import asyncio, mmap, os, struct, time
+from typing import Any, Callable, Dict, List, Optional
+
+from ..state.atomic_json import AtomicJSONWriter, flush_pending, read_json
+from ..ws.account import DUST, QUOTE_ASSETS, AccountBook
+from ..ws.ticker_cache import TickerCache, follow_tickers
+
+SCHEMA_EQUITY = "account_equity/v2"
+PUBLISH_SEC = float(os.environ.get("EQUITY_PUBLISH_SEC", "1"))
+KEEPALIVE_SEC = float(os.environ.get("EQUITY_KEEPALIVE_SEC", "10"))
+MARK_MAX_AGE_SEC = float(os.environ.get("EQUITY_MARK_MAX_AGE_SEC", "60"))
+WS_PUBLIC_URL = os.environ.get("KRAKEN_WS_V2_URL", "wss://ws.kraken.com/v2")
+
+def equity_path(app_path: str) -> str:
+    return os.path.join(app_path, "var", "account_equity_usd.json")
+
+def shm_path(app_path: str) -> str:
+    return os.environ.get("EQUITY_SHM_PATH") or os.path.join(app_path, "var", "equity.shm")
+
+def mark_to_market(balances: Dict[str, float], mid: Callable[[str], Optional[float]], quote: str = "USD") -> Dict[str, Any]:
+    """Cash (quote assets) + every other non-dust balance at its <asset>/<quote> mid; unpriced assets are listed."""
+    cash = sum(b for a, b in balances.items() if a in QUOTE_ASSETS)
+    positions: Dict[str, Dict[str, float]] = {}
+    unpriced: List[str] = []
+    for asset, qty in balances.items():
+        if asset in QUOTE_ASSETS or abs(qty) <= DUST:
+            continue
+        px = mid(f"{asset}/{quote}")
+        if px is None:
+            unpriced.append(asset)
+            continue
+        positions[asset] = {"qty": qty, "mark": px, "value_usd": qty * px}
+    pos_usd = sum(p["value_usd"] for p in positions.values())
+    return {"equity_usd": cash + pos_usd, "cash_usd": cash, "positions_usd": pos_usd,
+            "positions": positions, "unpriced": sorted(unpriced)}
+
+class EquityRecord:
+    """Fixed-size shared-memory equity record guarded by a seqlock (odd seq = write in progress).
+
+    Layout: seq u64 | equity f64 | cash f64 | positions f64 | asof f64 | stale u32
+    """
+    FMT = struct.Struct("<QddddI")
+
+    def __init__(self, path: str, create: bool = False):
+        self.path = path
+        if create:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            if os.fstat(fd).st_size < self.FMT.size:
+                os.ftruncate(fd, self.FMT.size)
+        else:
+            fd = os.open(path, os.O_RDONLY)
+        try:
+            self.mm = mmap.mmap(fd, self.FMT.size, access=mmap.ACCESS_WRITE if create else mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+
+    def write(self, equity: float, cash: float, positions: float, asof: float, stale: bool) -> None:
+        seq = self.FMT.unpack_from(self.mm, 0)[0]
+        struct.pack_into("<Q", self.mm, 0, seq + 1)
+        self.FMT.pack_into(self.mm, 0, seq + 1, equity, cash, positions, asof, 1 if stale else 0)
+        struct.pack_into("<Q", self.mm, 0, seq + 2)
+
+    def read(self, retries: int = 100) -> Optional[Dict[str, Any]]:
+        for _ in range(retries):
+            s1, eq, cash, pos, asof, stale = self.FMT.unpack_from(self.mm, 0)
+            if s1 & 1:
+                continue
+            if struct.unpack_from("<Q", self.mm, 0)[0] == s1:
+                if s1 == 0:
+                    return None
+                return {"equity_usd": eq, "cash_usd": cash, "positions_usd": pos, "asof": asof, "stale": bool(stale)}
+        return None
+
+    def close(self) -> None:
+        self.mm.close()
+
+def read_equity_record(app_path: str, max_age_s: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Latest published equity: shared-memory record first, JSON file otherwise; None if missing/too old."""
+    rec = None
+    try:
+        r = EquityRecord(shm_path(app_path))
+        try:
+            rec = r.read()
+        finally:
+            r.close()
+    except (OSError, ValueError):
+        rec = None
+    if rec is None:
+        d = read_json(equity_path(app_path))
+        if isinstance(d, dict) and d.get("_schema") == SCHEMA_EQUITY:
+            rec = d
+    if rec is None:
+        return None
+    if max_age_s is not None and time.time() - float(rec.get("asof") or 0) > max_age_s:
+        return None
+    return rec
+
+class EquityService:
+    """Live mark-to-market equity: balances stream (private WS) + ticker stream for held assets (public WS).
+
+    Publishes var/account_equity_usd.json (same `equity_usd` key the sizing/funnel readers use, plus
+    cash/positions/unpriced and `asof`) and the EquityRecord shm record every EQUITY_PUBLISH_SEC when
+    the value changed, or every EQUITY_KEEPALIVE_SEC so `asof` keeps proving freshness. `stale` is set
+    while the balances stream is down, an asset has no mark, or a mark is older than EQUITY_MARK_MAX_AGE_SEC.
+    """
+    def __init__(self, app_path: Optional[str] = None, book: Optional[AccountBook] = None,
+                 tickers: Optional[TickerCache] = None, quote: str = "USD"):
+        self.app_path = app_path or os.environ.get("APP", ".")
+        self.book = book or AccountBook()
+        self.tickers = tickers or TickerCache()
+        self.quote = quote
+        self.last: Optional[Dict[str, Any]] = None
+        self._last_write = 0.0
+        self._shm: Optional[EquityRecord] = None
+        self.publishes = 0
+
+    def held_symbols(self) -> List[str]:
+        return sorted(f"{a}/{self.quote}" for a, b in self.book.balances.items()
+                      if a not in QUOTE_ASSETS and abs(b) > DUST)
+
+    def compute(self) -> Dict[str, Any]:
+        now = time.time()
+        rec = mark_to_market(self.book.balances, lambda s: self.tickers.mid(s, MARK_MAX_AGE_SEC), self.quote)
+        mark_ts = [self.tickers.ts(f"{a}/{self.quote}") for a in rec["positions"]]
+        oldest = min((t for t in mark_ts if t), default=None)
+        rec.update(asof=now, balances_live=self.book.live,
+                   balances_age_s=round(self.book.age(), 3) if self.book.updated_ts else None,
+                   marks_max_age_s=round(now - oldest, 3) if oldest else None,
+                   stale=(not self.book.live) or bool(rec["unpriced"]),
+                   source="equity_service")
+        return rec
+
+    def publish(self, force: bool = False) -> Dict[str, Any]:
+        rec = self.compute()
+        key = (round(rec["equity_usd"], 8), rec["stale"])
+        prev = (round(self.last["equity_usd"], 8), self.last["stale"]) if self.last else None
+        if force or key != prev or rec["asof"] - self._last_write >= KEEPALIVE_SEC:
+            if self._shm is None:
+                self._shm = EquityRecord(shm_path(self.app_path), create=True)
+            self._shm.write(rec["equity_usd"], rec["cash_usd"], rec["positions_usd"], rec["asof"], rec["stale"])
+            AtomicJSONWriter(equity_path(self.app_path), schema_version=SCHEMA_EQUITY, durability="group").write(rec)
+            self._last_write = rec["asof"]
+            self.publishes += 1
+        self.last = rec
+        return rec
+
+    def prom_lines(self) -> List[str]:
+        r = self.last or {}
+        return [
+            f"momentum_equity_usd {r.get('equity_usd', 'NaN')}",
+            f"momentum_equity_cash_usd {r.get('cash_usd', 'NaN')}",
+            f"momentum_equity_positions_usd {r.get('positions_usd', 'NaN')}",
+            f"momentum_equity_unpriced_assets {len(r.get('unpriced') or [])}",
+            f"momentum_equity_stale {1 if r.get('stale', True) else 0}",
+            f"momentum_equity_publishes_total {self.publishes}",
+        ]
+
+    # ---- streams ----------------------------------------------------------------
+    async def _tickers_stream(self, stop: asyncio.Event) -> None:
+        await follow_tickers(self.held_symbols, self.tickers.on_message, stop, WS_PUBLIC_URL)
+
+    async def _publisher(self, stop: asyncio.Event) -> None:
+        from ..observability.textfile import write_textfile
+        while not stop.is_set():
+            try:
+                self.publish()
+                write_textfile(self.app_path, "equity", self.prom_lines())
+            except Exception:
+                pass
+            try:
+                await asyncio.sleep(PUBLISH_SEC)
+            except asyncio.CancelledError:
+                break
+
+    async def run(self) -> None:
+        from ..ws.private import PrivateWSManager
+        mgr = PrivateWSManager(self.app_path, streams=True, channels=("balances",), journal=False)
+        mgr.book = self.book
+        stop = mgr._stopping
+        tasks = [asyncio.create_task(mgr._stream(), name="equity_balances"),
+                 asyncio.create_task(self._tickers_stream(stop), name="equity_tickers"),
+                 asyncio.create_task(self._publisher(stop), name="equity_publisher")]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            stop.set()
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.book.live = False
+            try:
+                self.publish(force=True)
+            except Exception:
+                pass
+            flush_pending()
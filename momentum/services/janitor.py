@@ -3,7 +3,10 @@ import os
 import json
 import time
 from dataclasses import dataclass, asdict
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable, Tuple
+
+from momentum.state import read_cache
+from momentum.util.timer_wheel import TimerWheel
 
 @dataclass
 class Action:
@@ -32,11 +35,34 @@ class Janitor:
 
     def _read_json(self, rel: str, default):
         try:
-            with open(self._var(rel), "r") as f:
-                return json.load(f)
+            return read_cache.load(self._var(rel))
         except FileNotFoundError:
             return default
 
+    # ---- Rules -------------------------------------------------------------
+    def _age_close(self, symbol: str, pos: Dict[str, Any], now_ts: int) -> Optional[Action]:
+        qty = float(pos.get("qty", 0.0))
+        opened_at = pos.get("opened_at")
+        if qty <= 0 or opened_at is None:
+            return None
+        age = now_ts - int(opened_at)
+        if age < self.max_age_sec:
+            return None
+        return Action(kind="close_position", symbol=symbol, qty=qty,
+                      reason=f"age {age}s >= MAX_AGE_SEC {self.max_age_sec}s")
+
+    def _dangling_cancel(self, o: Dict[str, Any], positions: Dict[str, Any]) -> Optional[Action]:
+        if o.get("side") != "sell":
+            return None
+        holdings = positions.get(o.get("symbol"), {})
+        held_qty = float(holdings.get("qty", 0.0))
+        held_usd = float(holdings.get("usd", 0.0))
+        if held_qty > 0.0 and held_usd > self.dangling_sell_usd_threshold:
+            return None
+        return Action(kind="cancel_order", symbol=o.get("symbol"), qty=float(o.get("qty", 0.0)),
+                      reason=f"dangling SELL with holdings qty={held_qty} (usd={held_usd}) below threshold",
+                      order_id=o.get("order_id"))
+
     # ---- Planning ---------------------------------------------------------
     def plan(self, now_ts: Optional[int] = None) -> Dict[str, Any]:
         now_ts = int(now_ts or time.time())
@@ -47,39 +73,190 @@ class Janitor:
 
         # Rule 1: Close aged positions
         for symbol, pos in positions.items():
-            qty = float(pos.get("qty", 0.0))
-            opened_at = pos.get("opened_at")
-            if qty <= 0 or opened_at is None:
-                continue
-            age = now_ts - int(opened_at)
-            if age >= self.max_age_sec:
-                actions.append(Action(
-                    kind="close_position",
-                    symbol=symbol,
-                    qty=qty,
-                    reason=f"age {age}s >= MAX_AGE_SEC {self.max_age_sec}s"
-                ))
+            a = self._age_close(symbol, pos, now_ts)
+            if a is not None:
+                actions.append(a)
 
         # Rule 2: Cancel dangling SELLs (no holdings or below threshold)
         for o in open_orders:
-            if o.get("side") != "sell":
-                continue
-            symbol = o.get("symbol")
-            order_id = o.get("order_id")
-            qty = float(o.get("qty", 0.0))
-            holdings = positions.get(symbol, {})
-            held_qty = float(holdings.get("qty", 0.0))
-            held_usd = float(holdings.get("usd", 0.0))
-            if held_qty <= 0.0 or held_usd <= self.dangling_sell_usd_threshold:
-                actions.append(Action(
-                    kind="cancel_order",
-                    symbol=symbol,
-                    qty=qty,
-                    reason=f"dangling SELL with holdings qty={held_qty} (usd={held_usd}) below threshold",
-                    order_id=order_id
-                ))
+            a = self._dangling_cancel(o, positions)
+            if a is not None:
+                actions.append(a)
 
         return {
             "ts": now_ts,
             "actions": [asdict(a) for a in actions]
         }
+
+
+class JanitorScheduler:
+    """Long-running janitor: deadlines live in a TimerWheel instead of rescanning all state per pass.
+
+    State comes in through on_positions()/on_open_orders() (poll() feeds them from var/*.json when the
+    file mtime changes). Each diff schedules or cancels the position's age deadline (opened_at +
+    JANITOR_MAX_AGE_SEC) and, with JANITOR_ORDER_MAX_AGE_SEC > 0, an expiry for new orders; the
+    dangling-sell rule runs only for symbols whose holdings or sell orders changed. tick(now) fires due
+    timers. `pending` holds the outstanding actions (what plan() would report) until the position or
+    order behind them changes or goes away.
+    """
+    def __init__(self, janitor: Optional[Janitor] = None, wheel: Optional[TimerWheel] = None,
+                 order_max_age_sec: Optional[int] = None):
+        self.janitor = janitor or Janitor()
+        self.wheel = wheel or TimerWheel(tick_s=float(os.environ.get("JANITOR_TICK_SEC", "1")))
+        self.order_max_age_sec = int(order_max_age_sec if order_max_age_sec is not None
+                                     else os.environ.get("JANITOR_ORDER_MAX_AGE_SEC", "0"))
+        self.positions: Dict[str, Dict[str, Any]] = {}
+        self.orders: Dict[str, Dict[str, Any]] = {}                  # order_id -> order
+        self.sells: Dict[str, Dict[str, Dict[str, Any]]] = {}        # symbol -> {order_id: sell order}
+        self.pending: Dict[Tuple[str, str], Action] = {}
+        self._mtimes: Dict[str, float] = {}
+        self.fired = 0
+        self.dangling_checks = 0
+
+    # ---- state events -----------------------------------------------------
+    def on_positions(self, positions: Dict[str, Dict[str, Any]], now: float) -> None:
+        dirty = set()
+        for sym in set(self.positions) | set(positions):
+            pos = positions.get(sym)
+            if self.positions.get(sym) == pos:
+                continue
+            dirty.add(sym)
+            key = ("close", sym)
+            self.pending.pop(key, None)
+            if pos and float(pos.get("qty", 0.0)) > 0 and pos.get("opened_at") is not None:
+                self.wheel.schedule(key, int(pos["opened_at"]) + self.janitor.max_age_sec, now=now)
+            else:
+                self.wheel.cancel(key)
+        self.positions = dict(positions)
+        self._check_dangling(dirty)
+
+    def on_open_orders(self, orders: Iterable[Dict[str, Any]], now: float) -> None:
+        cur = {str(o["order_id"]): o for o in orders if o.get("order_id")}
+        dirty = set()
+        for oid in set(self.orders) | set(cur):
+            old, o = self.orders.get(oid), cur.get(oid)
+            if old == o:
+                continue
+            for row in (old, o):
+                if row is not None and row.get("side") == "sell":
+                    dirty.add(row.get("symbol"))
+            if old is not None and old.get("side") == "sell":
+                self.sells.get(old.get("symbol"), {}).pop(oid, None)
+            if o is None:
+                self.wheel.cancel(("expire", oid))
+                self.pending.pop(("cancel", oid), None)
+                self.pending.pop(("expire", oid), None)
+                continue
+            if o.get("side") == "sell":
+                self.sells.setdefault(o.get("symbol"), {})[oid] = o
+            if old is None and self.order_max_age_sec > 0:
+                placed = float(o.get("opened_at") or now)
+                self.wheel.schedule(("expire", oid), placed + self.order_max_age_sec, now=now)
+        self.orders = cur
+        self._check_dangling(dirty)
+
+    def _check_dangling(self, symbols: Iterable[str]) -> None:
+        for sym in symbols:
+            for oid, o in self.sells.get(sym, {}).items():
+                self.dangling_checks += 1
+                a = self.janitor._dangling_cancel(o, self.positions)
+                if a is not None:
+                    self.pending[("cancel", oid)] = a
+                else:
+                    self.pending.pop(("cancel", oid), None)
+
+    # ---- time -------------------------------------------------------------
+    def tick(self, now: float) -> int:
+        """Fire due deadlines; returns how many turned into pending actions."""
+        n = 0
+        for key, _ in self.wheel.advance(now):
+            kind, ident = key
+            a = None
+            if kind == "close":
+                a = self.janitor._age_close(ident, self.positions.get(ident, {}), int(now))
+            elif kind == "expire" and ident in self.orders:
+                o = self.orders[ident]
+                a = Action(kind="cancel_order", symbol=o.get("symbol"), qty=float(o.get("qty", 0.0)),
+                           reason=f"order age >= JANITOR_ORDER_MAX_AGE_SEC {self.order_max_age_sec}s", order_id=ident)
+            if a is not None:
+                self.pending[key] = a
+                n += 1
+        self.fired += n
+        return n
+
+    def poll(self, now: Optional[float] = None) -> bool:
+        """Feed positions.json / open_orders.json when their mtime changed."""
+        now = time.time() if now is None else now
+        changed = False
+        for rel, default, feed in (("positions.json", {}, self.on_positions), ("open_orders.json", [], self.on_open_orders)):
+            try:
+                mt = os.stat(self.janitor._var(rel)).st_mtime_ns
+            except FileNotFoundError:
+                mt = 0
+            if self._mtimes.get(rel) == mt:
+                continue
+            self._mtimes[rel] = mt
+            try:
+                feed(self.janitor._read_json(rel, default), now)
+            except ValueError:
+                continue              # half-written file; picked up on the next mtime change
+            changed = True
+        return changed
+
+    def plan(self, now: Optional[float] = None) -> Dict[str, Any]:
+        order = {"close_position": 0, "cancel_order": 1}
+        actions = sorted(self.pending.values(), key=lambda a: (order.get(a.kind, 9), a.symbol or "", a.order_id or ""))
+        return {"ts": int(now or time.time()), "actions": [asdict(a) for a in actions]}
+
+
+def executor_actions(plan: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """Planner actions -> var/janitor_actions.json as read by janitor.service.Janitor.run_once."""
+    out: Dict[str, List[Dict[str, Any]]] = {"cancel": [], "close": [], "amend": []}
+    for a in plan.get("actions", []):
+        if a["kind"] == "cancel_order" and a.get("order_id"):
+            out["cancel"].append({"order_id": a["order_id"]})
+        elif a["kind"] == "close_position":
+            out["close"].append({"pair": a["symbol"], "side": "sell", "qty": a["qty"]})
+    return out
+
+def main(dry_run: bool = True, loop: bool = False, app_path: Optional[str] = None,
+         interval_sec: Optional[float] = None) -> Dict[str, Any]:
+    """Plan once (loop=False) or run the timer-wheel scheduler (loop=True).
+
+    The plan goes to var/janitor_plan.json; live runs (dry_run=False) also write var/janitor_actions.json
+    for the executor. In loop mode files are rewritten only when the pending set changes.
+    """
+    from momentum.state.json_safety import write_json
+    app = app_path or os.environ.get("APP", ".")
+    jan = Janitor(app)
+    interval = float(interval_sec if interval_sec is not None else os.environ.get("JANITOR_LOOP_SEC", "1"))
+
+    def publish(plan: Dict[str, Any]) -> None:
+        write_json(jan._var("janitor_plan.json"), plan)
+        if not dry_run:
+            write_json(jan._var("janitor_actions.json"), executor_actions(plan))
+        print(json.dumps({"ts": plan["ts"], "dry_run": dry_run, "actions": len(plan["actions"])}), flush=True)
+
+    if not loop:
+        plan = jan.plan()
+        publish(plan)
+        return plan
+    sched = JanitorScheduler(jan)
+    last = None
+    exported = 0.0
+    while True:
+        now = time.time()
+        sched.poll(now)
+        sched.tick(now)
+        plan = sched.plan(now)
+        if plan["actions"] != last:
+            publish(plan)
+            last = plan["actions"]
+        if now - exported >= 15.0:
+            try:
+                read_cache.export(app, "janitor")
+            except Exception:
+                pass
+            exported = now
+        time.sleep(interval)
+
@@ -0,0 +1,198 @@
+from __future__ import annotations
+import asyncio, os, time
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..state import read_cache
+from ..util.backoff import exp_backoff
+
+# Adaptive reconciliation loop: the interval follows account activity instead of a fixed timer.
+#
+#   hot     an order was placed or a fill/closed order was seen within HOT_SEC: poll every MIN_SEC,
+#           relaxing linearly to OPEN_SEC as the activity ages
+#   open    open orders, nothing recent: OPEN_SEC
+#   idle    no open orders, no recent activity: IDLE_SEC
+#   backoff rate-limited (EAPI:Rate limit / 429): exponential up to BACKOFF_MAX_SEC, reset on success
+#
+# Activity is probed every WATCH_SEC from local files only (no REST): var/exec_history.json and
+# var/plans/ (order placement), and the private-WS account book's last_exec_id / open order ids.
+# A probe hit cuts the current sleep short, so a placement is reconciled within MIN_SEC.
+
+MIN_SEC = float(os.environ.get("RECONCILE_MIN_SEC", "5"))
+OPEN_SEC = float(os.environ.get("RECONCILE_OPEN_SEC", "30"))
+IDLE_SEC = float(os.environ.get("RECONCILE_IDLE_SEC", "300"))
+HOT_SEC = float(os.environ.get("RECONCILE_HOT_SEC", "120"))
+BACKOFF_MAX_SEC = float(os.environ.get("RECONCILE_BACKOFF_MAX_SEC", "900"))
+WATCH_SEC = float(os.environ.get("RECONCILE_WATCH_SEC", "1"))
+_RATE_LIMIT_MARKERS = ("EAPI:Rate limit", "EGeneral:Too many requests", "EOrder:Rate limit", "429")
+
+def is_rate_limited(err: BaseException) -> bool:
+    if getattr(err, "status", None) == 429:
+        return True
+    msg = str(err)
+    return any(m in msg for m in _RATE_LIMIT_MARKERS)
+
+class AdaptiveInterval:
+    """Next poll delay from the last activity time, the open-order count and rate-limit failures."""
+    def __init__(self, min_s: float = MIN_SEC, open_s: float = OPEN_SEC, idle_s: float = IDLE_SEC,
+                 hot_s: float = HOT_SEC, backoff_max_s: float = BACKOFF_MAX_SEC):
+        self.min_s, self.open_s, self.idle_s, self.hot_s, self.backoff_max_s = min_s, open_s, idle_s, hot_s, backoff_max_s
+        self.last_activity = 0.0
+        self.open_orders = 0
+        self.rate_limited = 0          # consecutive rate-limit failures
+        self.interval = idle_s
+        self.reason = "idle"
+
+    def activity(self, t: Optional[float] = None) -> None:
+        self.last_activity = max(self.last_activity, time.time() if t is None else t)
+
+    def on_success(self, open_orders: int) -> None:
+        self.open_orders = open_orders
+        self.rate_limited = 0
+
+    def on_rate_limit(self) -> None:
+        self.rate_limited += 1
+
+    def next(self, now: Optional[float] = None) -> Tuple[float, str]:
+        now = time.time() if now is None else now
+        base = self.open_s if self.open_orders else self.idle_s
+        age = now - self.last_activity
+        if age < self.hot_s:
+            iv, why = self.min_s + (min(self.open_s, base) - self.min_s) * max(0.0, age) / self.hot_s, "hot"
+        else:
+            iv, why = base, "open" if self.open_orders else "idle"
+        if self.rate_limited:
+            iv = max(iv, exp_backoff(self.rate_limited, base=max(self.open_s, iv), cap=self.backoff_max_s, jitter=0.2))
+            why = "backoff"
+        self.interval, self.reason = iv, why
+        return iv, why
+
+class ActivityProbe:
+    """Cheap local signals of trading activity; poll() returns True when something changed since the last call."""
+    def __init__(self, app_path: str):
+        var = os.path.join(app_path, "var")
+        self.stat_paths = [os.path.join(var, "exec_history.json"), os.path.join(var, "plans")]
+        self.book_path = os.path.join(var, "account_book.json")
+        self.marks: Dict[str, Any] = {}
+        self.primed = False
+
+    def _state(self) -> Dict[str, Any]:
+        st: Dict[str, Any] = {}
+        for p in self.stat_paths:
+            try:
+                s = os.stat(p)
+                st[p] = (s.st_mtime_ns, s.st_size)
+            except OSError:
+                st[p] = None
+        d = read_cache.get(self.book_path, {}, mode="frozen")
+        st["last_exec_id"] = d.get("last_exec_id") if isinstance(d, dict) else None
+        st["orders"] = tuple(sorted((d.get("orders") or {}).keys())) if isinstance(d, dict) else ()
+        return st
+
+    def poll(self) -> bool:
+        st = self._state()
+        changed = self.primed and st != self.marks
+        self.marks, self.primed = st, True
+        return changed
+
+class ReconcileDaemon:
+    def __init__(self, app_path: str, dry_run: bool = True, kraken=None, interval: Optional[AdaptiveInterval] = None):
+        self.app = app_path
+        self.dry_run = dry_run
+        self.kraken = kraken
+        self.iv = interval or AdaptiveInterval()
+        self.probe = ActivityProbe(app_path)
+        self.last_ok = 0.0
+        self.last_run = 0.0
+        self.runs = 0
+        self.full_runs = 0
+        self.errors = 0
+        self.rate_limits = 0
+        self.last_result: Dict[str, Any] = {}
+
+    def lag(self, now: Optional[float] = None) -> Dict[str, float]:
+        """Seconds since the last successful pass and since the newest trade/closed-order row the cursor holds."""
+        from .reconciliation import cursor_path
+        now = time.time() if now is None else now
+        cur = read_cache.get(cursor_path(self.app), {}, mode="frozen")
+        since = float(cur.get("since") or 0.0) if isinstance(cur, dict) else 0.0
+        return {"state": now - self.last_ok if self.last_ok else float("inf"),
+                "cursor": now - since if since else float("inf")}
+
+    async def step(self) -> Dict[str, Any]:
+        """One reconcile pass; feeds the outcome into the interval."""
+        from .reconciliation import reconcile_incremental
+        self.last_run = time.time()
+        self.runs += 1
+        try:
+            res = await reconcile_incremental(self.app, dry_run=self.dry_run, kraken=self.kraken)
+        except Exception as e:
+            self.errors += 1
+            if is_rate_limited(e):
+                self.rate_limits += 1
+                self.iv.on_rate_limit()
+            self.last_result = {"mode": "error", "error": str(e)[:200]}
+            return self.last_result
+        self.last_ok = time.time()
+        self.full_runs += res.get("mode") == "full"
+        oo = read_cache.get(os.path.join(self.app, "var", "open_orders_state.json"), {}, mode="frozen")
+        self.iv.on_success(sum(1 for k in oo if k != "_schema") if isinstance(oo, dict) else 0)
+        d_oo, d_pos = res.get("diff_oo") or {}, res.get("diff_pos") or {}
+        if res.get("trades") or res.get("closed") or any(d_oo.get(k) for k in ("add", "change", "remove")) \
+                or any(d_pos.get(k) for k in ("add", "change", "remove")):
+            self.iv.activity(self.last_ok)
+        self.last_result = {k: v for k, v in res.items() if not k.startswith("diff_")}
+        return self.last_result
+
+    async def sleep(self, delay: float, stop: Optional[asyncio.Event] = None) -> str:
+        """Sleep up to `delay`, returning early ("activity") when the probe sees a placement/fill."""
+        deadline = time.monotonic() + delay
+        woke = "timer"
+        while True:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return woke
+            if stop is not None and stop.is_set():
+                return "stop"
+            await asyncio.sleep(min(left, WATCH_SEC))
+            if self.probe.poll():
+                self.iv.activity()
+                # never closer than MIN_SEC to the previous pass, and never inside a rate-limit backoff
+                early = time.monotonic() + max(0.0, self.last_run + self.iv.min_s - time.time())
+                if not self.iv.rate_limited and early < deadline:
+                    deadline, woke = early, "activity"
+
+    def prom_lines(self) -> List[str]:
+        lag = self.lag()
+        inf = lambda x: x if x != float("inf") else -1
+        lines = [f"momentum_reconcile_interval_seconds {self.iv.interval:.3f}",
+                 f"momentum_reconcile_lag_seconds {inf(lag['state']):.3f}",
+                 f"momentum_reconcile_cursor_lag_seconds {inf(lag['cursor']):.3f}",
+                 f"momentum_reconcile_open_orders {self.iv.open_orders}",
+                 f"momentum_reconcile_runs_total {self.runs}",
+                 f"momentum_reconcile_full_runs_total {self.full_runs}",
+                 f"momentum_reconcile_errors_total {self.errors}",
+                 f"momentum_reconcile_rate_limited_total {self.rate_limits}",
+                 f"momentum_reconcile_last_success_timestamp {self.last_ok:.3f}"]
+        lines += [f'momentum_reconcile_mode{{mode="{m}"}} {int(self.iv.reason == m)}' for m in ("hot", "open", "idle", "backoff")]
+        return lines
+
+    async def run(self, stop: Optional[asyncio.Event] = None, iterations: int = 0) -> None:
+        from ..observability.textfile import write_textfile
+        from ..kraken.rest_client import KrakenREST
+        own = self.kraken is None
+        self.kraken = self.kraken or KrakenREST()
+        self.probe.poll()
+        n = 0
+        try:
+            while stop is None or not stop.is_set():
+                await self.step()
+                delay, why = self.iv.next()
+                write_textfile(self.app, "reconcile_daemon", self.prom_lines())
+                n += 1
+                if iterations and n >= iterations:
+                    return
+                print(f"[reconcile] {self.last_result} next={delay:.1f}s ({why})", flush=True)
+                await self.sleep(delay, stop)
+        finally:
+            if own:
+                await self.kraken.close()
@@ -1,9 +1,12 @@
 
 from __future__ import annotations
-import asyncio, json, time
-from typing import Tuple, Dict, Any
+import asyncio, json, os, time
+from typing import Any, Dict, List, Optional, Tuple
+from ..kraken.assets import AssetIndex, cached_asset_index, load_asset_index
 from ..kraken.rest_client import KrakenREST
 from ..state.atomic_json import AtomicJSONWriter, read_json
+from ..util.rate_limit import PriorityRateLimiter
+from ..ws.ticker_cache import TickerCache
 
 SCHEMA_OPEN_ORDERS = "open_orders_state/v1"
 SCHEMA_POSITIONS   = "positions_state/v1"
@@ -32,37 +35,81 @@ def _normalize_open_orders(oo_result: dict) -> Dict[str, Any]:
         }
     return norm
 
-async def _compute_positions(kraken: KrakenREST) -> Dict[str, Any]:
-    balances = await kraken.balances()
-    non_zero = {asset: float(amt) for asset, amt in balances.items() if float(amt) != 0.0}
-    if not non_zero:
-        return {"positions": {}, "asof": time.time()}
-    asset_map = {}
-    for asset in non_zero:
-        a = asset.replace("Z", "").replace("X", "")
-        if a == "USD":
-            continue
-        asset_map[asset] = f"{a}USD"
-    tick = {}
-    if asset_map:
-        pairs_csv = ",".join(asset_map.values())
+# Private endpoints share one account-wide call counter at Kraken (TradesHistory/ClosedOrders cost 2):
+# every private call reconciliation makes goes through one awaitable bucket sized below that counter,
+# so concurrent fetches queue for budget instead of tripping "EAPI:Rate limit exceeded".
+# Private calls go out one at a time by default: each takes its nonce when sent, and two in flight can
+# reach Kraken out of order ("EAPI:Invalid nonce"). >1 is for API keys with a nonce window only.
+# Public calls (Assets/AssetPairs/Ticker) do not take a slot and stay concurrent.
+REST_RATE = float(os.environ.get("RECONCILE_REST_RATE", "0.33"))
+REST_BURST = int(os.environ.get("RECONCILE_REST_BURST", "10"))
+PRIVATE_CONCURRENCY = int(os.environ.get("RECONCILE_PRIVATE_CONCURRENCY", "1"))
+MARK_MAX_AGE_SEC = float(os.environ.get("RECONCILE_MARK_MAX_AGE_SEC", "60"))
+_loops: Dict[asyncio.AbstractEventLoop, Tuple[PriorityRateLimiter, asyncio.Semaphore]] = {}
+
+def _loop_limits() -> Tuple[PriorityRateLimiter, asyncio.Semaphore]:
+    """REST budget + private-call slots of the running loop (both bind futures/tasks to it).
+
+    A new loop (asyncio.run per cycle, tests) gets fresh ones; the budget carries over the previous
+    loop's tokens so a restart does not hand out a second full burst."""
+    loop = asyncio.get_running_loop()     # the loop itself: a closed loop's id() can be reused
+    st = _loops.get(loop)
+    if st is None:
+        budget = PriorityRateLimiter(REST_RATE, REST_BURST, classes=1)
+        for prev, _ in _loops.values():
+            budget.tokens, budget.timestamp = prev.tokens, prev.timestamp
+        _loops.clear()
+        st = _loops[loop] = (budget, asyncio.Semaphore(max(1, PRIVATE_CONCURRENCY)))
+    return st
+
+async def _private(call, *args, cost: int = 1, **kw):
+    budget, sem = _loop_limits()
+    for _ in range(cost):
+        await budget.acquire(0)
+    async with sem:     # nonce assignment + send, serialized unless RECONCILE_PRIVATE_CONCURRENCY > 1
+        return await call(*args, **kw)
+
+async def _marks(app_path: str, kraken: KrakenREST, index: AssetIndex, codes: List[str]) -> Dict[str, float]:
+    """USD mid per asset code: public WS ticker cache first, one Ticker call for whatever is missing."""
+    pair_of = {c: index.usd_pair(c) for c in codes}
+    cache = TickerCache.load(app_path, max_age_s=MARK_MAX_AGE_SEC)
+    marks: Dict[str, float] = {}
+    for c, key in pair_of.items():
+        m = cache.mid(index.ws_symbol(key)) if key else None
+        if m:
+            marks[c] = m
+    missing = sorted({key for c, key in pair_of.items() if key and c not in marks})
+    if missing:
         try:
-            tick = await kraken.ticker(pairs_csv)
+            tick = await kraken.ticker(",".join(missing))
         except Exception:
             tick = {}
+        for c, key in pair_of.items():
+            info = tick.get(key) if c not in marks and key else None
+            if not info:
+                continue
+            try:
+                ask, bid = float(info.get("a", [0])[0]), float(info.get("b", [0])[0])
+            except Exception:
+                continue
+            if ask and bid:
+                marks[c] = (ask + bid) / 2
+    return marks
+
+async def _compute_positions(kraken: KrakenREST, balances: Optional[Dict[str, Any]] = None,
+                             index: Optional[AssetIndex] = None, app_path: Optional[str] = None) -> Dict[str, Any]:
+    if balances is None:
+        balances = await _private(kraken.balances)
+    non_zero = {asset: float(amt) for asset, amt in balances.items() if float(amt) != 0.0}
+    if not non_zero:
+        return {"positions": {}, "asof": time.time()}
+    index = index or AssetIndex({}, {})
+    held = [a for a in non_zero if not index.is_quote(a)]
+    marks = await _marks(app_path or "", kraken, index, held) if held else {}
     positions = {}
-    for asset, qty in non_zero.items():
-        a = asset.replace("Z", "").replace("X", "")
-        if a == "USD":
-            continue
-        info = tick.get(f"{a}USD", {})
-        try:
-            ask = float(info.get("a", [0])[0])
-            bid = float(info.get("b", [0])[0])
-            mid = (ask + bid) / 2 if (ask and bid) else 0.0
-        except Exception:
-            mid = 0.0
-        positions[a] = {"qty": qty, "mark_usd": mid, "value_usd": qty * mid}
+    for asset in held:
+        qty, mid = non_zero[asset], marks.get(asset, 0.0)
+        positions[index.asset_alt(asset)] = {"qty": qty, "mark_usd": mid, "value_usd": qty * mid}
     return {"positions": positions, "asof": time.time()}
 
 def _diff_states(current: dict, target: dict) -> dict:
@@ -76,20 +123,34 @@ def _diff_states(current: dict, target: dict) -> dict:
         diff["remove"].append(k)
     return diff
 
-async def reconcile(app_path: str, dry_run: bool = True):
+def _update_account_book(app_path: str, oo_live: dict, pos_live: dict) -> None:
+    # Only when no live private stream owns the book (it is fresher than any REST poll)
+    from ..ws.account import AccountBook, load_account_book
+    book = load_account_book(app_path, max_age_s=float("inf"))
+    if book is not None and book.source == "ws" and book.age() <= 30.0:
+        return
+    book = book or AccountBook(cached_asset_index(app_path))
+    book.apply_reconcile(oo_live, pos_live)
+    book.save(app_path)
+
+async def reconcile(app_path: str, dry_run: bool = True, kraken: Optional[KrakenREST] = None):
     var_dir = f"{app_path}/var"
     oo_path = f"{var_dir}/open_orders_state.json"
     pos_path = f"{var_dir}/positions.json"
 
-    kraken = KrakenREST()
+    own = kraken is None
+    kraken = kraken or KrakenREST()
     try:
-        oo_live = _normalize_open_orders(await kraken.open_orders())
+        # the three independent fetches overlap; positions then only wait on marks (cache or one Ticker)
+        index, oo_res, balances = await asyncio.gather(
+            load_asset_index(app_path, kraken), _private(kraken.open_orders), _private(kraken.balances))
+        oo_live = _normalize_open_orders(oo_res)
         oo_current = read_json(oo_path)
         if isinstance(oo_current, dict) and "_schema" in oo_current:
             oo_current = {k: v for k, v in oo_current.items() if k != "_schema"}
         diff_oo = _diff_states(oo_current, oo_live)
 
-        pos_live = await _compute_positions(kraken)
+        pos_live = await _compute_positions(kraken, balances, index, app_path)
         pos_current = read_json(pos_path)
         if isinstance(pos_current, dict) and "_schema" in pos_current:
             pos_current = {k: v for k, v in pos_current.items() if k != "_schema"}
@@ -98,6 +159,165 @@ async def reconcile(app_path: str, dry_run: bool = True):
         if not dry_run:
             AtomicJSONWriter(oo_path, schema_version=SCHEMA_OPEN_ORDERS).write(oo_live)
             AtomicJSONWriter(pos_path, schema_version=SCHEMA_POSITIONS).write(pos_live)
+            _update_account_book(app_path, oo_live, pos_live)
         return diff_oo, diff_pos
     finally:
-        await kraken.close()
+        if own:
+            await kraken.close()
+
+# ---- incremental reconciliation ------------------------------------------------------------
+# The full reconcile() above costs O(account) requests/bytes every run. reconcile_incremental()
+# keeps a cursor (last trade/closed-order time plus the ids seen at that instant) and only pulls
+# TradesHistory / ClosedOrders pages newer than it, patching open_orders_state.json and
+# positions.json in place. New open orders come from the live private-WS account book when it is
+# fresh, else from one OpenOrders call. A full audit runs every RECONCILE_AUDIT_SEC, when there is
+# no cursor yet, or when drift is detected (paging truncated, a position going negative, or the
+# live book's balances disagreeing with the patched positions).
+
+SCHEMA_CURSOR = "reconcile_cursor/v1"
+AUDIT_SEC = float(os.environ.get("RECONCILE_AUDIT_SEC", "900"))
+MAX_PAGES = int(os.environ.get("RECONCILE_MAX_PAGES", "20"))
+OVERLAP_SEC = 5.0              # re-read this much before the cursor; ids already applied are skipped
+DRIFT_TOL = float(os.environ.get("RECONCILE_DRIFT_TOL", "1e-8"))
+_PAGE = 50
+
+def cursor_path(app_path: str) -> str:
+    return os.path.join(app_path, "var", "reconcile_cursor.json")
+
+async def _paged(fetch, key: str, start: float) -> Tuple[Dict[str, Any], bool]:
+    """Every row newer than `start` across ofs pages; second value is True when MAX_PAGES cut it short."""
+    rows: Dict[str, Any] = {}
+    for page in range(MAX_PAGES):
+        res = await _private(fetch, cost=2, start=start, ofs=page * _PAGE)
+        got = res.get(key) or {}
+        rows.update(got)
+        if len(got) < _PAGE or len(rows) >= int(res.get("count") or 0):
+            return rows, False
+    return rows, True
+
+def _strip_schema(d: Any) -> dict:
+    return {k: v for k, v in d.items() if k != "_schema"} if isinstance(d, dict) else {}
+
+def _book_open_orders(app_path: str, index: AssetIndex) -> Optional[Tuple[Dict[str, Any], Any]]:
+    """(open orders in _normalize_open_orders shape, book) from a fresh WS-fed account book, else None."""
+    from ..ws.account import load_account_book
+    book = load_account_book(app_path, max_age_s=30.0)
+    if book is None or book.source != "ws":
+        return None
+    alt = lambda sym: index.altname(index.pair_key(sym) or "") or sym
+    return {oid: {"pair": alt(o.get("symbol")), "type": o.get("side"),
+                  "ordertype": o.get("order_type"), "price": float(o.get("limit_price") or 0.0), "price2": 0.0,
+                  "vol": float(o.get("order_qty") or 0.0), "vol_exec": float(o.get("cum_qty") or 0.0),
+                  "status": "open", "oflags": "", "time": o.get("timestamp"),
+                  "userref": o.get("order_userref"), "cl_ord_id": o.get("cl_ord_id")}
+            for oid, o in book.orders.items()}, book
+
+def apply_trades(positions: Dict[str, Any], trades: Dict[str, Any], index: AssetIndex) -> List[str]:
+    """Patch positions (positions.json "positions" map) with trade fills; returns keys that went negative."""
+    negative = []
+    for t in sorted(trades.values(), key=lambda t: float(t.get("time") or 0)):
+        base = index.base_of(t.get("pair") or "")
+        if not base or index.is_quote(base):
+            continue
+        key = index.asset_alt(base)
+        vol = float(t.get("vol") or 0.0) * (1 if t.get("type") == "buy" else -1)
+        p = dict(positions.get(key) or {"qty": 0.0, "mark_usd": 0.0})
+        p["qty"] = float(p.get("qty") or 0.0) + vol
+        if float(t.get("price") or 0.0) > 0:
+            p["mark_usd"] = float(t["price"])
+        p["value_usd"] = p["qty"] * float(p.get("mark_usd") or 0.0)
+        if p["qty"] < -DRIFT_TOL:
+            negative.append(key)
+        if abs(p["qty"]) <= DRIFT_TOL:
+            positions.pop(key, None)
+        else:
+            positions[key] = p
+    return negative
+
+async def reconcile_incremental(app_path: str, dry_run: bool = True, force_full: bool = False,
+                                kraken: Optional[KrakenREST] = None) -> Dict[str, Any]:
+    """One incremental pass (or a full audit when due); returns {"mode", "diff_oo", "diff_pos", "drift", ...}."""
+    var_dir = os.path.join(app_path, "var")
+    oo_path = os.path.join(var_dir, "open_orders_state.json")
+    pos_path = os.path.join(var_dir, "positions.json")
+    cur = _strip_schema(read_json(cursor_path(app_path)))
+    now = time.time()
+    full = force_full or not cur or now - float(cur.get("last_audit") or 0) >= AUDIT_SEC or bool(cur.get("drift"))
+    own = kraken is None
+    kraken = kraken or KrakenREST()
+    try:
+        if full:
+            reason = "forced" if force_full else "drift" if cur.get("drift") else "schedule" if cur else "no_cursor"
+            # trades just before `now` are already in the audited balances: mark them applied
+            (diff_oo, diff_pos), (recent, _) = await asyncio.gather(
+                reconcile(app_path, dry_run=dry_run, kraken=kraken),
+                _paged(kraken.trades_history, "trades", now - OVERLAP_SEC))
+            seen = {k: float(t.get("time") or 0) for k, t in recent.items()}
+            cur = {"since": max([now, *seen.values()]), "seen": seen, "last_audit": now, "drift": None,
+                   "audits": int(cur.get("audits") or 0) + 1, "incrementals": int(cur.get("incrementals") or 0)}
+            if not dry_run:
+                AtomicJSONWriter(cursor_path(app_path), schema_version=SCHEMA_CURSOR).write(cur)
+            return {"mode": "full", "reason": reason, "diff_oo": diff_oo, "diff_pos": diff_pos, "drift": None}
+
+        since = float(cur["since"])
+        seen: Dict[str, float] = dict(cur.get("seen") or {})     # ids applied within OVERLAP_SEC of the cursor
+        index = await load_asset_index(app_path, kraken)          # process/disk cached; public on a miss
+        from_book = _book_open_orders(app_path, index)
+        rest_oo = _private(kraken.open_orders) if from_book is None else asyncio.sleep(0, None)
+        (trades, t_trunc), (closed, c_trunc), oo_res = await asyncio.gather(
+            _paged(kraken.trades_history, "trades", since - OVERLAP_SEC),
+            _paged(kraken.closed_orders, "closed", since - OVERLAP_SEC), rest_oo)
+        trades = {k: v for k, v in trades.items() if k not in seen}
+        closed = {k: v for k, v in closed.items() if k not in seen}
+
+        oo = _strip_schema(read_json(oo_path))
+        pos_doc = _strip_schema(read_json(pos_path)) or {"positions": {}, "asof": 0.0}
+        positions = dict(pos_doc.get("positions") or {})
+        live, book = from_book if from_book is not None else (_normalize_open_orders(oo_res), None)
+
+        # open set = live view; rows we already hold are kept (REST fields), only vol_exec is patched
+        new_oo = {}
+        for k, v in live.items():
+            old = oo.get(k)
+            new_oo[k] = v if old is None else old if old.get("vol_exec") == v.get("vol_exec") else dict(old, vol_exec=v.get("vol_exec"))
+        negative = apply_trades(positions, trades, index)
+
+        drift = None
+        vanished = [k for k in oo.keys() - live.keys() if k not in closed]
+        if t_trunc or c_trunc:
+            drift = "paging_truncated"
+        elif negative:
+            drift = f"negative_position:{','.join(negative)}"
+        elif vanished:
+            drift = f"order_vanished:{vanished[0]}"
+        elif any(k in live for k in closed):
+            drift = "closed_order_still_open"
+        elif book is not None:
+            for key, p in positions.items():
+                bal = next((b for a, b in book.balances.items() if index.asset_alt(a) == key), None)
+                if bal is not None and abs(bal - float(p.get("qty") or 0.0)) > max(DRIFT_TOL, abs(bal) * 1e-6):
+                    drift = f"balance_mismatch:{key}"
+                    break
+
+        stamps = {k: float(r.get("time") or r.get("closetm") or 0) for k, r in list(trades.items()) + list(closed.items())}
+        newest = max([since, *stamps.values()])
+        seen_next = {k: t for k, t in {**seen, **stamps}.items() if t >= newest - OVERLAP_SEC}
+        diff_oo = _diff_states(oo, new_oo)
+        new_pos = {"positions": positions, "asof": now}
+        diff_pos = _diff_states(pos_doc.get("positions") or {}, positions)
+        if not dry_run:
+            if diff_oo["add"] or diff_oo["change"] or diff_oo["remove"]:
+                AtomicJSONWriter(oo_path, schema_version=SCHEMA_OPEN_ORDERS).write(new_oo)
+            pos_changed = bool(diff_pos["add"] or diff_pos["change"] or diff_pos["remove"])
+            if pos_changed:
+                AtomicJSONWriter(pos_path, schema_version=SCHEMA_POSITIONS).write(new_pos)
+            if pos_changed or diff_oo["add"] or diff_oo["change"] or diff_oo["remove"]:
+                _update_account_book(app_path, new_oo, new_pos)
+            AtomicJSONWriter(cursor_path(app_path), schema_version=SCHEMA_CURSOR).write(dict(
+                cur, since=newest, seen=seen_next,
+                drift=drift, incrementals=int(cur.get("incrementals") or 0) + 1))
+        return {"mode": "incremental", "diff_oo": diff_oo, "diff_pos": diff_pos, "drift": drift,
+                "trades": len(trades), "closed": len(closed), "open_source": "ws" if book is not None else "rest"}
+    finally:
+        if own:
+            await kraken.close()
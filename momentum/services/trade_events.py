@@ -0,0 +1,291 @@
+from __future__ import annotations
+import asyncio, inspect, os, re, sys, time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from momentum.domain.types import OrderRef
+from momentum.orders.armed import LatencyStats
+from momentum.services import trader
+
+QUEUE_MAX = int(os.environ.get("TRADE_EVENTS_QUEUE_MAX", "10000"))
+HOOK_TIMEOUT_SEC = float(os.environ.get("TRADE_EVENTS_HOOK_TIMEOUT_SEC", "0.5"))
+HOOK_BUDGET_SEC = float(os.environ.get("TRADE_EVENTS_HOOK_BUDGET_SEC", "0.005"))
+CLOSED_KEEP = 4096      # finished plan bases remembered so late status rows do not reopen them
+
+# cl_ord_id = <base>-E | <base>-SL | <base>-TP<n>  (orders.orchestrator.build_oto_plan)
+_LEG_RE = re.compile(r"^(?P<base>.+)-(?P<leg>E|SL|TP(?P<n>\d+))$")
+HOOK_EVENTS = ("fill", "entry_filled", "tp1", "all_tp", "sl_filled")
+
+def classify_leg(cl_ord_id: Optional[str]) -> Optional[Tuple[str, str, int]]:
+    """'oto-1-TP2' -> ('oto-1', 'TP', 2); ('oto-1', 'E', 0) / ('oto-1', 'SL', 0); None for foreign ids."""
+    m = _LEG_RE.match(cl_ord_id or "")
+    if not m:
+        return None
+    leg = m.group("leg")
+    return (m.group("base"), "TP", int(m.group("n"))) if m.group("n") else (m.group("base"), leg, 0)
+
+@dataclass(slots=True)
+class LegEvent:
+    base: str
+    leg: str                  # 'E' | 'SL' | 'TP'
+    tp_index: int
+    order_id: str
+    cl_ord_id: str
+    symbol: Optional[str]
+    side: Optional[str]
+    exec_type: str
+    order_status: Optional[str]
+    last_qty: float
+    last_price: float
+    cum_qty: float
+    t_recv: float             # perf_counter at WS receive
+
+@dataclass(slots=True)
+class PlanProgress:
+    base: str
+    symbol: Optional[str] = None
+    entry_qty: float = 0.0
+    entry_notional: float = 0.0
+    exit_qty: float = 0.0                                     # filled on -TPn legs
+    tp_legs: Dict[int, str] = field(default_factory=dict)     # tp index -> last order_status
+    sl_order_id: Optional[str] = None
+    tp1_fired: bool = False
+    all_tp_fired: bool = False
+    order_ids: List[str] = field(default_factory=list)       # leg order_ids (evicted from the clid map)
+    entry_closed: bool = False                                # -E leg filled / canceled / expired
+    done: bool = False
+
+    @property
+    def entry_avg(self) -> Optional[float]:
+        return self.entry_notional / self.entry_qty if self.entry_qty > 0 else None
+
+    def all_tp_filled(self) -> bool:
+        return bool(self.tp_legs) and all(s == "filled" for s in self.tp_legs.values())
+
+class TradeEventEngine:
+    """Executions stream -> plan-leg events -> hooks.
+
+    Feed raw WS v2 `executions` messages to on_message() (cheap, never blocks the socket reader);
+    run() drains the queue and dispatches per event:
+      fill          every trade on a plan leg              (default: services.trader.on_fill(OrderRef))
+      entry_filled  the -E leg reached order_status filled, or closed (canceled/expired) after a
+                    partial fill: plan.entry_qty / ev.cum_qty is then the size to protect
+      tp1           first fill on any -TPn leg, once/plan  (default: services.trader.on_tp1_hit(base))
+      all_tp        every known -TPn leg filled, once/plan (default: services.trader.on_all_tp_filled(base))
+      sl_filled     the -SL leg filled
+    Hooks are called as fn(event, plan), one at a time in registration order, each bounded by
+    TRADE_EVENTS_HOOK_TIMEOUT_SEC: coroutine hooks are awaited, sync hooks run in a worker thread
+    unless registered inline=True (only for hooks that just schedule loop work, e.g. orders.breakeven).
+    Timing: receive->dispatched per event and per-hook runtime.
+
+    Fills are never dropped: the queue is unbounded for trades; above queue_max only status-only rows
+    are shed (counted in `dropped`). A plan is forgotten once finished (SL filled, the TPs sold the
+    whole entry, or the entry closed without a fill); its base is remembered so late rows do not reopen it.
+    """
+    def __init__(self, default_hooks: bool = True, queue_max: int = QUEUE_MAX,
+                 hook_timeout_s: float = HOOK_TIMEOUT_SEC):
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.queue_max = queue_max
+        self.hook_timeout_s = hook_timeout_s
+        self.hooks: Dict[str, List[Tuple[str, Callable[..., Any], bool]]] = {k: [] for k in HOOK_EVENTS}
+        self.plans: Dict[str, PlanProgress] = {}
+        self._clids: Dict[str, str] = {}            # order_id -> cl_ord_id (trade rows may omit it)
+        self._closed: "OrderedDict[str, None]" = OrderedDict()
+        self.event_latency = LatencyStats()
+        self.hook_latency: Dict[str, LatencyStats] = {}
+        self.counts: Dict[str, int] = {k: 0 for k in HOOK_EVENTS}
+        self.hook_errors = 0
+        self.hook_timeouts = 0
+        self.over_budget = 0
+        self.dropped = 0
+        self.evicted = 0
+        if default_hooks:
+            self.add_hook("fill", lambda ev, plan: trader.on_fill(OrderRef(ev.order_id, ev.cl_ord_id)), "trader.on_fill")
+            self.add_hook("tp1", lambda ev, plan: trader.on_tp1_hit(plan.base), "trader.on_tp1_hit")
+            self.add_hook("all_tp", lambda ev, plan: trader.on_all_tp_filled(plan.base), "trader.on_all_tp_filled")
+
+    def add_hook(self, event: str, fn: Callable[..., Any], name: Optional[str] = None, inline: bool = False) -> None:
+        if event not in self.hooks:
+            raise ValueError(f"unknown hook event {event!r}; expected one of {HOOK_EVENTS}")
+        self.hooks[event].append((name or f"{event}:{getattr(fn, '__name__', 'hook')}", fn, inline))
+
+    # ---- ingest (socket reader side) ---------------------------------------------
+    def on_message(self, msg: Dict[str, Any], t_recv: Optional[float] = None) -> int:
+        if msg.get("channel") != "executions":
+            return 0
+        t_recv = time.perf_counter() if t_recv is None else t_recv
+        if msg.get("type") == "snapshot":
+            self.seed(msg.get("data") or [], t_recv)
+            return 0
+        n = 0
+        for row in msg.get("data") or []:
+            ev = self._event(row, t_recv)
+            if ev is None:
+                continue
+            if ev.exec_type != "trade" and self.queue.qsize() >= self.queue_max:
+                self.dropped += 1       # status-only row under backlog; fills always go through
+                continue
+            self.queue.put_nowait(ev)
+            n += 1
+        return n
+
+    def seed(self, rows: List[Dict[str, Any]], t_recv: float = 0.0) -> None:
+        """Learn open plan legs (e.g. from the executions snapshot) without dispatching, so all_tp
+        only fires once every TP leg of a plan placed before startup has filled."""
+        for row in rows:
+            ev = self._event(row, t_recv)
+            if ev is not None:
+                self._triggered(ev, self._plan(ev), seed=True)
+
+    def _event(self, row: Dict[str, Any], t_recv: float) -> Optional[LegEvent]:
+        oid = str(row.get("order_id") or "")
+        clid = row.get("cl_ord_id") or self._clids.get(oid)
+        leg = classify_leg(clid)
+        if leg is None or leg[0] in self._closed:
+            return None
+        if oid and oid not in self._clids:
+            self._clids[oid] = clid
+        def f(k):
+            try:
+                return float(row.get(k) or 0.0)
+            except (TypeError, ValueError):
+                return 0.0
+        return LegEvent(leg[0], leg[1], leg[2], oid, clid, row.get("symbol"), row.get("side"),
+                        str(row.get("exec_type") or ""), row.get("order_status"),
+                        f("last_qty"), f("last_price"), f("cum_qty"), t_recv)
+
+    # ---- dispatch ------------------------------------------------------------------
+    def _plan(self, ev: LegEvent) -> PlanProgress:
+        plan = self.plans.get(ev.base)
+        if plan is None:
+            plan = self.plans[ev.base] = PlanProgress(ev.base)
+        if ev.symbol and not plan.symbol:
+            plan.symbol = ev.symbol
+        if ev.order_id and ev.order_id not in plan.order_ids:
+            plan.order_ids.append(ev.order_id)
+        return plan
+
+    def _evict(self, plan: PlanProgress) -> None:
+        self.plans.pop(plan.base, None)
+        for oid in plan.order_ids:
+            self._clids.pop(oid, None)
+        self._closed[plan.base] = None
+        if len(self._closed) > CLOSED_KEEP:
+            self._closed.popitem(last=False)
+        self.evicted += 1
+
+    def _triggered(self, ev: LegEvent, plan: PlanProgress, seed: bool = False) -> List[str]:
+        out: List[str] = []
+        is_trade = ev.exec_type == "trade" and ev.last_qty > 0
+        if ev.leg == "TP":
+            plan.tp_legs[ev.tp_index] = ev.order_status or plan.tp_legs.get(ev.tp_index, "new")
+            if seed and ev.cum_qty > 0:
+                plan.tp1_fired = True
+        elif ev.leg == "SL":
+            plan.sl_order_id = ev.order_id or plan.sl_order_id
+        if seed:
+            return out
+        if is_trade:
+            out.append("fill")
+            if ev.leg == "E":
+                plan.entry_qty += ev.last_qty
+                plan.entry_notional += ev.last_qty * ev.last_price
+            elif ev.leg == "TP":
+                plan.exit_qty += ev.last_qty
+                if not plan.tp1_fired:
+                    plan.tp1_fired = True
+                    out.append("tp1")
+        if ev.leg == "E" and (ev.order_status == "filled" or (
+                ev.order_status in ("canceled", "expired") and (plan.entry_qty > 0 or ev.cum_qty > 0))):
+            out.append("entry_filled")
+        if ev.order_status == "filled":
+            if ev.leg == "SL":
+                out.append("sl_filled")
+                plan.done = True
+            elif ev.leg == "TP" and not plan.all_tp_fired and plan.all_tp_filled():
+                plan.all_tp_fired = True
+                out.append("all_tp")
+        if ev.leg == "E" and ev.order_status in ("filled", "canceled", "expired"):
+            plan.entry_closed = True
+        # finished: stopped out, nothing was bought, or the TPs sold everything the entry bought
+        if plan.entry_qty > 0:
+            plan.done = plan.done or (plan.entry_closed and plan.exit_qty >= plan.entry_qty * (1 - 1e-9))
+        elif ev.leg == "E" and ev.order_status in ("canceled", "expired"):
+            plan.done = True
+        return out
+
+    async def dispatch(self, ev: LegEvent) -> List[str]:
+        plan = self._plan(ev)
+        fired = self._triggered(ev, plan)
+        for name in fired:
+            self.counts[name] += 1
+            for hook, fn, inline in self.hooks[name]:
+                await self._call(hook, fn, ev, plan, inline)
+        if plan.done:
+            self._evict(plan)
+        self.event_latency.add(time.perf_counter() - ev.t_recv)
+        return fired
+
+    async def _call(self, hook: str, fn: Callable[..., Any], ev: LegEvent, plan: PlanProgress,
+                    inline: bool = False) -> None:
+        t0 = time.perf_counter()
+        try:
+            if inline or inspect.iscoroutinefunction(fn):
+                res = fn(ev, plan)
+            else:
+                res = asyncio.to_thread(fn, ev, plan)   # file/REST work in a sync hook must not stall dispatch
+            if inspect.isawaitable(res):
+                await asyncio.wait_for(res, self.hook_timeout_s)
+        except asyncio.TimeoutError:
+            self.hook_timeouts += 1
+        except Exception as e:
+            self.hook_errors += 1
+            print(f"[trade_events] ALERT hook {hook} failed on {ev.cl_ord_id}: {e!r}", file=sys.stderr, flush=True)
+        dt = time.perf_counter() - t0
+        if dt > HOOK_BUDGET_SEC:
+            self.over_budget += 1
+        st = self.hook_latency.get(hook)
+        if st is None:
+            st = self.hook_latency[hook] = LatencyStats(512)
+        st.add(dt)
+
+    async def run(self, stop: Optional[asyncio.Event] = None) -> None:
+        while stop is None or not stop.is_set():
+            try:
+                ev = await self.queue.get()
+            except asyncio.CancelledError:
+                break
+            await self.dispatch(ev)
+
+    async def serve(self, app_path: str, stop: asyncio.Event, metrics_every_s: float = 5.0) -> None:
+        """run() plus metrics.d/trade_events.prom every metrics_every_s (used by ws_private_runner)."""
+        from ..observability.textfile import write_textfile
+        worker = asyncio.create_task(self.run(stop), name="trade_events_dispatch")
+        try:
+            while not stop.is_set():
+                try:
+                    write_textfile(app_path, "trade_events", self.prom_lines())
+                except Exception:
+                    pass
+                try:
+                    await asyncio.sleep(metrics_every_s)
+                except asyncio.CancelledError:
+                    break
+        finally:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+
+    def prom_lines(self) -> List[str]:
+        lines = [*self.event_latency.prom_lines("momentum_trade_event_dispatch_seconds"),
+                 f"momentum_trade_event_queue_depth {self.queue.qsize()}",
+                 f"momentum_trade_event_dropped_total {self.dropped}",
+                 f"momentum_trade_event_plans_evicted_total {self.evicted}",
+                 f"momentum_trade_event_hook_errors_total {self.hook_errors}",
+                 f"momentum_trade_event_hook_timeouts_total {self.hook_timeouts}",
+                 f"momentum_trade_event_hook_over_budget_total {self.over_budget}",
+                 f"momentum_trade_event_plans {len(self.plans)}"]
+        lines += [f'momentum_trade_events_total{{event="{k}"}} {v}' for k, v in self.counts.items()]
+        for hook, st in sorted(self.hook_latency.items()):
+            lines += st.prom_lines("momentum_trade_event_hook_seconds", f'hook="{hook}"')
+        return lines
@@ -1,33 +1,155 @@
-
 from __future__ import annotations
-import json, os, tempfile, fcntl
+import atexit, os, tempfile, fcntl, threading, time
+from typing import Dict, Optional
+
+from . import codec, read_cache
+
+# strict:  tempfile + fsync + rename + dir fsync before write() returns (default, crash- and power-safe)
+# group:   write() encodes and returns; a background writer keeps only the latest version per path and
+#          commits it after ATOMIC_JSON_GROUP_MS with one fsync per file and one per directory
+# relaxed: tempfile + rename, no fsync (never torn, but a power cut may roll back to an older version)
+DURABILITY_LEVELS = ("strict", "group", "relaxed")
+DURABILITY = os.environ.get("ATOMIC_JSON_DURABILITY", "")          # overrides every writer when set
+GROUP_WINDOW_SEC = float(os.environ.get("ATOMIC_JSON_GROUP_MS", "50")) / 1000.0
+
+def replace_file(path: str, data: bytes, fsync: bool = True, dir_fsync: bool = True) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lock_fd = os.open(path + ".lock", os.O_CREAT | os.O_RDWR, 0o644)
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX)
+        with tempfile.NamedTemporaryFile("wb", dir=os.path.dirname(path), delete=False) as tf:
+            tf.write(data)
+            if fsync:
+                tf.flush(); os.fsync(tf.fileno())
+            tmp = tf.name
+        os.replace(tmp, path)
+        if fsync and dir_fsync:
+            _fsync_dir(os.path.dirname(path))
+    finally:
+        fcntl.flock(lock_fd, fcntl.LOCK_UN); os.close(lock_fd)
+
+def _fsync_dir(d: str) -> None:
+    dir_fd = os.open(d or ".", os.O_DIRECTORY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+class _GroupWriter:
+    """Per-path coalescing writer thread behind durability="group"."""
+    def __init__(self, window_s: float = GROUP_WINDOW_SEC):
+        self.window_s = window_s
+        self.cv = threading.Condition()
+        self.pending: Dict[str, bytes] = {}
+        self.inflight: Dict[str, bytes] = {}
+        self.thread: Optional[threading.Thread] = None
+        self._flush_req = False
+        self.submitted = 0
+        self.coalesced = 0
+        self.commits = 0
+        self.batches = 0
+        self.errors = 0
+
+    def submit(self, path: str, data: bytes) -> None:
+        with self.cv:
+            if path in self.pending:
+                self.coalesced += 1
+            self.pending[path] = data
+            self.submitted += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="atomic-json-group", daemon=True)
+                self.thread.start()
+            self.cv.notify_all()
+
+    def peek(self, path: str) -> Optional[bytes]:
+        """Latest not yet committed version (read-your-writes inside this process)."""
+        with self.cv:
+            return self.pending.get(path) or self.inflight.get(path)
+
+    def _run(self) -> None:
+        while True:
+            with self.cv:
+                while not self.pending:
+                    self.cv.wait()
+                deadline = time.monotonic() + self.window_s
+                while not self._flush_req:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    self.cv.wait(left)
+                self.inflight, self.pending = self.pending, {}
+            dirs = set()
+            for path, data in self.inflight.items():
+                try:
+                    replace_file(path, data, fsync=True, dir_fsync=False)
+                    dirs.add(os.path.dirname(path))
+                    self.commits += 1
+                except Exception:
+                    self.errors += 1
+            for d in dirs:
+                try:
+                    _fsync_dir(d)
+                except Exception:
+                    self.errors += 1
+            with self.cv:
+                self.inflight = {}
+                self.batches += 1
+                if not self.pending:
+                    self._flush_req = False
+                self.cv.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Commit everything submitted so far now; True when nothing is left pending."""
+        with self.cv:
+            if self.thread is None:
+                return True
+            self._flush_req = True
+            self.cv.notify_all()
+            return self.cv.wait_for(lambda: not self.pending and not self.inflight, timeout)
+
+    def stats(self) -> Dict[str, int]:
+        with self.cv:
+            return {"submitted": self.submitted, "coalesced": self.coalesced, "commits": self.commits,
+                    "batches": self.batches, "errors": self.errors, "pending": len(self.pending)}
+
+_group = _GroupWriter()
+
+def flush_pending(timeout: Optional[float] = 10.0) -> bool:
+    """Shutdown hook for durability="group" writers (also registered with atexit)."""
+    return _group.flush(timeout)
+
+def group_stats() -> Dict[str, int]:
+    return _group.stats()
+
+atexit.register(flush_pending)
+
+def write_bytes(path: str, data: bytes, durability: str = "strict") -> None:
+    level = DURABILITY or durability
+    if level == "group":
+        _group.submit(path, data)
+    elif level == "relaxed":
+        replace_file(path, data, fsync=False)
+    elif level == "strict":
+        replace_file(path, data)
+    else:
+        raise ValueError(f"unknown durability {level!r} (expected one of {DURABILITY_LEVELS})")
 
 class AtomicJSONWriter:
-    def __init__(self, path: str, schema_version: str | None = None):
+    def __init__(self, path: str, schema_version: str | None = None, durability: str = "strict"):
         self.path = path
         self.schema_version = schema_version
+        self.durability = durability
 
     def write(self, data: dict) -> None:
         if self.schema_version:
             data = dict(data); data["_schema"] = self.schema_version
-        os.makedirs(os.path.dirname(self.path), exist_ok=True)
-        lock_fd = os.open(self.path + ".lock", os.O_CREAT | os.O_RDWR, 0o644)
-        try:
-            fcntl.flock(lock_fd, fcntl.LOCK_EX)
-            dir_fd = os.open(os.path.dirname(self.path) or ".", os.O_DIRECTORY)
-            try:
-                with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(self.path), delete=False, encoding="utf-8") as tf:
-                    json.dump(data, tf, separators=(",", ":"), ensure_ascii=False)
-                    tf.flush(); os.fsync(tf.fileno()); tmp = tf.name
-                os.replace(tmp, self.path); os.fsync(dir_fd)
-            finally:
-                os.close(dir_fd)
-        finally:
-            fcntl.flock(lock_fd, fcntl.LOCK_UN); os.close(lock_fd)
+        write_bytes(self.path, codec.encode_for(self.path, data), self.durability)
 
 def read_json(path: str) -> dict:
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        pending = _group.peek(path)
+        if pending is not None:
+            return codec.loads(pending)
+        return read_cache.load(path)
     except Exception:
         return {}
@@ -0,0 +1,61 @@
+from __future__ import annotations
+import json, marshal, os
+from typing import Any, Optional
+import orjson
+
+# One codec for everything under var/: the format is chosen by file extension on write and
+# detected from the content on read, so a reader never needs to know which writer produced a file.
+#
+#   json    (.json, .jsonl, anything else)  orjson; compact, or 2-space indent with pretty=True
+#   marshal (.mbin)                         MAGIC + marshal v4 of the JSON-shaped object; internal
+#                                           artifacts only (Python-version specific, not for humans)
+#
+# orjson differs from stdlib json in two corners: non-str dict keys are stringified (as json does),
+# and NaN/inf become null instead of the non-standard NaN token. Files written by the old stdlib
+# writers can still hold NaN/Infinity tokens or ints beyond 64 bits, which orjson refuses; loads()
+# falls back to json.loads for those.
+
+MAGIC = b"\x00MMB1"
+MARSHAL_VERSION = 4
+BINARY_EXTS = frozenset((".mbin",))
+_OPTS = orjson.OPT_NON_STR_KEYS
+
+def format_for(path: str) -> str:
+    return "marshal" if os.path.splitext(path)[1] in BINARY_EXTS else "json"
+
+def dumps(obj: Any, fmt: str = "json", pretty: bool = False) -> bytes:
+    if fmt == "json":
+        return orjson.dumps(obj, option=_OPTS | orjson.OPT_INDENT_2 if pretty else _OPTS)
+    if fmt == "marshal":
+        return MAGIC + marshal.dumps(obj, MARSHAL_VERSION)
+    raise ValueError(f"unknown codec format {fmt!r}")
+
+def loads(data: Any) -> Any:
+    """Decode bytes/str from any writer of this module (header-sniffed); raises ValueError if invalid."""
+    if isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:len(MAGIC)]) == MAGIC:
+        try:
+            return marshal.loads(bytes(data[len(MAGIC):]))
+        except (EOFError, TypeError) as e:
+            raise ValueError(f"truncated binary artifact: {e}") from None
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        try:
+            return json.loads(bytes(data) if isinstance(data, memoryview) else data)
+        except ValueError:
+            pass
+        raise
+
+def dumps_line(obj: Any) -> bytes:
+    """One NDJSON line (trailing newline included)."""
+    return orjson.dumps(obj, option=_OPTS | orjson.OPT_APPEND_NEWLINE)
+
+def encode_for(path: str, obj: Any, pretty: bool = False) -> bytes:
+    return dumps(obj, format_for(path), pretty)
+
+def read(path: str, default: Optional[Any] = None) -> Any:
+    try:
+        with open(path, "rb") as f:
+            return loads(f.read())
+    except (OSError, ValueError):
+        return default
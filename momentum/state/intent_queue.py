@@ -0,0 +1,219 @@
+from __future__ import annotations
+import asyncio, os, sqlite3, threading, time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from . import codec
+
+# Durable hand-off between producers (exec_order --armed, trigger runner, amend script) and the
+# long-running order consumer (armed_order_runner), in one SQLite file in WAL mode.
+#
+#   put()     one INSERT, autocommitted; tens of microseconds with synchronous=NORMAL (no fsync per
+#             commit; a power cut may drop the last commits, never corrupt the file)
+#   dedupe    producer side: (topic, key) is unique, key defaults to the first message's cl_ord_id,
+#             so a retried producer cannot queue the same intent twice; consumer side: cl_ord_ids
+#             are recorded as delivered once acked and skipped when an intent is redelivered
+#   delivery  at-least-once: a consumer reads rows after its committed offset and commits the offset
+#             (together with its results) only after processing, so a crash replays the uncommitted tail;
+#             per-message progress (the ack of message i of intent seq) is recorded as each ack lands,
+#             so a replayed intent only resends the messages that were never acked
+
+SYNCHRONOUS = os.environ.get("INTENT_QUEUE_SYNC", "NORMAL").upper()       # NORMAL | FULL
+BUSY_TIMEOUT_MS = int(os.environ.get("INTENT_QUEUE_BUSY_MS", "5000"))
+RETENTION_SEC = float(os.environ.get("INTENT_QUEUE_RETENTION_SEC", str(7 * 86400)))
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS intents (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT, topic TEXT NOT NULL, key TEXT,
+    ts REAL NOT NULL, t_signal REAL, body BLOB NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS intents_topic_key ON intents(topic, key);
+CREATE INDEX IF NOT EXISTS intents_topic_seq ON intents(topic, seq);
+CREATE TABLE IF NOT EXISTS offsets (
+    consumer TEXT NOT NULL, topic TEXT NOT NULL, seq INTEGER NOT NULL, ts REAL NOT NULL,
+    PRIMARY KEY (consumer, topic)
+);
+CREATE TABLE IF NOT EXISTS results (
+    seq INTEGER NOT NULL, consumer TEXT NOT NULL, ts REAL NOT NULL, body BLOB NOT NULL,
+    PRIMARY KEY (seq, consumer)
+);
+CREATE TABLE IF NOT EXISTS delivered (cl_ord_id TEXT PRIMARY KEY, seq INTEGER NOT NULL, ts REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS progress (
+    seq INTEGER NOT NULL, consumer TEXT NOT NULL, idx INTEGER NOT NULL, ts REAL NOT NULL, body BLOB NOT NULL,
+    PRIMARY KEY (seq, consumer, idx)
+);
+"""
+
+_PUT = "INSERT OR IGNORE INTO intents(topic, key, ts, t_signal, body) VALUES (?,?,?,?,?)"
+_READ = "SELECT seq, topic, key, ts, t_signal, body FROM intents WHERE topic=? AND seq>? ORDER BY seq LIMIT ?"
+_COMMIT = "INSERT OR REPLACE INTO offsets(consumer, topic, seq, ts) VALUES (?,?,?,?)"
+
+def queue_path(app_path: str) -> str:
+    return os.path.join(app_path, "var", "intents.db")
+
+def default_key(payload: Any) -> Optional[str]:
+    """cl_ord_id of the first message in {"messages": [...]}, if any."""
+    msgs = payload.get("messages") if isinstance(payload, dict) else None
+    if msgs:
+        return ((msgs[0] or {}).get("params") or {}).get("cl_ord_id")
+    return None
+
+@dataclass
+class QueuedIntent:
+    seq: int
+    topic: str
+    key: Optional[str]
+    ts: float
+    t_signal: Optional[float]
+    payload: Any
+
+class IntentQueue:
+    def __init__(self, path: str, synchronous: str = SYNCHRONOUS):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(path, isolation_level=None, check_same_thread=False,
+                                  timeout=BUSY_TIMEOUT_MS / 1000.0, cached_statements=32)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(f"PRAGMA synchronous={synchronous}")
+        self.db.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        self.db.executescript(_DDL)
+        self._depth = 0
+        self.duplicates = 0
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
+
+    @contextmanager
+    def batch(self) -> Iterator["IntentQueue"]:
+        """One transaction around everything inside (nested batches join the outer one)."""
+        with self.lock:
+            if self._depth == 0:
+                self.db.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.db.execute("ROLLBACK")
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self.db.execute("COMMIT")
+
+    # ---- producer ------------------------------------------------------------------------
+    def put(self, payload: Any, topic: str = "orders", key: Optional[str] = None,
+            t_signal: Optional[float] = None) -> Optional[int]:
+        """Append one intent; returns its seq, or None when (topic, key) was already queued."""
+        key = key if key is not None else default_key(payload)
+        with self.lock:
+            cur = self.db.execute(_PUT, (topic, key, time.time(), t_signal, codec.dumps(payload)))
+            if cur.rowcount == 0:
+                self.duplicates += 1
+                return None
+            return cur.lastrowid
+
+    # ---- consumer ------------------------------------------------------------------------
+    def offset(self, consumer: str, topic: str = "orders") -> int:
+        with self.lock:
+            row = self.db.execute("SELECT seq FROM offsets WHERE consumer=? AND topic=?", (consumer, topic)).fetchone()
+        return int(row[0]) if row else 0
+
+    def read(self, consumer: str, topic: str = "orders", limit: int = 64) -> List[QueuedIntent]:
+        """Intents after the consumer's committed offset (the same rows again until commit())."""
+        with self.lock:
+            rows = self.db.execute(_READ, (topic, self.offset(consumer, topic), limit)).fetchall()
+        return [QueuedIntent(r[0], r[1], r[2], r[3], r[4], codec.loads(r[5])) for r in rows]
+
+    def commit(self, consumer: str, seq: int, topic: str = "orders") -> None:
+        with self.lock:
+            self.db.execute(_COMMIT, (consumer, topic, int(seq), time.time()))
+
+    async def wait(self, consumer: str, topic: str = "orders", timeout: float = 1.0, poll_s: float = 0.005,
+                   limit: int = 64) -> List[QueuedIntent]:
+        """read(), polling every poll_s until something arrives or timeout passes."""
+        deadline = time.monotonic() + timeout
+        while True:
+            got = self.read(consumer, topic, limit)
+            if got or time.monotonic() >= deadline:
+                return got
+            await asyncio.sleep(poll_s)
+
+    def record_result(self, seq: int, consumer: str, result: Any) -> None:
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO results(seq, consumer, ts, body) VALUES (?,?,?,?)",
+                            (int(seq), consumer, time.time(), codec.dumps(result)))
+
+    def result(self, seq: int, consumer: str = "armed") -> Optional[Any]:
+        with self.lock:
+            row = self.db.execute("SELECT body FROM results WHERE seq=? AND consumer=?", (int(seq), consumer)).fetchone()
+        return None if row is None else codec.loads(row[0])
+
+    def record_progress(self, seq: int, consumer: str, idx: int, result: Any) -> None:
+        """Outcome of message `idx` of intent `seq`; replays skip messages that have one."""
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO progress(seq, consumer, idx, ts, body) VALUES (?,?,?,?,?)",
+                            (int(seq), consumer, int(idx), time.time(), codec.dumps(result)))
+
+    def progress(self, seq: int, consumer: str) -> Dict[int, Any]:
+        with self.lock:
+            rows = self.db.execute("SELECT idx, body FROM progress WHERE seq=? AND consumer=?", (int(seq), consumer)).fetchall()
+        return {int(i): codec.loads(b) for i, b in rows}
+
+    def is_delivered(self, cl_ord_id: Optional[str]) -> bool:
+        if not cl_ord_id:
+            return False
+        with self.lock:
+            return self.db.execute("SELECT 1 FROM delivered WHERE cl_ord_id=?", (cl_ord_id,)).fetchone() is not None
+
+    def mark_delivered(self, cl_ord_ids: Iterable[Optional[str]], seq: int) -> None:
+        now = time.time()
+        with self.lock:
+            self.db.executemany("INSERT OR IGNORE INTO delivered(cl_ord_id, seq, ts) VALUES (?,?,?)",
+                                ((c, int(seq), now) for c in cl_ord_ids if c))
+
+    # ---- housekeeping --------------------------------------------------------------------
+    def stats(self, consumer: str, topic: str = "orders") -> Dict[str, Any]:
+        off = self.offset(consumer, topic)
+        with self.lock:
+            head, = self.db.execute("SELECT COALESCE(MAX(seq), 0) FROM intents WHERE topic=?", (topic,)).fetchone()
+            lag, oldest = self.db.execute("SELECT COUNT(*), MIN(ts) FROM intents WHERE topic=? AND seq>?",
+                                          (topic, off)).fetchone()
+        return {"head": int(head), "offset": off, "lag": int(lag),
+                "oldest_pending_age": time.time() - oldest if oldest else 0.0, "duplicates": self.duplicates}
+
+    def purge(self, retention_s: float = RETENTION_SEC) -> int:
+        """Drop intents every consumer has committed and that are older than retention_s (keys dedupe until then)."""
+        cutoff = time.time() - retention_s
+        with self.batch():
+            n = self.db.execute(
+                "DELETE FROM intents WHERE ts<? AND seq<=COALESCE((SELECT MIN(o.seq) FROM offsets o "
+                "WHERE o.topic=intents.topic), 0)", (cutoff,)).rowcount
+            self.db.execute("DELETE FROM results WHERE ts<?", (cutoff,))
+            self.db.execute("DELETE FROM progress WHERE ts<?", (cutoff,))
+            self.db.execute("DELETE FROM delivered WHERE ts<?", (cutoff,))
+        return n
+
+    def prom_lines(self, consumer: str, topic: str = "orders") -> List[str]:
+        s = self.stats(consumer, topic)
+        lb = f'{{consumer="{consumer}",topic="{topic}"}}'
+        return [f"momentum_intent_queue_head{lb} {s['head']}",
+                f"momentum_intent_queue_offset{lb} {s['offset']}",
+                f"momentum_intent_queue_lag{lb} {s['lag']}",
+                f"momentum_intent_queue_oldest_pending_age_seconds{lb} {s['oldest_pending_age']:.3f}",
+                f"momentum_intent_queue_duplicates_total{lb} {s['duplicates']}"]
+
+_shared: Dict[str, IntentQueue] = {}
+_shared_lock = threading.Lock()
+
+def shared_queue(app_path: str) -> IntentQueue:
+    """One open IntentQueue per app per process."""
+    path = queue_path(app_path)
+    with _shared_lock:
+        q = _shared.get(path)
+        if q is None:
+            q = _shared[path] = IntentQueue(path)
+        return q
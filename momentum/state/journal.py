@@ -0,0 +1,134 @@
+from __future__ import annotations
+import json, os, time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+SEGMENT_BYTES = int(os.environ.get("JOURNAL_SEGMENT_BYTES", str(8 << 20)))
+FSYNC_SEC = float(os.environ.get("JOURNAL_FSYNC_MS", "50")) / 1000.0
+_SUFFIX = ".jsonl"
+
+class EventJournal:
+    """Append-only event log in numbered segments: <dir>/<first seq, 20 digits>.jsonl.
+
+    Each record is one line {"n": seq, "t": unix ts, "k": kind, "d": data}. append() writes to the
+    OS buffer and fsyncs at most every `fsync_s` (0 = every append); sync() forces it, so a burst of
+    events costs one fsync (group commit). A segment rolls over after `segment_bytes`. On open, a torn
+    last line (crash mid-write) is truncated away. Consumers persist their state with the last seq
+    they applied and recover with replay(after=seq); compact(upto) then deletes segments whose
+    records are all covered, keeping `keep_segments` of them for inspection.
+    """
+    def __init__(self, path: str, segment_bytes: int = SEGMENT_BYTES, fsync_s: float = FSYNC_SEC,
+                 keep_segments: int = 1):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.fsync_s = fsync_s
+        self.keep_segments = keep_segments
+        os.makedirs(path, exist_ok=True)
+        self.n = 0
+        self._f = None
+        self._size = 0
+        self._synced = True
+        self._last_sync = 0.0
+        self.appends = 0
+        self.fsyncs = 0
+        segs = self.segments()
+        if segs:
+            self.n = self._repair(segs[-1][1]) or segs[-1][0] - 1
+
+    # ---- segments -----------------------------------------------------------------------
+    def segments(self) -> List[Tuple[int, str]]:
+        out = []
+        for name in os.listdir(self.path):
+            if name.endswith(_SUFFIX) and name[:-len(_SUFFIX)].isdigit():
+                out.append((int(name[:-len(_SUFFIX)]), os.path.join(self.path, name)))
+        out.sort()
+        return out
+
+    def _repair(self, seg: str) -> int:
+        """Drop a torn tail from the last segment; returns its last complete seq (0 if none)."""
+        last, good = 0, 0
+        with open(seg, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    last = json.loads(line)["n"]
+                except (ValueError, KeyError):
+                    break
+                good += len(line)
+        if good != os.path.getsize(seg):
+            with open(seg, "r+b") as f:
+                f.truncate(good)
+                os.fsync(f.fileno())
+        return last
+
+    def _open_segment(self) -> None:
+        segs = self.segments()
+        if segs and os.path.getsize(segs[-1][1]) < self.segment_bytes:
+            path = segs[-1][1]
+        else:
+            path = os.path.join(self.path, f"{self.n + 1:020d}{_SUFFIX}")
+        self._f = open(path, "a", encoding="utf-8")
+        self._size = self._f.tell()
+
+    # ---- writes ---------------------------------------------------------------------------
+    def append(self, kind: str, data: Any, t: Optional[float] = None) -> int:
+        if self._f is None or self._size >= self.segment_bytes:
+            self.close()
+            self._open_segment()
+        self.n += 1
+        line = json.dumps({"n": self.n, "t": time.time() if t is None else t, "k": kind, "d": data},
+                          ensure_ascii=False, separators=(",", ":")) + "\n"
+        self._f.write(line)
+        self._size += len(line)
+        self._synced = False
+        self.appends += 1
+        now = time.monotonic()
+        if now - self._last_sync >= self.fsync_s:
+            self.sync(now)
+        return self.n
+
+    def sync(self, now: Optional[float] = None) -> None:
+        if self._f is not None and not self._synced:
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self.fsyncs += 1
+            self._synced = True
+        self._last_sync = time.monotonic() if now is None else now
+
+    def close(self) -> None:
+        if self._f is not None:
+            self.sync()
+            self._f.close()
+            self._f = None
+
+    def compact(self, upto: int) -> int:
+        """Delete segments whose records are all <= upto; returns how many were removed."""
+        segs = self.segments()
+        removable = [p for (first, p), (nxt, _) in zip(segs, segs[1:]) if nxt - 1 <= upto]
+        removable = removable[:max(0, len(removable) - self.keep_segments)]
+        for p in removable:
+            os.unlink(p)
+        return len(removable)
+
+    # ---- reads ----------------------------------------------------------------------------
+    def replay(self, after: int = 0) -> Iterator[Dict[str, Any]]:
+        """Records with seq > after, in order (skips segments that end before it)."""
+        if self._f is not None:
+            self._f.flush()
+        segs = self.segments()
+        for i, (first, p) in enumerate(segs):
+            if i + 1 < len(segs) and segs[i + 1][0] - 1 <= after:
+                continue
+            with open(p, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        return
+                    if rec["n"] > after:
+                        yield rec
+
+    def stats(self) -> Dict[str, Any]:
+        segs = self.segments()
+        return {"seq": self.n, "segments": len(segs), "bytes": sum(os.path.getsize(p) for _, p in segs),
+                "appends": self.appends, "fsyncs": self.fsyncs}
@@ -0,0 +1,172 @@
+from __future__ import annotations
+import json, os, sqlite3, threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+SCHEMA_VERSION = 1
+SYNCHRONOUS = os.environ.get("STATE_SQLITE_SYNC", "NORMAL").upper()     # NORMAL | FULL | OFF
+BUSY_TIMEOUT_MS = int(os.environ.get("STATE_SQLITE_BUSY_MS", "5000"))
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY, pair TEXT, status TEXT, payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS orders_pair ON orders(pair);
+CREATE TABLE IF NOT EXISTS fills (
+    fill_id TEXT PRIMARY KEY, order_id TEXT, pair TEXT, ts REAL, payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fills_pair_ts ON fills(pair, ts);
+CREATE INDEX IF NOT EXISTS fills_order ON fills(order_id);
+CREATE TABLE IF NOT EXISTS positions (pair TEXT PRIMARY KEY, payload TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS pnl (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+_UPSERT_ORDER = "INSERT OR REPLACE INTO orders(order_id, pair, status, payload) VALUES (?,?,?,?)"
+_UPSERT_FILL = "INSERT OR REPLACE INTO fills(fill_id, order_id, pair, ts, payload) VALUES (?,?,?,?,?)"
+_UPSERT_POSITION = "INSERT OR REPLACE INTO positions(pair, payload) VALUES (?,?)"
+_UPSERT_PNL = "INSERT OR REPLACE INTO pnl(key, value) VALUES (?,?)"
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+def _num(v: Any) -> Optional[float]:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+def _order_row(order_id: str, p: Dict[str, Any]) -> Tuple:
+    descr = p.get("descr") if isinstance(p.get("descr"), dict) else {}
+    return (str(order_id), p.get("pair") or p.get("symbol") or descr.get("pair"),
+            p.get("status") or p.get("order_status"), _dumps(p))
+
+def _fill_row(fill_id: str, p: Dict[str, Any]) -> Tuple:
+    return (str(fill_id), p.get("ordertxid") or p.get("order_id"), p.get("pair") or p.get("symbol"),
+            _num(p.get("time")), _dumps(p))
+
+class SQLiteStore:
+    """state.store on SQLite in WAL mode (stdlib sqlite3 only).
+
+    Payloads stay JSON text; the columns the queries filter on (pair, order id, time, status) are
+    lifted out and indexed. One connection per store, guarded by a lock; writers in other processes
+    serialize on SQLite's own lock (busy timeout STATE_SQLITE_BUSY_MS) so there is no lost update.
+    Single upserts are one autocommitted statement; batch() / upsert_fills() wrap many in one
+    transaction. sqlite3 caches prepared statements per connection, so the fixed SQL strings below
+    are compiled once. With synchronous=NORMAL a commit is durable at the next WAL checkpoint (a
+    power cut may drop the last transactions, never corrupt the file); STATE_SQLITE_SYNC=FULL syncs
+    every commit.
+    """
+    def __init__(self, path: str, synchronous: str = SYNCHRONOUS):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(path, isolation_level=None, check_same_thread=False,
+                                  timeout=BUSY_TIMEOUT_MS / 1000.0, cached_statements=64)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(f"PRAGMA synchronous={synchronous}")
+        self.db.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        self.db.executescript(_DDL)
+        self._depth = 0
+
+    @property
+    def version(self) -> int:
+        return int(self.db.execute("PRAGMA user_version").fetchone()[0])
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
+
+    @contextmanager
+    def batch(self) -> Iterator["SQLiteStore"]:
+        """One transaction around everything inside (nested batches join the outer one)."""
+        with self.lock:
+            if self._depth == 0:
+                self.db.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.db.execute("ROLLBACK")
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self.db.execute("COMMIT")
+
+    # ---- writes --------------------------------------------------------------------------
+    def upsert_order(self, order_id: str, payload: Dict[str, Any]) -> None:
+        with self.lock:
+            self.db.execute(_UPSERT_ORDER, _order_row(order_id, payload))
+
+    def upsert_fill(self, fill_id: str, payload: Dict[str, Any]) -> None:
+        with self.lock:
+            self.db.execute(_UPSERT_FILL, _fill_row(fill_id, payload))
+
+    def upsert_orders(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        with self.batch():
+            self.db.executemany(_UPSERT_ORDER, (_order_row(k, v) for k, v in items))
+
+    def upsert_fills(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        with self.batch():
+            self.db.executemany(_UPSERT_FILL, (_fill_row(k, v) for k, v in items))
+
+    def put_position(self, pair: str, payload: Dict[str, Any]) -> None:
+        with self.lock:
+            self.db.execute(_UPSERT_POSITION, (pair, _dumps(payload)))
+
+    def put_pnl(self, values: Dict[str, Any]) -> None:
+        with self.batch():
+            self.db.executemany(_UPSERT_PNL, ((k, _dumps(v)) for k, v in values.items()))
+
+    # ---- reads ---------------------------------------------------------------------------
+    def get_order(self, order_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.db.execute("SELECT payload FROM orders WHERE order_id=?", (order_id,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def get_position(self, pair: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.db.execute("SELECT payload FROM positions WHERE pair=?", (pair,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def pnl_summary(self) -> Dict[str, Any]:
+        with self.lock:
+            rows = self.db.execute("SELECT key, value FROM pnl").fetchall()
+        return {k: json.loads(v) for k, v in rows}
+
+    def fills_for(self, pair: Optional[str] = None, order_id: Optional[str] = None,
+                  since: Optional[float] = None) -> List[Dict[str, Any]]:
+        sql, args = "SELECT payload FROM fills WHERE 1=1", []
+        if pair is not None:
+            sql += " AND pair=?"; args.append(pair)
+        if order_id is not None:
+            sql += " AND order_id=?"; args.append(order_id)
+        if since is not None:
+            sql += " AND ts>=?"; args.append(since)
+        with self.lock:
+            rows = self.db.execute(sql + " ORDER BY ts", args).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self.lock:
+            return {t: self.db.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                    for t in ("orders", "fills", "positions", "pnl")}
+
+    # ---- migration -----------------------------------------------------------------------
+    def migrate_from_json(self, json_path: str, force: bool = False) -> Optional[Dict[str, int]]:
+        """Import a legacy state.json once (user_version marks it done); returns the row counts."""
+        if self.version >= SCHEMA_VERSION and not force:
+            return None
+        data: Dict[str, Any] = {}
+        if os.path.exists(json_path):
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        with self.batch():
+            self.upsert_orders((data.get("orders") or {}).items())
+            self.upsert_fills((data.get("fills") or {}).items())
+            self.db.executemany(_UPSERT_POSITION,
+                                ((k, _dumps(v)) for k, v in (data.get("positions") or {}).items()))
+            self.put_pnl(data.get("pnl") or {})
+            self.db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        return self.counts()
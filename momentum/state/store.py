@@ -2,12 +2,25 @@
 from __future__ import annotations
 from typing import Optional, Dict, Any
 from pathlib import Path
-import json
+import json, os
 
 VAR = Path(__file__).resolve().parent.parent / "var"
 STATE_PATH = VAR / "state.json"
+DB_PATH = Path(os.environ.get("STATE_DB_PATH") or VAR / "state.db")
+BACKEND = os.environ.get("STATE_BACKEND", "json").lower()     # json | sqlite
 VAR.mkdir(parents=True, exist_ok=True)
 
+_db = None
+
+def _sqlite():
+    # first open imports an existing state.json (one-shot, see sqlite_store.migrate_from_json)
+    global _db
+    if _db is None:
+        from .sqlite_store import SQLiteStore
+        _db = SQLiteStore(str(DB_PATH))
+        _db.migrate_from_json(str(STATE_PATH))
+    return _db
+
 def _load() -> Dict[str, Any]:
     if not STATE_PATH.exists():
         return {"orders": {}, "fills": {}, "positions": {}, "pnl": {}}
@@ -17,19 +30,27 @@ def _save(data: Dict[str, Any]) -> None:
     STATE_PATH.write_text(json.dumps(data, indent=2))
 
 def upsert_order(order_id: str, payload: Dict[str, Any]) -> None:
+    if BACKEND == "sqlite":
+        return _sqlite().upsert_order(order_id, payload)
     data = _load()
     data["orders"][order_id] = payload
     _save(data)
 
 def upsert_fill(fill_id: str, payload: Dict[str, Any]) -> None:
+    if BACKEND == "sqlite":
+        return _sqlite().upsert_fill(fill_id, payload)
     data = _load()
     data["fills"][fill_id] = payload
     _save(data)
 
 def get_position(pair: str) -> Optional[Dict[str, Any]]:
+    if BACKEND == "sqlite":
+        return _sqlite().get_position(pair)
     data = _load()
     return data["positions"].get(pair)
 
 def pnl_summary() -> Dict[str, Any]:
+    if BACKEND == "sqlite":
+        return _sqlite().pnl_summary()
     data = _load()
     return data.get("pnl", {})
@@ -0,0 +1,89 @@
+from __future__ import annotations
+import os, time
+from typing import Any, Dict, List, Optional
+
+from . import codec
+from .atomic_json import write_bytes
+
+# Per-service warm-start snapshot: var/warm/<service>.mbin (state.codec marshal format; internal only).
+# A service checkpoints its in-memory structures as named sections, each stamped with the time its data
+# was current, periodically and on shutdown; on start it restores every section that is still younger
+# than the caller's max age instead of rebuilding it from REST / slow subscribes.
+#
+# The snapshot is versioned twice: SCHEMA_WARM_START for the container and a per-service `version`
+# the caller bumps when a section's shape changes. A mismatch, a torn file or a missing file all
+# mean a cold start, never an error. Files are created 0600 (tempfile), so a WS token may be kept.
+
+SCHEMA_WARM_START = "warm_start/v1"
+CHECKPOINT_SEC = float(os.environ.get("WARM_START_CHECKPOINT_SEC", "30"))
+ENABLED = os.environ.get("WARM_START", "1") != "0"
+
+def warm_path(app_path: str, service: str) -> str:
+    return os.path.join(app_path, "var", "warm", f"{service}.mbin")
+
+class WarmStart:
+    def __init__(self, app_path: str, service: str, version: int = 1):
+        self.path = warm_path(app_path, service)
+        self.service = service
+        self.version = version
+        self.sections: Dict[str, Dict[str, Any]] = {}
+        self.restored: Dict[str, float] = {}    # section -> age at restore
+        self.rejected: Dict[str, str] = {}      # section -> reason ("stale", "version", ...)
+        self.saved_ts = 0.0
+        self.saves = 0
+        self.loaded = False
+
+    # ---- checkpoint ----------------------------------------------------------------------
+    def put(self, name: str, data: Any, ts: Optional[float] = None) -> None:
+        """Stage a section; `ts` is when the data was current (defaults to now)."""
+        self.sections[name] = {"ts": time.time() if ts is None else ts, "data": data}
+
+    def save(self, durability: str = "group") -> None:
+        """Write every staged section; periodic checkpoints use group, shutdown passes strict."""
+        if not ENABLED:
+            return
+        doc = {"_schema": SCHEMA_WARM_START, "service": self.service, "version": self.version,
+               "saved_ts": time.time(), "sections": self.sections}
+        write_bytes(self.path, codec.encode_for(self.path, doc), durability)
+        self.saved_ts = doc["saved_ts"]
+        self.saves += 1
+
+    # ---- restore -------------------------------------------------------------------------
+    def load(self) -> "WarmStart":
+        self.loaded = True
+        if not ENABLED:
+            return self
+        doc = codec.read(self.path, {})
+        if not isinstance(doc, dict) or doc.get("_schema") != SCHEMA_WARM_START:
+            return self
+        if doc.get("version") != self.version:
+            self.rejected = {k: "version" for k in (doc.get("sections") or {})}
+            return self
+        self.sections = dict(doc.get("sections") or {})
+        return self
+
+    def get(self, name: str, max_age_s: float, default: Any = None) -> Any:
+        """Section data if present and younger than max_age_s, else `default` (a cold rebuild)."""
+        if not self.loaded:
+            self.load()
+        sec = self.sections.get(name)
+        if not isinstance(sec, dict):
+            return default
+        age = time.time() - float(sec.get("ts") or 0.0)
+        if age > max_age_s:
+            self.rejected[name] = "stale"
+            return default
+        self.restored[name] = age
+        return sec.get("data")
+
+    def prom_lines(self, started_ts: Optional[float] = None, ready_ts: Optional[float] = None) -> List[str]:
+        lb = f'{{service="{self.service}"}}'
+        lines = [f"momentum_warm_start_sections_restored{lb} {len(self.restored)}",
+                 f"momentum_warm_start_sections_rejected{lb} {len(self.rejected)}",
+                 f"momentum_warm_start_checkpoints_total{lb} {self.saves}",
+                 f"momentum_warm_start_last_checkpoint_timestamp{lb} {self.saved_ts:.3f}"]
+        lines += [f'momentum_warm_start_section_age_seconds{{service="{self.service}",section="{k}"}} {v:.3f}'
+                  for k, v in self.restored.items()]
+        if started_ts is not None and ready_ts is not None:
+            lines.append(f"momentum_warm_start_time_to_ready_seconds{lb} {ready_ts - started_ts:.3f}")
+        return lines
@@ -0,0 +1,214 @@
+
+from __future__ import annotations
+import asyncio, math, os, time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from ..state.atomic_json import AtomicJSONWriter, read_json
+
+SCHEMA_CLOCK = "clock_offset/v1"
+DEFAULT_DEADLINE_MS = 5000
+SYNC_INTERVAL_SEC = float(os.environ.get("CLOCK_SYNC_INTERVAL_SEC", "30"))
+OFFSET_MAX_AGE_SEC = float(os.environ.get("CLOCK_OFFSET_MAX_AGE_SEC", "900"))
+_RELOAD_SEC = 5.0
+
+def parse_rfc3339(ts: str) -> float:
+    """'2023-09-21T14:15:07.197274Z' -> epoch seconds (keeps microseconds)."""
+    if ts.endswith("Z"):
+        ts = ts[:-1] + "+00:00"
+    return datetime.fromisoformat(ts).timestamp()
+
+def format_deadline(t: float) -> str:
+    # Kraken expects RFC3339 with milliseconds
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(t)) + f".{int((t % 1)*1000):03d}Z"
+
+class ClockSync:
+    """Estimates offset = exchange_time - local_time and the round-trip time to the exchange.
+
+    Every sample bounds the offset to an interval: a request/response carrying server time s
+    (reported with `resolution`, 1s for REST /0/public/Time) gives [s - t_recv, s + resolution - t_send];
+    a one-way server timestamp (WS message) gives [s - t_recv, +inf). The estimate is the midpoint of the
+    intersection of the samples in the window; if they stop overlapping (clock step, drift) the window
+    restarts from the newest sample.
+    """
+    def __init__(self, window_s: float = 600.0, max_samples: int = 64):
+        self.window_s = float(window_s)
+        self.samples: Deque[Tuple[float, float, float]] = deque(maxlen=max_samples)  # (t_local, lo, hi)
+        self.offset = 0.0
+        self.lo = -math.inf
+        self.hi = math.inf
+        self.rtt: Optional[float] = None      # EWMA of request/response RTT, seconds
+        self.rtt_min: Optional[float] = None
+        self.last_sample_ts = 0.0
+        self.n_samples = 0
+        self.resets = 0
+
+    # ---- samples ------------------------------------------------------------
+    def add_sample(self, t_send: float, server_ts: float, t_recv: float, resolution: float = 0.0) -> None:
+        rtt = max(0.0, t_recv - t_send)
+        self.rtt = rtt if self.rtt is None else 0.8 * self.rtt + 0.2 * rtt
+        self.rtt_min = rtt if self.rtt_min is None else min(self.rtt_min, rtt)
+        self._add(t_recv, server_ts - t_recv, server_ts + resolution - t_send)
+
+    def add_one_way(self, server_ts: float, t_recv: float) -> None:
+        self._add(t_recv, server_ts - t_recv, math.inf)
+
+    def add_ws_ack(self, t_send: float, ack: Dict[str, Any], t_recv: float) -> bool:
+        """Feed a WS v2 method response carrying time_in/time_out; returns True if a sample was taken."""
+        ts = ack.get("time_out") or ack.get("time_in")
+        if not ts:
+            return False
+        try:
+            self.add_sample(t_send, parse_rfc3339(ts), t_recv)
+        except Exception:
+            return False
+        return True
+
+    def _add(self, t_local: float, lo: float, hi: float) -> None:
+        self.samples.append((t_local, lo, hi))
+        self.n_samples += 1
+        self.last_sample_ts = t_local
+        cutoff = t_local - self.window_s
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+        lo_all = max(s[1] for s in self.samples)
+        hi_all = min(s[2] for s in self.samples)
+        if lo_all > hi_all:
+            newest = self.samples[-1]
+            self.samples.clear(); self.samples.append(newest)
+            lo_all, hi_all = newest[1], newest[2]
+            self.resets += 1
+        self.lo, self.hi = lo_all, hi_all
+        self.offset = (lo_all + hi_all) / 2.0 if math.isfinite(hi_all) else lo_all
+
+    # ---- readout ------------------------------------------------------------
+    @property
+    def uncertainty(self) -> float:
+        return (self.hi - self.lo) / 2.0 if math.isfinite(self.hi) and math.isfinite(self.lo) else math.inf
+
+    def now(self) -> float:
+        return time.time() + self.offset
+
+    def deadline_iso(self, ms_from_now: int) -> str:
+        return format_deadline(self.now() + ms_from_now / 1000.0)
+
+    def safe_deadline_ms(self, floor_ms: int = 250, margin_ms: int = 100) -> int:
+        """Tightest deadline that still covers one RTT plus the offset uncertainty; default until synced."""
+        if self.rtt is None or not math.isfinite(self.uncertainty):
+            return DEFAULT_DEADLINE_MS
+        return max(int(floor_ms), int(math.ceil((self.rtt + self.uncertainty) * 1000.0)) + int(margin_ms))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "_schema": SCHEMA_CLOCK,
+            "offset_s": self.offset,
+            "uncertainty_s": self.uncertainty if math.isfinite(self.uncertainty) else None,
+            "rtt_s": self.rtt,
+            "rtt_min_s": self.rtt_min,
+            "samples": self.n_samples,
+            "resets": self.resets,
+            "last_sample_ts": self.last_sample_ts,
+        }
+
+    def prom_lines(self) -> List[str]:
+        nan = float("nan")
+        return [
+            f"momentum_clock_offset_seconds {self.offset}",
+            f"momentum_clock_offset_uncertainty_seconds {self.uncertainty if math.isfinite(self.uncertainty) else nan}",
+            f"momentum_clock_rtt_seconds {self.rtt if self.rtt is not None else nan}",
+            f"momentum_clock_rtt_min_seconds {self.rtt_min if self.rtt_min is not None else nan}",
+            f"momentum_clock_samples_total {self.n_samples}",
+            f"momentum_clock_resets_total {self.resets}",
+            f"momentum_clock_last_sample_age_seconds {time.time() - self.last_sample_ts if self.last_sample_ts else nan}",
+            f"momentum_clock_safe_deadline_ms {self.safe_deadline_ms()}",
+        ]
+
+    def save(self, path: str) -> None:
+        # rewritten every sample: group commit (unique temp file + lock + batched fsync, state.atomic_json)
+        AtomicJSONWriter(path, schema_version=SCHEMA_CLOCK, durability="group").write(self.snapshot())
+
+    @classmethod
+    def load(cls, path: str, max_age_s: float = OFFSET_MAX_AGE_SEC) -> Optional["ClockSync"]:
+        """Restore a clock published by another process; None if absent or older than max_age_s."""
+        try:
+            d = read_json(path)
+            if time.time() - float(d.get("last_sample_ts") or 0) > max_age_s:
+                return None
+            c = cls()
+            c.offset = float(d["offset_s"])
+            u = d.get("uncertainty_s")
+            if u is not None:
+                c.lo, c.hi = c.offset - float(u), c.offset + float(u)
+            c.rtt = d.get("rtt_s"); c.rtt_min = d.get("rtt_min_s")
+            c.n_samples = int(d.get("samples") or 0); c.resets = int(d.get("resets") or 0)
+            c.last_sample_ts = float(d["last_sample_ts"])
+            return c
+        except Exception:
+            return None
+
+# ---- process-wide exchange clock ----------------------------------------------
+# Order builders call exchange_time(). A process running the sampler installs its clock with
+# set_shared_clock(); every other process follows var/clock_offset.json written by that sampler.
+
+def offset_path(app_path: Optional[str] = None) -> str:
+    return os.path.join(app_path or os.environ.get("APP", "."), "var", "clock_offset.json")
+
+_shared: Dict[str, Any] = {"clock": ClockSync(), "owned": False, "checked": -math.inf, "mtime": None}
+
+def set_shared_clock(clock: ClockSync) -> None:
+    _shared.update(clock=clock, owned=True)
+
+def shared_clock() -> ClockSync:
+    if not _shared["owned"]:
+        now = time.monotonic()
+        if now - _shared["checked"] >= _RELOAD_SEC:
+            _shared["checked"] = now
+            path = offset_path()
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime != _shared["mtime"]:
+                _shared["mtime"] = mtime
+                _shared["clock"] = (ClockSync.load(path) if mtime is not None else None) or ClockSync()
+    return _shared["clock"]
+
+def exchange_time() -> float:
+    return time.time() + shared_clock().offset
+
+# ---- sampler ------------------------------------------------------------------
+
+async def sample_rest(kraken, clock: ClockSync) -> None:
+    t0 = time.time()
+    res = await kraken.server_time()
+    t1 = time.time()
+    clock.add_sample(t0, float(res["unixtime"]), t1, resolution=1.0)
+
+async def run_clock_sync(app_path: str, interval_s: float = SYNC_INTERVAL_SEC, kraken=None,
+                         clock: Optional[ClockSync] = None, iterations: int = 0) -> ClockSync:
+    """Sample /0/public/Time every interval_s, publish var/clock_offset.json and var/metrics.d/clock_sync.prom."""
+    from ..kraken.rest_client import KrakenREST  # lazy: aiohttp only needed for the sampler
+    from ..observability.textfile import write_textfile
+    clock = clock or ClockSync()
+    set_shared_clock(clock)
+    own = kraken is None
+    kraken = kraken or KrakenREST()
+    path = offset_path(app_path)
+    n = 0
+    try:
+        while True:
+            try:
+                await sample_rest(kraken, clock)
+                clock.save(path)
+            except Exception:
+                pass  # keep the last estimate; age metric shows staleness
+            write_textfile(app_path, "clock_sync", clock.prom_lines())
+            n += 1
+            if iterations and n >= iterations:
+                return clock
+            # sample faster until the 1s REST resolution has been narrowed down by a few samples
+            await asyncio.sleep(interval_s if clock.n_samples >= 8 else min(interval_s, 1.3))
+    finally:
+        if own:
+            await kraken.close()
@@ -1,6 +1,8 @@
 
 from __future__ import annotations
-import time
+import asyncio, time
+from collections import deque
+from typing import Deque, Dict, Hashable, List, Optional, Tuple
 
 class TokenBucket:
     def __init__(self, rate_per_sec: float, burst: int):
@@ -18,3 +20,117 @@ class TokenBucket:
             self.tokens -= 1.0
             return True
         return False
+
+class PriorityRateLimiter:
+    """Awaitable token bucket: callers wait for budget instead of being refused.
+
+    `await acquire(priority, key)` returns once a token is granted. Waiters are served strictly by
+    priority class (lower first: CLOSE > CANCEL > AMEND by default) and round-robin across `key`
+    (e.g. symbol) within a class, so one noisy key cannot starve the others. A single dispatcher task
+    hands out tokens as they refill. Queue depth and wait time per class are exported via prom_lines().
+    """
+    CLOSE, CANCEL, AMEND = 0, 1, 2
+    CLASS_NAMES = ("close", "cancel", "amend")
+
+    def __init__(self, rate_per_sec: float, burst: int, classes: int = 3):
+        self.rate = float(rate_per_sec)
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.timestamp = time.monotonic()
+        self._queues: List[Dict[Hashable, Deque[Tuple[asyncio.Future, float]]]] = [{} for _ in range(classes)]
+        self._rings: List[Deque[Hashable]] = [deque() for _ in range(classes)]
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.granted = [0] * classes
+        self.wait_sum = [0.0] * classes
+        self.wait_max = [0.0] * classes
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.timestamp) * self.rate)
+        self.timestamp = now
+
+    def depth(self, priority: Optional[int] = None) -> int:
+        qs = self._queues if priority is None else [self._queues[priority]]
+        return sum(len(d) for q in qs for d in q.values())
+
+    def _grant(self, priority: int, waited: float) -> None:
+        self.tokens -= 1.0
+        self.granted[priority] += 1
+        self.wait_sum[priority] += waited
+        if waited > self.wait_max[priority]:
+            self.wait_max[priority] = waited
+
+    async def acquire(self, priority: int = AMEND, key: Hashable = None) -> float:
+        """Wait for one token; returns the seconds spent waiting."""
+        priority = min(max(int(priority), 0), len(self._queues) - 1)
+        self._refill()
+        if self.tokens >= 1.0 and self.depth() == 0:
+            self._grant(priority, 0.0)
+            return 0.0
+        fut = asyncio.get_running_loop().create_future()
+        q = self._queues[priority]
+        if key not in q:
+            q[key] = deque()
+            self._rings[priority].append(key)
+        t0 = time.monotonic()
+        q[key].append((fut, t0))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch(), name="rate_limiter")
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # granted, but the waiter was cancelled before it could use the token: give it back
+                self.tokens = min(self.capacity, self.tokens + 1.0)
+                self.granted[priority] -= 1
+            else:
+                waiters = q.get(key)
+                if waiters is not None:
+                    try:
+                        waiters.remove((fut, t0))
+                    except ValueError:
+                        pass
+            raise
+        return time.monotonic() - t0
+
+    def _next(self) -> Optional[Tuple[int, asyncio.Future, float]]:
+        for prio, (q, ring) in enumerate(zip(self._queues, self._rings)):
+            while ring:
+                key = ring.popleft()
+                waiters = q[key]
+                while waiters and waiters[0][0].done():      # cancelled while queued
+                    waiters.popleft()
+                if not waiters:
+                    del q[key]
+                    continue
+                fut, t0 = waiters.popleft()
+                if waiters:
+                    ring.append(key)                          # round-robin: key goes to the back
+                else:
+                    del q[key]
+                return prio, fut, t0
+        return None
+
+    async def _dispatch(self) -> None:
+        while self.depth():
+            self._refill()
+            if self.tokens < 1.0:
+                await asyncio.sleep((1.0 - self.tokens) / self.rate)
+                continue
+            nxt = self._next()
+            if nxt is None:
+                break
+            prio, fut, t0 = nxt
+            self._grant(prio, time.monotonic() - t0)
+            fut.set_result(None)
+            await asyncio.sleep(0)
+
+    def prom_lines(self, name: str = "momentum_rate_limiter") -> List[str]:
+        lines = [f"{name}_tokens {self.tokens}"]
+        for i in range(len(self._queues)):
+            lb = f'{{class="{self.CLASS_NAMES[i] if i < len(self.CLASS_NAMES) else i}"}}'
+            lines += [f"{name}_queue_depth{lb} {self.depth(i)}",
+                      f"{name}_granted_total{lb} {self.granted[i]}",
+                      f"{name}_wait_seconds_sum{lb} {self.wait_sum[i]}",
+                      f"{name}_wait_seconds_max{lb} {self.wait_max[i]}"]
+        return lines
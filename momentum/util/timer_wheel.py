@@ -0,0 +1,112 @@
+from __future__ import annotations
+import math, time
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+class TimerWheel:
+    """Hierarchical timing wheel (Varghese & Lauck) keyed by hashable ids.
+
+    Level 0 has `slots[0]` buckets of `tick_s` seconds; each higher level covers a whole revolution of
+    the level below per bucket (defaults: 1s x 256 / 256s x 64 / ~4.5h x 64 / ~12d x 64). schedule()
+    and cancel() are O(1); advance() visits one level-0 bucket per elapsed tick and cascades a
+    higher-level bucket down when the level below wraps, so its cost follows due timers and elapsed
+    ticks, not the number of pending ones. A timer fires on the first advance() whose tick reaches its
+    deadline, i.e. up to one tick late and never early. Deadlines beyond the top level are parked at its far end
+    and re-cascaded. Re-scheduling a key replaces its previous deadline.
+    """
+    def __init__(self, tick_s: float = 1.0, slots: Sequence[int] = (256, 64, 64, 64), origin: float = 0.0):
+        self.tick_s = float(tick_s)
+        self.origin = float(origin)
+        self.slots = tuple(int(s) for s in slots)
+        self.spans: List[int] = [1]
+        for s in self.slots[:-1]:
+            self.spans.append(self.spans[-1] * s)
+        self.wheels: List[List[Dict[Hashable, Tuple[int, Any]]]] = [[{} for _ in range(s)] for s in self.slots]
+        self.where: Dict[Hashable, Tuple[int, int, int]] = {}    # key -> (level, slot, due_tick)
+        self.ready: Dict[Hashable, Any] = {}                     # already due at schedule time
+        self.now_tick: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self.where) + len(self.ready)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.where or key in self.ready
+
+    def _tick_of(self, t: float) -> int:
+        """Deadline -> first tick at or after it (timers never fire early)."""
+        return math.ceil((t - self.origin) / self.tick_s - 1e-9)
+
+    def _now_tick(self, t: float) -> int:
+        return math.floor((t - self.origin) / self.tick_s + 1e-9)
+
+    def _place(self, key: Hashable, due: int, payload: Any) -> None:
+        delta = due - self.now_tick
+        if delta <= 0:
+            self.ready[key] = payload
+            return
+        level = 0
+        while level + 1 < len(self.slots) and delta >= self.spans[level + 1]:
+            level += 1
+        top_range = self.spans[level] * self.slots[level]
+        slot_tick = due if delta < top_range else self.now_tick + top_range - self.spans[level]
+        slot = (slot_tick // self.spans[level]) % self.slots[level]
+        self.wheels[level][slot][key] = (due, payload)
+        self.where[key] = (level, slot, due)
+
+    def schedule(self, key: Hashable, deadline: float, payload: Any = None, now: Optional[float] = None) -> None:
+        if self.now_tick is None:
+            self.now_tick = self._now_tick(time.time() if now is None else now)
+        self.cancel(key)
+        self._place(key, self._tick_of(deadline), payload)
+
+    def cancel(self, key: Hashable) -> bool:
+        if key in self.ready:
+            del self.ready[key]
+            return True
+        loc = self.where.pop(key, None)
+        if loc is None:
+            return False
+        self.wheels[loc[0]][loc[1]].pop(key, None)
+        return True
+
+    def due_at(self, key: Hashable) -> Optional[float]:
+        loc = self.where.get(key)
+        return None if loc is None else self.origin + loc[2] * self.tick_s
+
+    def advance(self, now: float) -> List[Tuple[Hashable, Any]]:
+        """Move time to `now`; returns (key, payload) for every timer due at or before it."""
+        target = self._now_tick(now)
+        out = list(self.ready.items())
+        self.ready.clear()
+        if self.now_tick is None:
+            self.now_tick = target
+            return out
+        if not self.where:
+            self.now_tick = max(self.now_tick, target)
+            return out
+        while self.now_tick < target:
+            self.now_tick += 1
+            t = self.now_tick
+            top = 0
+            while top + 1 < len(self.slots) and t % self.spans[top + 1] == 0:
+                top += 1
+            for level in range(top, 0, -1):                       # cascade (highest first) where the level below wrapped
+                bucket = self.wheels[level][(t // self.spans[level]) % self.slots[level]]
+                if bucket:
+                    moved = list(bucket.items())
+                    bucket.clear()
+                    for key, (due, payload) in moved:
+                        del self.where[key]
+                        self._place(key, due, payload)
+            bucket = self.wheels[0][t % self.slots[0]]
+            if bucket:
+                for key, (due, payload) in list(bucket.items()):
+                    if due <= t:
+                        del bucket[key]
+                        del self.where[key]
+                        out.append((key, payload))
+            if not self.where:
+                self.now_tick = target
+                break
+        out.extend(self.ready.items())
+        self.ready.clear()
+        return out
@@ -3,6 +3,13 @@ from __future__ import annotations
 import os
 from pathlib import Path
 
+def _deadline_ms(v: str) -> int:
+    # DEADLINE_MS=auto: tightest safe deadline from the synced exchange clock (5000 until synced)
+    if v.strip().lower() == "auto":
+        from momentum.util.clock_sync import shared_clock
+        return shared_clock().safe_deadline_ms()
+    return int(v)
+
 def load_env_knobs(app_root: str | None = None) -> dict:
     """Load tunables from `.env_meanrev` in APP root. .env with secrets is not touched here.
     Returns a dict with sensible defaults if file is absent.
@@ -15,7 +22,7 @@ def load_env_knobs(app_root: str | None = None) -> dict:
         "ALLOW_LIVE": int(os.environ.get("ALLOW_LIVE", "0")),
         "DEFAULT_TIF": os.environ.get("DEFAULT_TIF", "gtc"),
         "DEFAULT_STP": os.environ.get("DEFAULT_STP", "cancel_newest"),
-        "DEADLINE_MS": int(os.environ.get("DEADLINE_MS", "5000")),
+        "DEADLINE_MS": _deadline_ms(os.environ.get("DEADLINE_MS", "5000")),
     }
     try:
         if path.exists():
@@ -26,7 +33,7 @@ def load_env_knobs(app_root: str | None = None) -> dict:
                         continue
                     k, v = line.split("=", 1)
                     if k in ("ENTRY_MAX_NOTIONAL", "DEADLINE_MS"):
-                        knobs[k] = float(v) if k == "ENTRY_MAX_NOTIONAL" else int(v)
+                        knobs[k] = float(v) if k == "ENTRY_MAX_NOTIONAL" else _deadline_ms(v)
                     elif k in ("ONE_POSITION_ONLY", "ABS_LIMIT_REQUIRED", "ALLOW_LIVE"):
                         knobs[k] = int(v)
                     elif k in ("DEFAULT_TIF", "DEFAULT_STP"):
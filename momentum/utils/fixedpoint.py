@@ -0,0 +1,149 @@
+
+from __future__ import annotations
+import math, re
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Iterable, List, Sequence, Tuple
+import orjson
+
+# Shared fixed-point layer for prices and quantities.
+# Prices are integer ticks of 10**-price_decimals, quantities integer lots of 10**-lot_decimals.
+# All plan math (splits, caps, offsets) runs on ints; floats/strings only appear at the wire edge.
+# Order payloads carry prices/quantities as exact decimal strings (PairSpec.price_str/qty_str);
+# WS v2 types them as JSON numbers, so wire_dumps writes those strings out as bare numbers.
+
+_ABS_EPS = 1e-9
+_REL_EPS = 1e-13
+WIRE_NUMBER_FIELDS = ("order_qty", "limit_price", "trigger_price", "display_qty", "price")
+_WIRE_NUM = re.compile(rb'"(' + "|".join(WIRE_NUMBER_FIELDS).encode() + rb')":"(-?[0-9]+(?:\.[0-9]+)?)"')
+
+def to_units(x: float, scale: int, mode: str = "nearest") -> int:
+    """Convert a float to integer units of 1/scale. mode: 'nearest' (half-up), 'floor' or 'ceil'.
+    Values within float drift of a unit boundary snap to it, so 0.1+0.2 never floors to 0.29999999.
+    """
+    v = float(x) * scale
+    tol = _ABS_EPS + abs(v) * _REL_EPS
+    n = round(v)
+    if abs(v - n) <= tol:
+        return int(n)
+    if mode == "floor":
+        return math.floor(v)
+    if mode == "ceil":
+        return math.ceil(v)
+    if mode == "nearest":
+        # half-up, with the .5 boundary snapped too (1.005 -> 1.01 as with Decimal ROUND_HALF_UP)
+        f = math.floor(v)
+        return f + 1 if v - f >= 0.5 - tol else f
+    raise ValueError(f"unknown rounding mode: {mode!r}")
+
+def units_to_float(n: int, decimals: int) -> float:
+    # int / int is correctly rounded, so repr() gives back the exact decimal
+    return n / (10 ** decimals)
+
+def units_to_str(n: int, decimals: int) -> str:
+    """Wire string for n units of 10**-decimals, trailing zeros stripped (e.g. 123450, 4 -> '12.345')."""
+    sign = "-" if n < 0 else ""
+    q, r = divmod(abs(int(n)), 10 ** decimals)
+    if r == 0:
+        return f"{sign}{q}"
+    return f"{sign}{q}.{r:0{decimals}d}".rstrip("0")
+
+def round_to_decimals(x: float, decimals: int, mode: str = "nearest") -> float:
+    return units_to_float(to_units(x, 10 ** decimals, mode), decimals)
+
+def decimals_for_step(step: float) -> int:
+    """Number of decimals for a power-of-ten step (0.01 -> 2). Raises ValueError for other steps
+    (PairSpec needs a power-of-ten grid; use round_to_step for arbitrary ticks)."""
+    if step <= 0:
+        raise ValueError(f"step must be > 0: {step}")
+    d = max(0, round(-math.log10(step)))
+    if not math.isclose(10.0 ** -d, step, rel_tol=1e-9):
+        raise ValueError(f"step {step} is not a power of ten")
+    return d
+
+def step_decimals(step: float) -> int:
+    """Decimals needed to write any step exactly (0.25 -> 2, 5 -> 0, 1e-8 -> 8)."""
+    if step <= 0:
+        raise ValueError(f"step must be > 0: {step}")
+    return max(0, -Decimal(repr(float(step))).normalize().as_tuple().exponent)
+
+def round_to_step(x: float, step: float, mode: str = "nearest") -> float:
+    """x snapped onto a grid of any step (0.5, 0.25, 5, 1e-8) with to_units' drift handling.
+    The grid is counted in integer steps and scaled back through exact units of the step's decimals."""
+    d = step_decimals(step)
+    n = to_units(float(x) / step, 1, mode)
+    return units_to_float(n * to_units(step, 10 ** d), d)
+
+@dataclass(frozen=True, slots=True)
+class PairSpec:
+    price_decimals: int = 8
+    lot_decimals: int = 8
+    min_lots: int = 0
+
+    @classmethod
+    def from_steps(cls, price_tick: float = 1e-8, lot_step: float = 1e-8, min_qty: float = 0.0) -> "PairSpec":
+        lot_dec = decimals_for_step(lot_step)
+        return cls(decimals_for_step(price_tick), lot_dec, to_units(min_qty, 10 ** lot_dec, "ceil"))
+
+    @property
+    def price_scale(self) -> int:
+        return 10 ** self.price_decimals
+
+    @property
+    def lot_scale(self) -> int:
+        return 10 ** self.lot_decimals
+
+    # ---- float -> int (once, at the input edge) --------------------------
+    def price_ticks(self, price: float, mode: str = "nearest") -> int:
+        return to_units(price, self.price_scale, mode)
+
+    def qty_lots(self, qty: float, mode: str = "floor") -> int:
+        return to_units(qty, self.lot_scale, mode)
+
+    # ---- int -> wire (once, at serialization) ----------------------------
+    def price(self, ticks: int) -> float:
+        return units_to_float(ticks, self.price_decimals)
+
+    def qty(self, lots: int) -> float:
+        return units_to_float(lots, self.lot_decimals)
+
+    def price_str(self, ticks: int) -> str:
+        return units_to_str(ticks, self.price_decimals)
+
+    def qty_str(self, lots: int) -> str:
+        return units_to_str(lots, self.lot_decimals)
+
+    # ---- integer plan math -----------------------------------------------
+    def notional(self, lots: int, ticks: int) -> float:
+        return (lots * ticks) / (self.price_scale * self.lot_scale)
+
+    def max_lots_for_notional(self, notional: float, ticks: int) -> int:
+        """Largest lot count whose notional at `ticks` stays <= notional."""
+        if ticks <= 0:
+            return 0
+        # cap floored to price precision first so the products stay exact ints (no 2**53 overflow)
+        return to_units(notional, self.price_scale, "floor") * self.lot_scale // ticks
+
+    def offset_ticks(self, ticks: int, pct: float, mode: str = "nearest") -> int:
+        """ticks * (1 + pct/100), rounded back onto the tick grid."""
+        return to_units(ticks * (1.0 + pct / 100.0), 1, mode)
+
+    def split_lots(self, total_lots: int, weights: Sequence[float]) -> Tuple[List[int], int]:
+        """Floor-split total_lots by weights; returns (legs, dust) with sum(legs) + dust == total_lots."""
+        s = float(sum(weights))
+        if s <= 0:
+            return [0] * len(weights), total_lots
+        legs = [to_units(total_lots * w / s, 1, "floor") for w in weights]
+        return legs, total_lots - sum(legs)
+
+def prices_to_ticks(values: Iterable[float], decimals: int, mode: str = "nearest") -> List[int]:
+    scale = 10 ** decimals
+    return [to_units(v, scale, mode) for v in values]
+
+def qtys_to_lots(values: Iterable[float], decimals: int, mode: str = "floor") -> List[int]:
+    scale = 10 ** decimals
+    return [to_units(v, scale, mode) for v in values]
+
+def wire_dumps(msg: Any) -> bytes:
+    """orjson bytes for a WS message; decimal strings in WIRE_NUMBER_FIELDS become bare JSON numbers."""
+    return _WIRE_NUM.sub(rb'"\1":\2', orjson.dumps(msg))
@@ -0,0 +1,435 @@
+from __future__ import annotations
+import asyncio, os, time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from momentum.kraken.assets import AssetIndex, v2_symbol
+from momentum.state.atomic_json import AtomicJSONWriter, read_json
+from momentum.utils.safety import LIMIT_ORDER_TYPES, SafetyViolation
+from momentum.utils.risk_sizing import compute_qty
+
+# Pre-trade risk engine: limits, equity and exposure live in memory and are updated by events
+# (fills, order open/close, marks, equity); a check is a walk over a tuple of compiled rules.
+# Exposure per symbol = position qty * mark + remaining notional of open buy orders.
+# Symbols are keyed by WS v2 symbol ("BTC/USD") like ws.account; REST names are normalized on entry.
+# Live: ws_private_runner attaches one to the private WS manager (executions -> on_* events, marks
+# from the public ticker cache, equity from services.equity) and publishes it to var/risk_engine.json;
+# other processes read it through shared_risk_engine() (armed entry gate, e2e_sim_live sizing).
+
+SCHEMA_RISK_ENGINE = "risk_engine/v1"
+REFRESH_SEC = float(os.environ.get("RISK_REFRESH_SEC", "2"))
+RESYNC_SEC = float(os.environ.get("RISK_RESYNC_SEC", "60"))
+STATE_MAX_AGE_SEC = float(os.environ.get("RISK_STATE_MAX_AGE_SEC", "30"))
+MARK_MAX_AGE_SEC = float(os.environ.get("RISK_MARK_MAX_AGE_SEC", "60"))
+_CLOSED = ("filled", "canceled", "expired")
+_RELOAD_SEC = 1.0
+
+def state_path(app_path: str) -> str:
+    return os.path.join(app_path, "var", "risk_engine.json")
+
+def _equity_from_service(app_path: Optional[str]) -> Optional[float]:
+    from momentum.services.equity import read_equity_record
+    rec = read_equity_record(app_path or os.environ.get("APP", "."), max_age_s=_opt_float(os.environ.get("EQUITY_MAX_AGE_SEC")))
+    return None if rec is None else float(rec["equity_usd"])
+
+Rule = Callable[[str, float], Optional[str]]    # (symbol, notional) -> reject reason | None
+
+def _opt_float(v: Any) -> Optional[float]:
+    try:
+        return None if v in (None, "") else float(v)
+    except (TypeError, ValueError):
+        return None
+
+@dataclass(frozen=True, slots=True)
+class RiskLimits:
+    entry_max_notional: Optional[float] = 10.0
+    entry_min_notional: Optional[float] = None
+    max_symbol_exposure: Optional[float] = None   # USD per symbol (position + open entries)
+    max_total_exposure: Optional[float] = None    # USD across all symbols
+    max_exposure_pct: Optional[float] = None      # of equity, caps total exposure
+    max_open_orders: Optional[int] = None
+    min_equity: Optional[float] = None
+    one_position_only: bool = True
+    abs_limit_required: bool = True
+    entry_risk_pct: Optional[float] = None        # sizing only
+
+    @classmethod
+    def from_env(cls, app_path: Optional[str] = None) -> "RiskLimits":
+        """Reads .env/.env_meanrev once (risk_sizing + utils.env knobs); the engine never re-reads them."""
+        from momentum.utils.env import load_env_knobs
+        from momentum.utils.risk_sizing import load_knobs_from_env
+        rk = load_knobs_from_env()
+        ek = load_env_knobs(app_path)
+        mo = _opt_float(os.environ.get("RISK_MAX_OPEN_ORDERS"))
+        return cls(
+            entry_max_notional=rk.get("ENTRY_MAX_NOTIONAL") if rk.get("ENTRY_MAX_NOTIONAL") is not None else ek.get("ENTRY_MAX_NOTIONAL"),
+            entry_min_notional=rk.get("ENTRY_MIN_NOTIONAL"),
+            max_symbol_exposure=_opt_float(os.environ.get("RISK_MAX_SYMBOL_EXPOSURE_USD")),
+            max_total_exposure=_opt_float(os.environ.get("RISK_MAX_TOTAL_EXPOSURE_USD")),
+            max_exposure_pct=_opt_float(os.environ.get("RISK_MAX_EXPOSURE_PCT")),
+            max_open_orders=int(mo) if mo is not None else None,
+            min_equity=_opt_float(os.environ.get("RISK_MIN_EQUITY_USD")),
+            one_position_only=bool(ek.get("ONE_POSITION_ONLY", 1)),
+            abs_limit_required=bool(ek.get("ABS_LIMIT_REQUIRED", 1)),
+            entry_risk_pct=rk.get("ENTRY_RISK_PCT"),
+        )
+
+class RiskEngine:
+    """Holds equity, per-symbol/total exposure and open-order counts; evaluates entries against compiled rules.
+
+    State changes only through the on_* events (or sync_book for a bulk load). Rules are rebuilt by
+    _compile() when limits or equity change, so per-intent work is a handful of dict lookups/compares.
+    Exits (sells) are only subject to the abs-limit rule.
+    """
+    def __init__(self, limits: RiskLimits, equity_usd: Optional[float] = None, assets: Optional[AssetIndex] = None):
+        self.limits = limits
+        self.equity = equity_usd
+        self.assets = assets
+        self._syms: Dict[str, str] = {}
+        self.pos_qty: Dict[str, float] = {}
+        self.mark: Dict[str, float] = {}
+        self.open_buy: Dict[str, float] = {}     # remaining notional of open buy orders
+        self.pending: Dict[str, int] = {}        # open buy orders per symbol
+        self.exposure: Dict[str, float] = {}
+        self.total_exposure = 0.0
+        self.open_orders = 0
+        self.checks = 0
+        self.rejects = 0
+        self.asof = 0.0
+        self.app_path: Optional[str] = None
+        self.book = None                                   # attached AccountBook (resync source)
+        self._orders: Dict[str, List[Any]] = {}             # order_id -> [symbol, side, price, remaining qty]
+        self._rules: Tuple[Rule, ...] = ()
+        self._compile()
+
+    @classmethod
+    def from_env(cls, app_path: Optional[str] = None, book=None, marks: Optional[Dict[str, float]] = None) -> "RiskEngine":
+        """One-time load: limits from env files, equity from the equity service (else the equity cache file),
+        exposure from the account book."""
+        from momentum.utils.risk_sizing import load_knobs_from_env, read_equity_usd
+        from momentum.kraken.assets import cached_asset_index
+        eng = cls(RiskLimits.from_env(app_path), assets=cached_asset_index(app_path) if app_path else None)
+        eng.app_path = app_path
+        try:
+            eq = _equity_from_service(app_path)
+            eng.on_equity(eq if eq is not None else read_equity_usd(load_knobs_from_env()))
+        except Exception:
+            pass   # equity unknown: equity-based rules stay off
+        if book is None:
+            from momentum.ws.account import shared_account_book
+            book = shared_account_book(app_path)
+        if book is not None:
+            eng.sync_book(book, marks)
+        return eng
+
+    # ---- compilation ------------------------------------------------------------
+    def _compile(self) -> None:
+        L = self.limits
+        rules: List[Rule] = []
+        if L.min_equity is not None:
+            eq, floor = self.equity, L.min_equity
+            if eq is None or eq < floor:
+                rules.append(lambda s, n, _r=f"equity_below_min:{eq}<{floor}": _r)
+        if L.entry_max_notional is not None:
+            mx = float(L.entry_max_notional)
+            rules.append(lambda s, n: f"entry_max_notional_exceeded:{n:.2f}>{mx}" if n > mx else None)
+        if L.entry_min_notional is not None:
+            mn = float(L.entry_min_notional)
+            rules.append(lambda s, n: f"entry_min_notional:{n:.2f}<{mn}" if n < mn else None)
+        if L.one_position_only:
+            pend, pos = self.pending, self.pos_qty
+            rules.append(lambda s, n: "one_position_only:pending_entry" if pend.get(s) else
+                         ("one_position_only:existing_position" if pos.get(s) else None))
+        if L.max_open_orders is not None:
+            mo = int(L.max_open_orders)
+            rules.append(lambda s, n: f"max_open_orders:{self.open_orders}>={mo}" if self.open_orders >= mo else None)
+        if L.max_symbol_exposure is not None:
+            ms, ex = float(L.max_symbol_exposure), self.exposure
+            rules.append(lambda s, n: f"symbol_exposure:{ex.get(s, 0.0) + n:.2f}>{ms}" if ex.get(s, 0.0) + n > ms else None)
+        cap = L.max_total_exposure
+        if L.max_exposure_pct is not None and self.equity is not None:
+            pct_cap = self.equity * L.max_exposure_pct
+            cap = pct_cap if cap is None else min(cap, pct_cap)
+        if cap is not None:
+            ct = float(cap)
+            rules.append(lambda s, n: f"total_exposure:{self.total_exposure + n:.2f}>{ct:.2f}"
+                         if self.total_exposure + n > ct else None)
+        self._rules = tuple(rules)
+
+    def symbol(self, name: str) -> str:
+        """v2 symbol for any pair name ("XBTUSD", "XBT/USD" -> "BTC/USD"); memoized."""
+        sym = self._syms.get(name)
+        if sym is None:
+            sym = self._syms[name] = v2_symbol(name, self.assets) or name
+        return sym
+
+    # ---- events -----------------------------------------------------------------
+    def _set_exposure(self, symbol: str) -> None:
+        new = self.pos_qty.get(symbol, 0.0) * self.mark.get(symbol, 0.0) + self.open_buy.get(symbol, 0.0)
+        self.total_exposure += new - self.exposure.get(symbol, 0.0)
+        if new:
+            self.exposure[symbol] = new
+        else:
+            self.exposure.pop(symbol, None)
+
+    def on_equity(self, equity_usd: Optional[float]) -> None:
+        self.equity = None if equity_usd is None else float(equity_usd)
+        self._compile()
+
+    def on_limits(self, limits: RiskLimits) -> None:
+        self.limits = limits
+        self._compile()
+
+    def on_mark(self, symbol: str, price: float) -> None:
+        symbol = self.symbol(symbol)
+        self.mark[symbol] = float(price)
+        if symbol in self.pos_qty:
+            self._set_exposure(symbol)
+
+    def on_order_open(self, symbol: str, side: str, qty: float, price: Optional[float]) -> None:
+        symbol = self.symbol(symbol)
+        self.open_orders += 1
+        if side == "buy":
+            self.pending[symbol] = self.pending.get(symbol, 0) + 1
+            self.open_buy[symbol] = self.open_buy.get(symbol, 0.0) + qty * (price or self.mark.get(symbol, 0.0))
+            self._set_exposure(symbol)
+
+    def on_order_closed(self, symbol: str, side: str, remaining_qty: float, price: Optional[float]) -> None:
+        """Order left the book (filled/canceled/expired); remaining_qty is what was still open."""
+        symbol = self.symbol(symbol)
+        self.open_orders = max(0, self.open_orders - 1)
+        if side == "buy":
+            n = self.pending.get(symbol, 0) - 1
+            if n > 0:
+                self.pending[symbol] = n
+            else:
+                self.pending.pop(symbol, None)
+            left = self.open_buy.get(symbol, 0.0) - remaining_qty * (price or self.mark.get(symbol, 0.0))
+            if n > 0 and left > 1e-9:
+                self.open_buy[symbol] = left
+            else:
+                self.open_buy.pop(symbol, None)
+            self._set_exposure(symbol)
+
+    def on_fill(self, symbol: str, side: str, qty: float, price: float) -> None:
+        """Execution: moves notional from the open order into the position (buy) or out of it (sell)."""
+        symbol = self.symbol(symbol)
+        q = self.pos_qty.get(symbol, 0.0) + (qty if side == "buy" else -qty)
+        if q > 1e-12:
+            self.pos_qty[symbol] = q
+        else:
+            self.pos_qty.pop(symbol, None)
+        self.mark.setdefault(symbol, float(price))
+        if side == "buy" and symbol in self.open_buy:
+            left = self.open_buy[symbol] - qty * price
+            if left > 1e-9:
+                self.open_buy[symbol] = left
+            else:
+                self.open_buy.pop(symbol, None)
+        self._set_exposure(symbol)
+
+    def sync_book(self, book, marks: Optional[Dict[str, float]] = None, quote: str = "USD") -> None:
+        """Bulk (re)load from an AccountBook (ws.account): open orders, positions and optional marks.
+
+        Positions are keyed by asset in the book ("XBT"); they are mapped to the pair's v2 symbol."""
+        if marks:
+            self.mark.update({self.symbol(s): p for s, p in marks.items()})
+        self.open_orders = len(book.orders)
+        self.pending = {s: ex.pending_entries for s, ex in book.exposure.items() if ex.pending_entries > 0}
+        self.open_buy = {s: ex.open_buy_notional for s, ex in book.exposure.items() if ex.open_buy_notional > 0}
+        self.pos_qty = {self.symbol(f"{a}{quote}"): p["qty"] for a, p in book.positions().items()}
+        self._orders = {oid: [self.symbol(o.get("symbol") or ""), o.get("side"), o.get("limit_price"),
+                              float(o.get("order_qty") or 0.0) - float(o.get("cum_qty") or 0.0)]
+                        for oid, o in book.orders.items()}
+        self.exposure = {}
+        self.total_exposure = 0.0
+        for s in set(self.pos_qty) | set(self.open_buy):
+            self._set_exposure(s)
+        self._compile()
+
+    # ---- live feed (ws.private.PrivateWSManager consumer) ---------------------------
+    def attach(self, mgr) -> "RiskEngine":
+        """Consume mgr's executions stream (on_message) and run serve() alongside it."""
+        self.book, self.app_path = mgr.book, mgr.app_path
+        mgr.add_consumer(self.on_message, self.serve)
+        return self
+
+    def on_message(self, msg: Dict[str, Any], t_recv: Optional[float] = None) -> None:
+        """Executions rows -> on_order_open / on_fill / on_order_closed. Snapshots resync from the attached
+        book (already updated by the manager); balance deltas mirror the fills and are picked up by the
+        periodic resync in serve()."""
+        ch = msg.get("channel")
+        if ch not in ("executions", "balances"):
+            return
+        if msg.get("type") == "snapshot":
+            if self.book is not None:
+                self.sync_book(self.book, self.mark)
+            return
+        if ch != "executions":
+            return
+        for row in msg.get("data") or []:
+            oid = str(row.get("order_id") or "")
+            o = self._orders.get(oid)
+            status = row.get("order_status")
+            if o is None and row.get("symbol") and row.get("side") and status not in _CLOSED:
+                qty = float(row.get("order_qty") or 0.0) - float(row.get("cum_qty") or 0.0)
+                o = self._orders[oid] = [self.symbol(row["symbol"]), row["side"], row.get("limit_price"), qty]
+                self.on_order_open(o[0], o[1], qty, _opt_float(o[2]))
+            last = float(row.get("last_qty") or 0.0)
+            if row.get("exec_type") == "trade" and last > 0:
+                sym = o[0] if o else self.symbol(row.get("symbol") or "")
+                side = o[1] if o else row.get("side")
+                if sym and side:
+                    self.on_fill(sym, side, last, float(row.get("last_price") or 0.0))
+                if o:
+                    o[3] -= last
+            if status in _CLOSED and o is not None:
+                del self._orders[oid]
+                self.on_order_closed(o[0], o[1], max(0.0, o[3]), _opt_float(o[2]))
+
+    def refresh(self, app_path: Optional[str] = None) -> None:
+        """Marks from the public ticker cache for every held/pending symbol, equity from services.equity."""
+        from momentum.ws.ticker_cache import TickerCache
+        app = app_path or self.app_path or os.environ.get("APP", ".")
+        syms = set(self.pos_qty) | set(self.open_buy)
+        if syms:
+            for s, px in TickerCache.load(app, max_age_s=MARK_MAX_AGE_SEC).mids(syms).items():
+                self.on_mark(s, px)
+        eq = _equity_from_service(app)
+        if eq is not None and eq != self.equity:
+            self.on_equity(eq)
+
+    async def serve(self, stop: asyncio.Event) -> None:
+        """Every RISK_REFRESH_SEC: refresh marks/equity, publish var/risk_engine.json and metrics.d/risk_engine.prom;
+        every RISK_RESYNC_SEC: resync from the attached account book."""
+        from momentum.observability.textfile import write_textfile
+        app = self.app_path or os.environ.get("APP", ".")
+        last_sync = time.monotonic()
+        while not stop.is_set():
+            try:
+                if self.book is not None and time.monotonic() - last_sync >= RESYNC_SEC:
+                    self.sync_book(self.book, self.mark)
+                    last_sync = time.monotonic()
+                self.refresh(app)
+                self.save(app)
+                write_textfile(app, "risk_engine", self.prom_lines())
+            except Exception:
+                pass
+            try:
+                await asyncio.sleep(REFRESH_SEC)
+            except asyncio.CancelledError:
+                break
+
+    # ---- persistence ------------------------------------------------------------
+    def snapshot(self) -> Dict[str, Any]:
+        return {"ts": time.time(), "equity": self.equity, "pos_qty": self.pos_qty, "mark": self.mark,
+                "open_buy": self.open_buy, "pending": self.pending, "open_orders": self.open_orders}
+
+    def save(self, app_path: str) -> None:
+        AtomicJSONWriter(state_path(app_path), schema_version=SCHEMA_RISK_ENGINE, durability="group").write(self.snapshot())
+
+    @classmethod
+    def from_snapshot(cls, d: Dict[str, Any], limits: RiskLimits, assets: Optional[AssetIndex] = None) -> "RiskEngine":
+        eng = cls(limits, _opt_float(d.get("equity")), assets)
+        eng.pos_qty = {s: float(q) for s, q in (d.get("pos_qty") or {}).items()}
+        eng.mark = {s: float(p) for s, p in (d.get("mark") or {}).items()}
+        eng.open_buy = {s: float(n) for s, n in (d.get("open_buy") or {}).items()}
+        eng.pending = {s: int(n) for s, n in (d.get("pending") or {}).items()}
+        eng.open_orders = int(d.get("open_orders") or 0)
+        eng.asof = float(d.get("ts") or 0.0)
+        for s in set(eng.pos_qty) | set(eng.open_buy):
+            eng._set_exposure(s)
+        eng._compile()
+        return eng
+
+    # ---- evaluation -------------------------------------------------------------
+    def check(self, symbol: str, side: str, qty: float, price: Optional[float],
+              order_type: str = "limit") -> Optional[str]:
+        """None when the intent passes, else the first reject reason."""
+        self.checks += 1
+        symbol = self.symbol(symbol)
+        if price is None:
+            if self.limits.abs_limit_required and order_type in LIMIT_ORDER_TYPES:
+                self.rejects += 1
+                return f"abs_limit_required:{order_type}"
+            price = self.mark.get(symbol, 0.0)
+        if side != "buy":
+            return None
+        n = qty * price
+        for rule in self._rules:
+            r = rule(symbol, n)
+            if r is not None:
+                self.rejects += 1
+                return r
+        return None
+
+    def enforce(self, symbol: str, side: str, qty: float, price: Optional[float], order_type: str = "limit") -> None:
+        r = self.check(symbol, side, qty, price, order_type)
+        if r is not None:
+            raise SafetyViolation(f"RISK: {symbol} {r}")
+
+    def evaluate_batch(self, symbols: Sequence[str], prices: Union[float, Sequence[float]],
+                       qtys: Union[float, Sequence[float]], side: str = "buy",
+                       cumulative: bool = False) -> List[Optional[str]]:
+        """Reject reason (or None) per candidate; scalars broadcast. With cumulative=True each accepted
+        candidate is counted against the total-exposure rules of the ones after it."""
+        n = len(symbols)
+        px = [float(prices)] * n if isinstance(prices, (int, float)) else prices
+        qs = [float(qtys)] * n if isinstance(qtys, (int, float)) else qtys
+        out: List[Optional[str]] = []
+        added = 0.0
+        for s, p, q in zip(symbols, px, qs):
+            r = self.check(s, side, q, p)
+            out.append(r)
+            if cumulative and r is None:
+                self.total_exposure += q * p
+                added += q * p
+        self.total_exposure -= added
+        return out
+
+    def feasible(self, symbols: Sequence[str], prices, qtys, side: str = "buy") -> List[str]:
+        return [s for s, r in zip(symbols, self.evaluate_batch(symbols, prices, qtys, side)) if r is None]
+
+    def size_qty(self, limit_price: float) -> Dict[str, Any]:
+        """risk_sizing.compute_qty on the cached equity (no file read per call)."""
+        if self.equity is None:
+            raise RuntimeError("equity unknown: feed on_equity() or provide the equity cache")
+        L = self.limits
+        return compute_qty(limit_price, self.equity, L.entry_risk_pct, L.entry_max_notional, L.entry_min_notional)
+
+    def prom_lines(self) -> List[str]:
+        return [
+            f"momentum_risk_checks_total {self.checks}",
+            f"momentum_risk_rejects_total {self.rejects}",
+            f"momentum_risk_total_exposure_usd {self.total_exposure}",
+            f"momentum_risk_open_orders {self.open_orders}",
+            f"momentum_risk_equity_usd {self.equity if self.equity is not None else 'NaN'}",
+        ]
+
+# ---- process-wide engine ----------------------------------------------------------
+# Limits are read once per process; the published state is re-read only when the live engine rewrites it.
+_shared: Dict[str, Any] = {"path": None, "engine": None, "mtime": None, "checked": -float("inf"), "limits": None}
+
+def shared_risk_engine(app_path: Optional[str] = None, max_age_s: float = STATE_MAX_AGE_SEC) -> Optional[RiskEngine]:
+    """Engine published by ws_private_runner (var/risk_engine.json); None when absent or older than max_age_s."""
+    app = app_path or os.environ.get("APP", ".")
+    path = state_path(app)
+    now = time.monotonic()
+    if path != _shared["path"] or now - _shared["checked"] >= _RELOAD_SEC:
+        _shared["checked"] = now
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if path != _shared["path"] or mtime != _shared["mtime"]:
+            d = read_json(path) if mtime else None
+            eng = None
+            if isinstance(d, dict) and d.get("_schema") == SCHEMA_RISK_ENGINE:
+                from momentum.kraken.assets import cached_asset_index
+                if _shared["limits"] is None or path != _shared["path"]:
+                    _shared["limits"] = RiskLimits.from_env(app)
+                eng = RiskEngine.from_snapshot(d, _shared["limits"], cached_asset_index(app))
+                eng.app_path = app
+            _shared.update(path=path, mtime=mtime, engine=eng)
+    eng = _shared["engine"]
+    return eng if eng is not None and time.time() - eng.asof <= max_age_s else None
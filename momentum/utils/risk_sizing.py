@@ -1,6 +1,7 @@
 
-import os, json, math, asyncio
+import os, json, math, asyncio, time
 from typing import Any, Dict
+from momentum.state import read_cache
 from momentum.utils.dotenv_loader import load_env_files
 
 def _to_float(x, default=None):
@@ -11,9 +12,14 @@ def _to_float(x, default=None):
     except Exception:
         return default
 
+_env_loaded = set()
+
 def load_knobs_from_env() -> Dict[str, Any]:
-    # Ensure .env and .env_meanrev are loaded first
-    load_env_files(os.environ.get("APP", "."))
+    # Ensure .env and .env_meanrev are loaded first (once per process and APP: existing env vars win anyway)
+    app = os.environ.get("APP", ".")
+    if app not in _env_loaded:
+        load_env_files(app)
+        _env_loaded.add(app)
     return {
         "ENTRY_RISK_PCT": _to_float(os.environ.get("ENTRY_RISK_PCT"), None),
         "ENTRY_MAX_NOTIONAL": _to_float(os.environ.get("ENTRY_MAX_NOTIONAL"), None),
@@ -21,6 +27,7 @@ def load_knobs_from_env() -> Dict[str, Any]:
         "EQUITY_SOURCE": os.environ.get("EQUITY_SOURCE", "file"),
         "EQUITY_FILE": os.path.expandvars(os.environ.get("EQUITY_FILE", os.path.join(os.environ.get("APP","."), "var", "account_equity_usd.json"))),
         "ALLOW_BALANCE_REST": os.environ.get("ALLOW_BALANCE_REST", "0") in ("1","true","yes","on","True"),
+        "EQUITY_MAX_AGE_SEC": _to_float(os.environ.get("EQUITY_MAX_AGE_SEC"), None),
     }
 
 def read_equity_usd(knobs: Dict[str, Any]) -> float:
@@ -29,11 +36,20 @@ def read_equity_usd(knobs: Dict[str, Any]) -> float:
         path = knobs.get("EQUITY_FILE")
         if not path or not os.path.isfile(path):
             raise RuntimeError(f"equity file missing: {path!r}. Generate it first (update_equity_cache_ws).")
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = read_cache.load(path, mode="frozen")
         if isinstance(data, dict) and "equity_usd" in data:
+            max_age = knobs.get("EQUITY_MAX_AGE_SEC")
+            # live files (services.equity) carry `asof`; legacy one-shot files have no timestamp
+            if max_age is not None and data.get("asof") is not None and time.time() - float(data["asof"]) > float(max_age):
+                raise RuntimeError(f"equity file stale: asof={data['asof']} older than EQUITY_MAX_AGE_SEC={max_age}")
             return float(data["equity_usd"])
         raise RuntimeError("equity file invalid: expected {'equity_usd': <number>}")
+    elif src == "shm":
+        from momentum.services.equity import read_equity_record  # lazy import
+        rec = read_equity_record(os.environ.get("APP", "."), max_age_s=knobs.get("EQUITY_MAX_AGE_SEC"))
+        if rec is None:
+            raise RuntimeError("no fresh live equity record; is momentum-equity.service running?")
+        return float(rec["equity_usd"])
     elif src == "rest":
         if not knobs.get("ALLOW_BALANCE_REST"):
             raise RuntimeError("REST equity disabled. Set ALLOW_BALANCE_REST=1 to enable.")
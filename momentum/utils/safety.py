@@ -1,7 +1,10 @@
 
 from __future__ import annotations
+import os
 from dataclasses import dataclass
 
+LIMIT_ORDER_TYPES = frozenset(("limit","stop-loss-limit","take-profit-limit","iceberg","trailing-stop-limit"))
+
 @dataclass
 class SafetyKnobs:
     entry_max_notional: float = 10.0
@@ -20,12 +23,38 @@ def enforce_entry_notional(symbol: str, side: str, qty: float, price: float | No
         raise SafetyViolation(f"ENTRY_MAX_NOTIONAL exceeded: {notional:.6f} {quote_ccy} > {knobs.entry_max_notional}")
 
 def enforce_abs_limit(order_type: str, limit_price: float | None, knobs: SafetyKnobs):
-    needs_limit = order_type in ("limit","stop-loss-limit","take-profit-limit","iceberg","trailing-stop-limit")
+    needs_limit = order_type in LIMIT_ORDER_TYPES
     if needs_limit and knobs.abs_limit_required and (limit_price is None):
         raise SafetyViolation(f"ABS_LIMIT_REQUIRED: order_type={order_type} must include explicit limit_price")
 
-def enforce_one_position_only(symbol: str, enabled: int):
-    # Placeholder hook. Integrate with your position tracker to block if symbol already has an open position.
-    # For now this is advisory only.
-    if enabled:
-        return  # no-op here; implement in the executor layer
+def one_position_min_qty() -> float:
+    # balances at or below this are dust, not a position (ONE_POSITION_MIN_QTY, base units)
+    return float(os.environ.get("ONE_POSITION_MIN_QTY", "0"))
+
+def one_position_fail_open() -> bool:
+    # ONE_POSITION_FAIL_OPEN=1: allow entries when no account book can be found (default: block them)
+    return os.environ.get("ONE_POSITION_FAIL_OPEN", "0") == "1"
+
+def enforce_one_position_only(symbol: str, enabled: int, side: str = "buy", book=None, min_qty: float | None = None):
+    # Entries only: blocks a buy when the account book (ws.account) shows a position or a pending entry.
+    # Without a book: the fresh shared (private WS) one, else the reconcile state files under $APP;
+    # with neither the entry is refused unless ONE_POSITION_FAIL_OPEN=1.
+    if not enabled or side != "buy":
+        return
+    if book is None:
+        from momentum.ws.account import book_from_state_files, shared_account_book, state_files_present
+        app = os.environ.get("APP", ".")
+        book = shared_account_book(app)
+        if book is None and state_files_present(app):
+            book = book_from_state_files(app)
+        if book is None:
+            if one_position_fail_open():
+                return
+            raise SafetyViolation(f"ONE_POSITION_ONLY: no account book for {symbol} (private WS book stale, "
+                                  f"no reconcile state files); set ONE_POSITION_FAIL_OPEN=1 to allow")
+    if min_qty is None:
+        min_qty = one_position_min_qty()
+    if book.has_position(symbol, min_qty):
+        raise SafetyViolation(f"ONE_POSITION_ONLY: {symbol} has an open position ({book.position_qty(symbol)})")
+    if book.has_pending_entry(symbol):
+        raise SafetyViolation(f"ONE_POSITION_ONLY: {symbol} has a pending entry order")
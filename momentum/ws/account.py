@@ -0,0 +1,397 @@
+from __future__ import annotations
+import os, time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterable, List, Optional
+
+from ..kraken.assets import AssetIndex, cached_asset_index, v2_symbol
+from ..state.atomic_json import AtomicJSONWriter, read_json
+
+SCHEMA_ACCOUNT_BOOK = "account_book/v1"
+CLOSED_STATUSES = frozenset(("filled", "canceled", "expired"))
+_ORDER_FIELDS = ("symbol", "side", "order_type", "order_qty", "limit_price", "cl_ord_id", "order_userref",
+                 "order_status", "cum_qty", "avg_price", "time_in_force", "timestamp")
+QUOTE_ASSETS = frozenset(("USD", "ZUSD"))
+DUST = 1e-12
+CLOSED_CLIDS_KEEP = 4096    # recently closed cl_ord_ids remembered (order hand-off dedupe, orders.armed)
+# v2 symbols use BTC/DOGE, REST balances may still report the legacy codes
+_ASSET_ALIASES = {"BTC": ("XBT", "XXBT"), "DOGE": ("XDG", "XXDG")}
+_RELOAD_SEC = 1.0
+
+def book_path(app_path: str) -> str:
+    return os.path.join(app_path, "var", "account_book.json")
+
+def _f(x: Any) -> float:
+    try:
+        return float(x)
+    except (TypeError, ValueError):
+        return 0.0
+
+def base_asset(symbol: str) -> str:
+    return symbol.split("/", 1)[0]
+
+@dataclass(slots=True)
+class SymbolExposure:
+    """Aggregates over the open orders of one symbol (remaining qty = order_qty - cum_qty)."""
+    open_buy_qty: float = 0.0
+    open_buy_notional: float = 0.0
+    open_sell_qty: float = 0.0
+    pending_entries: int = 0     # open buy orders
+
+    def add(self, row: Dict[str, Any], sign: int) -> None:
+        rem = max(0.0, _f(row.get("order_qty")) - _f(row.get("cum_qty")))
+        if row.get("side") == "buy":
+            self.open_buy_qty += sign * rem
+            self.open_buy_notional += sign * rem * _f(row.get("limit_price"))
+            self.pending_entries += sign
+        elif row.get("side") == "sell":
+            self.open_sell_qty += sign * rem
+
+class AccountBook:
+    """In-memory account state from the WS v2 private `executions` and `balances` channels.
+
+    orders:   open orders by order_id (snapshot replaces, updates merge; filled/canceled/expired drop out)
+    closed_clids: cl_ord_id -> final status of the last CLOSED_CLIDS_KEEP orders that left the book
+    balances: asset -> balance (the `balance` field of snapshot and ledger update rows)
+    opened_at: asset -> first time its balance went from zero to non-zero (spot "position age")
+
+    Orders are indexed by cl_ord_id and symbol, with per-symbol SymbolExposure kept incrementally,
+    so the pre-trade guards (has_position / has_pending_entry / exposure) are dict lookups.
+
+    With `journal` set (state.journal.EventJournal) every applied input is appended to it first
+    (executions / balances rows, REST reconcile results) and `journal_seq` tracks the last one;
+    snapshots carry that seq, so recover_account_book() = last snapshot + replay of the journal tail.
+
+    Symbols are kept as WS v2 symbols ("BTC/USD"): REST-shaped orders (reconcile, state files) are
+    renamed from their pair key/altname through `assets` (kraken.assets), and lookups accept either.
+    """
+    def __init__(self, assets: Optional[AssetIndex] = None):
+        self.assets = assets
+        self._syms: Dict[str, Optional[str]] = {}
+        self.orders: Dict[str, Dict[str, Any]] = {}
+        self.by_clid: Dict[str, str] = {}
+        self.closed_clids: Dict[str, str] = {}
+        self.by_symbol: Dict[str, Dict[str, None]] = {}   # symbol -> ordered set of order_ids
+        self.exposure: Dict[str, SymbolExposure] = {}
+        self.balances: Dict[str, float] = {}
+        self.opened_at: Dict[str, Optional[float]] = {}
+        self.fills: Deque[Dict[str, Any]] = deque(maxlen=256)
+        self.last_exec_id: Optional[str] = None
+        self.seq: Dict[str, int] = {}
+        self.gaps = 0
+        self.updated_ts = 0.0
+        self.live = False   # set by the stream owner while subscribed: the book is current even without traffic
+        self.source = "rest"
+        self.dirty = False
+        self.journal = None
+        self.journal_seq = 0
+
+    def _journal(self, kind: str, data: Dict[str, Any], t: float) -> None:
+        if self.journal is not None:
+            self.journal_seq = self.journal.append(kind, data, t)
+
+    # ---- stream input ---------------------------------------------------------
+    def on_message(self, msg: Dict[str, Any]) -> bool:
+        """Apply one channel message; returns False on a sequence gap (caller should resubscribe)."""
+        ch = msg.get("channel")
+        if ch not in ("executions", "balances"):
+            return True
+        ok = True
+        seq = msg.get("sequence")
+        if seq is not None:
+            prev = self.seq.get(ch)
+            if msg.get("type") != "snapshot" and prev is not None and seq != prev + 1:
+                self.gaps += 1
+                ok = False
+            self.seq[ch] = seq
+        now = time.time()
+        snap = msg.get("type") == "snapshot"
+        data = msg.get("data") or []
+        self._journal(ch, {"snapshot": snap, "rows": data}, now)
+        self._apply_channel(ch, snap, data, now)
+        return ok
+
+    def _apply_channel(self, ch: str, snap: bool, data: List[Dict[str, Any]], now: float) -> None:
+        if ch == "executions":
+            if snap:
+                self.set_orders({})
+            for e in data:
+                self.apply_execution(e)
+        else:
+            self.apply_balances(data, snapshot=snap, now=now)
+        self.updated_ts = now
+        self.source = "ws"
+        self.dirty = True
+
+    def apply_event(self, rec: Dict[str, Any]) -> None:
+        """Replay one journal record (see _journal); uses the recorded time, never the clock."""
+        d, t = rec["d"], rec["t"]
+        if rec["k"] in ("executions", "balances"):
+            self._apply_channel(rec["k"], d.get("snapshot", False), d.get("rows") or [], t)
+        elif rec["k"] == "reconcile":
+            self._apply_reconcile(d.get("open_orders") or {}, d.get("positions") or {}, t)
+        self.journal_seq = rec["n"]
+
+    def apply_execution(self, e: Dict[str, Any]) -> None:
+        oid = e.get("order_id")
+        if not oid:
+            return
+        if e.get("exec_type") == "trade":
+            self.fills.append({k: e.get(k) for k in ("exec_id", "order_id", "cl_ord_id", "symbol", "side",
+                                                     "last_qty", "last_price", "timestamp")})
+            self.last_exec_id = e.get("exec_id") or self.last_exec_id
+        status = e.get("order_status") or e.get("exec_type")
+        row = self.orders.get(oid)
+        if row is not None:
+            self._unindex(row)
+        if status in CLOSED_STATUSES:
+            self.orders.pop(oid, None)
+            clid = e.get("cl_ord_id") or (row or {}).get("cl_ord_id")
+            if clid:
+                self.closed_clids.pop(clid, None)
+                self.closed_clids[clid] = status
+                if len(self.closed_clids) > CLOSED_CLIDS_KEEP:
+                    del self.closed_clids[next(iter(self.closed_clids))]
+            return
+        if row is None:
+            row = self.orders[oid] = {"order_id": oid}
+        for k in _ORDER_FIELDS:
+            if e.get(k) is not None:
+                row[k] = e[k]
+        self._index(row)
+
+    # ---- indexes --------------------------------------------------------------
+    def _index(self, row: Dict[str, Any]) -> None:
+        oid, sym, clid = row["order_id"], row.get("symbol"), row.get("cl_ord_id")
+        if clid:
+            self.by_clid[clid] = oid
+        if sym:
+            self.by_symbol.setdefault(sym, {})[oid] = None
+            ex = self.exposure.get(sym)
+            if ex is None:
+                ex = self.exposure[sym] = SymbolExposure()
+            ex.add(row, 1)
+
+    def _unindex(self, row: Dict[str, Any]) -> None:
+        oid, sym, clid = row["order_id"], row.get("symbol"), row.get("cl_ord_id")
+        if clid and self.by_clid.get(clid) == oid:
+            del self.by_clid[clid]
+        if sym and sym in self.by_symbol:
+            ids = self.by_symbol[sym]
+            ids.pop(oid, None)
+            ex = self.exposure[sym]
+            ex.add(row, -1)
+            if not ids:
+                del self.by_symbol[sym]; del self.exposure[sym]
+
+    def symbol(self, name: Optional[str]) -> Optional[str]:
+        """v2 symbol for any pair name ("XBTUSD", "XXBTZUSD", "XBT/USD" -> "BTC/USD"); memoized."""
+        sym = self._syms.get(name) if name else name
+        if sym is None and name:
+            sym = self._syms[name] = v2_symbol(name, self.assets)
+        return sym
+
+    def set_orders(self, orders: Dict[str, Dict[str, Any]]) -> None:
+        """Replace all open orders and rebuild the indexes (snapshots, reconciliation, loading)."""
+        self.orders, self.by_clid, self.by_symbol, self.exposure = {}, {}, {}, {}
+        for oid, row in orders.items():
+            row = dict(row); row["order_id"] = oid
+            if row.get("symbol"):
+                row["symbol"] = self.symbol(row["symbol"])
+            self.orders[oid] = row
+            self._index(row)
+
+    def apply_reconcile(self, open_orders: Dict[str, Dict[str, Any]], positions: Dict[str, Any]) -> None:
+        """Fold a REST reconciliation result (services.reconciliation normalized shapes) into the book."""
+        now = time.time()
+        self._journal("reconcile", {"open_orders": open_orders, "positions": positions}, now)
+        self._apply_reconcile(open_orders, positions, now)
+
+    def _apply_reconcile(self, open_orders: Dict[str, Dict[str, Any]], positions: Dict[str, Any], now: float) -> None:
+        self.set_orders({txid: {"symbol": od.get("pair"), "side": od.get("type"), "order_type": od.get("ordertype"),
+                                "order_qty": _f(od.get("vol")), "cum_qty": _f(od.get("vol_exec")),
+                                "limit_price": _f(od.get("price")), "cl_ord_id": od.get("cl_ord_id"),
+                                "order_userref": od.get("userref"), "order_status": od.get("status", "open")}
+                         for txid, od in open_orders.items()})
+        pos = positions.get("positions", positions) if isinstance(positions, dict) else {}
+        rows = [{"asset": a, "balance": (p.get("qty") if isinstance(p, dict) else p)} for a, p in pos.items()]
+        rows += [{"asset": a, "balance": b} for a, b in self.balances.items() if a in QUOTE_ASSETS]
+        self.apply_balances(rows, snapshot=True, now=now)
+        self.source = "rest"
+        self.updated_ts = now
+        self.dirty = True
+
+    def apply_balances(self, rows: List[Dict[str, Any]], snapshot: bool = False, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        if snapshot:
+            keep = {a: t for a, t in self.opened_at.items()}
+            self.balances = {}
+            self.opened_at = {}
+        for r in rows:
+            asset = r.get("asset")
+            if not asset or "balance" not in r:
+                continue
+            bal = _f(r["balance"])
+            was = abs(self.balances.get(asset, 0.0)) > DUST
+            self.balances[asset] = bal
+            if abs(bal) <= DUST:
+                self.opened_at.pop(asset, None)
+            elif snapshot:
+                self.opened_at[asset] = keep.get(asset)   # age unknown unless carried over from a previous snapshot
+            elif not was:
+                self.opened_at[asset] = now
+
+    # ---- consumer views -------------------------------------------------------
+    def order(self, order_id: str) -> Optional[Dict[str, Any]]:
+        return self.orders.get(order_id)
+
+    def order_by_clid(self, cl_ord_id: str) -> Optional[Dict[str, Any]]:
+        oid = self.by_clid.get(cl_ord_id)
+        return self.orders.get(oid) if oid is not None else None
+
+    def knows_clid(self, cl_ord_id: str) -> bool:
+        """The exchange has seen this cl_ord_id: open now, or closed recently (see closed_clids)."""
+        return cl_ord_id in self.by_clid or cl_ord_id in self.closed_clids
+
+    def open_orders(self, symbol: Optional[str] = None, side: Optional[str] = None) -> List[Dict[str, Any]]:
+        ids: Iterable[str] = self.orders if symbol is None else self.by_symbol.get(self.symbol(symbol), ())
+        return [self.orders[i] for i in ids if side is None or self.orders[i].get("side") == side]
+
+    def symbol_exposure(self, symbol: str) -> SymbolExposure:
+        return self.exposure.get(self.symbol(symbol)) or SymbolExposure()
+
+    def position_qty(self, symbol: str) -> float:
+        base = base_asset(self.symbol(symbol))
+        q = self.balances.get(base)
+        if q is None:
+            for alias in _ASSET_ALIASES.get(base, ()):
+                if alias in self.balances:
+                    return self.balances[alias]
+            return 0.0
+        return q
+
+    def has_position(self, symbol: str, min_qty: float = DUST) -> bool:
+        return abs(self.position_qty(symbol)) > min_qty
+
+    def has_pending_entry(self, symbol: str) -> bool:
+        ex = self.exposure.get(self.symbol(symbol))
+        return ex is not None and ex.pending_entries > 0
+
+    def positions(self) -> Dict[str, Dict[str, Any]]:
+        """Non-quote assets with a balance, keyed by asset (same keying as reconciliation's positions.json)."""
+        return {a: {"qty": b, "opened_at": self.opened_at.get(a)}
+                for a, b in self.balances.items() if a not in QUOTE_ASSETS and abs(b) > DUST}
+
+    def asof(self) -> float:
+        return time.time() if self.live else self.updated_ts
+
+    def age(self) -> float:
+        t = self.asof()
+        return time.time() - t if t else float("inf")
+
+    # ---- persistence ----------------------------------------------------------
+    def snapshot(self) -> Dict[str, Any]:
+        return {"ts": self.asof(), "source": "ws" if self.live else self.source, "orders": self.orders, "balances": self.balances,
+                "opened_at": self.opened_at, "closed_clids": self.closed_clids,
+                "last_exec_id": self.last_exec_id, "seq": self.seq,
+                "journal_seq": self.journal_seq}
+
+    def save(self, app_path: str) -> None:
+        # group: frequent rewrites coalesce; the journal (if on) is the durable record
+        AtomicJSONWriter(book_path(app_path), schema_version=SCHEMA_ACCOUNT_BOOK, durability="group").write(self.snapshot())
+        self.dirty = False
+
+    @classmethod
+    def from_snapshot(cls, d: Dict[str, Any], assets: Optional[AssetIndex] = None) -> "AccountBook":
+        b = cls(assets)
+        b.set_orders(d.get("orders") or {})
+        b.balances = {k: _f(v) for k, v in (d.get("balances") or {}).items()}
+        b.opened_at = dict(d.get("opened_at") or {})
+        b.closed_clids = dict(d.get("closed_clids") or {})
+        b.last_exec_id = d.get("last_exec_id")
+        b.updated_ts = _f(d.get("ts"))
+        b.source = d.get("source") or "rest"
+        b.journal_seq = int(d.get("journal_seq") or 0)
+        return b
+
+def load_account_book(app_path: str, max_age_s: float = 30.0) -> Optional[AccountBook]:
+    """Persisted book written by the private WS manager; None when absent or older than max_age_s."""
+    d = read_json(book_path(app_path))
+    if not isinstance(d, dict) or d.get("_schema") != SCHEMA_ACCOUNT_BOOK:
+        return None
+    b = AccountBook.from_snapshot(d, cached_asset_index(app_path))
+    return b if b.age() <= max_age_s else None
+
+def recover_account_book(app_path: str, journal) -> AccountBook:
+    """Last persisted snapshot (any age) + every journal record after its journal_seq; attaches the journal.
+
+    Work is bounded by the events since the last snapshot, not by total history."""
+    d = read_json(book_path(app_path))
+    assets = cached_asset_index(app_path)
+    b = AccountBook.from_snapshot(d, assets) if isinstance(d, dict) and d.get("_schema") == SCHEMA_ACCOUNT_BOOK else AccountBook(assets)
+    if b.journal_seq > journal.n:        # journal lost or reset: the snapshot is all there is
+        b.journal_seq = journal.n
+    replayed = 0
+    for rec in journal.replay(after=b.journal_seq):
+        b.apply_event(rec)
+        replayed += 1
+    b.dirty = replayed > 0
+    b.journal = journal
+    return b
+
+def state_files_present(app_path: str) -> bool:
+    var = os.path.join(app_path, "var")
+    return any(os.path.exists(os.path.join(var, f)) for f in ("open_orders_state.json", "positions.json"))
+
+def book_from_state_files(app_path: str) -> AccountBook:
+    """One-time build from the REST reconcile files (open_orders_state.json list/dict, positions.json)."""
+    var = os.path.join(app_path, "var")
+    oo = read_json(os.path.join(var, "open_orders_state.json"))
+    if isinstance(oo, dict):
+        oo = oo.get("open") or oo.get("orders") or {k: v for k, v in oo.items() if k != "_schema"}
+    items = list(oo.items()) if isinstance(oo, dict) else list(enumerate(oo)) if isinstance(oo, list) else []
+    orders: Dict[str, Dict[str, Any]] = {}
+    for key, od in items:
+        if not isinstance(od, dict) or od.get("status", "open") != "open":
+            continue
+        oid = str(od.get("order_id") or od.get("txid") or key)
+        orders[oid] = {"symbol": od.get("symbol") or od.get("pair"), "side": od.get("side") or od.get("type"),
+                       "order_qty": _f(od.get("order_qty") or od.get("vol") or od.get("qty")),
+                       "cum_qty": _f(od.get("cum_qty") or od.get("vol_exec")),
+                       "limit_price": _f(od.get("limit_price") or od.get("price")), "cl_ord_id": od.get("cl_ord_id")}
+    b = AccountBook(cached_asset_index(app_path))
+    b.set_orders(orders)
+    pos = read_json(os.path.join(var, "positions.json"))
+    pos = pos.get("positions", pos) if isinstance(pos, dict) else {}
+    for k, p in pos.items():
+        if not isinstance(p, dict):
+            continue
+        q = _f(p.get("net_base", p.get("qty")))
+        if q:
+            b.balances[base_asset(k)] = q
+            b.opened_at[base_asset(k)] = p.get("opened_at")
+    b.updated_ts = time.time()
+    return b
+
+# ---- process-wide book ----------------------------------------------------------
+# Loaded once per process and re-read only when the stream owner rewrites account_book.json.
+_shared: Dict[str, Any] = {"path": None, "book": None, "mtime": None, "checked": -float("inf")}
+
+def shared_account_book(app_path: Optional[str] = None, max_age_s: float = 30.0) -> Optional[AccountBook]:
+    path = book_path(app_path or os.environ.get("APP", "."))
+    now = time.monotonic()
+    if path != _shared["path"] or now - _shared["checked"] >= _RELOAD_SEC:
+        _shared["checked"] = now
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if path != _shared["path"] or mtime != _shared["mtime"]:
+            _shared.update(path=path, mtime=mtime,
+                           book=load_account_book(os.path.dirname(os.path.dirname(path)), float("inf")) if mtime else None)
+    b = _shared["book"]
+    return b if b is not None and b.age() <= max_age_s else None
+
+def account_book_for(app_path: str, max_age_s: float = 30.0) -> AccountBook:
+    """Live streamed book when fresh, otherwise a one-time build from the reconcile state files."""
+    return shared_account_book(app_path, max_age_s) or book_from_state_files(app_path)
@@ -1,21 +1,59 @@
-import asyncio, os, time
-from typing import Optional
+import asyncio, json, os, time
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from .account import AccountBook, load_account_book, recover_account_book
+from ..kraken.assets import cached_asset_index
+from ..state import read_cache
+from ..state.atomic_json import flush_pending
+from ..util.backoff import exp_backoff
 
 DEFAULT_INTERVAL = int(os.environ.get("PRIVATE_HB_INTERVAL_SEC", "5"))
+SNAPSHOT_INTERVAL = float(os.environ.get("ACCOUNT_SNAPSHOT_SEC", "5"))
+SNAPSHOT_KEEPALIVE = float(os.environ.get("ACCOUNT_SNAPSHOT_KEEPALIVE_SEC", "15"))
+JOURNAL = os.environ.get("ACCOUNT_JOURNAL", "0") == "1"
+WS_AUTH_URL = "wss://ws-auth.kraken.com/v2"
 
 class PrivateWSManager:
     """
-    Minimal-yet-correct private WS manager shell.
+    Private WS manager.
     - Keeps the service alive with an async runner.
     - Periodically updates var/private_ws_hb.txt to reflect liveness.
-    - Designed to be extended with real auth/streams later without API breakage.
+    - With API credentials: subscribes to v2 `executions` (open-order snapshot) and `balances`, applies
+      snapshots/deltas to an in-memory AccountBook (self.book) and persists var/account_book.json at a
+      low cadence (only when changed, or every ACCOUNT_SNAPSHOT_KEEPALIVE_SEC to refresh its timestamp).
+    - ACCOUNT_JOURNAL=1: every applied event is also appended to var/journal/account (state.journal);
+      startup recovers snapshot + journal tail, and each snapshot compacts the segments it covers.
     """
-    def __init__(self, app_path: Optional[str], flush_interval: Optional[float] = None):
+    def __init__(self, app_path: Optional[str], flush_interval: Optional[float] = None, streams: Optional[bool] = None,
+                 channels: Tuple[str, ...] = ("executions", "balances"), journal: Optional[bool] = None):
         self.app_path = app_path or os.environ.get("APP", ".")
         self.flush_interval = float(flush_interval if flush_interval is not None else DEFAULT_INTERVAL)
         self._hb_path = os.path.join(self.app_path, "var", "private_ws_hb.txt")
         self._tasks = set()
         self._stopping = asyncio.Event()
+        self.streams = bool(os.getenv("KRAKEN_KEY") and os.getenv("KRAKEN_SECRET")) if streams is None else streams
+        self.channels = tuple(channels)
+        # warm start from the last persisted book (keeps position opened_at across restarts)
+        self.journal = None
+        if JOURNAL if journal is None else journal:
+            from ..state.journal import EventJournal
+            self.journal = EventJournal(os.path.join(self.app_path, "var", "journal", "account"))
+            self.book = recover_account_book(self.app_path, self.journal)
+        else:
+            self.book = load_account_book(self.app_path, max_age_s=float("inf")) or AccountBook(cached_asset_index(self.app_path))
+        self.book.live = False
+        self.reconnects = 0
+        self.messages = 0
+        self.listeners: List[Callable[[dict, float], Any]] = []   # fn(msg, t_recv) after the book update
+        self._consumers: List[Callable[[asyncio.Event], Awaitable[None]]] = []
+
+    def add_consumer(self, on_message: Callable[[dict, float], Any],
+                     task: Optional[Callable[[asyncio.Event], Awaitable[None]]] = None) -> None:
+        """Tap the account streams: on_message gets every decoded message (must not block); task(stop)
+        runs alongside the streams, e.g. services.trade_events.TradeEventEngine.serve."""
+        self.listeners.append(on_message)
+        if task is not None:
+            self._consumers.append(task)
 
     async def _heartbeat_writer(self):
         """Write epoch seconds to private heartbeat file at a fixed cadence."""
@@ -32,16 +70,124 @@ class PrivateWSManager:
             except asyncio.CancelledError:
                 break
 
+    async def _consume(self, ws) -> None:
+        """Feed channel messages into the book until the socket closes or a sequence gap forces a resubscribe."""
+        import aiohttp
+        while not self._stopping.is_set():
+            msg = await ws.receive()
+            t_recv = time.perf_counter()
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                if msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING,
+                                aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                    return
+                continue
+            try:
+                data = json.loads(msg.data)
+            except Exception:
+                continue
+            self.messages += 1
+            if data.get("channel") in ("executions", "balances") and data.get("type") == "snapshot":
+                self.book.live = True
+            ok = self.book.on_message(data)
+            for cb in self.listeners:
+                try:
+                    cb(data, t_recv)
+                except Exception:
+                    pass
+            if not ok:
+                return
+
+    async def _stream(self):
+        import aiohttp
+        from ..kraken.rest_client import KrakenREST
+        attempt = 0
+        while not self._stopping.is_set():
+            try:
+                async with aiohttp.ClientSession() as sess:
+                    token = (await KrakenREST(session=sess)._post_private("GetWebSocketsToken", {}))["token"]
+                    async with sess.ws_connect(WS_AUTH_URL, heartbeat=15) as ws:
+                        if "executions" in self.channels:
+                            await ws.send_str(json.dumps({"method": "subscribe", "params": {
+                                "channel": "executions", "token": token, "snap_orders": True, "snap_trades": False}}))
+                        if "balances" in self.channels:
+                            await ws.send_str(json.dumps({"method": "subscribe", "params": {
+                                "channel": "balances", "token": token, "snapshot": True}}))
+                        attempt = 0
+                        await self._consume(ws)
+            except asyncio.CancelledError:
+                break
+            except Exception:
+                pass
+            self.book.live = False
+            self.book.seq.clear()
+            if self._stopping.is_set():
+                break
+            attempt += 1
+            self.reconnects += 1
+            try:
+                await asyncio.sleep(exp_backoff(attempt))
+            except asyncio.CancelledError:
+                break
+
+    async def _journal_syncer(self):
+        """Bound the unsynced journal tail to ~fsync_s when a burst ends between appends."""
+        while not self._stopping.is_set():
+            try:
+                self.journal.sync()
+            except Exception:
+                pass
+            try:
+                await asyncio.sleep(max(self.journal.fsync_s, 0.01))
+            except asyncio.CancelledError:
+                break
+
+    async def _snapshot_writer(self):
+        from ..observability.textfile import write_textfile
+        last_save = 0.0
+        saved_seq = 0
+        while not self._stopping.is_set():
+            try:
+                if self.book.dirty or (self.book.live and time.time() - last_save >= SNAPSHOT_KEEPALIVE):
+                    if self.journal is not None:
+                        self.journal.sync()      # the snapshot must never be ahead of the durable journal
+                    self.book.save(self.app_path)
+                    last_save = time.time()
+                    if self.journal is not None:
+                        # the snapshot is group-committed: only trust the previous one to be on disk
+                        self.journal.compact(saved_seq)
+                        saved_seq = self.book.journal_seq
+                write_textfile(self.app_path, "account_ws", [
+                    f"momentum_account_ws_live {1 if self.book.live else 0}",
+                    f"momentum_account_ws_messages_total {self.messages}",
+                    f"momentum_account_ws_reconnects_total {self.reconnects}",
+                    f"momentum_account_ws_sequence_gaps_total {self.book.gaps}",
+                    f"momentum_account_open_orders {len(self.book.orders)}",
+                    f"momentum_account_book_age_seconds {self.book.age() if self.book.updated_ts else 'NaN'}",
+                    *([f"momentum_account_journal_seq {self.journal.n}",
+                       f"momentum_account_journal_fsyncs_total {self.journal.fsyncs}"] if self.journal is not None else []),
+                ])
+                read_cache.export(self.app_path, "private_ws")
+            except Exception:
+                pass
+            try:
+                await asyncio.sleep(SNAPSHOT_INTERVAL)
+            except asyncio.CancelledError:
+                break
+
     async def run(self):
         """
-        Start background tasks (currently heartbeat). Extend here with:
-        - WS auth token retrieval
-        - account streams subscribe
-        - message receiver & persistence
+        Start background tasks: heartbeat, and with credentials the account streams + snapshot writer.
         """
         try:
             t_hb = asyncio.create_task(self._heartbeat_writer(), name="private_hb_writer")
             self._tasks.add(t_hb)
+            if self.streams:
+                self._tasks.add(asyncio.create_task(self._stream(), name="private_account_stream"))
+                self._tasks.add(asyncio.create_task(self._snapshot_writer(), name="private_snapshot_writer"))
+                if self.journal is not None:
+                    self._tasks.add(asyncio.create_task(self._journal_syncer(), name="private_journal_syncer"))
+                for task in self._consumers:
+                    self._tasks.add(asyncio.create_task(task(self._stopping)))
             await asyncio.gather(*self._tasks)
         finally:
             self._stopping.set()
@@ -49,3 +195,14 @@ class PrivateWSManager:
                 t.cancel()
             if self._tasks:
                 await asyncio.gather(*self._tasks, return_exceptions=True)
+            if self.streams and self.book.updated_ts:
+                self.book.live = False
+                try:
+                    if self.journal is not None:
+                        self.journal.sync()
+                    self.book.save(self.app_path)
+                except Exception:
+                    pass
+            if self.journal is not None:
+                self.journal.close()
+            flush_pending()
@@ -4,12 +4,19 @@ import json
 import asyncio
 import random
 import time
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
 import websockets
 
+from .ticker_cache import TickerCache
+from ..state import codec
+from ..state.warm_start import CHECKPOINT_SEC, WarmStart
+
 DEFAULT_WS_V2 = os.environ.get("KRAKEN_WS_V2_URL", "wss://ws.kraken.com/v2")
 DEFAULT_WS_V1 = os.environ.get("KRAKEN_WS_V1_URL", "wss://ws.kraken.com/")
+WARM_VERSION = 1
+WARM_TICKER_MAX_AGE_SEC = float(os.environ.get("WARM_TICKER_MAX_AGE_SEC", "60"))
+WARM_UNIVERSE_MAX_AGE_SEC = float(os.environ.get("WARM_UNIVERSE_MAX_AGE_SEC", "86400"))
 
 def _exp_backoff_with_jitter(attempt: int, base: float = 1.0, cap: float = 300.0) -> float:
     return random.uniform(0.0, min(cap, base * (2 ** attempt)))
@@ -17,8 +24,8 @@ def _exp_backoff_with_jitter(attempt: int, base: float = 1.0, cap: float = 300.0
 def load_universe_pairs(app_path: Optional[str], limit: int) -> List[str]:
     app_path = app_path or os.environ.get("APP", ".")
     path = os.path.join(app_path, "var", "universe.json")
-    with open(path, "r") as f:
-        data = json.load(f)
+    with open(path, "rb") as f:
+        data = codec.loads(f.read())
     pairs = [u["pair"] for u in data.get("universe", [])]
     if limit and limit > 0:
         pairs = pairs[:limit]
@@ -33,12 +40,55 @@ class PublicWSManager:
         self.v2_url = os.environ.get("KRAKEN_WS_V2_URL", DEFAULT_WS_V2)
         self.v1_url = os.environ.get("KRAKEN_WS_V1_URL", DEFAULT_WS_V1)
         self.channel = os.environ.get("WS_PUBLIC_CHANNEL", "ticker")
+        self.tickers = TickerCache()   # v2 ticker rows, persisted to var/ticker_cache.json for marks
+        self.ticker_flush_s = float(os.environ.get("TICKER_CACHE_FLUSH_SEC", "2"))
+        self.warm_batch_size = int(os.environ.get("WS_WARM_BATCH_SIZE", "50"))
+        self.warm = WarmStart(self.app_path, "ws_public", version=WARM_VERSION)
+        self.subscribed: set = set()   # symbols the exchange acked a subscription for
+        self.confirmed: set = set()    # ... restored from the last run: safe to subscribe without pacing
+        self.pairs: List[str] = []
+        self.started_ts = time.time()
+        self.ready_ts: Optional[float] = None
+
+    def restore(self) -> List[str]:
+        """Pairs to stream plus warm state: fresh ticker rows, last universe, previously acked symbols."""
+        self.tickers = TickerCache.load(self.app_path, max_age_s=WARM_TICKER_MAX_AGE_SEC)
+        try:
+            pairs = load_universe_pairs(self.app_path, self.ws_symbol_limit)
+        except (OSError, ValueError, KeyError):
+            pairs = list(self.warm.get("universe", WARM_UNIVERSE_MAX_AGE_SEC) or [])[:self.ws_symbol_limit or None]
+            if not pairs:
+                raise
+        self.confirmed = set(self.warm.get("subscribed", WARM_UNIVERSE_MAX_AGE_SEC) or ())
+        self.pairs = pairs
+        self._check_ready()
+        return pairs
+
+    def _check_ready(self) -> None:
+        # ready = a usable mark for every streamed pair (restored or live)
+        if self.ready_ts is None and self.pairs and len(self.tickers.mids(self.pairs, WARM_TICKER_MAX_AGE_SEC)) == len(self.pairs):
+            self.ready_ts = time.time()
+
+    def checkpoint(self, durability: str = "group") -> None:
+        self.warm.put("universe", list(self.pairs))
+        self.warm.put("subscribed", sorted(self.subscribed | (self.confirmed & set(self.pairs))))
+        try:
+            self.warm.save(durability)
+            if self.tickers.dirty or durability == "strict":
+                self.tickers.save(self.app_path)
+            from ..observability.textfile import write_textfile
+            write_textfile(self.app_path, "warm_start_ws_public", self.warm.prom_lines(self.started_ts, self.ready_ts))
+        except Exception:
+            pass
 
     async def run(self) -> None:
-        pairs = load_universe_pairs(self.app_path, self.ws_symbol_limit)
-        ok = await self._connect_and_stream(self.v2_url, pairs, version=2)
-        if not ok:
-            await self._connect_and_stream(self.v1_url, pairs, version=1)
+        pairs = self.restore()
+        try:
+            ok = await self._connect_and_stream(self.v2_url, pairs, version=2)
+            if not ok:
+                await self._connect_and_stream(self.v1_url, pairs, version=1)
+        finally:
+            self.checkpoint("strict")
 
     async def _connect_and_stream(self, url: str, pairs: List[str], version: int) -> bool:
         attempt = 0
@@ -61,6 +111,20 @@ class PublicWSManager:
                                 pass
                             await asyncio.sleep(5)  # write every 5s regardless of traffic
 
+                    async def ticker_flusher():
+                        last_checkpoint = time.time()
+                        while True:
+                            await asyncio.sleep(self.ticker_flush_s)
+                            self._check_ready()
+                            if self.tickers.dirty:
+                                try:
+                                    self.tickers.save(self.app_path)
+                                except Exception:
+                                    pass
+                            if time.time() - last_checkpoint >= CHECKPOINT_SEC:
+                                self.checkpoint()
+                                last_checkpoint = time.time()
+
                     async def receiver():
                         while True:
                             msg = await ws.recv()
@@ -68,12 +132,21 @@ class PublicWSManager:
                             msg_counter["last_ts"] = int(time.time())
                             # append compact JSON to log (bounded size rotation could be added later)
                             try:
-                                with open(log_path, "a") as f:
-                                    f.write(json.dumps({"ts": msg_counter["last_ts"], "data": json.loads(msg)}) + "\n")
+                                data = codec.loads(msg)
+                                if version == 2 and isinstance(data, dict):
+                                    self.tickers.on_message(data)
+                                    if data.get("method") == "subscribe" and data.get("success"):
+                                        sym = (data.get("result") or {}).get("symbol")
+                                        if sym:
+                                            self.subscribed.add(sym)
+                                with open(log_path, "ab") as f:
+                                    f.write(codec.dumps_line({"ts": msg_counter["last_ts"], "data": data}))
                             except Exception:
                                 pass
 
                     tasks = [asyncio.create_task(heartbeat_writer()), asyncio.create_task(receiver())]
+                    if version == 2:
+                        tasks.append(asyncio.create_task(ticker_flusher()))
                     done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
                     for t in pending:
                         t.cancel()
@@ -92,9 +165,18 @@ class PublicWSManager:
                 if attempt > 10 and version == 2:
                     return False
 
+    def _batches(self, pairs: List[str]) -> Tuple[List[List[str]], int]:
+        """(batches, n): symbols acked before (last run or an earlier connection) go first in the first n
+        large unpaced batches; new ones keep the WS_BATCH_SIZE / WS_BATCH_INTERVAL_MS pacing."""
+        acked = self.confirmed | self.subscribed
+        known = [p for p in pairs if p in acked]
+        new = [p for p in pairs if p not in acked]
+        fast = [known[i:i + self.warm_batch_size] for i in range(0, len(known), self.warm_batch_size)]
+        return fast + [new[i:i + self.batch_size] for i in range(0, len(new), self.batch_size)], len(fast)
+
     async def _subscribe_in_batches(self, ws, pairs: List[str], version: int) -> None:
-        for i in range(0, len(pairs), self.batch_size):
-            chunk = pairs[i:i+self.batch_size]
+        batches, n_known = self._batches(pairs)
+        for i, chunk in enumerate(batches):
             if version == 2:
                 payload = {
                     "method": "subscribe",
@@ -110,4 +192,5 @@ class PublicWSManager:
                     "subscription": {"name": self.channel},
                 }
             await ws.send(json.dumps(payload))
-            await asyncio.sleep(self.batch_interval_ms / 1000.0)
+            if i >= n_known:
+                await asyncio.sleep(self.batch_interval_ms / 1000.0)
@@ -0,0 +1,114 @@
+from __future__ import annotations
+import asyncio, json, os, time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from ..state.atomic_json import AtomicJSONWriter, read_json
+from ..util.backoff import exp_backoff
+
+SCHEMA_TICKER_CACHE = "ticker_cache/v1"
+
+def cache_path(app_path: str) -> str:
+    return os.path.join(app_path, "var", "ticker_cache.json")
+
+class TickerCache:
+    """Latest WS v2 `ticker` row per symbol: symbol -> (bid, ask, last, recv_ts)."""
+    def __init__(self):
+        self.rows: Dict[str, Tuple[float, float, float, float]] = {}
+        self.dirty = False
+
+    def on_message(self, msg: Dict[str, Any], now: Optional[float] = None) -> int:
+        if msg.get("channel") != "ticker":
+            return 0
+        now = time.time() if now is None else now
+        n = 0
+        for r in msg.get("data") or []:
+            sym = r.get("symbol")
+            if not sym:
+                continue
+            try:
+                self.rows[sym] = (float(r.get("bid") or 0.0), float(r.get("ask") or 0.0), float(r.get("last") or 0.0), now)
+                n += 1
+            except (TypeError, ValueError):
+                continue
+        self.dirty = self.dirty or n > 0
+        return n
+
+    def mid(self, symbol: str, max_age_s: Optional[float] = None) -> Optional[float]:
+        row = self.rows.get(symbol)
+        if row is None or (max_age_s is not None and time.time() - row[3] > max_age_s):
+            return None
+        bid, ask, last, _ = row
+        return (bid + ask) / 2.0 if bid > 0 and ask > 0 else (last or None)
+
+    def mids(self, symbols: Iterable[str], max_age_s: Optional[float] = None) -> Dict[str, float]:
+        out = {}
+        for s in symbols:
+            m = self.mid(s, max_age_s)
+            if m is not None:
+                out[s] = m
+        return out
+
+    def ts(self, symbol: str) -> Optional[float]:
+        row = self.rows.get(symbol)
+        return row[3] if row else None
+
+    def save(self, app_path: str) -> None:
+        AtomicJSONWriter(cache_path(app_path), schema_version=SCHEMA_TICKER_CACHE, durability="group").write(
+            {"ts": time.time(), "rows": {s: list(r) for s, r in self.rows.items()}})
+        self.dirty = False
+
+    @classmethod
+    def load(cls, app_path: str, max_age_s: Optional[float] = None) -> "TickerCache":
+        """Persisted cache (written by the public WS manager); rows older than max_age_s are dropped."""
+        c = cls()
+        d = read_json(cache_path(app_path))
+        now = time.time()
+        for s, r in ((d.get("rows") or {}) if isinstance(d, dict) else {}).items():
+            try:
+                row = (float(r[0]), float(r[1]), float(r[2]), float(r[3]))
+            except (TypeError, ValueError, IndexError):
+                continue
+            if max_age_s is None or now - row[3] <= max_age_s:
+                c.rows[s] = row
+        return c
+
+async def follow_tickers(symbols: Callable[[], Iterable[str]], on_message: Callable[[Dict[str, Any]], Any],
+                         stop: asyncio.Event, url: str = "wss://ws.kraken.com/v2") -> None:
+    """Public v2 ticker subscription that follows symbols() (re-evaluated every second), reconnecting with backoff."""
+    import aiohttp
+    attempt = 0
+    while not stop.is_set():
+        subscribed: set = set()
+        try:
+            async with aiohttp.ClientSession() as sess:
+                async with sess.ws_connect(url, heartbeat=30) as ws:
+                    attempt = 0
+                    while not stop.is_set():
+                        want = set(symbols())
+                        if want - subscribed:
+                            await ws.send_str(json.dumps({"method": "subscribe", "params": {
+                                "channel": "ticker", "symbol": sorted(want - subscribed)}}))
+                        if subscribed - want:
+                            await ws.send_str(json.dumps({"method": "unsubscribe", "params": {
+                                "channel": "ticker", "symbol": sorted(subscribed - want)}}))
+                        subscribed = want
+                        try:
+                            msg = await ws.receive(timeout=1.0)
+                        except asyncio.TimeoutError:
+                            continue
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            try:
+                                on_message(json.loads(msg.data))
+                            except Exception:
+                                continue
+                        elif msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                            break
+        except asyncio.CancelledError:
+            break
+        except Exception:
+            pass
+        attempt += 1
+        try:
+            await asyncio.sleep(exp_backoff(attempt))
+        except asyncio.CancelledError:
+            break
@@ -0,0 +1,96 @@
+
+import asyncio, json
+import aiohttp, pytest
+from momentum.utils.safety import SafetyViolation, enforce_one_position_only
+from momentum.ws.account import AccountBook, book_from_state_files, load_account_book
+from momentum.ws.private import PrivateWSManager
+
+EXEC_SNAP = {"channel": "executions", "type": "snapshot", "sequence": 1, "data": [
+    {"order_id": "O1", "cl_ord_id": "mom-E", "symbol": "BTC/USD", "side": "buy", "order_type": "limit",
+     "order_qty": 0.001, "limit_price": 28000.0, "order_status": "new", "exec_type": "new"}]}
+BAL_SNAP = {"channel": "balances", "type": "snapshot", "sequence": 1, "data": [
+    {"asset": "USD", "balance": 100.0}, {"asset": "ETH", "balance": 0.5}, {"asset": "DOGE", "balance": 0.0}]}
+
+def test_snapshot_deltas_and_gap():
+    b = AccountBook()
+    assert b.on_message(EXEC_SNAP) and b.on_message(BAL_SNAP)
+    assert [o["order_id"] for o in b.open_orders("BTC/USD", "buy")] == ["O1"]
+    assert b.positions() == {"ETH": {"qty": 0.5, "opened_at": None}}
+    b.on_message({"channel": "executions", "type": "update", "sequence": 2, "data": [
+        {"order_id": "O1", "exec_type": "trade", "exec_id": "X1", "last_qty": 0.001, "order_status": "filled"}]})
+    b.on_message({"channel": "balances", "type": "update", "sequence": 2, "data": [
+        {"asset": "BTC", "amount": 0.001, "balance": 0.001, "type": "trade"}]})
+    assert b.orders == {} and b.last_exec_id == "X1" and b.positions()["BTC"]["opened_at"] is not None
+    assert not b.on_message({"channel": "balances", "type": "update", "sequence": 5, "data": []}) and b.gaps == 1
+
+def test_manager_consumes_stream_and_persists(tmp_path):
+    class _WS:
+        def __init__(self, msgs):
+            self.msgs = [type("M", (), {"type": aiohttp.WSMsgType.TEXT, "data": json.dumps(m)}) for m in msgs]
+            self.msgs.append(type("M", (), {"type": aiohttp.WSMsgType.CLOSED, "data": None}))
+        async def receive(self):
+            return self.msgs.pop(0)
+    mgr = PrivateWSManager(str(tmp_path), streams=False)
+    asyncio.run(mgr._consume(_WS([{"method": "subscribe", "success": True}, EXEC_SNAP, BAL_SNAP])))
+    assert mgr.book.live and mgr.messages == 3
+    mgr.book.save(str(tmp_path))
+    again = load_account_book(str(tmp_path))
+    assert again is not None and again.orders["O1"]["cl_ord_id"] == "mom-E" and again.balances["ETH"] == 0.5
+
+def test_indexes_exposure_and_one_position_guard(tmp_path):
+    b = AccountBook()
+    b.on_message(EXEC_SNAP)
+    b.on_message({"channel": "executions", "type": "update", "sequence": 2, "data": [
+        {"order_id": "O1", "exec_type": "trade", "cum_qty": 0.0004, "order_status": "partially_filled"},
+        {"order_id": "O2", "cl_ord_id": "mom-T", "symbol": "BTC/USD", "side": "sell", "order_qty": 0.0004,
+         "limit_price": 29000.0, "order_status": "new"}]})
+    ex = b.symbol_exposure("BTC/USD")
+    assert ex.pending_entries == 1 and abs(ex.open_buy_qty - 0.0006) < 1e-12 and abs(ex.open_sell_qty - 0.0004) < 1e-12
+    assert b.order_by_clid("mom-T")["order_id"] == "O2" and len(b.open_orders("BTC/USD")) == 2
+    with pytest.raises(SafetyViolation, match="pending entry"):
+        enforce_one_position_only("BTC/USD", 1, book=b)
+    enforce_one_position_only("BTC/USD", 1, side="sell", book=b)
+    b.on_message({"channel": "executions", "type": "update", "sequence": 3, "data": [
+        {"order_id": "O1", "exec_type": "canceled", "order_status": "canceled"}]})
+    assert not b.has_pending_entry("BTC/USD") and b.order_by_clid("mom-E") is None
+    b.apply_balances([{"asset": "XBT", "balance": 0.0004}])
+    with pytest.raises(SafetyViolation, match="open position"):
+        enforce_one_position_only("BTC/USD", 1, book=b)
+    # reconcile-shaped state files build the same indexes
+    (tmp_path / "var").mkdir()
+    (tmp_path / "var" / "open_orders_state.json").write_text(json.dumps({"_schema": "open_orders_state/v1",
+        "TX1": {"pair": "ETH/USD", "type": "buy", "vol": 0.1, "vol_exec": 0.0, "price": 2000.0, "status": "open"}}))
+    assert book_from_state_files(str(tmp_path)).has_pending_entry("ETH/USD")
+
+def test_rest_pair_names_map_to_ws_symbols(tmp_path):
+    from momentum.kraken.assets import SCHEMA_ASSET_INDEX, AssetIndex, _cached, v2_symbol
+    assert [v2_symbol(n) for n in ("XBTUSD", "XXBTZUSD", "XBT/USD", "ETHUSD", "BTC/USD")] == \
+        ["BTC/USD", "BTC/USD", "BTC/USD", "ETH/USD", "BTC/USD"]
+    idx = AssetIndex({}, {"XDGUSD": {"base": "XXDG", "quote": "ZUSD", "altname": "XDGUSD", "wsname": "XDG/USD"}})
+    assert v2_symbol("XDGUSD", idx) == "DOGE/USD"
+    (tmp_path / "var").mkdir()
+    (tmp_path / "var" / "open_orders_state.json").write_text(json.dumps({"_schema": "open_orders_state/v1",
+        "TX1": {"pair": "XDGUSD", "type": "buy", "vol": 10, "vol_exec": 0.0, "price": 0.1, "status": "open"}}))
+    (tmp_path / "var" / "positions.json").write_text(json.dumps({"positions": {"XBT": {"qty": 0.0004}}}))
+    (tmp_path / "var" / "asset_index.json").write_text(json.dumps({"_schema": SCHEMA_ASSET_INDEX, **idx.to_dict()}))
+    b = book_from_state_files(str(tmp_path))
+    _cached.pop(str(tmp_path), None)
+    assert b.has_pending_entry("DOGE/USD") and b.has_pending_entry("XDGUSD") and b.symbol_exposure("DOGE/USD").pending_entries == 1
+    assert b.has_position("BTC/USD") and b.has_position("XBTUSD") and not b.has_position("BTC/USD", 0.001)
+    b = AccountBook()
+    b.apply_reconcile({"TX2": {"pair": "XBTUSD", "type": "buy", "vol": 0.001, "price": 28000.0}}, {})
+    assert [o["order_id"] for o in b.open_orders("BTC/USD")] == ["TX2"]
+    with pytest.raises(SafetyViolation, match="pending entry"):
+        enforce_one_position_only("BTC/USD", 1, book=b)
+
+def test_one_position_guard_without_a_stream_book(tmp_path, monkeypatch):
+    monkeypatch.setenv("APP", str(tmp_path))
+    monkeypatch.delenv("ONE_POSITION_FAIL_OPEN", raising=False)
+    with pytest.raises(SafetyViolation, match="no account book"):         # nothing to check against: refuse
+        enforce_one_position_only("BTC/USD", 1)
+    monkeypatch.setenv("ONE_POSITION_FAIL_OPEN", "1")
+    enforce_one_position_only("BTC/USD", 1)
+    (tmp_path / "var").mkdir()
+    (tmp_path / "var" / "positions.json").write_text(json.dumps({"positions": {"XBT": {"qty": 0.0004}}}))
+    with pytest.raises(SafetyViolation, match="open position"):           # reconcile state files stand in
+        enforce_one_position_only("BTC/USD", 1)
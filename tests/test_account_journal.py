@@ -0,0 +1,34 @@
+import os
+from momentum.state.journal import EventJournal
+from momentum.ws.account import AccountBook, recover_account_book
+
+def _exec(seq, oid, status, qty=1.0):
+    return {"channel": "executions", "type": "update", "sequence": seq, "data": [
+        {"order_id": oid, "symbol": "ETH/USD", "side": "buy", "order_qty": qty, "limit_price": 2000.0,
+         "order_status": status, "exec_type": "new" if status == "new" else "trade", "exec_id": f"X{seq}"}]}
+
+def test_snapshot_plus_tail_recovery_and_compaction(tmp_path):
+    app = str(tmp_path)
+    j = EventJournal(os.path.join(app, "var", "journal", "account"), segment_bytes=600, fsync_s=0)
+    live = AccountBook(); live.journal = j
+    live.on_message({"channel": "balances", "type": "snapshot", "sequence": 1,
+                     "data": [{"asset": "USD", "balance": 500.0}]})
+    for i in range(2, 30):
+        live.on_message(_exec(i, f"O{i}", "new" if i % 3 else "filled"))
+    live.save(app)
+    assert j.compact(live.journal_seq) > 0 and len(j.segments()) >= 2
+    live.on_message(_exec(30, "O30", "new"))
+    live.on_message({"channel": "balances", "type": "update", "sequence": 2,
+                     "data": [{"asset": "ETH", "balance": 0.25}]})
+    with open(j.segments()[-1][1], "a") as f:
+        f.write('{"n":99,"t":1,"k":"balan')              # crash mid-append, no final snapshot
+    j.close()
+
+    j2 = EventJournal(j.path)
+    assert j2.n == live.journal_seq
+    book = recover_account_book(app, j2)
+    assert book.orders == live.orders and book.balances == live.balances
+    assert book.opened_at == live.opened_at and book.dirty and book.journal is j2
+    assert sum(1 for _ in j2.replay(after=book.journal_seq)) == 0
+    book.on_message(_exec(32, "O2", "filled"))                 # appends continue after the torn line
+    assert "O2" not in book.orders and j2.n == book.journal_seq == live.journal_seq + 1
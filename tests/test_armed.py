@@ -0,0 +1,259 @@
+
+import asyncio, json, time
+import aiohttp, orjson
+from momentum.orders.armed import ArmedOrderConnection, drain_inbox, selection_has_candidates, submit
+from momentum.orders.orchestrator import EntrySpec, SLSpec, TPLeg, build_oto_plan, execute_plan
+from momentum.utils.safety import SafetyKnobs
+
+class _Msg:
+    def __init__(self, type, data=None):
+        self.type, self.data = type, data
+
+class _FakeWS:
+    """Acks every request with success + time_in/time_out, like ws-auth v2."""
+    def __init__(self):
+        self.sent, self.closed, self.q = [], False, asyncio.Queue()
+    async def send_str(self, s):
+        m = orjson.loads(s); self.sent.append(m)
+        ack = {"method": "pong" if m["method"] == "ping" else m["method"], "req_id": m["req_id"], "success": True,
+               "result": {"cl_ord_id": (m.get("params") or {}).get("cl_ord_id")},
+               "time_in": "2024-01-01T00:00:00.000000Z", "time_out": "2024-01-01T00:00:00.000100Z"}
+        self.q.put_nowait(_Msg(aiohttp.WSMsgType.TEXT, orjson.dumps(ack).decode()))
+    async def receive(self):
+        return await self.q.get()
+    async def close(self):
+        self.closed = True; self.q.put_nowait(_Msg(aiohttp.WSMsgType.CLOSED))
+
+def _conn(tmp_path):
+    conn = ArmedOrderConnection(str(tmp_path), knobs=SafetyKnobs(entry_max_notional=1e6, one_position_only=0))
+    conn.set_token("tok"); conn.attach(_FakeWS())
+    return conn
+
+def test_template_fire_injects_token_and_records_latency(tmp_path):
+    async def go():
+        conn = _conn(tmp_path)
+        from momentum.exchange.kraken.fast_payloads import FastIntent
+        msg = conn.templates.get("BTC/USD").build(FastIntent(side="buy", qty=0.001, limit_price=28440))
+        ack = await asyncio.wait_for(await conn.fire(msg, t_signal=time.time()), 1)
+        pong = await conn.call("ping")
+        await conn.disarm()
+        return conn, ack, pong
+    conn, ack, pong = asyncio.run(go())
+    assert ack["success"] and pong["method"] == "pong"
+    assert conn.signal_to_wire.count == 1 and conn.ack.count == 1 and conn.ping_rtt.count == 1
+    assert "momentum_armed_signal_to_wire_seconds_count 1" in (tmp_path / "var" / "metrics.d" / "armed_orders.prom").read_text()
+
+def test_inbox_and_plan_on_armed_connection(tmp_path):
+    (tmp_path / "var" / "funnel").mkdir(parents=True)
+    assert not selection_has_candidates(str(tmp_path))
+    (tmp_path / "var" / "funnel" / "selection.json").write_text(json.dumps({"candidates": 2, "results": []}))
+    assert selection_has_candidates(str(tmp_path))
+    plan = build_oto_plan(EntrySpec("BTC/USD", "buy", "limit", 0.001, 28440.0, client_id="t1"),
+                          [TPLeg(1.0, 28600.0)], SLSpec(28300.0), None)
+    async def go():
+        conn = _conn(tmp_path); ws = conn.ws
+        submit(str(tmp_path), [{"method": "add_order", "params": {"symbol": "BTC/USD"}}], name="a")
+        n = await drain_inbox(conn, str(tmp_path))
+        res = await execute_plan(str(tmp_path), plan, validate=1, conn=conn)
+        await conn.disarm()
+        return ws, n, res
+    ws, n, res = asyncio.run(go())
+    assert n == 1 and orjson.loads((tmp_path / "var" / "order_outbox" / "a.json").read_bytes())["acks"][0]["success"]
+    assert [r["res"]["status"] for r in res["results"]] == ["ok", "ok", "ok"]
+    assert all(m["params"]["token"] == "tok" for m in ws.sent) and ws.closed
+    assert res["results"][0]["clid"] == "t1-E"
+
+def test_intent_queue_dedupe_offsets_and_redelivery(tmp_path):
+    from momentum.orders.armed import drain_queue, enqueue
+    from momentum.state.intent_queue import IntentQueue, queue_path, shared_queue
+    app = str(tmp_path)
+    msgs = [{"method": "add_order", "params": {"symbol": "BTC/USD", "cl_ord_id": "c1-E"}},
+            {"method": "add_order", "params": {"symbol": "BTC/USD", "cl_ord_id": "c1-SL"}}]
+    s1 = enqueue(app, msgs, t_signal=time.time())
+    assert s1 and enqueue(app, msgs) is None                       # producer retry deduped on cl_ord_id
+    q = shared_queue(app)
+    q.mark_delivered(["c1-E"], s1)                                 # as if a crash hit after the entry was acked
+    s2 = enqueue(app, [{"method": "amend_order", "params": {"cl_ord_id": "c1-SL", "trigger_price": 1.0}}], key="amend:1")
+
+    async def go():
+        conn = _conn(tmp_path); ws = conn.ws
+        n = await drain_queue(conn, q)
+        again = await drain_queue(conn, q)
+        await conn.disarm()
+        return ws, n, again
+    ws, n, again = asyncio.run(go())
+    assert (n, again) == (2, 0) and q.offset("armed") == s2
+    assert [m["params"]["cl_ord_id"] for m in ws.sent] == ["c1-SL", "c1-SL"]    # entry skipped, amend not deduped
+    acks = q.result(s1)["acks"]
+    assert acks[0]["skipped"] and acks[1]["success"] and q.is_delivered("c1-SL")
+
+    q2 = IntentQueue(queue_path(app))                              # a restarted consumer resumes from its offset
+    assert q2.read("armed") == [] and len(q2.read("other")) == 2 and q2.stats("armed")["lag"] == 0
+
+def test_inbox_survives_send_failure(tmp_path):
+    app = str(tmp_path)
+    async def go():
+        conn = _conn(tmp_path); ws = conn.ws
+        real = ws.send_str
+        async def broken(s):
+            raise ConnectionResetError("socket gone")
+        ws.send_str = broken
+        submit(app, [{"method": "add_order", "params": {"symbol": "BTC/USD"}}], name="b")
+        try:
+            await drain_inbox(conn, app)
+            raised = False
+        except ConnectionResetError:
+            raised = True
+        pending = dict(conn._pending)
+        ws.send_str = real
+        n = await drain_inbox(conn, app)                             # retried once the socket works
+        await conn.disarm()
+        return raised, pending, n
+    raised, pending, n = asyncio.run(go())
+    assert raised and pending == {} and n == 1
+    assert orjson.loads((tmp_path / "var" / "order_outbox" / "b.json").read_bytes())["acks"][0]["success"]
+    assert list((tmp_path / "var" / "order_inbox").iterdir()) == []
+
+def test_exits_wait_for_entry_fill(tmp_path):
+    from momentum.orders.armed import enqueue, enqueue_exits, record_exits
+    from momentum.services.trade_events import TradeEventEngine
+    from momentum.state.intent_queue import shared_queue
+    app = str(tmp_path)
+    sl = {"method": "add_order", "params": {"symbol": "BTC/USD", "cl_ord_id": "mom6-1-SL"}}
+    tp = {"method": "add_order", "params": {"symbol": "BTC/USD", "cl_ord_id": "mom6-1-TP1"}}
+    record_exits(app, "mom6-1", [sl, tp], side="buy", volume=0.001, entry_price=28440.0, lot_decimals=8)
+    enqueue(app, [{"method": "add_order", "params": {"symbol": "BTC/USD", "cl_ord_id": "mom6-1-E"}}])
+    q = shared_queue(app)
+    assert [m["params"]["cl_ord_id"] for it in q.read("t") for m in it.payload["messages"]] == ["mom6-1-E"]
+    engine = TradeEventEngine(default_hooks=False)
+    engine.add_hook("entry_filled", lambda ev, plan: enqueue_exits(app, plan.base))
+    fill = {"channel": "executions", "type": "update", "data": [
+        {"order_id": "O1", "cl_ord_id": "mom6-1-E", "exec_type": "trade", "order_status": "filled",
+         "last_qty": 0.001, "last_price": 28440.0, "cum_qty": 0.001}]}
+    async def go():
+        for _ in range(2):                      # a replayed fill must not queue the exits twice
+            engine.on_message(fill)
+            await engine.dispatch(engine.queue.get_nowait())
+    asyncio.run(go())
+    msgs = [[m["params"]["cl_ord_id"] for m in it.payload["messages"]] for it in q.read("t")]
+    assert msgs == [["mom6-1-E"], ["mom6-1-SL", "mom6-1-TP1"]]
+    assert enqueue_exits(app, "unknown") is None
+
+def test_queue_replay_resends_only_unacked_messages(tmp_path):
+    import pytest
+    from momentum.orders.armed import drain_queue, enqueue
+    from momentum.state.intent_queue import shared_queue
+    app = str(tmp_path)
+    msgs = [{"method": "amend_order", "params": {"cl_ord_id": "c2-SL", "trigger_price": 1.0}},
+            {"method": "add_order", "params": {"symbol": "BTC/USD", "order_type": "take-profit"}},
+            {"method": "add_order", "params": {"symbol": "BTC/USD", "cl_ord_id": "c2-TP2"}}]
+    seq = enqueue(app, msgs, key="exits:c2")
+    q = shared_queue(app)
+    async def go():
+        conn = _conn(tmp_path); ws = conn.ws
+        real = ws.send_str
+        async def lossy(s):                       # the id-less TP leg's ack never arrives
+            if orjson.loads(s)["params"].get("order_type") == "take-profit":
+                ws.sent.append(orjson.loads(s)); return
+            await real(s)
+        ws.send_str = lossy
+        with pytest.raises(RuntimeError, match="will retry"):
+            await drain_queue(conn, q, timeout=0.05)
+        first = (len(ws.sent), q.offset("armed"))
+        ws.send_str = real
+        n = await drain_queue(conn, q, timeout=0.05)
+        await conn.disarm()
+        return ws, first, n
+    ws, first, n = asyncio.run(go())
+    assert first == (3, 0) and n == 1 and q.offset("armed") == seq
+    assert [m["method"] for m in ws.sent[3:]] == ["add_order"] and len(ws.sent) == 4   # only the unacked leg again
+    res = q.result(seq)
+    assert res["attempts"] == 1 and all(a["success"] for a in res["acks"]) and q.is_delivered("c2-TP2")
+
+def test_lost_ack_is_resolved_from_account_book(tmp_path, monkeypatch, capsys):
+    import pytest
+    from momentum.orders.armed import drain_queue, enqueue
+    from momentum.state.atomic_json import flush_pending
+    from momentum.state.intent_queue import shared_queue
+    from momentum.ws import account
+    from momentum.ws.account import AccountBook
+    monkeypatch.setattr(account, "_RELOAD_SEC", 0.0)
+    app = str(tmp_path)
+    seq = enqueue(app, [{"method": "add_order", "params": {"symbol": "BTC/USD", "cl_ord_id": "c3-E"}}], key="entry:c3")
+    q = shared_queue(app)
+    async def go():
+        conn = _conn(tmp_path); ws = conn.ws
+        async def lost(s):                        # reaches the exchange, the ack never comes back
+            ws.sent.append(orjson.loads(s))
+        ws.send_str = lost
+        with pytest.raises(RuntimeError, match="will retry"):
+            await drain_queue(conn, q, timeout=0.05)
+        with pytest.raises(RuntimeError, match="unconfirmed"):     # no account book: alert, never resend blind
+            await drain_queue(conn, q, timeout=0.05)
+        blocked = (len(ws.sent), conn.unconfirmed, q.result(seq)["attempts"])
+        b = AccountBook()
+        b.on_message({"channel": "executions", "type": "snapshot", "sequence": 1, "data": [
+            {"order_id": "O9", "cl_ord_id": "c3-E", "symbol": "BTC/USD", "side": "buy", "order_type": "limit",
+             "order_qty": 0.001, "limit_price": 28000.0, "order_status": "new", "exec_type": "new"}]})
+        b.on_message({"channel": "executions", "type": "update", "sequence": 2, "data": [
+            {"order_id": "O9", "exec_type": "trade", "exec_id": "X9", "last_qty": 0.001, "order_status": "filled"}]})
+        b.save(app); flush_pending()
+        n = await drain_queue(conn, q, timeout=0.05)
+        await conn.disarm()
+        return ws, blocked, n
+    ws, blocked, n = asyncio.run(go())
+    assert blocked == (1, 1, 1) and "[armed] ALERT" in capsys.readouterr().err
+    assert n == 1 and len(ws.sent) == 1 and q.offset("armed") == seq and q.is_delivered("c3-E")
+    assert q.result(seq)["acks"][0]["recovered"] == "account_book"
+
+def test_partial_fill_then_cancel_queues_resized_exits(tmp_path):
+    from momentum.orders.armed import exits_hook, record_exits
+    from momentum.services.trade_events import TradeEventEngine
+    from momentum.state.intent_queue import shared_queue
+    app = str(tmp_path)
+    def leg(clid, qty):
+        return {"method": "add_order", "params": {"symbol": "BTC/USD", "cl_ord_id": clid, "order_qty": qty}}
+    record_exits(app, "mom7-1", [leg("mom7-1-SL", "0.001"), leg("mom7-1-TP1", "0.0005"), leg("mom7-1-TP2", "0.0005")],
+                 symbol="BTC/USD", side="buy", volume=0.001, entry_price=28440.0, lot_decimals=8)
+    engine = TradeEventEngine(default_hooks=False)
+    engine.add_hook("entry_filled", exits_hook(app))
+    rows = [{"order_id": "O7", "cl_ord_id": "mom7-1-E", "exec_type": "trade", "order_status": "partially_filled",
+             "last_qty": 0.0003, "last_price": 28440.0, "cum_qty": 0.0003},
+            {"order_id": "O7", "exec_type": "canceled", "order_status": "canceled", "cum_qty": 0.0003}]
+    async def go():
+        fired = []
+        for r in rows:
+            engine.on_message({"channel": "executions", "type": "update", "data": [r]})
+            fired.append(await engine.dispatch(engine.queue.get_nowait()))
+        return fired
+    assert asyncio.run(go()) == [["fill"], ["entry_filled"]] and engine.hook_errors == 0
+    [it] = shared_queue(app).read("t")
+    qty = {m["params"]["cl_ord_id"]: m["params"]["order_qty"] for m in it.payload["messages"]}
+    assert qty == {"mom7-1-SL": "0.0003", "mom7-1-TP1": "0.00015", "mom7-1-TP2": "0.00015"}
+
+def test_queued_entry_is_gated_by_the_live_risk_engine(tmp_path, monkeypatch):
+    from momentum.orders.armed import drain_queue, enqueue
+    from momentum.state.atomic_json import flush_pending
+    from momentum.state.intent_queue import shared_queue
+    from momentum.utils import risk_engine
+    from momentum.utils.risk_engine import RiskEngine, RiskLimits
+    monkeypatch.setattr(risk_engine, "_RELOAD_SEC", 0.0)
+    app = str(tmp_path)
+    eng = RiskEngine(RiskLimits(entry_max_notional=100.0), equity_usd=100.0)
+    eng.on_fill("BTC/USD", "buy", 0.0003, 30000.0)            # already holding BTC
+    eng.save(app); flush_pending()
+    entry = {"method": "add_order", "params": {"symbol": "BTC/USD", "side": "buy", "order_type": "limit",
+                                               "order_qty": 0.0002, "limit_price": 30000.0, "cl_ord_id": "r1-E"}}
+    exit_ = {"method": "add_order", "params": {"symbol": "ETH/USD", "side": "buy", "order_type": "limit",
+                                               "order_qty": 0.001, "limit_price": 2000.0, "cl_ord_id": "r2-SL"}}
+    s1, s2 = enqueue(app, [entry]), enqueue(app, [exit_])
+    q = shared_queue(app)
+    async def go():
+        conn = _conn(tmp_path); ws = conn.ws
+        n = await drain_queue(conn, q, timeout=0.05)
+        await conn.disarm()
+        return conn, ws, n
+    conn, ws, n = asyncio.run(go())
+    assert n == 2 and conn.risk_rejects == 1 and q.offset("armed") == s2
+    assert q.result(s1)["acks"][0] == {"success": False, "error": "RISK: one_position_only:existing_position", "rejected": True}
+    assert [m["params"]["cl_ord_id"] for m in ws.sent] == ["r2-SL"]           # exits are never gated
@@ -0,0 +1,24 @@
+import json, pytest
+from momentum.state.atomic_json import AtomicJSONWriter, flush_pending, group_stats, read_json
+from momentum.state.json_safety import read_json_dict, write_json
+
+def test_group_coalesces_to_latest_and_flushes(tmp_path):
+    path = str(tmp_path / "var" / "g.json")
+    w = AtomicJSONWriter(path, "g/v1", durability="group")
+    before = group_stats()
+    for i in range(50):
+        w.write({"i": i})
+    assert read_json(path)["i"] == 49                   # read-your-writes before the commit
+    assert flush_pending(5.0)
+    after = group_stats()
+    assert json.loads(open(path).read()) == {"i": 49, "_schema": "g/v1"}
+    assert after["commits"] - before["commits"] < 50 and after["coalesced"] > before["coalesced"]
+    assert after["pending"] == 0
+
+def test_levels_and_write_json(tmp_path):
+    p = str(tmp_path / "var" / "r.json")
+    write_json(p, {"a": 1}, durability="relaxed")
+    AtomicJSONWriter(p + "2").write({"b": 2})
+    assert read_json_dict(p) == {"a": 1} and read_json(p + "2") == {"b": 2}
+    with pytest.raises(ValueError):
+        write_json(p, {}, durability="eventually")
@@ -0,0 +1,38 @@
+
+import asyncio, json, math
+from momentum.state.atomic_json import flush_pending
+from momentum.util.clock_sync import ClockSync, parse_rfc3339, run_clock_sync
+
+class _FakeKraken:
+    """Server clock 2.37s ahead, 1s resolution, ~40ms RTT."""
+    def __init__(self):
+        self.t = 1_700_000_000.0
+    async def server_time(self):
+        return {"unixtime": int(self.t + 0.02 + 2.37)}
+
+def test_interval_filter_converges_on_second_resolution():
+    c = ClockSync()
+    t = 1_700_000_000.0
+    for i in range(12):
+        t += 1.3
+        c.add_sample(t, math.floor(t + 0.02 + 2.37), t + 0.04, resolution=1.0)
+    assert abs(c.offset - 2.37) < 0.06
+    assert c.uncertainty < 0.1 and abs(c.rtt - 0.04) < 1e-6
+    assert 250 <= c.safe_deadline_ms() < 5000
+
+def test_ws_ack_and_reset_on_clock_step():
+    c = ClockSync()
+    assert c.add_ws_ack(100.0, {"time_in": "1970-01-01T00:01:40.515000Z"}, 100.010)
+    assert abs(c.offset - 0.51) < 0.006
+    c.add_sample(200.0, 205.0, 200.01)   # local clock stepped: intervals no longer overlap
+    assert c.resets == 1 and abs(c.offset - 4.995) < 0.006
+    assert abs(parse_rfc3339("2023-09-21T14:15:07.197274Z") % 1 - 0.197274) < 1e-6
+
+def test_runner_publishes_offset_and_metrics(tmp_path):
+    clock = asyncio.run(run_clock_sync(str(tmp_path), 0.0, kraken=_FakeKraken(), iterations=2))
+    assert clock.n_samples == 2
+    assert ClockSync.load(str(tmp_path / "var" / "clock_offset.json")).offset == clock.offset
+    flush_pending()                                     # published through state.atomic_json, no fixed .tmp
+    assert json.loads((tmp_path / "var" / "clock_offset.json").read_text())["_schema"] == "clock_offset/v1"
+    assert not (tmp_path / "var" / "clock_offset.json.tmp").exists()
+    assert "momentum_clock_rtt_seconds" in (tmp_path / "var" / "metrics.d" / "clock_sync.prom").read_text()
@@ -0,0 +1,32 @@
+import pytest
+from momentum.state import codec
+from momentum.state.atomic_json import AtomicJSONWriter, read_json
+from momentum.state.read_cache import JSONReadCache
+
+def test_roundtrip_and_negotiation(tmp_path):
+    obj = {"orders": {"O1": {"vol": "0.5", "price": 101.25, "tags": ["a", "é"]}}, "n": 3, "ok": True, "x": None}
+    for fmt in ("json", "marshal"):
+        assert codec.loads(codec.dumps(obj, fmt)) == obj
+    assert codec.dumps(obj) == b'{"orders":{"O1":{"vol":"0.5","price":101.25,"tags":["a","\xc3\xa9"]}},"n":3,"ok":true,"x":null}'
+    assert codec.loads(codec.dumps(obj, pretty=True)) == obj and codec.dumps({1: 2}) == b'{"1":2}'
+
+    js, mb = str(tmp_path / "var" / "s.json"), str(tmp_path / "var" / "s.mbin")
+    AtomicJSONWriter(js, "s/v1").write(obj)
+    AtomicJSONWriter(mb, "s/v1").write(obj)
+    assert open(js, "rb").read(1) == b"{" and open(mb, "rb").read().startswith(codec.MAGIC)
+    assert read_json(js) == read_json(mb) == dict(obj, _schema="s/v1")
+    assert JSONReadCache().load(mb, mode="frozen")["orders"]["O1"]["price"] == 101.25
+
+    with open(mb, "r+b") as f:
+        f.truncate(12)
+    with pytest.raises(ValueError):
+        codec.loads(open(mb, "rb").read())
+    assert read_json(mb) == {} and codec.read(mb, "dflt") == "dflt"
+
+def test_loads_falls_back_to_stdlib_json():
+    legacy = b'{"pnl": NaN, "cap": Infinity, "id": 123456789012345678901234567890}'
+    d = codec.loads(legacy)
+    assert d["pnl"] != d["pnl"] and d["cap"] == float("inf") and d["id"] == 123456789012345678901234567890
+    assert codec.loads(memoryview(legacy))["id"] == d["id"]
+    with pytest.raises(ValueError):
+        codec.loads(b'{"broken": ')
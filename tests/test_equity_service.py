@@ -0,0 +1,34 @@
+
+import pytest
+from momentum.services.equity import EquityRecord, EquityService, mark_to_market, read_equity_record, shm_path
+from momentum.ws.account import AccountBook
+from momentum.ws.ticker_cache import TickerCache
+
+def test_mark_to_market_and_ticker_cache(tmp_path):
+    t = TickerCache()
+    assert t.on_message({"channel": "ticker", "type": "update", "data": [
+        {"symbol": "ETH/USD", "bid": 1999.0, "ask": 2001.0, "last": 2000.5},
+        {"symbol": "SOL/USD", "bid": 0, "ask": 0, "last": 50.0}]}) == 2
+    assert t.mid("ETH/USD") == 2000.0 and t.mid("SOL/USD") == 50.0 and t.mid("ETH/USD", max_age_s=-1) is None
+    t.save(str(tmp_path))
+    assert TickerCache.load(str(tmp_path)).mid("ETH/USD") == 2000.0
+    r = mark_to_market({"USD": 100.0, "ETH": 0.5, "SOL": 2.0, "ADA": 10.0, "XBT": 0.0}, t.mid)
+    assert r["equity_usd"] == pytest.approx(1200.0) and r["cash_usd"] == 100.0 and r["unpriced"] == ["ADA"]
+
+def test_service_publishes_file_and_shm(tmp_path):
+    app = str(tmp_path)
+    b = AccountBook()
+    b.apply_balances([{"asset": "USD", "balance": 80.0}, {"asset": "ETH", "balance": 0.01}], snapshot=True)
+    b.live = True
+    t = TickerCache()
+    t.on_message({"channel": "ticker", "data": [{"symbol": "ETH/USD", "bid": 2000.0, "ask": 2000.0}]})
+    svc = EquityService(app, book=b, tickers=t)
+    assert svc.held_symbols() == ["ETH/USD"]
+    rec = svc.publish()
+    assert rec["equity_usd"] == pytest.approx(100.0) and not rec["stale"]
+    live = read_equity_record(app, max_age_s=5)
+    assert live["equity_usd"] == pytest.approx(100.0) and live["stale"] is False
+    b.live = False
+    svc.publish()
+    assert EquityRecord(shm_path(app)).read()["stale"] is True and svc.publishes == 2
+    assert read_equity_record(app, max_age_s=-1) is None
@@ -0,0 +1,61 @@
+
+import orjson
+import pytest
+from momentum.models.intent import Intent, TakeProfitLeg
+from momentum.utils.safety import SafetyKnobs, SafetyViolation
+from momentum.exchange.kraken.ws_v2_payloads import build_primary_payload, build_standalone_tp_messages
+from momentum.exchange.kraken.fast_payloads import FastIntent, FastTPLeg, OrderTemplate, TPTemplate, TemplateCache
+
+KNOBS = SafetyKnobs(entry_max_notional=100000, one_position_only=0, abs_limit_required=1)
+
+def _strip(msg: dict) -> dict:
+    p = dict(msg["params"]); p.pop("deadline"); p.pop("cl_ord_id")
+    return {**msg, "params": p}
+
+def test_primary_parity_with_oto_sl():
+    intent = Intent(symbol="BTC/USD", side="buy", qty=0.001, order_type="limit", limit_price=28440, post_only=True,
+                    oto_order_type="stop-loss-limit", oto_trigger_price=28410, oto_limit_price=28400)
+    ref = build_primary_payload(intent, "USD", KNOBS, token_placeholder="TOKEN").model_dump()
+    tpl = OrderTemplate(intent, "USD", KNOBS, token_placeholder="TOKEN")
+    fast = tpl.build(FastIntent(side="buy", qty=0.001, limit_price=28440, oto_trigger_price=28410, oto_limit_price=28400))
+    assert _strip(fast) == _strip(ref)
+    assert fast["params"]["cl_ord_id"].startswith("mom-") and len(fast["params"]["cl_ord_id"]) == 16
+    assert orjson.loads(tpl.dumps(FastIntent(side="buy", qty=0.001, limit_price=28440, cl_ord_id="x",
+                                             oto_trigger_price=28410, oto_limit_price=28400)))["params"]["cl_ord_id"] == "x"
+
+def test_standalone_tp_parity():
+    legs = [TakeProfitLeg(trigger_price=28600, limit_price=28590, pct_size=0.4), TakeProfitLeg(trigger_price=28700, pct_size=0.6)]
+    ref = [m.model_dump() for m in build_standalone_tp_messages("BTC/USD", "sell", 0.001, legs, "USD", KNOBS, token_placeholder="TOKEN")]
+    fast = TPTemplate("BTC/USD", "sell", token_placeholder="TOKEN").build(
+        0.001, [FastTPLeg(28600, 28590, 0.4), FastTPLeg(28700, None, 0.6)])
+    assert [_strip(m) for m in fast] == [_strip(m) for m in ref]
+    assert fast[1]["params"]["cl_ord_id"].startswith("tp2-")
+
+def test_fast_path_keeps_safety_checks():
+    cache = TemplateCache("USD", SafetyKnobs(entry_max_notional=10, one_position_only=0, abs_limit_required=1))
+    tpl = cache.get("BTC/USD")
+    assert cache.get("BTC/USD") is tpl
+    with pytest.raises(SafetyViolation):
+        tpl.build(FastIntent(side="buy", qty=1.0))
+    with pytest.raises(SafetyViolation):
+        tpl.build(FastIntent(side="buy", qty=1.0, limit_price=28440))
+
+def test_fast_path_order_checks_and_gtd(tmp_path, monkeypatch):
+    from momentum.state.atomic_json import flush_pending
+    from momentum.ws.account import AccountBook
+    cache = TemplateCache("USD", SafetyKnobs(entry_max_notional=100, one_position_only=1, abs_limit_required=1))
+    with pytest.raises(ValueError):
+        cache.get("BTC/USD").build(FastIntent(side="hold", qty=0.001, limit_price=28440))
+    with pytest.raises(ValueError):
+        cache.get("BTC/USD").build(FastIntent(side="buy", qty=0.0, limit_price=28440))
+    b = AccountBook()
+    b.on_message({"channel": "executions", "type": "snapshot", "sequence": 1, "data": [
+        {"order_id": "O1", "cl_ord_id": "mom-E", "symbol": "BTC/USD", "side": "buy", "order_type": "limit",
+         "order_qty": 0.001, "limit_price": 28000.0, "order_status": "new", "exec_type": "new"}]})
+    b.save(str(tmp_path)); flush_pending()
+    monkeypatch.setenv("APP", str(tmp_path))
+    with pytest.raises(SafetyViolation, match="pending entry"):
+        cache.get("BTC/USD").build(FastIntent(side="buy", qty=0.001, limit_price=28440))
+    gtd = cache.get("BTC/USD", tif="gtd", gtd_expire_iso="2030-01-01T00:00:00Z")
+    assert gtd is not cache.get("BTC/USD", tif="gtd")
+    assert gtd.build(FastIntent(side="sell", qty=0.001, limit_price=28440))["params"]["expire_time"] == "2030-01-01T00:00:00Z"
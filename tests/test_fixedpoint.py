@@ -0,0 +1,43 @@
+
+from momentum.utils.fixedpoint import PairSpec, decimals_for_step, to_units, units_to_str
+from momentum.config.minlot import quantize_qty
+from momentum.orders.orchestrator import EntrySpec, TPLeg, build_oto_plan
+
+def test_units_absorb_float_drift():
+    assert to_units(0.1 + 0.2, 10, "floor") == 3
+    assert to_units(0.29, 100, "ceil") == 29
+    assert to_units(1.005, 100, "nearest") == 101
+    assert to_units(2.675, 100, "floor") == 267
+    assert quantize_qty(0.1 + 0.2, 1e-8) == 0.3
+    assert decimals_for_step(1e-8) == 8
+
+def test_wire_strings_and_notional_cap():
+    spec = PairSpec(price_decimals=2, lot_decimals=6)
+    assert units_to_str(2844005, 2) == "28440.05"
+    assert spec.qty_str(1000) == "0.001" and spec.price_str(2844000) == "28440"
+    lots = spec.max_lots_for_notional(10.0, spec.price_ticks(28440.05))
+    assert spec.notional(lots, 2844005) <= 10.0 < spec.notional(lots + 1, 2844005)
+    assert spec.split_lots(1001, [50, 30, 20]) == ([500, 300, 200], 1)
+
+def test_oto_plan_leg_volumes_sum_exactly():
+    plan = build_oto_plan(EntrySpec(pair="BTC/USD", side="buy", ordertype="limit", volume=0.3, price=100.0),
+                          [TPLeg(ratio=0.1, price=101.0), TPLeg(ratio=0.2, price=102.0)], None, None,
+                          spec=PairSpec(price_decimals=1, lot_decimals=8))
+    tps = [l["params"]["volume"] for l in plan["legs"] if l["kind"] == "TP"]
+    assert tps == ["0.03", "0.06", "0.21"] and plan["volume"] == 0.3
+
+def test_generic_steps_and_wire_numbers():
+    from momentum.exchange.kraken.fast_payloads import TemplateCache
+    from momentum.scripts.e2e_sim_live import _ceil_to_tick, _floor_to_step
+    from momentum.utils.fixedpoint import round_to_step, wire_dumps
+    from momentum.utils.safety import SafetyKnobs
+    assert _ceil_to_tick(1.26, 0.25) == 1.5 and _floor_to_step(12.0, 5.0) == 10.0 and _ceil_to_tick(0.1 + 0.2, 0.1) == 0.3
+    assert round_to_step(7.3, 0.5) == 7.5
+    spec = PairSpec(price_decimals=2, lot_decimals=8)
+    tpl = TemplateCache("USD", SafetyKnobs(entry_max_notional=10, one_position_only=0)).get("BTC/USD")
+    msg = tpl.build_units(spec, "buy", 1000, 2844005)
+    assert msg["params"]["order_qty"] == "0.00001" and msg["params"]["limit_price"] == "28440.05"
+    assert b'"order_qty":0.00001,' in wire_dumps(msg) and b'"limit_price":28440.05,' in wire_dumps(msg)
+    big = build_oto_plan(EntrySpec(pair="X/USD", side="buy", ordertype="limit", volume=1.0, price=2_000_000.01),
+                         [TPLeg(ratio=1.0, price=2_100_000.03)], None, None)
+    assert [l["params"]["price"] for l in big["legs"]] == ["2000000.01", "2100000.03"]
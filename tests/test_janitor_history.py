@@ -0,0 +1,25 @@
+import asyncio, json, os, time
+from momentum.janitor.history import JanitorHistory
+
+def test_group_commit_replay_and_compaction(tmp_path):
+    path = str(tmp_path / "var" / "janitor_history.json")
+    os.makedirs(os.path.dirname(path))
+    with open(path, "w") as f:                          # legacy single-file history still loads
+        json.dump({"done": {"old": {"ts": 1.0, "ack": {}}}, "last_seen": {"old": 1.0}}, f)
+
+    async def go():
+        h = JanitorHistory(path, debounce_sec=5, commit_window_s=0.01, compact_every=10_000)
+        await asyncio.gather(*(h.mark(f"cancel:{i}", {"success": True}) for i in range(20)))
+        return h
+    h = asyncio.run(go())
+    assert h.commits == 1 and h.journal_records == 20 and h.seen_recent("cancel:3")
+    with open(h.journal_path, "a") as f:
+        f.write('{"k":"torn","ts"')                      # crash mid-append
+
+    h2 = JanitorHistory(path, debounce_sec=5)
+    assert h2.journal_records == 20 and "cancel:19" in h2.done and "torn" not in h2.last_seen
+    h2.compact(now=time.time() + 60)                     # last_seen past debounce is evicted, done kept
+    assert h2.last_seen == {} and "cancel:0" in h2.done and "old" not in h2.done
+    assert os.path.getsize(h2.journal_path) == 0
+    h3 = JanitorHistory(path, debounce_sec=5)
+    assert set(h3.done) == set(h2.done) and h3.journal_records == 0
@@ -0,0 +1,45 @@
+
+import json, random
+from momentum.services.janitor import Janitor, JanitorScheduler, executor_actions
+from momentum.util.timer_wheel import TimerWheel
+
+def test_timer_wheel_matches_reference():
+    rnd = random.Random(1)
+    w = TimerWheel(1.0, (8, 4, 4))              # small wheel: exercises cascades and the overflow path
+    now, ref = 0.0, {}
+    w.advance(now)
+    for _ in range(5000):
+        if rnd.random() < 0.5:
+            k = rnd.randrange(300)
+            ref[k] = now + rnd.choice((rnd.uniform(0, 10), rnd.uniform(0, 200), rnd.uniform(0, 2000)))
+            w.schedule(k, ref[k], now=now)
+        if rnd.random() < 0.1 and ref:
+            k = rnd.choice(list(ref)); w.cancel(k); del ref[k]
+        now += rnd.choice((0.25, 1.0, 5.0, 40.0))
+        due = sorted(k for k, d in ref.items() if d <= int(now))
+        assert sorted(k for k, _ in w.advance(now)) == due
+        for k in due:
+            del ref[k]
+        assert len(w) == len(ref)
+
+def test_scheduler_matches_plan_and_touches_only_changed_symbols(tmp_path, monkeypatch):
+    monkeypatch.setenv("JANITOR_MAX_AGE_SEC", "100")
+    var = tmp_path / "var"; var.mkdir()
+    positions = {"BTC/USD": {"qty": 0.1, "usd": 5.0, "opened_at": 1000},
+                 "ETH/USD": {"qty": 0.0, "usd": 0.0, "opened_at": None}}
+    orders = [{"symbol": "ETH/USD", "side": "sell", "qty": 1.0, "order_id": "O1"},
+              {"symbol": "BTC/USD", "side": "sell", "qty": 0.1, "order_id": "O2"}]
+    (var / "positions.json").write_text(json.dumps(positions))
+    (var / "open_orders.json").write_text(json.dumps(orders))
+    jan = Janitor(str(tmp_path))
+    sched = JanitorScheduler(jan, TimerWheel(origin=0.0))
+    assert sched.poll(1050) and not sched.poll(1050)
+    sched.tick(1050)
+    assert sched.plan(1050)["actions"] == jan.plan(1050)["actions"]            # only the dangling ETH sell
+    checks = sched.dangling_checks
+    sched.tick(1100)
+    assert sched.plan(1100)["actions"] == jan.plan(1100)["actions"]            # BTC aged out at 1100
+    assert executor_actions(sched.plan(1100))["close"] == [{"pair": "BTC/USD", "side": "sell", "qty": 0.1}]
+    sched.on_positions(dict(positions, **{"ETH/USD": {"qty": 2.0, "usd": 50.0, "opened_at": 1090}}), 1101)
+    assert sched.dangling_checks == checks + 1                                # ETH only, BTC sell untouched
+    assert [a["kind"] for a in sched.plan(1101)["actions"]] == ["close_position"]
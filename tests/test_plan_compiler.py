@@ -0,0 +1,31 @@
+
+from momentum.orders.plan_compiler import PlanBatch, PlanSchema, compile_plans, read_batch, write_batch
+from momentum.utils.fixedpoint import PairSpec
+
+SCHEMA = PlanSchema(tp=((0.9, 50.0), (1.4, 30.0), (2.1, 20.0)), sl_pct=-0.5, be_offset_pct=0.05, max_notional=10.0)
+
+def test_batch_dust_merge_and_guards():
+    specs = [PairSpec(2, 6), PairSpec(2, 6), PairSpec(2, 0)]
+    batch = compile_plans(["BTC/USD", "ETH/USD", "XYZ/USD"], specs, [28440.123, 28440.0, 1.0], [0.00031, 0.001, 2.0], SCHEMA)
+    btc, eth, xyz = batch.rows()
+    assert btc["status"] == "ok" and btc["entry"] == {"price": 28440.12, "qty": 0.00031}
+    assert [l["qty"] for l in btc["tp_legs"]] == [0.000155, 0.000093, 0.000062]
+    assert btc["tp_legs"][0]["price"] == 28696.08 and btc["sl"]["trigger"] == 28297.92
+    assert eth["reject_reason"].startswith("entry_max_notional_exceeded")
+    # 2 lots: 50% -> 1, 30% -> 0 (dropped), 20% -> 0 (dropped); dust lot merges into leg 1
+    assert [(l["idx"], l["qty"]) for l in xyz["tp_legs"]] == [(1, 2.0)]
+    assert batch.ok_count == 2
+
+def test_artifact_roundtrip(tmp_path):
+    batch = compile_plans(["BTC/USD"], [PairSpec(1, 8)], 100.0, 0.05, SCHEMA)
+    path = str(tmp_path / "plans.batch.json")
+    write_batch(path, batch, ts="t")
+    again = read_batch(path)
+    assert isinstance(again, PlanBatch) and again.rows() == batch.rows()
+
+def test_allocations_are_percent_of_entry():
+    # allocations are alloc/100 of the entry (not normalized by their total); dust closes the position
+    under = compile_plans(["X/USD"], [PairSpec(2, 0)], 1.0, 10.0, PlanSchema(tp=((1.0, 30.0), (2.0, 30.0)), sl_pct=-1.0))
+    assert under.tp_lots == [[3, 7]]
+    over = compile_plans(["X/USD"], [PairSpec(2, 0)], 1.0, 10.0, PlanSchema(tp=((1.0, 80.0), (2.0, 80.0)), sl_pct=-1.0))
+    assert over.tp_lots == [[8, 2]]
@@ -0,0 +1,51 @@
+
+import asyncio
+from momentum.util.rate_limit import PriorityRateLimiter as L
+
+def test_priority_fairness_and_no_drops():
+    async def go():
+        lim = L(rate_per_sec=200.0, burst=1)
+        order = []
+        async def job(prio, key, tag):
+            await lim.acquire(prio, key)
+            order.append(tag)
+        await lim.acquire(L.AMEND)                        # drain the burst so everything below queues
+        tasks = [asyncio.create_task(job(L.AMEND, "A", f"amend{i}")) for i in range(2)]
+        tasks += [asyncio.create_task(job(L.CANCEL, "BTC", f"btc{i}")) for i in range(3)]
+        tasks += [asyncio.create_task(job(L.CANCEL, "ETH", "eth0"))]
+        tasks += [asyncio.create_task(job(L.CLOSE, "SOL", "close0"))]
+        await asyncio.sleep(0)
+        assert lim.depth() == 7
+        await asyncio.gather(*tasks)
+        return lim, order
+    lim, order = asyncio.run(go())
+    assert order == ["close0", "btc0", "eth0", "btc1", "btc2", "amend0", "amend1"]
+    assert lim.depth() == 0 and sum(lim.granted) == 8 and lim.wait_max[L.AMEND] > 0
+    assert 'momentum_rate_limiter_queue_depth{class="close"} 0' in lim.prom_lines()
+
+def test_cancelled_waiter_is_skipped():
+    async def go():
+        lim = L(rate_per_sec=100.0, burst=1)
+        await lim.acquire()
+        t = asyncio.create_task(lim.acquire(L.CANCEL, "x"))
+        await asyncio.sleep(0)
+        t.cancel()
+        waited = await lim.acquire(L.CANCEL, "y")
+        return lim, waited
+    lim, waited = asyncio.run(go())
+    assert waited > 0 and lim.depth() == 0 and lim.granted[L.CANCEL] == 1
+
+def test_granted_then_cancelled_waiter_returns_token():
+    async def go():
+        lim = L(rate_per_sec=1e-3, burst=1)
+        await lim.acquire()                                 # bucket empty: the next caller queues
+        t = asyncio.create_task(lim.acquire(L.CANCEL, "x"))
+        await asyncio.sleep(0)
+        prio, fut, _ = lim._next()                          # what the dispatcher does once a token is back
+        lim.tokens += 1.0; lim._grant(prio, 0.0); fut.set_result(None)
+        t.cancel()                                          # ... and the caller is cancelled before resuming
+        await asyncio.gather(t, return_exceptions=True)
+        lim._dispatcher.cancel()
+        return lim
+    lim = asyncio.run(go())
+    assert lim.tokens >= 1.0 and lim.granted[L.CANCEL] == 0 and lim.depth() == 0
@@ -0,0 +1,31 @@
+import json, os, pytest
+from momentum.state.read_cache import JSONReadCache
+
+def test_revalidates_on_replace_and_inplace_write(tmp_path):
+    p = str(tmp_path / "positions.json")
+    with open(p, "w") as f:
+        json.dump({"ETH": {"qty": 1}}, f)
+    c = JSONReadCache()
+    a = c.load(p); a["ETH"]["qty"] = 99                      # copy mode: caller mutations stay private
+    assert c.load(p) == {"ETH": {"qty": 1}} and (c.hits, c.misses) == (1, 1)
+    fz = c.load(p, mode="frozen")
+    assert fz is c.load(p, mode="frozen") and isinstance(fz, dict) and json.dumps(fz)
+    with pytest.raises(TypeError):
+        fz["ETH"]["qty"] = 2
+
+    tmp = p + ".tmp"                                         # atomic replace -> new inode
+    with open(tmp, "w") as f:
+        json.dump({"ETH": {"qty": 2}}, f)
+    os.replace(tmp, p)
+    assert c.load(p)["ETH"]["qty"] == 2
+    with open(p, "w") as f:                                  # in-place rewrite -> size/mtime change
+        f.write('{"ETH": {"qty": 30}, "BTC": {}}')
+    assert c.load(p)["ETH"]["qty"] == 30 and c.misses == 3
+
+    with open(p, "w") as f:
+        f.write('{"half":')
+    with pytest.raises(ValueError):
+        c.load(p)
+    os.unlink(p)
+    assert c.get(p, "gone") == "gone" and p not in c.entries
+    assert "momentum_json_read_cache_hits_total 3" in c.prom_lines()
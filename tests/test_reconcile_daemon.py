@@ -0,0 +1,47 @@
+import asyncio, os, time
+from momentum.services import reconcile_daemon as rd
+
+def test_interval_follows_activity_and_backs_off():
+    iv = rd.AdaptiveInterval(min_s=5, open_s=30, idle_s=300, hot_s=120, backoff_max_s=900)
+    now = 10_000.0
+    assert iv.next(now) == (300, "idle")
+    iv.on_success(open_orders=2)
+    assert iv.next(now) == (30, "open")
+    iv.activity(now)
+    assert iv.next(now) == (5, "hot")
+    assert iv.next(now + 60)[0] == 17.5                        # relaxes linearly towards OPEN_SEC
+    iv.on_rate_limit(); iv.on_rate_limit()
+    d, why = iv.next(now)
+    assert why == "backoff" and 48 <= d <= 72                  # 2nd consecutive hit: ~2 x 30s
+    iv.on_success(open_orders=0)
+    assert iv.next(now + 500) == (300, "idle")
+
+class RateLimited(Exception):
+    pass
+
+def test_daemon_backoff_and_placement_wakeup(tmp_path, monkeypatch):
+    app = str(tmp_path)
+    os.makedirs(f"{app}/var", exist_ok=True)
+    calls = []
+    async def fake(app_path, dry_run=True, kraken=None):
+        calls.append(time.time())
+        if len(calls) == 1:
+            raise RateLimited("Kraken error: ['EAPI:Rate limit exceeded']")
+        return {"mode": "incremental", "trades": 0, "closed": 0, "diff_oo": {}, "diff_pos": {}}
+    monkeypatch.setattr("momentum.services.reconciliation.reconcile_incremental", fake)
+    monkeypatch.setattr(rd, "WATCH_SEC", 0.01)
+    d = rd.ReconcileDaemon(app, kraken=object(), interval=rd.AdaptiveInterval(min_s=0.05, open_s=1, idle_s=60, hot_s=10))
+
+    async def main():
+        d.probe.poll()
+        await d.step()
+        assert d.iv.next()[1] == "backoff" and d.rate_limits == 1
+        await d.step()
+        assert d.iv.next()[1] == "idle"
+        sleeper = asyncio.create_task(d.sleep(60))
+        await asyncio.sleep(0.05)
+        open(f"{app}/var/exec_history.json", "w").write("{}")     # an order was placed
+        return await asyncio.wait_for(sleeper, 2)
+    assert asyncio.run(main()) == "activity"
+    assert d.iv.next()[1] == "hot"
+    assert any(l.startswith("momentum_reconcile_interval_seconds") for l in d.prom_lines())
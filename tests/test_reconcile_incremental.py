@@ -0,0 +1,97 @@
+import asyncio, json, time
+import pytest
+from momentum.kraken import assets
+from momentum.services import reconciliation as rc
+from momentum.ws.ticker_cache import TickerCache
+
+@pytest.fixture(autouse=True)
+def _fresh(monkeypatch):
+    monkeypatch.setattr(rc, "REST_RATE", 1e6)
+    monkeypatch.setattr(rc, "REST_BURST", 1000)
+    monkeypatch.setattr(rc, "_loops", {})
+    assets._cached.clear()
+
+class FakeKraken:
+    def __init__(self):
+        self.open = {"O1": {"descr": {"pair": "ETHUSD", "type": "sell", "ordertype": "limit", "price": "3000"},
+                            "vol": "0.5", "vol_exec": "0", "status": "open", "opentm": 1.0}}
+        self.bal = {"ZUSD": "100", "XETH": "1.0"}
+        self.trades, self.closed, self.calls = {}, {}, []
+        self.inflight = self.peak = self.private_inflight = self.private_peak = 0
+    async def _hit(self, name, private=False):
+        self.calls.append(name)
+        self.inflight += 1; self.peak = max(self.peak, self.inflight)
+        self.private_inflight += private; self.private_peak = max(self.private_peak, self.private_inflight)
+        await asyncio.sleep(0.01)
+        self.inflight -= 1; self.private_inflight -= private
+    async def assets(self):
+        await self._hit("Assets"); return {"XETH": {"altname": "ETH"}, "XXBT": {"altname": "XBT"}, "ZUSD": {"altname": "USD"}}
+    async def asset_pairs(self):
+        await self._hit("AssetPairs")
+        return {"XETHZUSD": {"base": "XETH", "quote": "ZUSD", "altname": "ETHUSD", "wsname": "ETH/USD"},
+                "XXBTZUSD": {"base": "XXBT", "quote": "ZUSD", "altname": "XBTUSD", "wsname": "XBT/USD"}}
+    async def open_orders(self):
+        await self._hit("OpenOrders", True); return {"open": dict(self.open)}
+    async def balances(self):
+        await self._hit("Balance", True); return dict(self.bal)
+    async def ticker(self, csv):
+        await self._hit(f"Ticker:{csv}")
+        return {"XETHZUSD": {"a": ["2001"], "b": ["1999"]}, "XXBTZUSD": {"a": ["60010"], "b": ["59990"]}}
+    async def trades_history(self, start=None, ofs=0):
+        self.calls.append("TradesHistory")
+        rows = {k: v for k, v in self.trades.items() if v["time"] > start}
+        return {"trades": dict(list(rows.items())[ofs:ofs + 50]), "count": len(rows)}
+    async def closed_orders(self, start=None, ofs=0):
+        self.calls.append("ClosedOrders")
+        rows = {k: v for k, v in self.closed.items() if v["closetm"] > start}
+        return {"closed": dict(list(rows.items())[ofs:ofs + 50]), "count": len(rows)}
+
+def test_incremental_patch_dedupe_and_drift_audit(tmp_path):
+    app, k = str(tmp_path), FakeKraken()
+    run = lambda: asyncio.run(rc.reconcile_incremental(app, dry_run=False, kraken=k))
+    assert run()["mode"] == "full"
+    since = json.load(open(rc.cursor_path(app)))["since"]
+
+    k.calls.clear()
+    k.trades["T1"] = {"ordertxid": "O1", "pair": "XETHZUSD", "type": "sell", "vol": "0.5", "price": "3000", "time": since + 1}
+    k.closed["O1"] = {"status": "closed", "closetm": since + 1}
+    k.open.clear()
+    res = run()
+    assert res["mode"] == "incremental" and res["trades"] == 1 and res["drift"] is None
+    assert "Balance" not in k.calls
+    pos = json.load(open(f"{app}/var/positions.json"))["positions"]
+    assert pos["ETH"]["qty"] == 0.5 and json.load(open(f"{app}/var/open_orders_state.json")) == {"_schema": rc.SCHEMA_OPEN_ORDERS}
+
+    assert run()["trades"] == 0                                    # overlap window re-read, nothing re-applied
+    assert json.load(open(f"{app}/var/positions.json"))["positions"]["ETH"]["qty"] == 0.5
+
+    k.trades["T2"] = {"ordertxid": "O9", "pair": "XETHZUSD", "type": "sell", "vol": "2", "price": "3000", "time": since + 2}
+    assert run()["drift"] == "negative_position:ETH"
+    res = run()
+    assert res["mode"] == "full" and res["reason"] == "drift"
+
+def test_full_reconcile_overlaps_fetches_and_uses_cached_marks(tmp_path):
+    app, k = str(tmp_path), FakeKraken()
+    k.bal = {"ZUSD": "100", "XETH": "1.0", "XXBT": "0.5"}
+    tc = TickerCache()
+    tc.on_message({"channel": "ticker", "data": [{"symbol": "BTC/USD", "bid": 59000, "ask": 59002}]}, now=time.time())
+    tc.save(app)
+    asyncio.run(rc.reconcile(app, dry_run=False, kraken=k))
+    assert k.peak >= 3                                              # Assets/AssetPairs overlap the private calls
+    assert k.private_peak == 1                                      # OpenOrders/Balance never in flight together
+    assert [c for c in k.calls if c.startswith("Ticker")] == ["Ticker:XETHZUSD"]   # BTC came from the WS cache
+    pos = json.load(open(f"{app}/var/positions.json"))["positions"]
+    assert pos["XBT"]["mark_usd"] == 59001 and pos["ETH"]["mark_usd"] == 2000 and "USD" not in pos
+
+    k.calls.clear(); assets._cached.clear()
+    asyncio.run(rc.reconcile(app, dry_run=True, kraken=k))
+    assert "Assets" not in k.calls and "AssetPairs" not in k.calls    # index served from var/asset_index.json
+
+def test_rest_budget_is_per_event_loop(monkeypatch):
+    monkeypatch.setattr(rc, "REST_RATE", 0.01)
+    monkeypatch.setattr(rc, "REST_BURST", 3)
+    async def call():
+        return await rc._private(asyncio.sleep, 0, result="ok"), rc._loop_limits()
+    (r1, (b1, s1)), (r2, (b2, s2)) = asyncio.run(call()), asyncio.run(call())
+    assert r1 == r2 == "ok" and b1 is not b2 and s1 is not s2
+    assert b2.tokens < 2.0                                  # the second loop did not get a fresh burst
@@ -0,0 +1,82 @@
+
+import pytest
+from momentum.utils.risk_engine import RiskEngine, RiskLimits
+from momentum.utils.safety import SafetyViolation
+from momentum.ws.account import AccountBook
+
+LIMITS = RiskLimits(entry_max_notional=10.0, max_symbol_exposure=15.0, max_total_exposure=20.0, max_open_orders=3)
+
+def test_event_driven_exposure_and_rules():
+    eng = RiskEngine(LIMITS, equity_usd=100.0)
+    assert eng.check("BTC/USD", "buy", 0.0002, 30000.0) is None
+    assert eng.check("BTC/USD", "buy", 0.001, 30000.0).startswith("entry_max_notional_exceeded")
+    eng.on_order_open("BTC/USD", "buy", 0.0003, 30000.0)          # 9 USD pending
+    assert eng.check("BTC/USD", "buy", 0.0001, 30000.0) == "one_position_only:pending_entry"
+    eng.on_fill("BTC/USD", "buy", 0.0003, 30000.0)
+    eng.on_order_closed("BTC/USD", "buy", 0.0, 30000.0)
+    assert eng.pending == {} and abs(eng.total_exposure - 9.0) < 1e-9
+    eng.on_mark("BTC/USD", 40000.0)                               # position now 12 USD
+    assert abs(eng.exposure["BTC/USD"] - 12.0) < 1e-9
+    assert eng.check("ETH/USD", "buy", 0.005, 2000.0).startswith("total_exposure")   # 12 + 10 > 20
+    assert eng.check("BTC/USD", "sell", 0.0003, 40000.0) is None                     # exits pass
+    with pytest.raises(SafetyViolation):
+        eng.enforce("ETH/USD", "buy", 0.001, None)                                   # abs limit required
+
+def test_batch_and_book_sync():
+    b = AccountBook()
+    b.on_message({"channel": "executions", "type": "snapshot", "data": [
+        {"order_id": "O1", "symbol": "SOL/USD", "side": "buy", "order_qty": 0.1, "limit_price": 50.0, "order_status": "new"}]})
+    b.apply_balances([{"asset": "ETH", "balance": 0.002}, {"asset": "USD", "balance": 80.0}], snapshot=True)
+    eng = RiskEngine(RiskLimits(entry_max_notional=10.0, max_exposure_pct=0.2), equity_usd=80.0)
+    eng.sync_book(b, marks={"ETH/USD": 2500.0})
+    assert abs(eng.total_exposure - 10.0) < 1e-9 and eng.open_orders == 1
+    pairs = ["SOL/USD", "ETH/USD", "ADA/USD", "DOT/USD"]
+    assert eng.evaluate_batch(pairs, 1.0, 5.0) == ["one_position_only:pending_entry", "one_position_only:existing_position", None, None]
+    # cap = 0.2 * 80 = 16: only one more 5 USD entry fits when counted cumulatively
+    assert eng.evaluate_batch(["ADA/USD", "DOT/USD"], 1.0, 5.0, cumulative=True)[1].startswith("total_exposure")
+    assert eng.total_exposure == pytest.approx(10.0)
+    sized = RiskEngine(RiskLimits(entry_max_notional=10.0, entry_risk_pct=0.1), equity_usd=80.0).size_qty(2.0)
+    assert sized["final_qty"] == pytest.approx(4.0)
+
+def test_rest_names_and_book_positions_share_v2_symbols():
+    b = AccountBook()
+    b.apply_balances([{"asset": "XXBT", "balance": 0.0003}, {"asset": "ZUSD", "balance": 80.0}], snapshot=True)
+    eng = RiskEngine(RiskLimits(entry_max_notional=10.0), equity_usd=80.0)
+    eng.sync_book(b, marks={"XBTUSD": 30000.0})
+    assert eng.pos_qty == {"BTC/USD": pytest.approx(0.0003)} and eng.total_exposure == pytest.approx(9.0)
+    assert eng.evaluate_batch(["XBTUSD", "XXBTZUSD", "ETHUSD"], 1.0, 5.0) == ["one_position_only:existing_position"] * 2 + [None]
+
+def test_attached_engine_follows_the_private_stream_and_publishes(tmp_path, monkeypatch):
+    import asyncio, json, time
+    import aiohttp
+    from momentum.state.atomic_json import flush_pending
+    from momentum.utils import risk_engine
+    from momentum.ws.private import PrivateWSManager
+    from momentum.ws.ticker_cache import TickerCache
+    monkeypatch.setattr(risk_engine, "_RELOAD_SEC", 0.0)
+    class _WS:
+        def __init__(self, msgs):
+            self.msgs = [type("M", (), {"type": aiohttp.WSMsgType.TEXT, "data": json.dumps(m)}) for m in msgs]
+            self.msgs.append(type("M", (), {"type": aiohttp.WSMsgType.CLOSED, "data": None}))
+        async def receive(self):
+            return self.msgs.pop(0)
+    mgr = PrivateWSManager(str(tmp_path), streams=False)
+    eng = RiskEngine(LIMITS, equity_usd=100.0).attach(mgr)
+    new = {"channel": "executions", "type": "update", "sequence": 1, "data": [
+        {"order_id": "O1", "cl_ord_id": "p-E", "symbol": "BTC/USD", "side": "buy", "order_type": "limit",
+         "order_qty": 0.0003, "limit_price": 30000.0, "order_status": "new", "exec_type": "new"}]}
+    asyncio.run(mgr._consume(_WS([new])))
+    assert eng.pending == {"BTC/USD": 1} and eng.check("BTC/USD", "buy", 0.0001, 30000.0) == "one_position_only:pending_entry"
+    fill = {"channel": "executions", "type": "update", "sequence": 2, "data": [
+        {"order_id": "O1", "exec_type": "trade", "last_qty": 0.0003, "last_price": 30000.0, "order_status": "filled"}]}
+    asyncio.run(mgr._consume(_WS([fill])))
+    assert eng.pending == {} and eng.open_orders == 0 and eng.pos_qty == {"BTC/USD": pytest.approx(0.0003)}
+    tc = TickerCache()
+    tc.on_message({"channel": "ticker", "data": [{"symbol": "BTC/USD", "bid": 39990, "ask": 40010}]}, now=time.time())
+    tc.save(str(tmp_path)); flush_pending()
+    eng.refresh(str(tmp_path))                                   # mark from the public ticker cache
+    assert eng.exposure["BTC/USD"] == pytest.approx(12.0)
+    eng.save(str(tmp_path)); flush_pending()
+    shared = risk_engine.shared_risk_engine(str(tmp_path))
+    assert shared is not None and shared.total_exposure == pytest.approx(12.0)
+    assert shared.check("BTC/USD", "buy", 0.0001, 40000.0) == "one_position_only:existing_position"
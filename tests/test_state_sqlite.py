@@ -0,0 +1,36 @@
+import json, threading
+from momentum.state import store
+from momentum.state.sqlite_store import SQLiteStore
+
+def test_migrate_and_l1_api_on_sqlite(tmp_path, monkeypatch):
+    legacy = {"orders": {"O1": {"pair": "XBT/USD", "status": "open"}},
+              "fills": {"T1": {"ordertxid": "O1", "pair": "XBT/USD", "time": 10.0, "vol": "1"}},
+              "positions": {"XBT/USD": {"qty": 1.0}}, "pnl": {"realized": 12.5}}
+    (tmp_path / "state.json").write_text(json.dumps(legacy))
+    monkeypatch.setattr(store, "STATE_PATH", tmp_path / "state.json")
+    monkeypatch.setattr(store, "DB_PATH", tmp_path / "state.db")
+    monkeypatch.setattr(store, "BACKEND", "sqlite")
+    monkeypatch.setattr(store, "_db", None)
+
+    assert store.get_position("XBT/USD") == {"qty": 1.0}
+    assert store.pnl_summary() == {"realized": 12.5}
+    store.upsert_fill("T2", {"ordertxid": "O1", "pair": "XBT/USD", "time": 11.0})
+    store.upsert_order("O1", {"pair": "XBT/USD", "status": "closed"})
+    db = store._db
+    assert db.migrate_from_json(str(tmp_path / "state.json")) is None     # one-shot
+    assert [f["time"] for f in db.fills_for(order_id="O1")] == [10.0, 11.0]
+    assert db.get_order("O1")["status"] == "closed"
+    assert db.counts() == {"orders": 1, "fills": 2, "positions": 1, "pnl": 1}
+
+def test_concurrent_writers_lose_nothing(tmp_path):
+    path = str(tmp_path / "s.db")
+    def writer(w):
+        db = SQLiteStore(path)                          # own connection, like another process
+        for i in range(200):
+            db.upsert_fill(f"{w}-{i}", {"pair": "ETH/USD", "time": i})
+        db.close()
+    ts = [threading.Thread(target=writer, args=(w,)) for w in range(4)]
+    [t.start() for t in ts]; [t.join() for t in ts]
+    db = SQLiteStore(path)
+    db.upsert_fills((f"b{i}", {"pair": "SOL/USD", "time": i}) for i in range(50))
+    assert db.counts()["fills"] == 850 and len(db.fills_for(pair="SOL/USD", since=40)) == 10
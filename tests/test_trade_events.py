@@ -0,0 +1,160 @@
+
+import asyncio
+from momentum.services.trade_events import TradeEventEngine, classify_leg
+
+def _row(oid, clid, exec_type, status, qty=0.0, px=0.0):
+    return {"order_id": oid, "cl_ord_id": clid, "symbol": "ETH/USD", "exec_type": exec_type,
+            "order_status": status, "last_qty": qty, "last_price": px}
+
+def test_classify_leg():
+    assert classify_leg("oto-1-E") == ("oto-1", "E", 0)
+    assert classify_leg("oto-1-SL") == ("oto-1", "SL", 0)
+    assert classify_leg("oto-1-TP12") == ("oto-1", "TP", 12)
+    assert classify_leg("manual-x") is None and classify_leg(None) is None
+
+def test_engine_dispatches_plan_hooks():
+    eng = TradeEventEngine(default_hooks=True)
+    seen = []
+    eng.add_hook("tp1", lambda ev, plan: seen.append(("tp1", plan.base, plan.entry_avg)))
+    async def all_tp(ev, plan):
+        seen.append(("all_tp", plan.base))
+    eng.add_hook("all_tp", all_tp)
+    eng.on_message({"channel": "executions", "type": "snapshot", "data": [
+        _row("O2", "p-TP1", "new", "new"), _row("O3", "p-TP2", "new", "new")]})
+    eng.on_message({"channel": "executions", "type": "update", "data": [
+        _row("O1", "p-E", "trade", "filled", 0.2, 2000.0),
+        {"order_id": "O2", "exec_type": "trade", "order_status": "filled", "last_qty": 0.1, "last_price": 2100.0},
+        _row("O3", "p-TP2", "trade", "partially_filled", 0.05, 2200.0),
+        _row("O3", "p-TP2", "trade", "filled", 0.05, 2200.0),
+        _row("X", "manual", "trade", "filled", 1.0, 1.0)]})
+    assert eng.queue.qsize() == 4
+    async def drain():
+        fired = []
+        while not eng.queue.empty():
+            fired.append(await eng.dispatch(eng.queue.get_nowait()))
+        return fired
+    fired = asyncio.run(drain())
+    assert fired == [["fill", "entry_filled"], ["fill", "tp1"], ["fill"], ["fill", "all_tp"]]
+    assert seen == [("tp1", "p", 2000.0), ("all_tp", "p")]
+    assert eng.counts["fill"] == 4 and eng.hook_errors == 0 and eng.event_latency.count == 4
+    lines = eng.prom_lines()
+    assert any(l.startswith('momentum_trade_event_hook_seconds_count{hook="trader.on_fill"} 4') for l in lines)
+
+def test_breakeven_pipeline_coalesces_tp_fills(tmp_path):
+    from momentum.orders.breakeven import BreakevenPipeline
+    from momentum.orders.orchestrator import EntrySpec, SLSpec, TPLeg, build_oto_plan, record_plan
+    plan = build_oto_plan(EntrySpec("ETH/USD", "buy", "limit", 0.3, 2000.0, client_id="p"),
+                          [TPLeg(0.5, 2100.0), TPLeg(0.5, 2200.0)], SLSpec(1900.0), be_offset=2.0)
+    assert plan["be_trigger"] == 2002.0
+    record_plan(str(tmp_path), plan)
+    class _Conn:
+        armed = True
+        def __init__(self):
+            self.calls = []
+        async def call(self, method, params):
+            self.calls.append(params)
+            await asyncio.sleep(0.01)
+            return {"success": True, "result": {}}
+    conn = _Conn()
+    eng = TradeEventEngine(default_hooks=False)
+    be = BreakevenPipeline(str(tmp_path), conn)
+    be.attach(eng)
+    async def go():
+        eng.on_message({"channel": "executions", "type": "update", "data": [
+            _row("O1", "p-E", "trade", "filled", 0.3, 2000.0),
+            _row("O2", "p-TP1", "trade", "partially_filled", 0.05, 2100.0),
+            _row("O2", "p-TP1", "trade", "filled", 0.1, 2100.0),
+            _row("O3", "p-TP2", "trade", "partially_filled", 0.05, 2200.0)]})
+        while not eng.queue.empty():
+            await eng.dispatch(eng.queue.get_nowait())
+            await asyncio.sleep(0)      # let the amend worker reach the wire between fills
+        while be.state["p"].task is not None:
+            await asyncio.sleep(0.005)
+    asyncio.run(go())
+    # first amend on TP1, the two fills during flight collapse into one follow-up
+    assert [(c["cl_ord_id"], c["trigger_price"], c["order_qty"]) for c in conn.calls] == [
+        ("p-SL", "2002", "0.25"), ("p-SL", "2002", "0.1")]
+    assert be.coalesced == 2 and be.amends == 2 and be.fill_to_ack.count == 2
+
+def test_breakeven_trigger_snaps_to_tick_per_side(tmp_path):
+    import json
+    from momentum.orders.breakeven import BreakevenPipeline
+    from momentum.orders.orchestrator import be_amend_params, record_plan
+    from momentum.services.trade_events import PlanProgress
+    from momentum.utils.fixedpoint import PairSpec, wire_dumps
+    spec = PairSpec(price_decimals=2, lot_decimals=4)
+    long = be_amend_params(2000.004, 0.013, "l-SL", 0.12349, "buy", spec)
+    short = be_amend_params(2000.004, 0.013, "s-SL", 0.12349, "sell", spec)
+    assert (long["trigger_price"], long["order_qty"]) == ("2000.01", "0.1234")      # 2000.017 rounded down
+    assert short["trigger_price"] == "2000"                                          # 1999.991 rounded up
+    assert b'"trigger_price":2000.01' in wire_dumps({"params": long})
+    (tmp_path / "var").mkdir()
+    (tmp_path / "var" / "minlot.json").write_text(json.dumps(
+        {"ETH/USD": {"min_qty": 0.001, "lot_step": 0.0001, "price_decimals": 2}}))
+    record_plan(str(tmp_path), {"base_cid": "s", "legs": [], "pair": "ETH/USD", "side": "sell",
+                                "be_offset": 0.5, "volume": 0.2, "lot_decimals": 4})
+    plan = PlanProgress("s", entry_qty=0.2, entry_notional=0.2 * 1999.987, exit_qty=0.1)
+    be = BreakevenPipeline(str(tmp_path), conn=None)
+    assert be.target(plan) == ("s-SL", 1999.49, 0.1)                               # entry_avg - 0.5 = 1999.487, up
+
+def test_breakeven_retries_alerts_and_evicts(tmp_path, capsys):
+    from momentum.orders.breakeven import BreakevenPipeline
+    from momentum.orders.orchestrator import EntrySpec, SLSpec, TPLeg, build_oto_plan, record_plan
+    record_plan(str(tmp_path), build_oto_plan(EntrySpec("ETH/USD", "buy", "limit", 0.2, 2000.0, client_id="q"),
+                                              [TPLeg(0.5, 2100.0), TPLeg(0.5, 2200.0)], SLSpec(1900.0), be_offset=2.0))
+    class _Conn:
+        armed = True
+        def __init__(self, fail):
+            self.calls, self.fail = [], fail
+        async def call(self, method, params):
+            self.calls.append(params)
+            if len(self.calls) <= self.fail:
+                raise ConnectionError("socket closed")
+            return {"success": True, "result": {}}
+    async def feed(eng, be, rows):
+        eng.on_message({"channel": "executions", "type": "update", "data": rows})
+        while not eng.queue.empty():
+            await eng.dispatch(eng.queue.get_nowait())
+        while any(s.task is not None for s in be.state.values()):
+            await asyncio.sleep(0.001)
+    # two failures, then the same target goes through
+    eng, conn = TradeEventEngine(default_hooks=False), _Conn(fail=2)
+    be = BreakevenPipeline(str(tmp_path), conn, retry_base_s=0.001)
+    be.attach(eng)
+    asyncio.run(feed(eng, be, [_row("O1", "q-E", "trade", "filled", 0.2, 2000.0),
+                               _row("O2", "q-TP1", "trade", "filled", 0.1, 2100.0)]))
+    assert len(conn.calls) == 3 and be.retries == 2 and be.state["q"].sent == (2002.0, 0.1) and not be.unprotected
+    # the last TP closes the plan: nothing left to amend, state dropped
+    asyncio.run(feed(eng, be, [_row("O3", "q-TP2", "trade", "filled", 0.1, 2200.0)]))
+    assert "q" not in be.state and "q" not in be._plans and be.evicted == 1
+    # retries exhausted -> reported, kept for the next fill
+    eng, conn = TradeEventEngine(default_hooks=False), _Conn(fail=99)
+    be = BreakevenPipeline(str(tmp_path), conn, retry_base_s=0.001, max_attempts=3)
+    be.attach(eng)
+    asyncio.run(feed(eng, be, [_row("O1", "q-E", "trade", "filled", 0.2, 2000.0),
+                               _row("O2", "q-TP1", "trade", "filled", 0.1, 2100.0)]))
+    assert len(conn.calls) == 3 and be.exhausted == 1 and "socket closed" in be.unprotected["q"]
+    assert "ALERT q-SL" in capsys.readouterr().err and "momentum_be_unprotected_plans 1" in be.prom_lines()
+
+def test_engine_keeps_fills_under_backlog_and_evicts_finished_plans():
+    import threading
+    eng = TradeEventEngine(default_hooks=False, queue_max=2)
+    threads = []
+    eng.add_hook("fill", lambda ev, plan: threads.append(threading.current_thread() is threading.main_thread()))
+    eng.on_message({"channel": "executions", "type": "update", "data": [
+        _row("O1", "r-E", "trade", "filled", 0.2, 2000.0), _row("O2", "r-SL", "new", "new"),
+        _row("O3", "r-TP1", "new", "new"), _row("O2", "r-SL", "trade", "filled", 0.2, 1900.0),
+        _row("O4", "s-E", "trade", "partially_filled", 0.1, 10.0)]})
+    assert eng.queue.qsize() == 4 and eng.dropped == 1      # a status row is shed, every fill is queued
+    async def drain():
+        while not eng.queue.empty():
+            await eng.dispatch(eng.queue.get_nowait())
+    asyncio.run(drain())
+    assert threads == [False, False, False]                 # sync hooks run off the event loop thread
+    assert "r" not in eng.plans and "O1" not in eng._clids and "O2" not in eng._clids and eng.evicted == 1
+    assert list(eng.plans) == ["s"]
+    eng.on_message({"channel": "executions", "type": "update", "data": [_row("O3", "r-TP1", "canceled", "canceled")]})
+    assert eng.queue.empty() and "r" not in eng.plans
+    eng.on_message({"channel": "executions", "type": "update", "data": [_row("O5", "t-E", "canceled", "canceled")]})
+    asyncio.run(drain())
+    assert "t" not in eng.plans and eng.evicted == 2
@@ -0,0 +1,96 @@
+
+import random
+import pytest
+from momentum.orders.triggers import Trigger, TriggerEngine, exit_order
+
+def test_static_time_and_cancel():
+    fired = []
+    eng = TriggerEngine(sink=fired.extend)
+    sl = eng.add(Trigger("ETH/USD", "stop", "sell", 0.1, level=1900.0, ref="p"))
+    tp = eng.add(Trigger("ETH/USD", "take", "sell", 0.1, level=2100.0, ref="p"))
+    short_sl = eng.add(Trigger("ETH/USD", "stop", "buy", 0.2, level=2050.0))
+    eng.add(Trigger("SOL/USD", "time", "sell", 1.0, deadline=100.0))
+    assert eng.on_tick("ETH/USD", 2000.0) == []
+    assert eng.on_tick("ETH/USD", 2060.0) == [short_sl]
+    assert eng.cancel_ref("p") == 2 and eng.on_tick("ETH/USD", 1800.0) == []
+    assert [t.kind for t in eng.on_time(99.0)] == [] and [t.kind for t in eng.on_time(100.0)] == ["time"]
+    assert len(fired) == 2 and len(eng) == 0 and not sl.active and not tp.active
+    assert exit_order(short_sl)["params"] == {"order_type": "market", "side": "buy", "order_qty": 0.2, "symbol": "ETH/USD"}
+
+def test_trailing_ladder_matches_brute_force():
+    rnd = random.Random(3)
+    eng = TriggerEngine()
+    ref = {}                                    # tid -> [side, distance, peak]
+    px, fired_fast, fired_ref = 100.0, set(), set()
+    for step in range(4000):
+        if step % 5 == 0:
+            side = rnd.choice(("sell", "buy"))
+            t = eng.add(Trigger("X/USD", "trail", side, 1.0, distance=rnd.uniform(0.2, 3.0)), price=px)
+            ref[t.tid] = [side, t.distance, px]
+        px = max(1.0, px + rnd.gauss(0, 0.5))
+        fired_fast |= {t.tid for t in eng.on_tick("X/USD", px)}
+        for tid, (side, d, peak) in list(ref.items()):
+            peak = max(peak, px) if side == "sell" else min(peak, px)
+            ref[tid][2] = peak
+            if (side == "sell" and px <= peak - d) or (side == "buy" and px >= peak + d):
+                fired_ref.add(tid); del ref[tid]
+    assert fired_fast == fired_ref and len(fired_ref) > 100 and len(eng) == len(ref)
+
+def test_add_validates():
+    eng = TriggerEngine()
+    with pytest.raises(ValueError):
+        eng.add(Trigger("X/USD", "trail", "sell", 1.0, distance=1.0))      # no price yet
+    with pytest.raises(ValueError):
+        eng.add(Trigger("X/USD", "stop", "hold", 1.0, level=1.0))
+    assert len(eng) == 0
+
+def test_inbox_and_warm_restart(tmp_path):
+    from momentum.orders.triggers import drain_triggers, submit_triggers
+    app = str(tmp_path)
+    eng = TriggerEngine()
+    submit_triggers(app, [Trigger("ETH/USD", "trail", "sell", 0.5, distance=10.0, ref="p", peak=2000.0),
+                          Trigger("ETH/USD", "stop", "sell", 0.5, level=1900.0, ref="q")])
+    assert drain_triggers(eng, app) == 2 and eng.symbols() == ["ETH/USD"]
+    eng.on_tick("ETH/USD", 2050.0)
+    eng.save(app)
+    again = TriggerEngine.load(app)
+    assert [t.kind for t in again.on_tick("ETH/USD", 2039.0)] == ["trail"]     # peak 2050 survived the restart
+    submit_triggers(app, cancel_refs=["q"])
+    assert drain_triggers(again, app) == 1 and len(again) == 0
+
+def test_failed_sink_keeps_triggers_armed(tmp_path):
+    calls = []
+    def sink(fired):
+        calls.append([t.kind for t in fired])
+        if len(calls) == 1:
+            raise OSError("queue locked")
+    eng = TriggerEngine(sink=sink)
+    sl = eng.add(Trigger("ETH/USD", "stop", "sell", 0.1, level=1900.0, ref="p", deadline=50.0))
+    assert eng.on_tick("ETH/USD", 1890.0) == [] and sl.active and len(eng) == 1 and eng.sink_errors == 1
+    assert eng.on_time(60.0) == [sl] and not sl.active and len(eng) == 0   # handed back once, not twice
+    assert calls == [["stop"], ["stop"]] and sl.fired_price == 1890.0
+
+def test_exit_id_survives_restart_and_qty_rounds_to_lots(tmp_path):
+    from momentum.utils.fixedpoint import PairSpec
+    app = str(tmp_path)
+    eng = TriggerEngine()
+    t = eng.add(Trigger("ETH/USD", "stop", "sell", 0.123456789, level=1900.0, ref="plan-1"))
+    eng.save(app)
+    again = TriggerEngine.load(app)
+    (t2,) = again.by_id.values()
+    assert t2.uid == t.uid and exit_order(t2)["params"]["cl_ord_id"] == exit_order(t)["params"]["cl_ord_id"]
+    assert exit_order(t2, PairSpec(price_decimals=2, lot_decimals=4))["params"]["order_qty"] == "0.1234"
+
+def test_cancel_compacts_heaps():
+    from momentum.orders.triggers import COMPACT_MIN
+    eng = TriggerEngine()
+    ts = [eng.add(Trigger("X/USD", k, "sell", 1.0, level=10.0 + i, distance=1.0, deadline=1e12), price=100.0)
+          for i in range(300) for k in ("stop", "trail")]
+    keep = ts[-2:]
+    for t in ts[:-2]:
+        eng.cancel(t.tid)
+    lad, tl = eng.static["X/USD"], eng.trails[("X/USD", "sell")]
+    assert len(lad.down) + len(lad.up) < COMPACT_MIN and len(eng.deadlines) < COMPACT_MIN   # garbage stays bounded
+    eng.compact()
+    assert len(lad.down) + len(lad.up) == 1 and sum(len(b[1]) for b in tl.stack) == 1 and len(eng.deadlines) == 2
+    assert set(eng.on_tick("X/USD", 1.0)) == set(keep)
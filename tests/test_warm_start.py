@@ -0,0 +1,53 @@
+import asyncio, json, os, time
+from momentum.state.warm_start import WarmStart, warm_path
+from momentum.ws.public import PublicWSManager
+from momentum.orders.armed import ArmedOrderConnection
+from momentum.utils.safety import SafetyKnobs
+
+def test_sections_staleness_and_version(tmp_path):
+    app = str(tmp_path)
+    w = WarmStart(app, "svc", version=2)
+    w.put("fresh", {"a": [1, 2]})
+    w.put("old", [1], ts=time.time() - 3600)
+    w.save("strict")
+    r = WarmStart(app, "svc", version=2)
+    assert r.get("fresh", 60) == {"a": [1, 2]} and r.get("old", 60, default="cold") == "cold"
+    assert set(r.restored) == {"fresh"} and r.rejected == {"old": "stale"}
+    assert WarmStart(app, "svc", version=3).get("fresh", 60) is None           # shape changed: cold start
+    with open(warm_path(app, "svc"), "r+b") as f:                               # torn file: cold start
+        f.truncate(10)
+    assert WarmStart(app, "svc", version=2).get("fresh", 60) is None
+    assert os.stat(warm_path(app, "svc")).st_mode & 0o077 == 0
+
+def test_public_ws_restores_universe_marks_and_acked_symbols(tmp_path, monkeypatch):
+    app = str(tmp_path)
+    os.makedirs(f"{app}/var")
+    with open(f"{app}/var/universe.json", "w") as f:
+        json.dump({"universe": [{"pair": p} for p in ("BTC/USD", "ETH/USD", "SOL/USD")]}, f)
+    m = PublicWSManager(app)
+    m.restore()
+    assert m.ready_ts is None and m._batches(m.pairs)[1] == 0                     # cold: everything paced
+    m.tickers.on_message({"channel": "ticker", "data": [{"symbol": s, "bid": 1, "ask": 2} for s in m.pairs]})
+    m.subscribed |= {"BTC/USD", "ETH/USD"}
+    m.checkpoint("strict")
+
+    os.remove(f"{app}/var/universe.json")                                       # e.g. a deploy wiped it
+    w = PublicWSManager(app)
+    assert w.restore() == ["BTC/USD", "ETH/USD", "SOL/USD"]
+    assert w.ready_ts is not None and w.ready_ts - w.started_ts < 1.0
+    batches, fast = w._batches(w.pairs)
+    assert fast == 1 and batches[0] == ["BTC/USD", "ETH/USD"] and batches[1] == ["SOL/USD"]
+    sent = []
+    class _WS:
+        async def send(self, s): sent.append(time.monotonic())
+    w.batch_interval_ms = 200
+    t0 = time.monotonic()
+    asyncio.run(w._subscribe_in_batches(_WS(), w.pairs, 2))
+    assert sent[0] - t0 < 0.05 and sent[1] - sent[0] < 0.05                     # acked symbols not paced
+
+def test_armed_token_survives_restart(tmp_path):
+    knobs = SafetyKnobs(entry_max_notional=1e6, one_position_only=0)
+    ArmedOrderConnection(str(tmp_path), knobs=knobs).set_token("tok")
+    c = ArmedOrderConnection(str(tmp_path), knobs=knobs)
+    assert c.warm.get("token", c.token_refresh_s)["token"] == "tok"
+    assert c.warm.get("token", 0.0) is None                                     # past the refresh age: fetch anew